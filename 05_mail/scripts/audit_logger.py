@@ -15,11 +15,14 @@ import uuid
 import getpass
 import re
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import IO, List, Dict, Optional, Any
 from dataclasses import dataclass, asdict
 
 from .encryption import EncryptionManager
 
+SENT_LIST_HEADER = ["メールアドレス_enc", "会社名", "送信日時", "Message-ID"]
+UNSENT_LIST_HEADER = ["メールアドレス_enc", "会社名", "エラー内容"]
+
 
 @dataclass
 class AuditLogEntry:
@@ -82,33 +85,10 @@ class AuditLogger:
         failure_count = len(results) - success_count
 
         # 詳細情報を暗号化
-        encrypted_details = []
-        for result in results:
-            detail = {
-                "email_enc": self._encrypt_if_available(result.get("email", "")),
-                "company_name": result.get("company_name", ""),
-                "success": result.get("success", False),
-                "message_id": result.get("message_id", ""),
-                "sent_at": result.get("sent_at", ""),
-                "request_key": result.get("request_key", result.get("dedupe_key", "")),
-                "mail_key": result.get("mail_key", ""),
-                "dedupe_key_version": result.get("dedupe_key_version", ""),
-                "decision_trace": result.get("decision_trace", []),
-                "action": result.get("action", ""),
-            }
-            encrypted_details.append(detail)
+        encrypted_details = [self._audit_detail(result) for result in results]
 
         # エラー情報（メールアドレスはマスク）
-        errors = []
-        for result in results:
-            if not result.get("success"):
-                error_payload = result.get("error_details")
-                if error_payload in (None, ""):
-                    error_payload = result.get("error", "")
-                errors.append({
-                    "email_masked": self.mask_email_domain_only(result.get("email", "")),
-                    "error": self._mask_error_details(error_payload),
-                })
+        errors = [self._audit_error(result) for result in results if not result.get("success")]
 
         # ログエントリ作成
         entry = AuditLogEntry(
@@ -125,23 +105,92 @@ class AuditLogger:
         )
 
         # ファイル書き込み
-        timestamp = self.start_time.strftime("%Y%m%d_%H%M%S")
-        log_file = self.log_dir / f"audit_{timestamp}_{self.execution_id[:8]}.json"
+        log_file = self._audit_log_path()
 
         entry_dict = asdict(entry)
-        if product_info:
-            entry_dict["product_info"] = product_info
-        if workflow_context:
-            entry_dict["workflow_context"] = workflow_context
-            for key in ("request_id", "run_id", "workflow_mode", "send_mode"):
-                if key in workflow_context:
-                    entry_dict[key] = workflow_context.get(key, "")
+        entry_dict.update(self._audit_extras(product_info, workflow_context))
 
         with open(log_file, 'w', encoding='utf-8') as f:
             json.dump(entry_dict, f, ensure_ascii=False, indent=2)
 
         return str(log_file)
 
+    def open_stream(
+        self,
+        input_file: str,
+        product_info: Optional[Dict[str, str]] = None,
+        workflow_context: Optional[Dict[str, str]] = None,
+    ) -> "AuditStream":
+        """
+        結果を1件ずつ書き出す監査ログ・送信済み/未送信リストを開く。
+        出力ファイルの名前と内容は write_audit_log / write_sent_list /
+        write_unsent_list と同じで、保持するのは件数だけ。
+        """
+        return AuditStream(self, input_file, product_info, workflow_context)
+
+    def _audit_log_path(self) -> Path:
+        timestamp = self.start_time.strftime("%Y%m%d_%H%M%S")
+        return self.log_dir / f"audit_{timestamp}_{self.execution_id[:8]}.json"
+
+    def _sent_list_path(self) -> Path:
+        return self.log_dir / f"sent_list_{self.start_time.strftime('%Y%m%d_%H%M%S')}.csv"
+
+    def _unsent_list_path(self) -> Path:
+        return self.log_dir / f"unsent_list_{self.start_time.strftime('%Y%m%d_%H%M%S')}.csv"
+
+    def _audit_detail(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "email_enc": self._encrypt_if_available(result.get("email", "")),
+            "company_name": result.get("company_name", ""),
+            "success": result.get("success", False),
+            "message_id": result.get("message_id", ""),
+            "sent_at": result.get("sent_at", ""),
+            "request_key": result.get("request_key", result.get("dedupe_key", "")),
+            "mail_key": result.get("mail_key", ""),
+            "dedupe_key_version": result.get("dedupe_key_version", ""),
+            "decision_trace": result.get("decision_trace", []),
+            "action": result.get("action", ""),
+        }
+
+    def _audit_error(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        error_payload = result.get("error_details")
+        if error_payload in (None, ""):
+            error_payload = result.get("error", "")
+        return {
+            "email_masked": self.mask_email_domain_only(result.get("email", "")),
+            "error": self._mask_error_details(error_payload),
+        }
+
+    @staticmethod
+    def _audit_extras(
+        product_info: Optional[Dict[str, str]],
+        workflow_context: Optional[Dict[str, str]],
+    ) -> Dict[str, Any]:
+        extras: Dict[str, Any] = {}
+        if product_info:
+            extras["product_info"] = product_info
+        if workflow_context:
+            extras["workflow_context"] = workflow_context
+            for key in ("request_id", "run_id", "workflow_mode", "send_mode"):
+                if key in workflow_context:
+                    extras[key] = workflow_context.get(key, "")
+        return extras
+
+    def _sent_row(self, result: Dict[str, Any]) -> List[Any]:
+        return [
+            self._encrypt_if_available(result.get("email", "")),
+            result.get("company_name", ""),
+            result.get("sent_at", ""),
+            result.get("message_id", ""),
+        ]
+
+    def _unsent_row(self, result: Dict[str, Any]) -> List[Any]:
+        return [
+            self._encrypt_if_available(result.get("email", "")),
+            result.get("company_name", ""),
+            result.get("error", ""),
+        ]
+
     def write_sent_list(
         self,
         results: List[Dict[str, Any]],
@@ -157,28 +206,16 @@ class AuditLogger:
         Returns:
             ファイルパス
         """
-        timestamp = self.start_time.strftime("%Y%m%d_%H%M%S")
-        filename = f"sent_list_{timestamp}.csv"
-        filepath = self.log_dir / filename
+        filepath = self._sent_list_path()
 
         filtered = [r for r in results if r.get("success")] if success_only else results
 
         with open(filepath, 'w', encoding='utf-8', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow([
-                "メールアドレス_enc",
-                "会社名",
-                "送信日時",
-                "Message-ID"
-            ])
+            writer.writerow(SENT_LIST_HEADER)
 
             for result in filtered:
-                writer.writerow([
-                    self._encrypt_if_available(result.get("email", "")),
-                    result.get("company_name", ""),
-                    result.get("sent_at", ""),
-                    result.get("message_id", ""),
-                ])
+                writer.writerow(self._sent_row(result))
 
         return str(filepath)
 
@@ -195,26 +232,16 @@ class AuditLogger:
         Returns:
             ファイルパス
         """
-        timestamp = self.start_time.strftime("%Y%m%d_%H%M%S")
-        filename = f"unsent_list_{timestamp}.csv"
-        filepath = self.log_dir / filename
+        filepath = self._unsent_list_path()
 
         failed = [r for r in results if not r.get("success")]
 
         with open(filepath, 'w', encoding='utf-8', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow([
-                "メールアドレス_enc",
-                "会社名",
-                "エラー内容"
-            ])
+            writer.writerow(UNSENT_LIST_HEADER)
 
             for result in failed:
-                writer.writerow([
-                    self._encrypt_if_available(result.get("email", "")),
-                    result.get("company_name", ""),
-                    result.get("error", ""),
-                ])
+                writer.writerow(self._unsent_row(result))
 
         return str(filepath)
 
@@ -293,17 +320,8 @@ class AuditLogger:
         Returns:
             フォーマット済み文字列
         """
-        lines = ["=" * 50]
-        lines.append("送信結果サマリ")
-        lines.append("=" * 50)
-
         success_count = sum(1 for r in results if r.get("success"))
-        failure_count = len(results) - success_count
-
-        lines.append(f"総件数: {len(results)}")
-        lines.append(f"成功: {success_count}")
-        lines.append(f"失敗: {failure_count}")
-        lines.append("")
+        lines = self._screen_summary_lines(len(results), success_count)
 
         lines.append("-" * 50)
         lines.append("詳細:")
@@ -329,3 +347,131 @@ class AuditLogger:
 
         lines.append("=" * 50)
         return "\n".join(lines)
+
+    @staticmethod
+    def _screen_summary_lines(total: int, success_count: int) -> List[str]:
+        return [
+            "=" * 50,
+            "送信結果サマリ",
+            "=" * 50,
+            f"総件数: {total}",
+            f"成功: {success_count}",
+            f"失敗: {total - success_count}",
+            "",
+        ]
+
+
+class AuditStream:
+    """
+    送信結果を1件ずつ監査ログ・送信済み/未送信リストへ書き出す（AuditLogger.open_stream）。
+
+    監査ログ JSON の details / errors は一時ファイルへ追記しておき、close() で
+    write_audit_log と同じ構造の JSON に組み立てる。メモリに残すのは件数だけ。
+    """
+
+    def __init__(
+        self,
+        logger: AuditLogger,
+        input_file: str,
+        product_info: Optional[Dict[str, str]],
+        workflow_context: Optional[Dict[str, str]],
+    ):
+        self.logger = logger
+        self.input_file = input_file
+        self.product_info = product_info
+        self.workflow_context = workflow_context
+        self.total_count = 0
+        self.success_count = 0
+        self.audit_log_path = logger._audit_log_path()
+        self.sent_list_path = logger._sent_list_path()
+        self.unsent_list_path: Optional[Path] = None
+
+        self._details = open(self._spool_path("details"), "w+", encoding="utf-8")
+        self._errors = open(self._spool_path("errors"), "w+", encoding="utf-8")
+        self._sent_file = open(self.sent_list_path, "w", encoding="utf-8", newline="")
+        self._sent = csv.writer(self._sent_file)
+        self._sent.writerow(SENT_LIST_HEADER)
+        self._unsent_file: Optional[IO[str]] = None
+        self._unsent: Any = None
+
+    def _spool_path(self, part: str) -> Path:
+        return self.audit_log_path.with_name(f"{self.audit_log_path.name}.{part}.part")
+
+    def write(self, result: Dict[str, Any]) -> None:
+        logger = self.logger
+        self.total_count += 1
+        self._details.write(json.dumps(logger._audit_detail(result), ensure_ascii=False) + "\n")
+        if result.get("success"):
+            self.success_count += 1
+            self._sent.writerow(logger._sent_row(result))
+            return
+        self._errors.write(json.dumps(logger._audit_error(result), ensure_ascii=False) + "\n")
+        if self._unsent is None:
+            # 未送信リストは失敗が1件でもあるときだけ作る（write_unsent_list と同じ）。
+            self.unsent_list_path = logger._unsent_list_path()
+            self._unsent_file = open(self.unsent_list_path, "w", encoding="utf-8", newline="")
+            self._unsent = csv.writer(self._unsent_file)
+            self._unsent.writerow(UNSENT_LIST_HEADER)
+        self._unsent.writerow(logger._unsent_row(result))
+
+    def screen_output(self) -> str:
+        lines = self.logger._screen_summary_lines(self.total_count, self.success_count)
+        lines.append(f"詳細: {self.sent_list_path.name} / 監査ログ {self.audit_log_path.name}")
+        lines.append("=" * 50)
+        return "\n".join(lines)
+
+    def close(self) -> str:
+        """監査ログ JSON を確定してパスを返す。"""
+        logger = self.logger
+        self._sent_file.close()
+        if self._unsent_file is not None:
+            self._unsent_file.close()
+        header = {
+            "execution_id": logger.execution_id,
+            "start_time": logger.start_time.isoformat(),
+            "end_time": datetime.datetime.now().isoformat(),
+            "operator": logger.operator,
+            "input_file": Path(self.input_file).name,
+            "total_count": self.total_count,
+            "success_count": self.success_count,
+            "failure_count": self.total_count - self.success_count,
+        }
+        try:
+            with open(self.audit_log_path, "w", encoding="utf-8") as f:
+                f.write("{\n")
+                for key, value in header.items():
+                    f.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+                self._copy_array(f, "details", self._details)
+                f.write(",\n")
+                self._copy_array(f, "errors", self._errors)
+                for key, value in logger._audit_extras(self.product_info, self.workflow_context).items():
+                    f.write(f",\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}")
+                f.write("\n}\n")
+        finally:
+            self.discard()
+        return str(self.audit_log_path)
+
+    def discard(self) -> None:
+        """一時ファイルを閉じて消す（監査ログ JSON は作らない）。"""
+        for spool in (self._details, self._errors):
+            if not spool.closed:
+                spool.close()
+            try:
+                os.remove(spool.name)
+            except OSError:
+                pass
+        for handle in (self._sent_file, self._unsent_file):
+            if handle is not None and not handle.closed:
+                handle.close()
+
+    @staticmethod
+    def _copy_array(out: IO[str], key: str, spool: IO[str]) -> None:
+        spool.flush()
+        spool.seek(0)
+        out.write(f"  {json.dumps(key)}: [")
+        first = True
+        for line in spool:
+            out.write("\n    " if first else ",\n    ")
+            out.write(line.rstrip("\n"))
+            first = False
+        out.write("\n  ]" if not first else "]")
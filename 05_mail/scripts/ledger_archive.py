@@ -0,0 +1,260 @@
+"""
+ledger_archive.py - send_events の月次アーカイブ
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# zstandard は封印済みアーカイブの圧縮にのみ使う（オプショナル依存）
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+UTC = dt.timezone.utc
+
+ARCHIVE_PREFIX = "send_events_"
+ARCHIVE_SUFFIX = ".sqlite3"
+COMPRESSED_SUFFIX = ".sqlite3.zst"
+_ARCHIVE_NAME = re.compile(r"^send_events_(\d{6})\.sqlite3(\.zst)?$")
+
+
+def month_key(ts: dt.datetime) -> str:
+    return ts.astimezone(UTC).strftime("%Y%m")
+
+
+def month_bounds(key: str) -> Tuple[dt.datetime, dt.datetime]:
+    start = dt.datetime(int(key[:4]), int(key[4:]), 1, tzinfo=UTC)
+    end = dt.datetime(start.year + (start.month == 12), start.month % 12 + 1, 1, tzinfo=UTC)
+    return start, end
+
+
+class LedgerArchive:
+    """
+    send_events を月単位の SQLite ファイルへ退避する。
+    ホット台帳からはコピー確定後にのみ削除するため、途中で落ちても行は失われない
+    （再実行時は INSERT OR IGNORE で重複を吸収する）。
+    """
+
+    def __init__(
+        self,
+        archive_dir: Path,
+        open_conn: Callable[[], sqlite3.Connection],
+        compress: bool = False,
+    ):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._open_conn = open_conn
+        self.compress = bool(compress) and ZSTD_AVAILABLE
+
+    def _plain_path(self, key: str) -> Path:
+        return self.archive_dir / f"{ARCHIVE_PREFIX}{key}{ARCHIVE_SUFFIX}"
+
+    def _compressed_path(self, key: str) -> Path:
+        return self.archive_dir / f"{ARCHIVE_PREFIX}{key}{COMPRESSED_SUFFIX}"
+
+    def list_months(self) -> List[str]:
+        months = set()
+        for path in self.archive_dir.iterdir():
+            match = _ARCHIVE_NAME.match(path.name)
+            if match:
+                months.add(match.group(1))
+        return sorted(months)
+
+    def _decompress(self, src: Path, dst: Path) -> None:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"zstandard が未インストールのため展開できません: {src.name}")
+        tmp = dst.with_name(dst.name + ".tmp")
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            zstandard.ZstdDecompressor().copy_stream(fin, fout)
+        tmp.replace(dst)
+
+    def _writable_path(self, key: str) -> Path:
+        plain = self._plain_path(key)
+        compressed = self._compressed_path(key)
+        if not plain.exists() and compressed.exists():
+            # 封印後に遅れて届いた行のため一度展開する。
+            self._decompress(compressed, plain)
+            compressed.unlink()
+        return plain
+
+    def seal(self, key: str) -> bool:
+        plain = self._plain_path(key)
+        if not self.compress or not plain.exists():
+            return False
+        target = self._compressed_path(key)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(plain, "rb") as fin, open(tmp, "wb") as fout:
+            zstandard.ZstdCompressor(level=10).copy_stream(fin, fout)
+        tmp.replace(target)
+        plain.unlink()
+        return True
+
+    @contextmanager
+    def _attached(self, conn: sqlite3.Connection, path: Path) -> Iterator[None]:
+        conn.execute("ATTACH DATABASE ? AS arc;", (str(path),))
+        try:
+            yield
+        finally:
+            conn.execute("DETACH DATABASE arc;")
+
+    @contextmanager
+    def _readable_path(self, key: str) -> Iterator[Optional[Path]]:
+        plain = self._plain_path(key)
+        if plain.exists():
+            yield plain
+            return
+        compressed = self._compressed_path(key)
+        if not compressed.exists():
+            yield None
+            return
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / plain.name
+            self._decompress(compressed, target)
+            yield target
+
+    @staticmethod
+    def _columns(conn: sqlite3.Connection, schema: str) -> List[Tuple[str, str]]:
+        rows = conn.execute(f"PRAGMA {schema}.table_info(send_events);").fetchall()
+        return [(str(r[1]), str(r[2] or "")) for r in rows]
+
+    def _ensure_archive_schema(self, conn: sqlite3.Connection) -> List[str]:
+        main_cols = self._columns(conn, "main")
+        if not self._columns(conn, "arc"):
+            defs = ", ".join(
+                "id INTEGER PRIMARY KEY" if name == "id" else f"{name} {ctype}".strip()
+                for name, ctype in main_cols
+            )
+            conn.execute(f"CREATE TABLE arc.send_events ({defs});")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS arc.idx_arc_events_created ON send_events(created_at_utc);"
+            )
+        else:
+            existing = {name for name, _ in self._columns(conn, "arc")}
+            for name, ctype in main_cols:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE arc.send_events ADD COLUMN {name} {ctype};")
+        return [name for name, _ in main_cols]
+
+    def archive_before(self, cutoff: dt.datetime, chunk_size: int = 5000) -> Dict[str, int]:
+        """
+        created_at_utc が cutoff より古い行を月別ファイルへ移し、月ごとの移動件数を返す。
+        cutoff 以前に月末を迎えた月は封印し、compress 指定時は圧縮する。
+        """
+        cutoff_iso = cutoff.astimezone(UTC).isoformat()
+        chunk = max(1, int(chunk_size))
+        moved: Dict[str, int] = {}
+        conn = self._open_conn()
+        try:
+            rows = conn.execute(
+                "SELECT DISTINCT substr(created_at_utc, 1, 7) FROM send_events WHERE created_at_utc < ?;",
+                (cutoff_iso,),
+            ).fetchall()
+            keys = sorted(str(r[0]).replace("-", "") for r in rows if r[0])
+            for key in keys:
+                start, end = month_bounds(key)
+                lower = start.isoformat()
+                upper = min(end, cutoff.astimezone(UTC)).isoformat()
+                with self._attached(conn, self._writable_path(key)):
+                    columns = ", ".join(self._ensure_archive_schema(conn))
+                    while True:
+                        bound = conn.execute(
+                            """
+                            SELECT id FROM send_events
+                             WHERE created_at_utc >= ? AND created_at_utc < ?
+                             ORDER BY id LIMIT 1 OFFSET ?;
+                            """,
+                            (lower, upper, chunk - 1),
+                        ).fetchone()
+                        max_id = int(bound[0]) if bound else None
+                        id_clause = "" if max_id is None else f" AND id <= {max_id}"
+                        # 先にアーカイブ側を確定させ、その後で退避済みの行だけを削除する。
+                        conn.execute("BEGIN IMMEDIATE")
+                        try:
+                            conn.execute(
+                                f"""
+                                INSERT OR IGNORE INTO arc.send_events ({columns})
+                                SELECT {columns} FROM main.send_events
+                                 WHERE created_at_utc >= ? AND created_at_utc < ?{id_clause};
+                                """,
+                                (lower, upper),
+                            )
+                            conn.execute("COMMIT")
+                        except Exception:
+                            conn.execute("ROLLBACK")
+                            raise
+                        conn.execute("BEGIN IMMEDIATE")
+                        try:
+                            deleted = conn.execute(
+                                f"""
+                                DELETE FROM main.send_events
+                                 WHERE created_at_utc >= ? AND created_at_utc < ?{id_clause}
+                                   AND EXISTS (
+                                       SELECT 1 FROM arc.send_events a WHERE a.id = main.send_events.id
+                                   );
+                                """,
+                                (lower, upper),
+                            ).rowcount
+                            conn.execute("COMMIT")
+                        except Exception:
+                            conn.execute("ROLLBACK")
+                            raise
+                        moved[key] = moved.get(key, 0) + max(0, int(deleted))
+                        if max_id is None:
+                            break
+                if end <= cutoff.astimezone(UTC):
+                    self.seal(key)
+        finally:
+            conn.close()
+        return moved
+
+    def expire_before(self, cutoff: dt.datetime) -> List[str]:
+        """月末が cutoff 以前のアーカイブファイルを削除し、対象月を返す。"""
+        removed: List[str] = []
+        for key in self.list_months():
+            _, end = month_bounds(key)
+            if end > cutoff.astimezone(UTC):
+                continue
+            for path in (self._plain_path(key), self._compressed_path(key)):
+                if path.exists():
+                    path.unlink()
+            removed.append(key)
+        return removed
+
+    def query(
+        self,
+        where_sql: str,
+        params: Sequence[Any],
+        start: Optional[dt.datetime] = None,
+        end: Optional[dt.datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """期間に掛かる月のアーカイブを順に ATTACH し、同じ条件で send_events を検索する。"""
+        results: List[Dict[str, Any]] = []
+        conn = self._open_conn()
+        try:
+            for key in self.list_months():
+                month_start, month_end = month_bounds(key)
+                if start is not None and month_end <= start.astimezone(UTC):
+                    continue
+                if end is not None and month_start >= end.astimezone(UTC):
+                    continue
+                with self._readable_path(key) as path:
+                    if path is None:
+                        continue
+                    with self._attached(conn, path):
+                        rows = conn.execute(
+                            f"SELECT * FROM arc.send_events WHERE {where_sql};",
+                            tuple(params),
+                        ).fetchall()
+                        results.extend(dict(row) for row in rows)
+        finally:
+            conn.close()
+        return results
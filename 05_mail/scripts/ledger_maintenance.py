@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+ledger_maintenance.py - send ledger maintenance commands
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+SKILL_DIR = SCRIPT_DIR.parent
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SendLedger
+
+EXIT_OK = 0
+EXIT_INVALID_INPUT = 4
+
+
+def _load_config(config_path: str) -> Dict[str, Any]:
+    path = Path(config_path)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / path
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _build_ledger(config: Dict[str, Any]) -> SendLedger:
+    base_dir = Path(__file__).resolve().parents[1]
+    ledger_path_cfg = str(config.get("ledger_sqlite_path", "./logs/send_ledger.sqlite3"))
+    ledger_path = base_dir / ledger_path_cfg if not Path(ledger_path_cfg).is_absolute() else Path(ledger_path_cfg)
+    archive_dir_cfg = str(config.get("ledger_archive_dir", "") or "")
+    archive_dir = None
+    if archive_dir_cfg:
+        archive_dir = str(base_dir / archive_dir_cfg if not Path(archive_dir_cfg).is_absolute() else Path(archive_dir_cfg))
+    return SendLedger(
+        str(ledger_path),
+        retention_days=int(config.get("log_retention_days", 90)),
+        busy_timeout_ms=int(config.get("dedupe_busy_timeout_ms", 15000)),
+        backoff_attempts=int(config.get("dedupe_retry_attempts", 5)),
+        credential_target_name=str(config.get("credential_target_name", "")) or None,
+        sweep_chunk_size=int(config.get("ledger_sweep_chunk_size", 5000)),
+        archive_dir=archive_dir,
+        archive_hot_days=int(config.get("ledger_archive_hot_days", 7)),
+        archive_compress=bool(config.get("ledger_archive_compress", False)),
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Send ledger maintenance")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument(
+        "--rebuild-last-sent",
+        action="store_true",
+        help="rebuild last_sent from send_events",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="delete rows past retention in bounded chunks",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="move send_events past the hot window into monthly archive files",
+    )
+    parser.add_argument(
+        "--list-runs",
+        action="store_true",
+        help="list unfinished send runs that can be passed to --resume",
+    )
+    parser.add_argument(
+        "--max-chunks",
+        type=int,
+        default=None,
+        help="stop --sweep after this many chunks (default: until done)",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        config = _load_config(args.config)
+    except Exception as exc:
+        print(f"設定ファイル読込エラー: {exc}")
+        return EXIT_INVALID_INPUT
+
+    op_flags = [
+        bool(args.rebuild_last_sent),
+        bool(args.sweep),
+        bool(args.archive),
+        bool(args.list_runs),
+    ]
+    if sum(1 for f in op_flags if f) != 1:
+        print("操作は1つだけ指定してください: --rebuild-last-sent / --sweep / --archive / --list-runs")
+        return EXIT_INVALID_INPUT
+
+    ledger = _build_ledger(config)
+    try:
+        if args.rebuild_last_sent:
+            rows = ledger.rebuild_last_sent()
+            print(f"last_sent_rows={rows}")
+            return EXIT_OK
+        if args.sweep:
+            stats = ledger.sweep_retention(
+                rerun_window_hours=int(config.get("rerun_window_hours", 24)),
+                unknown_sent_hold_sec=int(config.get("unknown_sent_hold_sec", 1800)),
+                chunk_size=ledger.sweep_chunk_size,
+                max_chunks=args.max_chunks,
+            )
+            print(" ".join(f"{k}={v}" for k, v in stats.items()))
+            return EXIT_OK
+        if args.archive:
+            if ledger.archive is None:
+                print("ledger_archive_dir が未設定です")
+                return EXIT_INVALID_INPUT
+            result = ledger.archive_events(
+                rerun_window_hours=int(config.get("rerun_window_hours", 24)),
+            )
+            for key, count in sorted(result["moved"].items()):
+                print(f"archived {key} rows={count}")
+            for key in result["expired"]:
+                print(f"expired {key}")
+            return EXIT_OK
+        if args.list_runs:
+            for run in ledger.list_runs():
+                print(
+                    f"run_id={run['run_id']} done={int(run['high_water']) + 1}/{run['total']} "
+                    f"updated_at={run['updated_at_utc']}"
+                )
+            return EXIT_OK
+    finally:
+        ledger.close()
+    return EXIT_INVALID_INPUT
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,16 +7,27 @@ mail_sender.py - Outlookメール送信モジュール
 - リトライ機能（最大3回）
 - 代替ID生成（Message-ID取得失敗時）
 - 送信間隔制御
+- 送信経路の差し替え（Outlook / SMTP）
 """
 
 import datetime
+import functools
+import queue
 import re
+import smtplib
+import socket
+import threading
 import time
 import uuid
 import hashlib
-from typing import Optional, Dict, List, Tuple
+from email.message import EmailMessage
+from email import policy as email_policy
+from email.utils import formatdate, make_msgid
+from typing import Any, Callable, Optional, Dict, List, Sequence, Tuple
 from dataclasses import dataclass, field
 
+from .sent_items_query import SentItemsQuery, build_filter as build_sent_items_filter, window as sent_window
+
 # win32comは実行時にインポート
 try:
     import win32com.client
@@ -26,6 +37,37 @@ except ImportError:
     WIN32COM_AVAILABLE = False
 
 
+MESSAGE_ID_MODE_STAMPED = "stamped"
+MESSAGE_ID_MODE_LOOKUP = "lookup"
+
+
+@functools.lru_cache(maxsize=1)
+def _default_message_id_domain() -> str:
+    return socket.getfqdn() or "localhost"
+
+
+def build_stamped_message_id(idempotency_token: str, scope: str = "", domain: str = "") -> str:
+    """
+    idempotency トークンから決定的な Message-ID を作る。
+    同じ実行内の再送では同じ値になり、scope（run_id）が違えば別の値になる。
+    """
+    digest = hashlib.sha256(f"{idempotency_token}\n{scope}".encode("utf-8")).hexdigest()[:40]
+    return f"<{digest}@{domain or _default_message_id_domain()}>"
+
+
+@dataclass
+class PendingMessageIdLookup:
+    """送信後に非同期で行う Message-ID 取得（stamped=True は付与値の検証）"""
+    mail_item: Any
+    subject: str
+    recipient: str
+    sent_time_approx: datetime.datetime
+    provisional_id: str
+    stamped: bool = False
+    # 送信したスレッドでマーシャリング済みの mail_item（並行送信時に使う）
+    marshaled: Any = None
+
+
 @dataclass
 class SendResult:
     """送信結果"""
@@ -37,6 +79,7 @@ class SendResult:
     is_fallback_id: bool = False
     message_id_source: str = ""
     sent_at: datetime.datetime = None
+    pending_lookup: Optional[PendingMessageIdLookup] = None
 
 
 @dataclass
@@ -50,8 +93,582 @@ class SendSummary:
     end_time: datetime.datetime = None
 
 
+@dataclass
+class OutgoingMail:
+    """送信経路へ渡す1通分のメール（照合用マーカーは付与済み）"""
+    to: str
+    subject: str
+    text_body: str
+    html_body: Optional[str] = None
+    idempotency_token: str = ""
+    # 送信前に付与する Message-ID（空なら経路側で決める）
+    message_id: str = ""
+
+
+@dataclass
+class DeliveryResult:
+    """送信経路からの受け渡し結果"""
+    message_id: str
+    is_fallback_id: bool
+    message_id_source: str
+    sent_at: datetime.datetime
+    pending_lookup: Optional[PendingMessageIdLookup] = None
+
+
+class MailTransport:
+    """
+    送信経路の抽象。
+    リトライ・送信間隔・ドライランは OutlookMailSender 側で扱い、
+    経路は1通の受け渡しと Message-ID の確定だけを受け持つ。
+    """
+
+    name = ""
+
+    def deliver(self, mail: OutgoingMail) -> DeliveryResult:
+        raise NotImplementedError
+
+    def check_connection(self) -> Tuple[bool, str]:
+        raise NotImplementedError
+
+    def reconcile_unknown_send(
+        self,
+        token: str,
+        body_marker: str,
+        message_id: str,
+        subject: str,
+        recipient: str,
+        sent_after: Optional[datetime.datetime] = None,
+        sent_before: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        送信済みフォルダを持たない経路では照合できない。
+
+        sent_after / sent_before は送信しえた時刻の範囲。件名+宛先での照合はこの範囲に限り、
+        sent_after が無ければ件名+宛先では照合しない（同じ件名の過去の正規送信と取り違えないため）。
+
+        戻り値の checked は、送信済みを検索でき、その検索が最後まで正常に終わった場合だけ True。
+        matched=False かつ checked=True のときに限り「未送信」と判断してよい。
+        """
+        return {"matched": False, "method": "", "message_id": "", "checked": False}
+
+    def reconcile_unknown_batch(self, locks: Sequence[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数件の照合。locks の各要素は request_key / token / body_marker / message_id /
+        subject / recipient / sent_after / sent_before を持つ。既定では1件ずつ reconcile_unknown_send を呼ぶ。
+        """
+        return {
+            lock["request_key"]: self.reconcile_unknown_send(
+                token=lock.get("token", ""),
+                body_marker=lock.get("body_marker", ""),
+                message_id=lock.get("message_id", ""),
+                subject=lock.get("subject", ""),
+                recipient=lock.get("recipient", ""),
+                sent_after=lock.get("sent_after"),
+                sent_before=lock.get("sent_before"),
+            )
+            for lock in locks
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class OutlookTransport(MailTransport):
+    """Outlook（win32com）経由の送信経路。COM 操作は送信クラス側の実装を使う。"""
+
+    name = "outlook"
+
+    def __init__(self, sender: "OutlookMailSender"):
+        self._sender = sender
+
+    def deliver(self, mail: OutgoingMail) -> DeliveryResult:
+        return self._sender._deliver_via_outlook(mail)
+
+    def check_connection(self) -> Tuple[bool, str]:
+        return self._sender.check_outlook_connection()
+
+    def reconcile_unknown_send(
+        self,
+        token: str,
+        body_marker: str,
+        message_id: str,
+        subject: str,
+        recipient: str,
+        sent_after: Optional[datetime.datetime] = None,
+        sent_before: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Any]:
+        return self._sender._reconcile_in_sent_items(
+            token=token,
+            body_marker=body_marker,
+            message_id=message_id,
+            subject=subject,
+            recipient=recipient,
+            sent_after=sent_after,
+            sent_before=sent_before,
+        )
+
+    def reconcile_unknown_batch(self, locks: Sequence[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+        return self._sender._reconcile_batch_in_sent_items(locks)
+
+
+class SmtpAmbiguousDeliveryError(Exception):
+    """本文送出後に応答を受け取れず、受理されたか判断できない。"""
+
+
+class _SmtpSession:
+    """SmtpTransport が貸し出す1本分の接続と、その接続での送信通数"""
+
+    __slots__ = ("smtp", "sent")
+
+    def __init__(self) -> None:
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.sent = 0
+
+
+class SmtpTransport(MailTransport):
+    """
+    SMTP 送信経路。
+
+    - 接続は max_messages_per_connection 通まで使い回す
+    - 並行送信時は最大 max_connections 本の接続を貸し出す（1通ごとに1接続を占有）
+    - サーバが PIPELINING を広告していれば MAIL / RCPT / DATA を1往復で送る
+    - Message-ID は送信前に自前で採番するため、送信後のポーリングは不要
+    """
+
+    name = "smtp"
+    IDEMPOTENCY_HEADER = "X-Idempotency-Key"
+    # 再送で二重送信しないよう、リトライ対象のキーワードを含めない文言にする。
+    AMBIGUOUS_MESSAGE = "本文送出後にSMTPサーバの応答を受け取れず、送信結果が不明です"
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 25,
+        from_address: str = "",
+        username: str = "",
+        password: str = "",
+        starttls: bool = False,
+        use_ssl: bool = False,
+        timeout_sec: float = 30.0,
+        max_messages_per_connection: int = 100,
+        message_id_domain: str = "",
+        max_connections: int = 1,
+    ):
+        if not from_address:
+            raise ValueError("SMTP送信には smtp.from_address の設定が必要です。")
+        self.host = host
+        self.port = int(port)
+        self.from_address = from_address
+        self.username = username
+        self.password = password
+        self.starttls = bool(starttls)
+        self.use_ssl = bool(use_ssl)
+        self.timeout_sec = float(timeout_sec)
+        self.max_messages_per_connection = max(1, int(max_messages_per_connection))
+        self.message_id_domain = message_id_domain or from_address.rsplit("@", 1)[-1]
+
+        self.max_connections = max(1, int(max_connections))
+
+        self._idle: List[_SmtpSession] = []
+        self._sessions = 0
+        self._cond = threading.Condition()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout_sec)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout_sec)
+        try:
+            smtp.ehlo()
+            if self.starttls and not self.use_ssl:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    @staticmethod
+    def _drop(session: "_SmtpSession") -> None:
+        smtp, session.smtp = session.smtp, None
+        session.sent = 0
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _connection(self, session: "_SmtpSession") -> Tuple[smtplib.SMTP, bool]:
+        """(接続, 使い回しかどうか) を返す。"""
+        if session.smtp is not None and session.sent >= self.max_messages_per_connection:
+            self._drop(session)
+        if session.smtp is not None:
+            return session.smtp, True
+        session.smtp = self._connect()
+        session.sent = 0
+        return session.smtp, False
+
+    def _checkout(self) -> "_SmtpSession":
+        with self._cond:
+            while not self._idle and self._sessions >= self.max_connections:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._sessions += 1
+            return _SmtpSession()
+
+    def _checkin(self, session: "_SmtpSession") -> None:
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    def build_message(self, mail: OutgoingMail) -> Tuple[EmailMessage, str]:
+        message = EmailMessage()
+        message_id = mail.message_id or make_msgid(domain=self.message_id_domain)
+        message["From"] = self.from_address
+        message["To"] = mail.to
+        message["Subject"] = mail.subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = message_id
+        if mail.idempotency_token:
+            message[self.IDEMPOTENCY_HEADER] = str(mail.idempotency_token)
+        message.set_content(mail.text_body or "")
+        if mail.html_body:
+            message.add_alternative(mail.html_body, subtype="html")
+        return message, message_id
+
+    def deliver(self, mail: OutgoingMail) -> DeliveryResult:
+        message, message_id = self.build_message(mail)
+        payload = message.as_bytes(policy=email_policy.SMTP)
+        session = self._checkout()
+        try:
+            smtp, reused = self._connection(session)
+            sent_at = datetime.datetime.now()
+            try:
+                self._transaction(smtp, mail.to, payload)
+            except smtplib.SMTPServerDisconnected:
+                # 使い回し中の接続がサーバ側で閉じられていた（本文は未送出）。
+                self._drop(session)
+                if not reused:
+                    raise
+                smtp, _ = self._connection(session)
+                sent_at = datetime.datetime.now()
+                self._transaction(smtp, mail.to, payload)
+            except SmtpAmbiguousDeliveryError:
+                self._drop(session)
+                raise
+            session.sent += 1
+        finally:
+            self._checkin(session)
+        source = "stamped" if mail.message_id else "generated"
+        return DeliveryResult(message_id, False, source, sent_at)
+
+    @staticmethod
+    def _envelope_address(address: str) -> str:
+        """エンベロープ用に <addr-spec> へ整形する。改行を含むアドレスは送出前に拒否する。"""
+        if "\r" in address or "\n" in address:
+            raise ValueError(f"アドレスに改行文字が含まれています: {address!r}")
+        return smtplib.quoteaddr(address)
+
+    def _transaction(self, smtp: smtplib.SMTP, to: str, payload: bytes) -> None:
+        envelope_from = self._envelope_address(self.from_address)
+        envelope_to = self._envelope_address(to)
+        if not smtp.has_extn("pipelining"):
+            code, msg = smtp.mail(self.from_address)
+            if code != 250:
+                self._reset(smtp)
+                raise smtplib.SMTPSenderRefused(code, msg, self.from_address)
+            code, msg = smtp.rcpt(to)
+            if code not in (250, 251):
+                self._reset(smtp)
+                raise smtplib.SMTPRecipientsRefused({to: (code, msg)})
+            try:
+                code, msg = smtp.data(payload)
+            except smtplib.SMTPServerDisconnected as exc:
+                raise SmtpAmbiguousDeliveryError(self.AMBIGUOUS_MESSAGE) from exc
+            if code != 250:
+                raise smtplib.SMTPDataError(code, msg)
+            return
+
+        smtp.send(
+            f"MAIL FROM:{envelope_from}\r\nRCPT TO:{envelope_to}\r\nDATA\r\n".encode("utf-8")
+        )
+        replies = [smtp.getreply() for _ in range(3)]
+        (mail_code, mail_msg), (rcpt_code, rcpt_msg), (data_code, data_msg) = replies
+        if data_code != 354:
+            self._reset(smtp)
+            if mail_code != 250:
+                raise smtplib.SMTPSenderRefused(mail_code, mail_msg, self.from_address)
+            if rcpt_code not in (250, 251):
+                raise smtplib.SMTPRecipientsRefused({to: (rcpt_code, rcpt_msg)})
+            raise smtplib.SMTPDataError(data_code, data_msg)
+
+        body = re.sub(rb"(?m)^\.", b"..", payload)
+        if not body.endswith(b"\r\n"):
+            body += b"\r\n"
+        try:
+            smtp.send(body + b".\r\n")
+            code, msg = smtp.getreply()
+        except (smtplib.SMTPServerDisconnected, OSError) as exc:
+            raise SmtpAmbiguousDeliveryError(self.AMBIGUOUS_MESSAGE) from exc
+        if code != 250:
+            raise smtplib.SMTPDataError(code, msg)
+
+    @staticmethod
+    def _reset(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    def check_connection(self) -> Tuple[bool, str]:
+        session = self._checkout()
+        try:
+            smtp, _ = self._connection(session)
+            code, _ = smtp.noop()
+            if code == 250:
+                return True, f"SMTP接続OK ({self.host}:{self.port})"
+            return False, f"SMTP接続エラー: NOOP={code}"
+        except (smtplib.SMTPException, OSError, socket.timeout) as e:
+            self._drop(session)
+            return False, f"SMTP接続エラー: {e}"
+        finally:
+            self._checkin(session)
+
+    def close(self) -> None:
+        with self._cond:
+            for session in self._idle:
+                self._drop(session)
+
+
+class ResolveTicket:
+    """MessageIdResolver に投入した1件分の取得結果"""
+
+    def __init__(self, pending: PendingMessageIdLookup):
+        self.pending = pending
+        self.done = False
+        self.changed = False
+        self.message_id = pending.provisional_id
+        self.message_id_source = "stamped" if pending.stamped else "pending"
+        self.is_fallback_id = not pending.stamped
+
+
+def _marshal_for_thread(item: Any) -> Tuple[str, Any]:
+    # COM オブジェクトは別スレッドへ直接渡せないため、ストリームへマーシャリングする。
+    if WIN32COM_AVAILABLE and hasattr(item, "_oleobj_"):
+        stream = pythoncom.CoMarshalInterThreadInterfaceInStream(pythoncom.IID_IDispatch, item._oleobj_)
+        return "com", stream
+    return "py", item
+
+
+def _unmarshal_in_thread(token: Tuple[str, Any]) -> Any:
+    kind, value = token
+    if kind == "com":
+        return win32com.client.Dispatch(
+            pythoncom.CoGetInterfaceAndReleaseStream(value, pythoncom.IID_IDispatch)
+        )
+    return value
+
+
+class MessageIdResolver:
+    """
+    送信後の Message-ID 取得を専用スレッドで行う。
+    仮 ID で記録済みの行は on_resolved コールバック（台帳の更新など）で差し替える。
+    送信間隔の待ち時間と取得処理が重なるため、1通ごとの待ちが無くなる。
+    """
+
+    def __init__(self, sender: "OutlookMailSender"):
+        self._sender = sender
+        self._queue: "queue.Queue[Optional[Tuple[ResolveTicket, Tuple[str, Any], Optional[Callable[[ResolveTicket], None]]]]]" = queue.Queue()
+        self._cond = threading.Condition()
+        self._outstanding = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(
+        self,
+        pending: PendingMessageIdLookup,
+        on_resolved: Optional[Callable[[ResolveTicket], None]] = None,
+    ) -> ResolveTicket:
+        ticket = ResolveTicket(pending)
+        token = pending.marshaled if pending.marshaled is not None else _marshal_for_thread(pending.mail_item)
+        with self._cond:
+            self._outstanding += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="message-id-resolver", daemon=True)
+                self._thread.start()
+        self._queue.put((ticket, token, on_resolved))
+        return ticket
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return self._outstanding
+
+    def drain(self, timeout_sec: float) -> bool:
+        """投入済みの取得がすべて終わるまで最大 timeout_sec 待つ。間に合えば True。"""
+        deadline = time.monotonic() + max(0.0, float(timeout_sec))
+        with self._cond:
+            while self._outstanding > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout_sec: float = 0.0) -> None:
+        self.drain(timeout_sec)
+        with self._cond:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+
+    def _run(self) -> None:
+        if WIN32COM_AVAILABLE:
+            pythoncom.CoInitialize()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            ticket, token, on_resolved = job
+            try:
+                self._resolve(ticket, _unmarshal_in_thread(token))
+                if ticket.changed and on_resolved is not None:
+                    on_resolved(ticket)
+            except Exception:
+                # 取得できなければ仮 ID のまま残す（監査上は pending / fallback として扱う）。
+                pass
+            finally:
+                ticket.done = True
+                with self._cond:
+                    self._outstanding -= 1
+                    self._cond.notify_all()
+
+    def _resolve(self, ticket: ResolveTicket, mail_item: Any) -> None:
+        pending = ticket.pending
+        sender = self._sender
+        found, source = "", ""
+        if not pending.stamped:
+            found = sender._poll_message_id_from_mail_item(
+                mail_item=mail_item,
+                timeout_sec=sender.DIRECT_MESSAGE_ID_POLL_TIMEOUT_SEC,
+                interval_sec=sender.DIRECT_MESSAGE_ID_POLL_INTERVAL_SEC,
+            )
+            source = "direct"
+        if not found:
+            found = sender._get_message_id_from_sent_items(
+                subject=pending.subject,
+                recipient=pending.recipient,
+                sent_time_approx=pending.sent_time_approx,
+                time_window_sec=sender.SENT_TIME_WINDOW_SEC,
+            )
+            source = "sent_items"
+        if found and found != pending.provisional_id:
+            ticket.message_id, ticket.message_id_source, ticket.is_fallback_id = found, source, False
+            ticket.changed = True
+        elif not found and not pending.stamped:
+            ticket.message_id_source = "fallback"
+            ticket.changed = True
+
+
+class TokenBucket:
+    """
+    毎分 rate_per_min 個補充、最大 burst 個のトークンバケット。
+    時刻は呼び出し側が渡す（単調増加の秒）。予約済みの将来時刻まで先に進むことがある。
+    """
+
+    def __init__(self, rate_per_min: float, burst: int = 1, now: float = 0.0):
+        if rate_per_min <= 0:
+            raise ValueError("rate_per_min は正の値を指定してください。")
+        self.rate_per_sec = float(rate_per_min) / 60.0
+        self.capacity = float(max(1, int(burst)))
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, at: float) -> None:
+        if at > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (at - self.updated) * self.rate_per_sec)
+            self.updated = at
+
+    def ready_at(self, now: float) -> float:
+        """1トークン取り出せる最も早い時刻。"""
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return now
+        return self.updated + (1.0 - self.tokens) / self.rate_per_sec
+
+    def take(self, at: float) -> None:
+        self._refill(at)
+        self.tokens -= 1.0
+
+
+class SendRateLimiter:
+    """
+    全体のトークンバケットと、宛先ドメインごとのトークンバケットで送信ペースを制御する。
+    acquire は両方のトークンが揃う時刻をロック内で予約し、待ちはロックの外で行うため、
+    複数スレッドから呼んでも別ドメイン宛ての送信は互いを待たない。
+    """
+
+    def __init__(
+        self,
+        global_per_min: float = 0,
+        per_domain_per_min: float = 0,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.global_per_min = float(global_per_min or 0)
+        self.per_domain_per_min = float(per_domain_per_min or 0)
+        self.burst = max(1, int(burst))
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._global: Optional[TokenBucket] = None
+        if self.global_per_min > 0:
+            self._global = TokenBucket(self.global_per_min, self.burst, now=clock())
+        self._domains: Dict[str, TokenBucket] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.global_per_min > 0 or self.per_domain_per_min > 0
+
+    @staticmethod
+    def domain_of(recipient: str) -> str:
+        address = str(recipient or "").strip().strip("<>").lower()
+        return address.rsplit("@", 1)[-1] if "@" in address else address
+
+    def reserve(self, recipient: str) -> float:
+        """送信枠を予約し、送信してよい時刻（clock 基準）を返す。"""
+        with self._lock:
+            now = self._clock()
+            buckets: List[TokenBucket] = []
+            if self._global is not None:
+                buckets.append(self._global)
+            if self.per_domain_per_min > 0:
+                domain = self.domain_of(recipient)
+                bucket = self._domains.get(domain)
+                if bucket is None:
+                    bucket = TokenBucket(self.per_domain_per_min, self.burst, now=now)
+                    self._domains[domain] = bucket
+                buckets.append(bucket)
+            start = max([now] + [bucket.ready_at(now) for bucket in buckets])
+            for bucket in buckets:
+                bucket.take(start)
+            return start
+
+    def acquire(self, recipient: str) -> float:
+        """送信枠が空くまで待つ。待った秒数を返す。"""
+        start = self.reserve(recipient)
+        wait = start - self._clock()
+        if wait > 0:
+            self._sleep(wait)
+            return wait
+        return 0.0
+
+
 class OutlookMailSender:
-    """Outlookメール送信クラス"""
+    """Outlookメール送信クラス（送信経路は transport で差し替え可能）"""
 
     # Message-ID取得用MAPIプロパティ
     MESSAGE_ID_PROPERTY = "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
@@ -60,10 +677,14 @@ class OutlookMailSender:
     MESSAGE_HEADER_PROPERTY = "http://schemas.microsoft.com/mapi/proptag/0x007D001F"
     IDEMPOTENCY_HEADER_URN = "urn:schemas:mailheader:x-idempotency-key"
     SENT_FOLDER_ID = 5  # olFolderSentMail
+    OUTBOX_FOLDER_ID = 4  # olFolderOutbox
     SENT_TIME_WINDOW_SEC = 180
     DIRECT_MESSAGE_ID_POLL_INTERVAL_SEC = 0.5
     DIRECT_MESSAGE_ID_POLL_TIMEOUT_SEC = 8.0
     MAX_SENT_ITEMS_SCAN = 200
+    RECONCILE_LOOKBACK_DAYS = 7
+    MAX_RECONCILE_BATCH_ROWS = 5000
+    RECONCILE_MARKERS_PER_QUERY = 50
 
     def __init__(
         self,
@@ -72,7 +693,12 @@ class OutlookMailSender:
         retry_interval_sec: float = 3.0,
         message_id_retry_count: int = 3,
         message_id_retry_interval_sec: float = 2.0,
-        dry_run: bool = False
+        dry_run: bool = False,
+        transport: Optional[MailTransport] = None,
+        message_id_mode: str = MESSAGE_ID_MODE_LOOKUP,
+        message_id_domain: str = "",
+        async_message_id: bool = False,
+        rate_limiter: Optional[SendRateLimiter] = None,
     ):
         """
         Args:
@@ -82,6 +708,13 @@ class OutlookMailSender:
             message_id_retry_count: Message-ID取得リトライ回数
             message_id_retry_interval_sec: Message-ID取得リトライ間隔（秒）
             dry_run: ドライランモード（実際には送信しない）
+            transport: 送信経路（None は Outlook）
+            message_id_mode: stamped は送信前に決定的な Message-ID を付与して確定値とする。
+                lookup は送信後に MailItem / 送信済みフォルダから取得する
+            message_id_domain: 付与する Message-ID のドメイン（空ならホスト名）
+            async_message_id: 送信後の Message-ID 取得・検証を MessageIdResolver に任せ、
+                send_mail は仮 ID ですぐに返す
+            rate_limiter: 全体・宛先ドメイン別の送信ペース（指定時は send_interval_sec の代わりに使う）
         """
         self.send_interval_sec = send_interval_sec
         self.retry_count = retry_count
@@ -89,9 +722,18 @@ class OutlookMailSender:
         self.message_id_retry_count = message_id_retry_count
         self.message_id_retry_interval_sec = message_id_retry_interval_sec
         self.dry_run = dry_run
-
-        self._outlook = None
+        if message_id_mode not in (MESSAGE_ID_MODE_STAMPED, MESSAGE_ID_MODE_LOOKUP):
+            raise ValueError(f"未対応の message_id_mode です: {message_id_mode}")
+        self.message_id_mode = message_id_mode
+        self.message_id_domain = message_id_domain
+        self.async_message_id = async_message_id
+        self.rate_limiter = rate_limiter if rate_limiter is not None and rate_limiter.enabled else None
+
+        # COM オブジェクトはスレッド（アパートメント）ごとに取得する
+        self._com_state = threading.local()
         self._last_send_time: Optional[datetime.datetime] = None
+        self._interval_lock = threading.Lock()
+        self.transport: MailTransport = transport or OutlookTransport(self)
 
     def _get_outlook(self):
         """Outlookアプリケーションを取得"""
@@ -100,11 +742,13 @@ class OutlookMailSender:
                 "win32comが利用できません。pywin32をインストールしてください。"
             )
 
-        if self._outlook is None:
+        outlook = getattr(self._com_state, "outlook", None)
+        if outlook is None:
             pythoncom.CoInitialize()
-            self._outlook = win32com.client.Dispatch("Outlook.Application")
+            outlook = win32com.client.Dispatch("Outlook.Application")
+            self._com_state.outlook = outlook
 
-        return self._outlook
+        return outlook
 
     def send_mail(
         self,
@@ -115,6 +759,7 @@ class OutlookMailSender:
         html_body: Optional[str] = None,
         idempotency_token: str = "",
         body_reconcile_marker: str = "",
+        message_id_scope: str = "",
     ) -> SendResult:
         """
         メールを送信する。
@@ -125,6 +770,7 @@ class OutlookMailSender:
             body: 本文（プレーンテキスト）
             company_name: 会社名（ログ用）
             html_body: HTML本文（オプション）
+            message_id_scope: stamped モードで Message-ID に混ぜる値（通常は run_id）
 
         Returns:
             SendResult
@@ -136,7 +782,10 @@ class OutlookMailSender:
         )
 
         # 送信間隔を確保
-        self._wait_for_interval()
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(to)
+        else:
+            self._wait_for_interval()
 
         # ドライランモード
         if self.dry_run:
@@ -146,53 +795,42 @@ class OutlookMailSender:
             result.sent_at = datetime.datetime.now()
             return result
 
-        # 送信実行（リトライ付き）
-        for attempt in range(self.retry_count + 1):
-            try:
-                outlook = self._get_outlook()
-                mail = outlook.CreateItem(0)  # 0 = olMailItem
-                mail.To = to
-                mail.Subject = subject
-
-                text_body = body
-                html_payload = html_body
-                if body_reconcile_marker:
-                    marker = str(body_reconcile_marker).strip()
-                    if marker:
-                        if html_payload:
-                            html_payload = f"{html_payload}<br><br><!-- {marker} -->"
-                        else:
-                            text_body = f"{text_body}\n\n{marker}"
-
+        text_body = body
+        html_payload = html_body
+        if body_reconcile_marker:
+            marker = str(body_reconcile_marker).strip()
+            if marker:
                 if html_payload:
-                    mail.HTMLBody = html_payload
+                    html_payload = f"{html_payload}<br><br><!-- {marker} -->"
                 else:
-                    mail.Body = text_body
-
-                if idempotency_token:
-                    self._set_idempotency_header(mail, idempotency_token)
-
-                # 送信前に情報を記録
-                subject_before_send = mail.Subject
-                recipient_before_send = mail.To
-                sent_time_approx = datetime.datetime.now()
-
-                mail.Send()
-                self._last_send_time = datetime.datetime.now()
+                    text_body = f"{text_body}\n\n{marker}"
+        outgoing = OutgoingMail(
+            to=to,
+            subject=subject,
+            text_body=text_body,
+            html_body=html_payload,
+            idempotency_token=idempotency_token,
+        )
+        if self.message_id_mode == MESSAGE_ID_MODE_STAMPED and idempotency_token:
+            outgoing.message_id = build_stamped_message_id(
+                idempotency_token,
+                scope=message_id_scope,
+                domain=self.message_id_domain,
+            )
 
-                # Message-ID取得
-                message_id, is_fallback, message_id_source = self._get_message_id_with_source(
-                    mail,
-                    subject_before_send,
-                    recipient_before_send,
-                    sent_time_approx
-                )
+        # 送信実行（リトライ付き）
+        for attempt in range(self.retry_count + 1):
+            try:
+                delivery = self.transport.deliver(outgoing)
+                if self._last_send_time is None or self._last_send_time < delivery.sent_at:
+                    self._last_send_time = delivery.sent_at
 
                 result.success = True
-                result.message_id = message_id
-                result.is_fallback_id = is_fallback
-                result.message_id_source = message_id_source
-                result.sent_at = sent_time_approx
+                result.message_id = delivery.message_id
+                result.is_fallback_id = delivery.is_fallback_id
+                result.message_id_source = delivery.message_id_source
+                result.sent_at = delivery.sent_at
+                result.pending_lookup = delivery.pending_lookup
                 return result
 
             except Exception as e:
@@ -208,6 +846,76 @@ class OutlookMailSender:
 
         return result
 
+    def _deliver_via_outlook(self, outgoing: OutgoingMail) -> DeliveryResult:
+        """Outlook で1通送信し、Message-ID を確定する。"""
+        outlook = self._get_outlook()
+        mail = outlook.CreateItem(0)  # 0 = olMailItem
+        mail.To = outgoing.to
+        mail.Subject = outgoing.subject
+
+        if outgoing.html_body:
+            mail.HTMLBody = outgoing.html_body
+        else:
+            mail.Body = outgoing.text_body
+
+        if outgoing.idempotency_token:
+            self._set_idempotency_header(mail, outgoing.idempotency_token)
+        stamped = bool(outgoing.message_id) and self._stamp_message_id(mail, outgoing.message_id)
+
+        # 送信前に情報を記録
+        subject_before_send = mail.Subject
+        recipient_before_send = mail.To
+        sent_time_approx = datetime.datetime.now()
+
+        mail.Send()
+        self._last_send_time = datetime.datetime.now()
+        if stamped and self.async_message_id:
+            # 付与した値を確定値とし、検証は MessageIdResolver の送信済み検索に任せる。
+            delivery = DeliveryResult(outgoing.message_id, False, "stamped", sent_time_approx)
+            delivery.pending_lookup = PendingMessageIdLookup(
+                mail, subject_before_send, recipient_before_send, sent_time_approx,
+                outgoing.message_id, stamped=True, marshaled=_marshal_for_thread(mail),
+            )
+            return delivery
+        if stamped and self._read_back_message_id(mail) == outgoing.message_id:
+            # 同期モードは送信後に1回だけ読み戻し、付与値が残っていれば確定値とする。
+            # 書き換えられていれば下の取得経路で実際の値を引く。
+            return DeliveryResult(outgoing.message_id, False, "stamped", sent_time_approx)
+        if self.async_message_id:
+            # 取得は MessageIdResolver に任せ、仮 ID で先に返す。
+            provisional = self._generate_fallback_id(subject_before_send, sent_time_approx)
+            return DeliveryResult(
+                provisional, True, "pending", sent_time_approx,
+                pending_lookup=PendingMessageIdLookup(
+                    mail, subject_before_send, recipient_before_send, sent_time_approx, provisional,
+                    marshaled=_marshal_for_thread(mail),
+                ),
+            )
+
+        # Message-ID取得
+        message_id, is_fallback, message_id_source = self._get_message_id_with_source(
+            mail,
+            subject_before_send,
+            recipient_before_send,
+            sent_time_approx
+        )
+        return DeliveryResult(message_id, is_fallback, message_id_source, sent_time_approx)
+
+    def _stamp_message_id(self, mail_item, message_id: str) -> bool:
+        """送信前の MailItem に Message-ID を設定する。設定できなければ False。"""
+        try:
+            mail_item.PropertyAccessor.SetProperty(self.MESSAGE_ID_PROPERTY, message_id)
+            return True
+        except Exception:
+            return False
+
+    def _read_back_message_id(self, mail_item) -> str:
+        """送信後の MailItem から Message-ID を1回だけ読む。読めなければ空文字。"""
+        try:
+            return str(mail_item.PropertyAccessor.GetProperty(self.MESSAGE_ID_PROPERTY) or "").strip()
+        except Exception:
+            return ""
+
     def _set_idempotency_header(self, mail_item, token: str) -> None:
         """可能な範囲で idempotency ヘッダを設定する。"""
         if mail_item is None:
@@ -219,13 +927,15 @@ class OutlookMailSender:
             return
 
     def _wait_for_interval(self):
-        """送信間隔を確保する"""
-        if self._last_send_time is None:
-            return
-
-        elapsed = (datetime.datetime.now() - self._last_send_time).total_seconds()
-        if elapsed < self.send_interval_sec:
-            time.sleep(self.send_interval_sec - elapsed)
+        """送信間隔を確保する（並行送信時も送信開始の間隔が send_interval_sec 以上になる）"""
+        with self._interval_lock:
+            if self._last_send_time is not None:
+                elapsed = (datetime.datetime.now() - self._last_send_time).total_seconds()
+                if elapsed < self.send_interval_sec:
+                    time.sleep(self.send_interval_sec - elapsed)
+            if not self.dry_run:
+                # 送信開始時刻を予約しておき、並行する次の送信はここから間隔を取る。
+                self._last_send_time = datetime.datetime.now()
 
     def _get_message_id(
         self,
@@ -299,6 +1009,27 @@ class OutlookMailSender:
             time.sleep(interval_sec)
         return ""
 
+    def _open_sent_items_query(self) -> SentItemsQuery:
+        outlook = self._get_outlook()
+        namespace = outlook.GetNamespace("MAPI")
+        sent_folder = namespace.GetDefaultFolder(self.SENT_FOLDER_ID)
+        return SentItemsQuery(sent_folder, max_rows=self.MAX_SENT_ITEMS_SCAN)
+
+    def _open_outbox_query(self) -> SentItemsQuery:
+        namespace = self._get_outlook().GetNamespace("MAPI")
+        return SentItemsQuery(namespace.GetDefaultFolder(self.OUTBOX_FOLDER_ID), max_rows=self.MAX_RECONCILE_BATCH_ROWS)
+
+    def _waiting_in_outbox(self, rows: Sequence[Any], subject: str, recipient_norm: Any) -> bool:
+        """送信トレイに件名・宛先が一致するアイテムが残っているか（Send() 済みで未送出の可能性）。"""
+        for row in rows:
+            if row.subject != subject:
+                continue
+            item_to = self._normalize_recipients(row.to)
+            if recipient_norm and item_to and not self._recipient_matches(recipient_norm, item_to):
+                continue
+            return True
+        return False
+
     def _get_message_id_from_sent_items(
         self,
         subject: str,
@@ -306,60 +1037,35 @@ class OutlookMailSender:
         sent_time_approx: datetime.datetime,
         time_window_sec: int = 180,
     ) -> str:
-        """送信済みフォルダからMessage-IDを再検索する。"""
+        """送信済みフォルダからMessage-IDを再検索する（件名・送信日時で絞り込み）。"""
         recipient_expected = self._normalize_recipients(recipient)
-        sent_time_base = self._normalize_datetime(sent_time_approx)
+        min_allowed_time, max_allowed_time = sent_window(
+            self._normalize_datetime(sent_time_approx), time_window_sec
+        )
+        dasl = build_sent_items_filter(
+            subject=str(subject).strip(),
+            sent_from=min_allowed_time,
+            sent_to=max_allowed_time,
+        )
         for attempt in range(self.message_id_retry_count):
             try:
-                outlook = self._get_outlook()
-                namespace = outlook.GetNamespace("MAPI")
-                sent_folder = namespace.GetDefaultFolder(self.SENT_FOLDER_ID)
-                items = sent_folder.Items
-                items.Sort("[SentOn]", True)  # 降順
-
-                scanned = 0
-                min_allowed_time = sent_time_base - datetime.timedelta(seconds=time_window_sec)
-                max_allowed_time = sent_time_base + datetime.timedelta(seconds=time_window_sec)
-
-                for item in items:
-                    scanned += 1
-                    if scanned > self.MAX_SENT_ITEMS_SCAN:
-                        break
-
-                    try:
-                        item_subject = str(getattr(item, "Subject", "")).strip()
-                        if item_subject != str(subject).strip():
-                            continue
-
-                        item_sent_on_raw = getattr(item, "SentOn", None)
-                        if not isinstance(item_sent_on_raw, datetime.datetime):
-                            continue
-                        item_sent_on = self._normalize_datetime(item_sent_on_raw)
-
-                        if item_sent_on < min_allowed_time:
-                            continue
-                        if item_sent_on > max_allowed_time:
-                            continue
-
-                        actual_recipients = self._normalize_recipients(
-                            str(getattr(item, "To", ""))
-                        )
-                        if (
-                            recipient_expected
-                            and actual_recipients
-                            and not self._recipient_matches(recipient_expected, actual_recipients)
-                        ):
-                            continue
-
-                        message_id = self._extract_message_id_from_item(item)
-                        if message_id:
-                            return message_id
-
-                        surrogate_id = self._build_sent_item_surrogate_id(item)
-                        if surrogate_id:
-                            return surrogate_id
-                    except Exception:
+                for row in self._open_sent_items_query().find(dasl):
+                    if row.sent_on is None:
                         continue
+                    if row.sent_on < min_allowed_time or row.sent_on > max_allowed_time:
+                        continue
+                    actual_recipients = self._normalize_recipients(row.to)
+                    if (
+                        recipient_expected
+                        and actual_recipients
+                        and not self._recipient_matches(recipient_expected, actual_recipients)
+                    ):
+                        continue
+                    if row.message_id:
+                        return row.message_id
+                    surrogate_id = self._build_sent_item_surrogate_id(row.entry_id)
+                    if surrogate_id:
+                        return surrogate_id
             except Exception:
                 pass
 
@@ -375,12 +1081,10 @@ class OutlookMailSender:
             return value.replace(tzinfo=None)
         return value
 
-    def _build_sent_item_surrogate_id(self, item) -> str:
+    @staticmethod
+    def _build_sent_item_surrogate_id(entry_id: str) -> str:
         """Message-IDが取得できない場合の送信済みアイテム由来ID。"""
-        try:
-            entry_id = str(getattr(item, "EntryID", "")).strip()
-        except Exception:
-            entry_id = ""
+        entry_id = str(entry_id or "").strip()
         if not entry_id:
             return ""
         return f"OUTLOOK:{entry_id}"
@@ -505,6 +1209,12 @@ class OutlookMailSender:
             company_name="テスト送信"
         )
 
+    def reconcile_unknown_batch(self, locks: Sequence[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数の UNKNOWN_SENT をまとめて照合する。戻り値は request_key ごとの照合結果。
+        """
+        return self.transport.reconcile_unknown_batch(locks)
+
     def reconcile_unknown_send(
         self,
         token: str,
@@ -512,87 +1222,235 @@ class OutlookMailSender:
         message_id: str,
         subject: str,
         recipient: str,
+        sent_after: Optional[datetime.datetime] = None,
+        sent_before: Optional[datetime.datetime] = None,
     ) -> Dict[str, str]:
         """
-        UNKNOWN_SENT の回復照合を行う。
+        UNKNOWN_SENT の回復照合を行う（照合方法は送信経路に依存）。
+        """
+        return self.transport.reconcile_unknown_send(
+            token=token,
+            body_marker=body_marker,
+            message_id=message_id,
+            subject=subject,
+            recipient=recipient,
+            sent_after=sent_after,
+            sent_before=sent_before,
+        )
+
+    def _reconcile_in_sent_items(
+        self,
+        token: str,
+        body_marker: str,
+        message_id: str,
+        subject: str,
+        recipient: str,
+        sent_after: Optional[datetime.datetime] = None,
+        sent_before: Optional[datetime.datetime] = None,
+    ) -> Dict[str, str]:
+        """
+        Outlook 送信済みフォルダで UNKNOWN_SENT の回復照合を行う。
         優先順: header token -> body marker -> message-id -> subject+recipient
+        subject+recipient は sent_after〜sent_before の前後 SENT_TIME_WINDOW_SEC に送ったものだけを対象にする。
+        検索に失敗した場合や、送信トレイに該当しうるアイテムが残っている場合は checked=False。
         """
+        unchecked = {"matched": False, "method": "", "message_id": "", "checked": False}
         if not WIN32COM_AVAILABLE:
-            return {"matched": False, "method": "", "message_id": ""}
+            return unchecked
 
         token_norm = str(token or "").strip().lower()
         marker_norm = str(body_marker or "").strip()
         message_id_norm = str(message_id or "").strip()
         subject_norm = str(subject or "").strip()
         recipient_norm = self._normalize_recipients(recipient)
+        since = datetime.datetime.now() - datetime.timedelta(days=self.RECONCILE_LOOKBACK_DAYS)
 
         try:
-            outlook = self._get_outlook()
-            namespace = outlook.GetNamespace("MAPI")
-            sent_folder = namespace.GetDefaultFolder(self.SENT_FOLDER_ID)
-            items = sent_folder.Items
-            items.Sort("[SentOn]", True)
-
-            scanned = 0
-            for item in items:
-                scanned += 1
-                if scanned > self.MAX_SENT_ITEMS_SCAN:
-                    break
-                try:
-                    headers = str(
-                        item.PropertyAccessor.GetProperty(self.MESSAGE_HEADER_PROPERTY) or ""
-                    )
-                except Exception:
-                    headers = ""
-                header_lower = headers.lower()
-
-                item_message_id = self._extract_message_id_from_item(item)
-                if token_norm and f"x-idempotency-key: {token_norm}" in header_lower:
-                    return {
-                        "matched": True,
-                        "method": "header",
-                        "message_id": item_message_id or "",
-                    }
-
-                if marker_norm:
-                    try:
-                        item_body = str(getattr(item, "Body", "") or "")
-                    except Exception:
-                        item_body = ""
-                    try:
-                        item_html = str(getattr(item, "HTMLBody", "") or "")
-                    except Exception:
-                        item_html = ""
-                    if marker_norm in item_body or marker_norm in item_html:
-                        return {
-                            "matched": True,
-                            "method": "body",
-                            "message_id": item_message_id or "",
-                        }
-
-                if message_id_norm and item_message_id and item_message_id == message_id_norm:
-                    return {
-                        "matched": True,
-                        "method": "message_id",
-                        "message_id": item_message_id,
-                    }
-
-                item_subject = str(getattr(item, "Subject", "")).strip()
-                if subject_norm and item_subject != subject_norm:
+            query = self._open_sent_items_query()
+            # 優先順に1条件ずつストア側で絞り込む。通常は最初の header 検索で確定する。
+            for method, criteria in (
+                ("header", {"header_contains": f"x-idempotency-key: {token_norm}"} if token_norm else None),
+                ("body", {"body_contains": marker_norm} if marker_norm else None),
+                ("message_id", {"message_id": message_id_norm} if message_id_norm else None),
+            ):
+                if criteria is None:
                     continue
-                item_to = self._normalize_recipients(str(getattr(item, "To", "")))
-                if recipient_norm and item_to and not self._recipient_matches(recipient_norm, item_to):
-                    continue
-                if subject_norm:
+                rows = query.find(build_sent_items_filter(sent_from=since, **criteria))
+                if rows:
+                    return {"matched": True, "method": method, "message_id": rows[0].message_id, "checked": True}
+
+            window = self._reconcile_window(sent_after, sent_before)
+            if subject_norm and window is not None:
+                window_from, window_to = window
+                for row in query.find(
+                    build_sent_items_filter(subject=subject_norm, sent_from=window_from, sent_to=window_to)
+                ):
+                    if row.sent_on is None or not window_from <= row.sent_on <= window_to:
+                        continue
+                    item_to = self._normalize_recipients(row.to)
+                    if recipient_norm and item_to and not self._recipient_matches(recipient_norm, item_to):
+                        continue
                     return {
                         "matched": True,
                         "method": "subject_to",
-                        "message_id": item_message_id or self._build_sent_item_surrogate_id(item),
+                        "message_id": row.message_id or self._build_sent_item_surrogate_id(row.entry_id),
+                        "checked": True,
                     }
+
+            if subject_norm:
+                outbox = self._open_outbox_query().find(build_sent_items_filter(subject=subject_norm))
+                if self._waiting_in_outbox(outbox, subject_norm, recipient_norm):
+                    return unchecked
         except Exception:
-            return {"matched": False, "method": "", "message_id": ""}
+            return unchecked
 
-        return {"matched": False, "method": "", "message_id": ""}
+        return {"matched": False, "method": "", "message_id": "", "checked": True}
+
+    def _reconcile_batch_in_sent_items(self, locks: Sequence[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        送信済みフォルダを1回取得し、idempotency トークン / Message-ID / 件名+宛先の索引で
+        複数の UNKNOWN_SENT をまとめて照合する。優先順は単発の照合と同じ。
+        本文マーカーは Table 列では末尾まで読めないため、未解決分を OR 条件で絞り込み、
+        該当したアイテムの本文だけを開いて突き合わせる。
+        """
+        results: Dict[str, Dict[str, Any]] = {
+            lock["request_key"]: {"matched": False, "method": "", "message_id": "", "checked": False}
+            for lock in locks
+        }
+        if not locks or not WIN32COM_AVAILABLE:
+            return results
+
+        since = datetime.datetime.now() - datetime.timedelta(days=self.RECONCILE_LOOKBACK_DAYS)
+        try:
+            query = self._open_sent_items_query()
+            rows = query.find(build_sent_items_filter(sent_from=since), max_rows=self.MAX_RECONCILE_BATCH_ROWS)
+            outbox = self._open_outbox_query().find("")
+        except Exception:
+            return results
+        # 上限で打ち切った場合は、見つからなかったことを未送信の根拠にしない。
+        complete = len(rows) < self.MAX_RECONCILE_BATCH_ROWS
+
+        # rows は新しい順。同じキーが複数あれば最新を採る。
+        by_token: Dict[str, Any] = {}
+        by_message_id: Dict[str, Any] = {}
+        by_subject: Dict[str, List[Any]] = {}
+        for row in rows:
+            if row.idempotency_key:
+                by_token.setdefault(row.idempotency_key.lower(), row)
+            if row.message_id:
+                by_message_id.setdefault(row.message_id, row)
+            by_subject.setdefault(row.subject, []).append(row)
+
+        pending_markers = [
+            str(lock.get("body_marker", "") or "").strip()
+            for lock in locks
+            if str(lock.get("token", "") or "").strip().lower() not in by_token
+        ]
+        by_marker, failed_markers = self._index_body_markers(query, [m for m in pending_markers if m], since)
+
+        for lock in locks:
+            token_norm = str(lock.get("token", "") or "").strip().lower()
+            marker_norm = str(lock.get("body_marker", "") or "").strip()
+            message_id_norm = str(lock.get("message_id", "") or "").strip()
+            subject_norm = str(lock.get("subject", "") or "").strip()
+            recipient_norm = self._normalize_recipients(str(lock.get("recipient", "") or ""))
+            window = self._reconcile_window(lock.get("sent_after"), lock.get("sent_before"))
+
+            method, row = "", None
+            if token_norm and token_norm in by_token:
+                method, row = "header", by_token[token_norm]
+            elif marker_norm and marker_norm in by_marker:
+                method, row = "body", by_marker[marker_norm]
+            elif message_id_norm and message_id_norm in by_message_id:
+                method, row = "message_id", by_message_id[message_id_norm]
+            elif subject_norm and window is not None:
+                for candidate in by_subject.get(subject_norm, []):
+                    if candidate.sent_on is None or not window[0] <= candidate.sent_on <= window[1]:
+                        continue
+                    item_to = self._normalize_recipients(candidate.to)
+                    if recipient_norm and item_to and not self._recipient_matches(recipient_norm, item_to):
+                        continue
+                    method, row = "subject_to", candidate
+                    break
+            if row is None:
+                results[lock["request_key"]]["checked"] = (
+                    complete
+                    and marker_norm not in failed_markers
+                    and not self._waiting_in_outbox(outbox, subject_norm, recipient_norm)
+                )
+                continue
+            message_id = row.message_id
+            if method == "subject_to" and not message_id:
+                message_id = self._build_sent_item_surrogate_id(row.entry_id)
+            results[lock["request_key"]] = {"matched": True, "method": method, "message_id": message_id, "checked": True}
+        return results
+
+    def _reconcile_window(
+        self,
+        sent_after: Optional[datetime.datetime],
+        sent_before: Optional[datetime.datetime],
+    ) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        """
+        件名+宛先で照合する送信日時の範囲（送信済みアイテムと同じローカル時刻・tz なし）。
+        sent_before が無ければ現在時刻まで。sent_after が無ければ None（件名+宛先では照合しない）。
+        """
+        if sent_after is None:
+            return None
+        slack = datetime.timedelta(seconds=self.SENT_TIME_WINDOW_SEC)
+        start = self._to_local_naive(sent_after) - slack
+        end = self._to_local_naive(sent_before) if sent_before is not None else datetime.datetime.now()
+        return start, end + slack
+
+    @staticmethod
+    def _to_local_naive(value: datetime.datetime) -> datetime.datetime:
+        """tz 付きはローカル時刻へ変換して tz を外す（tz なしはローカル時刻とみなす）。"""
+        if value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+    def _index_body_markers(
+        self,
+        query: SentItemsQuery,
+        markers: List[str],
+        since: datetime.datetime,
+    ) -> Tuple[Dict[str, Any], set]:
+        """
+        本文マーカー -> 送信済みアイテム行。OR 条件で絞った行の本文だけを読む。
+        検索や本文の読み出しに失敗して照合しきれなかったマーカーも返す。
+        """
+        found: Dict[str, Any] = {}
+        failed: set = set()
+        if not markers:
+            return found, failed
+        namespace = self._get_outlook().GetNamespace("MAPI")
+        step = self.RECONCILE_MARKERS_PER_QUERY
+        for start in range(0, len(markers), step):
+            chunk = markers[start:start + step]
+            try:
+                rows = query.find(
+                    build_sent_items_filter(sent_from=since, body_contains_any=chunk),
+                    max_rows=self.MAX_RECONCILE_BATCH_ROWS,
+                )
+            except Exception:
+                failed.update(chunk)
+                continue
+            unread = len(rows) >= self.MAX_RECONCILE_BATCH_ROWS
+            for row in rows:
+                remaining = [m for m in chunk if m not in found]
+                if not remaining:
+                    break
+                try:
+                    item = namespace.GetItemFromID(row.entry_id)
+                    text = str(getattr(item, "Body", "") or "") + str(getattr(item, "HTMLBody", "") or "")
+                except Exception:
+                    unread = True
+                    continue
+                for marker in remaining:
+                    if marker in text:
+                        found[marker] = row
+            if unread:
+                failed.update(m for m in chunk if m not in found)
+        return found, failed
 
     def send_bulk(
         self,
@@ -646,6 +1504,14 @@ class OutlookMailSender:
         summary.end_time = datetime.datetime.now()
         return summary
 
+    def check_connection(self) -> Tuple[bool, str]:
+        """送信経路の接続を確認する。"""
+        return self.transport.check_connection()
+
+    def close(self) -> None:
+        """送信経路が保持する接続を閉じる。"""
+        self.transport.close()
+
     def check_outlook_connection(self) -> Tuple[bool, str]:
         """
         Outlook接続を確認する。
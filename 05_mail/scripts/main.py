@@ -13,24 +13,40 @@ import datetime as dt
 import json
 import re
 import sys
+import time
 import hashlib
+import itertools
 import urllib.parse
 import unicodedata
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Optional, Dict, List, Any, Callable
+from typing import Optional, Dict, List, Any, Callable, Deque, Generator, Iterable, Set, Tuple, Union
 from dataclasses import asdict
 
+import keyring
+
 from .csv_handler import CSVHandler, ContactRecord
 from .domain_filter import DomainFilter
 from .pii_detector import PIIDetector
-from .template_processor import TemplateProcessor, get_default_template
+from .template_processor import CompiledTemplate, RenderedBody, TemplateProcessor, get_default_template
 from .url_validator import URLValidator
-from .mail_sender import OutlookMailSender
+from .mail_sender import (
+    MailTransport,
+    MessageIdResolver,
+    OutlookMailSender,
+    ResolveTicket,
+    SendRateLimiter,
+    SmtpTransport,
+)
 from .audit_logger import AuditLogger
 from .encryption import EncryptionManager
 from .send_ledger import (
+    LeaseManager,
+    RUN_STATUS_COMPLETED,
     SendLedger,
+    STATUS_IN_PROGRESS,
     STATUS_SKIPPED_DUPLICATE_IN_RUN,
     STATUS_SKIPPED_CONFIRM_REQUIRED,
     STATUS_SKIPPED_AUTO,
@@ -40,6 +56,9 @@ EXIT_CODE_OK = 0
 EXIT_CODE_CONFIRM_REQUIRED = 3
 EXIT_CODE_INVALID_INPUT = 4
 
+# iter_send_bulk が集計に保持する警告の上限（以降は warning_count のみ数える）
+STREAM_WARNING_LIMIT = 100
+
 TRACKING_QUERY_PREFIXES = ("utm_",)
 TRACKING_QUERY_KEYS = {
     "gclid",
@@ -56,14 +75,18 @@ TRACKING_QUERY_KEYS = {
 class QuoteRequestSkill:
     """見積依頼スキル メインクラス"""
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
         """
         Args:
             config_path: 設定ファイルパス。Noneの場合はデフォルトパスを使用。
+            config: 設定値。指定した場合は設定ファイルを読まずにこれを使う
+                （分割送信のワーカーへ親の実効設定を引き継ぐ用途）。
         """
         self.base_dir = Path(__file__).parent.parent
         self.config_path = config_path or str(self.base_dir / "config.json")
-        self.config = self._load_config()
+        self.config = dict(config) if config is not None else self._load_config()
+        # 分割送信時にワーカープロセス側でスキルを組み立てる関数（None は config_path から生成）
+        self.shard_skill_factory: Optional[Callable[[], Any]] = None
 
         # モジュール初期化
         self.encryption_manager = EncryptionManager(
@@ -75,7 +98,15 @@ class QuoteRequestSkill:
             self.config.get("domain_blacklist", [])
         )
         self.pii_detector = PIIDetector()
-        self.template_processor = TemplateProcessor()
+        template_cache_cfg = str(self.config.get("template_cache_dir", "./logs/template_cache") or "")
+        template_cache_dir = None
+        if template_cache_cfg:
+            template_cache_dir = str(
+                self.base_dir / template_cache_cfg
+                if not Path(template_cache_cfg).is_absolute()
+                else Path(template_cache_cfg)
+            )
+        self.template_processor = TemplateProcessor(cache_dir=template_cache_dir)
         self.url_validator = URLValidator(
             timeout=self.config.get("url_timeout_sec", 10),
             retry_count=self.config.get("url_retry_count", 2),
@@ -83,8 +114,14 @@ class QuoteRequestSkill:
         )
         self.mail_sender = OutlookMailSender(
             send_interval_sec=self.config.get("send_interval_sec", 3.0),
-            dry_run=self.config.get("dry_run", False)
+            dry_run=self.config.get("dry_run", False),
+            transport=self._build_mail_transport(),
+            message_id_mode=str(self.config.get("message_id_mode", "stamped")),
+            message_id_domain=str(self.config.get("message_id_domain", "") or ""),
+            async_message_id=bool(self.config.get("message_id_async", True)),
+            rate_limiter=self._build_rate_limiter(),
         )
+        self.message_id_resolver = MessageIdResolver(self.mail_sender)
         self.audit_logger = AuditLogger(
             str(self.base_dir / "logs"),
             self.encryption_manager
@@ -97,13 +134,66 @@ class QuoteRequestSkill:
             if not Path(ledger_path_cfg).is_absolute()
             else Path(ledger_path_cfg)
         )
+        archive_dir_cfg = str(self.config.get("ledger_archive_dir", "") or "")
+        archive_dir = None
+        if archive_dir_cfg:
+            archive_dir = str(
+                self.base_dir / archive_dir_cfg
+                if not Path(archive_dir_cfg).is_absolute()
+                else Path(archive_dir_cfg)
+            )
         self.send_ledger = SendLedger(
             str(ledger_path),
             retention_days=self.config.get("log_retention_days", 90),
             busy_timeout_ms=self.config.get("dedupe_busy_timeout_ms", 15000),
             backoff_attempts=self.config.get("dedupe_retry_attempts", 5),
             credential_target_name=self.config.get("credential_target_name"),
+            group_commit_max_events=self.config.get("ledger_group_commit_max_events", 0),
+            group_commit_max_delay_ms=self.config.get("ledger_group_commit_max_delay_ms", 0),
+            sweep_chunk_size=self.config.get("ledger_sweep_chunk_size", 5000),
+            sweep_max_chunks=self.config.get("ledger_sweep_max_chunks_per_batch", 20),
+            archive_dir=archive_dir,
+            archive_hot_days=self.config.get("ledger_archive_hot_days", 7),
+            archive_compress=bool(self.config.get("ledger_archive_compress", False)),
+        )
+
+    def _build_mail_transport(self) -> Optional[MailTransport]:
+        """mail_transport 設定から送信経路を組み立てる（outlook は既定の経路を使う）。"""
+        kind = str(self.config.get("mail_transport", "outlook") or "outlook").strip().lower()
+        if kind == "outlook":
+            return None
+        if kind != "smtp":
+            raise ValueError(f"未対応の mail_transport です: {kind}")
+        smtp_cfg = dict(self.config.get("smtp") or {})
+        password = ""
+        password_key = str(smtp_cfg.get("password_credential_key", "") or "")
+        if password_key:
+            service = self.config.get("credential_target_name") or "見積依頼スキル"
+            password = keyring.get_password(service, password_key) or ""
+        return SmtpTransport(
+            host=str(smtp_cfg.get("host", "localhost")),
+            port=int(smtp_cfg.get("port", 25)),
+            from_address=str(smtp_cfg.get("from_address", "")),
+            username=str(smtp_cfg.get("username", "") or ""),
+            password=password,
+            starttls=bool(smtp_cfg.get("starttls", False)),
+            use_ssl=bool(smtp_cfg.get("use_ssl", False)),
+            timeout_sec=float(smtp_cfg.get("timeout_sec", 30)),
+            max_messages_per_connection=int(smtp_cfg.get("max_messages_per_connection", 100)),
+            message_id_domain=str(smtp_cfg.get("message_id_domain", "") or ""),
+            # 0 は send_concurrency と同じ本数
+            max_connections=int(smtp_cfg.get("max_connections", 0) or self.config.get("send_concurrency", 1)),
+        )
+
+    def _build_rate_limiter(self) -> Optional[SendRateLimiter]:
+        """rate_limits 設定から送信ペース制御を組み立てる（どちらも 0 なら send_interval_sec を使う）。"""
+        limits = dict(self.config.get("rate_limits") or {})
+        limiter = SendRateLimiter(
+            global_per_min=float(limits.get("global_per_min", 0) or 0),
+            per_domain_per_min=float(limits.get("per_domain_per_min", 0) or 0),
+            burst=int(limits.get("burst", 1) or 1),
         )
+        return limiter if limiter.enabled else None
 
     def _load_config(self) -> Dict[str, Any]:
         """設定ファイルを読み込む"""
@@ -350,7 +440,7 @@ class QuoteRequestSkill:
 
     def render_email(
         self,
-        template_content: str,
+        template_content: Union[str, CompiledTemplate],
         record: ContactRecord,
         product_name: str,
         product_features: str,
@@ -360,7 +450,7 @@ class QuoteRequestSkill:
         quantity: str = "",
     ) -> str:
         """
-        メール本文をレンダリングする。
+        メール本文をレンダリングする（template_content は compile() 済みでもよい）。
         """
         result = self.template_processor.create_email_body(
             template_content=template_content,
@@ -375,14 +465,47 @@ class QuoteRequestSkill:
         )
         return result.content
 
+    def render_emails(
+        self,
+        template_content: Union[str, CompiledTemplate],
+        records: List[ContactRecord],
+        product_name: str,
+        product_features: str,
+        product_url: str,
+        maker_name: str = "",
+        maker_code: str = "",
+        quantity: str = "",
+        workers: int = 1,
+    ) -> List[RenderedBody]:
+        """
+        複数宛先のメール本文と本文ハッシュ（mail_key 用）をまとめて生成する。
+        各本文は render_email と同一。
+        """
+        if not isinstance(template_content, CompiledTemplate):
+            template_content = self.template_processor.compile(template_content)
+        return self.template_processor.render_batch(
+            template_content,
+            {
+                "product_name": product_name,
+                "product_features": product_features,
+                "product_url": product_url,
+                "maker_name": maker_name,
+                "maker_code": maker_code,
+                "quantity": quantity,
+            },
+            records,
+            fingerprint=self._build_body_fingerprint,
+            workers=workers,
+        )
+
     def check_outlook_connection(self) -> Dict[str, Any]:
         """
-        Outlook接続を確認する。
+        送信経路（Outlook / SMTP）の接続を確認する。
 
         Returns:
             {"connected": bool, "message": str}
         """
-        connected, message = self.mail_sender.check_outlook_connection()
+        connected, message = self.mail_sender.check_connection()
         return {"connected": connected, "message": message}
 
     def send_test(
@@ -426,27 +549,280 @@ class QuoteRequestSkill:
         confirm_rerun_callback: Optional[Callable[[ContactRecord, Dict[str, Any]], bool]] = None,
         confirm_bulk_send_callback: Optional[Callable[[int], bool]] = None,
         workflow_context: Optional[Dict[str, str]] = None,
+        resume_run_id: Optional[str] = None,
+        stream_results: Optional[bool] = None,
+        chunked: Optional[bool] = None,
     ) -> Dict[str, Any]:
-        max_recipients = self.config.get("max_recipients", 50)
-        if len(records) > max_recipients:
+        """
+        宛先ごとに本文を生成し、台帳で再実行判定・ロック確保をしながら送信する。
+        resume_run_id を指定すると、異常終了した同じ宛先リストの実行を
+        確定済み位置（run_manifest.high_water）の次から再開する。
+        stream_results（既定は config の stream_results）が真なら iter_send_bulk で
+        結果を逐次ファイルへ書き出し、戻り値には件数だけを返す（results は空）。
+        chunked（既定は config の chunked_send）が真なら max_recipients を超える宛先も
+        max_recipients 件ずつのチャンクに分けて同じ run_id で順に送信する。
+        """
+        request = dict(
+            subject=subject,
+            template_content=template_content,
+            product_name=product_name,
+            product_features=product_features,
+            product_url=product_url,
+            maker_name=maker_name,
+            maker_code=maker_code,
+            quantity=quantity,
+            input_file=input_file,
+            confirm_rerun_callback=confirm_rerun_callback,
+            confirm_bulk_send_callback=confirm_bulk_send_callback,
+            workflow_context=workflow_context,
+            resume_run_id=resume_run_id,
+            chunked=chunked,
+        )
+        if stream_results is None:
+            stream_results = bool(self.config.get("stream_results", False))
+        if stream_results:
+            stream = self.iter_send_bulk(records, **request)
+            while True:
+                try:
+                    next(stream)
+                except StopIteration as done:
+                    return done.value
+
+        failure, job = self._open_bulk_job(len(records), request)
+        if failure is not None:
+            return failure
+        run_id = job["run_id"]
+        if job["manifest"] is not None and int(job["manifest"]["total"]) != len(records):
+            return self._resume_mismatch(run_id)
+        chunk_size = job["chunk_size"] or max(1, len(records))
+        results: List[Dict[str, Any]] = []
+        warnings: List[str] = []
+        tallies = dict.fromkeys(("skipped_duplicate_count", "skipped_rerun_count", "confirmation_required_count"), 0)
+        error = ""
+        for start in range(0, len(records), chunk_size):
+            if start > 0:
+                self._pause_between_chunks(job)
+            prepared = self._prepare_bulk_items(
+                records=records[start:start + chunk_size],
+                start_index=start,
+                **job["prepare"],
+            )
+            failure, outcome = self._run_window(job, prepared, confirm_rerun_callback)
+            if failure is not None:
+                if start == 0:
+                    return failure
+                # 送信済みのチャンクがあれば、その結果で監査ログを出してから失敗を返す。
+                error = failure["error"]
+                break
+            results.extend(outcome["results"])
+            warnings.extend(message for _, message in outcome["warnings"])
+            for key in tallies:
+                tallies[key] += outcome[key]
+        if not error:
+            self.send_ledger.finish_run(run_id)
+
+        # グループコミット待ちの SKIPPED / FAILED_PRE_SEND を監査ログ出力前に確定する。
+        self.send_ledger.flush_pending_events()
+        if workflow_context is None:
+            audit_log_path = self.audit_logger.write_audit_log(
+                input_file,
+                results,
+                product_info=job["product_info"],
+            )
+        else:
+            audit_log_path = self.audit_logger.write_audit_log(
+                input_file,
+                results,
+                product_info=job["product_info"],
+                workflow_context=workflow_context,
+            )
+        sent_list_path = self.audit_logger.write_sent_list(results)
+        unsent_list_path = ""
+        if any(not r["success"] for r in results):
+            unsent_list_path = self.audit_logger.write_unsent_list(results)
+
+        screen_output = self.audit_logger.format_screen_output(results)
+        attempted_results = [r for r in results if not r.get("skipped")]
+        counts = {
+            "total": len(results),
+            "attempted_count": len(attempted_results),
+            "success_count": sum(1 for r in attempted_results if r["success"]),
+            "failure_count": sum(1 for r in attempted_results if not r["success"]),
+            "warning_count": len(warnings),
+        }
+        counts.update(tallies)
+        summary = self._bulk_summary(
+            job,
+            counts,
+            warnings,
+            results,
+            audit_log_path=audit_log_path,
+            sent_list_path=sent_list_path,
+            unsent_list_path=unsent_list_path,
+            screen_output=screen_output,
+        )
+        if error:
+            summary.update({"success": False, "error": error, "exit_code": EXIT_CODE_INVALID_INPUT})
+        return summary
+
+    def iter_send_bulk(
+        self,
+        records: Iterable[ContactRecord],
+        subject: str,
+        template_content: str,
+        product_name: str,
+        product_features: str,
+        product_url: str,
+        maker_name: str = "",
+        maker_code: str = "",
+        quantity: str = "",
+        input_file: str = "",
+        confirm_rerun_callback: Optional[Callable[[ContactRecord, Dict[str, Any]], bool]] = None,
+        confirm_bulk_send_callback: Optional[Callable[[int], bool]] = None,
+        workflow_context: Optional[Dict[str, str]] = None,
+        resume_run_id: Optional[str] = None,
+        total: Optional[int] = None,
+        chunked: Optional[bool] = None,
+    ) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """
+        send_bulk の逐次版。records を stream_window_size 件ずつ本文生成・台帳判定・送信し、
+        結果 dict を行順に yield しながら監査ログ・送信済み/未送信リストへ追記する。
+        手元に残すのは件数と先頭 STREAM_WARNING_LIMIT 件の警告だけで、実行内重複の判定は
+        run_manifest を引く。戻り値（StopIteration.value）は send_bulk と同じ形（results は空）。
+        records が件数を持たないイテレータなら total に件数を渡すこと。
+        チャンク実行（chunked）では区間の大きさを max_recipients とし、区間の間で
+        chunk_pause_sec 秒待つ。
+        """
+        request = dict(
+            subject=subject,
+            template_content=template_content,
+            product_name=product_name,
+            product_features=product_features,
+            product_url=product_url,
+            maker_name=maker_name,
+            maker_code=maker_code,
+            quantity=quantity,
+            input_file=input_file,
+            confirm_rerun_callback=confirm_rerun_callback,
+            confirm_bulk_send_callback=confirm_bulk_send_callback,
+            workflow_context=workflow_context,
+            resume_run_id=resume_run_id,
+            chunked=chunked,
+        )
+        if total is None:
+            if not hasattr(records, "__len__"):
+                return {
+                    "success": False,
+                    "error": "件数の分からない records を渡す場合は total を指定してください。",
+                    "exit_code": EXIT_CODE_INVALID_INPUT,
+                }
+            total = len(records)  # type: ignore[arg-type]
+        failure, job = self._open_bulk_job(int(total), request)
+        if failure is not None:
+            return failure
+        run_id = job["run_id"]
+        window = job["chunk_size"] or max(1, int(self.config.get("stream_window_size", 500)))
+        counts = dict.fromkeys(
+            (
+                "total",
+                "attempted_count",
+                "success_count",
+                "failure_count",
+                "skipped_duplicate_count",
+                "skipped_rerun_count",
+                "confirmation_required_count",
+                "warning_count",
+            ),
+            0,
+        )
+        warnings: List[str] = []
+        sink = self.audit_logger.open_stream(
+            input_file,
+            product_info=job["product_info"],
+            workflow_context=workflow_context,
+        )
+        error = ""
+        try:
+            source = iter(records)
+            position = 0
+            while True:
+                chunk = list(itertools.islice(source, window))
+                if not chunk:
+                    break
+                if position > 0 and job["chunk_size"]:
+                    self._pause_between_chunks(job)
+                prepared = self._prepare_bulk_items(records=chunk, start_index=position, **job["prepare"])
+                position += len(chunk)
+                failure, outcome = self._run_window(job, prepared, confirm_rerun_callback)
+                if failure is not None:
+                    error = failure["error"]
+                    break
+                self.send_ledger.flush_pending_events()
+                for key in ("skipped_duplicate_count", "skipped_rerun_count", "confirmation_required_count"):
+                    counts[key] += outcome[key]
+                for _, message in outcome["warnings"]:
+                    counts["warning_count"] += 1
+                    if len(warnings) < STREAM_WARNING_LIMIT:
+                        warnings.append(message)
+                for result in outcome["results"]:
+                    counts["total"] += 1
+                    if not result.get("skipped"):
+                        counts["attempted_count"] += 1
+                        counts["success_count" if result["success"] else "failure_count"] += 1
+                    sink.write(result)
+                    yield result
+                outcome = None
+            if not error:
+                self.send_ledger.finish_run(run_id)
+        finally:
+            # 中断時も、それまでの結果で監査ログを確定させる。
+            audit_log_path = sink.close()
+        summary = self._bulk_summary(
+            job,
+            counts,
+            warnings,
+            [],
+            audit_log_path=audit_log_path,
+            sent_list_path=str(sink.sent_list_path),
+            unsent_list_path=str(sink.unsent_list_path or ""),
+            screen_output=sink.screen_output(),
+        )
+        if error:
+            summary.update({"success": False, "error": error, "exit_code": EXIT_CODE_INVALID_INPUT})
+        return summary
+
+    def _open_bulk_job(self, total: int, request: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        send_bulk / iter_send_bulk 共通の事前処理（入力検証、台帳の掃除、一括送信確認、
+        run_id とマニフェストの決定）。失敗時は (エラー dict, {}) を返す。
+        """
+        max_recipients = int(self.config.get("max_recipients", 50))
+        chunked = request["chunked"]
+        if chunked is None:
+            chunked = bool(self.config.get("chunked_send", False))
+        # チャンク実行では max_recipients は1チャンクの件数になり、ジョブ全体は max_job_recipients で抑える。
+        limit = int(self.config.get("max_job_recipients", 10000)) if chunked else max_recipients
+        if total > limit:
             return {
                 "success": False,
-                "error": f"送信件数が上限を超えています: {len(records)} > {max_recipients}",
+                "error": f"送信件数が上限を超えています: {total} > {limit}",
                 "exit_code": EXIT_CODE_INVALID_INPUT,
-            }
+            }, {}
 
+        maker_code = request["maker_code"]
+        product_url = request["product_url"]
         maker_code_norm = self._normalize_maker_code(maker_code)
         canonical_input_url = self._normalize_input_url(product_url)
         if not maker_code_norm:
-            return {"success": False, "error": "maker_code は必須です。", "exit_code": EXIT_CODE_INVALID_INPUT}
+            return {"success": False, "error": "maker_code は必須です。", "exit_code": EXIT_CODE_INVALID_INPUT}, {}
         if not canonical_input_url:
-            return {"success": False, "error": "product_url は必須です。", "exit_code": EXIT_CODE_INVALID_INPUT}
+            return {"success": False, "error": "product_url は必須です。", "exit_code": EXIT_CODE_INVALID_INPUT}, {}
 
         dedupe_key_version = str(self.config.get("dedupe_key_version", "v2"))
         rerun_policy_default = str(self.config.get("rerun_policy_default", "auto_skip"))
         rerun_scope = str(self.config.get("rerun_scope", "global"))
         rerun_window_hours = int(self.config.get("rerun_window_hours", 24))
-        in_progress_ttl_sec = int(self.config.get("dedupe_in_progress_ttl_sec", 2700))
+        in_progress_ttl_sec = int(self.config.get("dedupe_in_progress_ttl_sec", 180))
         dedupe_heartbeat_sec = int(self.config.get("dedupe_heartbeat_sec", 30))
         unknown_sent_hold_sec = int(self.config.get("unknown_sent_hold_sec", 1800))
         idempotency_secret_version = str(self.config.get("idempotency_secret_version", "v1"))
@@ -462,17 +838,18 @@ class QuoteRequestSkill:
         )
 
         confirmation_threshold = self.config.get("confirmation_threshold", 5)
-        if len(records) >= confirmation_threshold and confirm_bulk_send_callback is not None:
+        confirm_bulk_send_callback = request["confirm_bulk_send_callback"]
+        if total >= confirmation_threshold and confirm_bulk_send_callback is not None:
             try:
-                if not bool(confirm_bulk_send_callback(len(records))):
+                if not bool(confirm_bulk_send_callback(total)):
                     return {
                         "success": False,
-                        "error": f"{len(records)}件の送信は確認によりキャンセルされました。",
+                        "error": f"{total}件の送信は確認によりキャンセルされました。",
                         "results": [],
                         "warnings": [],
                         "warning": "",
                         "exit_code": EXIT_CODE_CONFIRM_REQUIRED,
-                    }
+                    }, {}
             except Exception as callback_error:
                 return {
                     "success": False,
@@ -481,20 +858,352 @@ class QuoteRequestSkill:
                     "warnings": [],
                     "warning": "",
                     "exit_code": EXIT_CODE_CONFIRM_REQUIRED,
-                }
+                }, {}
 
+        manifest: Optional[Dict[str, Any]] = None
+        resume_run_id = request["resume_run_id"]
+        if resume_run_id:
+            manifest = self.send_ledger.get_run_manifest(resume_run_id)
+            if manifest is None:
+                return {
+                    "success": False,
+                    "error": f"再開対象の実行が見つかりません: {resume_run_id}",
+                    "exit_code": EXIT_CODE_INVALID_INPUT,
+                }, {}
+            if manifest["status"] == RUN_STATUS_COMPLETED:
+                return {
+                    "success": False,
+                    "error": f"実行 {resume_run_id} は完了済みのため再開できません。",
+                    "exit_code": EXIT_CODE_INVALID_INPUT,
+                }, {}
+            # 監査ログと台帳の run_id を元の実行に揃える。
+            self.audit_logger.execution_id = resume_run_id
         run_id = getattr(self.audit_logger, "execution_id", "")
-        run_scope = run_id if rerun_scope == "same_run" else None
-        quantity_norm = self._normalize_quantity(quantity)
+        subject = request["subject"]
         subject_norm = self._normalize_subject(subject)
-        non_interactive = confirm_rerun_callback is None
+        if manifest is None:
+            self.send_ledger.begin_run(run_id, dedupe_key_version, subject_norm)
+
+        product_info = None
+        if request["product_name"] or request["maker_name"] or maker_code or request["quantity"] or product_url:
+            product_info = {
+                "product_name": request["product_name"],
+                "maker_name": request["maker_name"],
+                "maker_code": maker_code,
+                "quantity": request["quantity"],
+                "product_url": product_url,
+            }
+        job = {
+            "run_id": run_id,
+            "manifest": manifest,
+            "non_interactive": request["confirm_rerun_callback"] is None,
+            "chunk_size": max(1, max_recipients) if chunked else None,
+            "chunk_pause_sec": float(self.config.get("chunk_pause_sec", 0)),
+            "product_info": product_info,
+            "prepare": {
+                "subject": subject,
+                "template_content": request["template_content"],
+                # 宛先ごとの描画はジョブ内で1度だけ分割したテンプレートを使う。
+                "compiled_template": self.template_processor.compile(request["template_content"]),
+                "product_name": request["product_name"],
+                "product_features": request["product_features"],
+                "product_url": product_url,
+                "maker_name": request["maker_name"],
+                "maker_code": maker_code,
+                "quantity": request["quantity"],
+                "maker_code_norm": maker_code_norm,
+                "canonical_input_url": canonical_input_url,
+                "quantity_norm": self._normalize_quantity(request["quantity"]),
+                "subject_norm": subject_norm,
+                "dedupe_key_version": dedupe_key_version,
+                "idempotency_secret_version": idempotency_secret_version,
+            },
+            "context": {
+                "run_id": run_id,
+                "run_scope": run_id if rerun_scope == "same_run" else None,
+                "subject": subject,
+                "subject_norm": subject_norm,
+                "dedupe_key_version": dedupe_key_version,
+                "rerun_policy_default": rerun_policy_default,
+                "rerun_window_hours": rerun_window_hours,
+                "in_progress_ttl_sec": in_progress_ttl_sec,
+                "dedupe_heartbeat_sec": dedupe_heartbeat_sec,
+                "unknown_sent_hold_sec": unknown_sent_hold_sec,
+                "idempotency_secret_version": idempotency_secret_version,
+                "send_concurrency": int(self.config.get("send_concurrency", 1)),
+            },
+        }
+        return None, job
+
+    @staticmethod
+    def _pause_between_chunks(job: Dict[str, Any]) -> None:
+        """チャンク間の待機（送信サーバ・受信側への負荷を分散する）。"""
+        if job["chunk_pause_sec"] > 0:
+            time.sleep(job["chunk_pause_sec"])
+
+    @staticmethod
+    def _resume_mismatch(run_id: str) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": f"再開対象の実行 {run_id} と宛先・件名・本文が一致しません。",
+            "exit_code": EXIT_CODE_INVALID_INPUT,
+        }
+
+    def _admit_window(
+        self,
+        job: Dict[str, Any],
+        prepared: List[Dict[str, Any]],
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]], Set[str]]:
+        """
+        準備済みの区間をマニフェストへ登録（再開時は登録済みの並びと照合）し、
+        (エラー dict, 送信対象, 再開時に照合する失効ロック, 先行位置の request_key) を返す。
+        """
+        if not prepared:
+            return None, [], [], set()
+        run_id = job["run_id"]
+        manifest = job["manifest"]
+        start = int(prepared[0]["index"])
+        items = [(p["request_key"], p["mail_key"]) for p in prepared]
+        prior: Set[str] = set()
+        if start > 0:
+            prior = self.send_ledger.find_run_request_keys(run_id, [rk for rk, _ in items], before=start)
+        if manifest is None:
+            self.send_ledger.append_run_items(run_id, start, items)
+            return None, prepared, [], prior
+
+        stored = self.send_ledger.load_run_items(run_id, start=start, limit=len(items))
+        if stored != items[:len(stored)]:
+            return self._resume_mismatch(run_id), [], [], set()
+        self.send_ledger.append_run_items(run_id, start + len(stored), items[len(stored):])
+        high_water = int(manifest["high_water"])
+        targets = [p for p in prepared if p["index"] > high_water]
+        prior.update(p["request_key"] for p in prepared if p["index"] <= high_water)
+        if not targets:
+            return None, [], [], prior
+        # 延長が2周期以上止まっているロックは元のプロセスが終了したものとして照合・引き継ぐ。
+        stale_locks, active_locks = self.send_ledger.expire_stale_run_locks(
+            run_id,
+            [p["request_key"] for p in targets],
+            idle_sec=2 * job["context"]["dedupe_heartbeat_sec"],
+        )
+        if active_locks:
+            return {
+                "success": False,
+                "error": (
+                    f"実行 {run_id} の送信ロック {active_locks} 件がまだ延長されています。"
+                    "元のプロセスが終了してから再開してください。"
+                ),
+                "exit_code": EXIT_CODE_INVALID_INPUT,
+            }, [], [], set()
+        return None, targets, stale_locks, prior
+
+    def _run_window(
+        self,
+        job: Dict[str, Any],
+        prepared: List[Dict[str, Any]],
+        confirm_rerun_callback: Optional[Callable[[ContactRecord, Dict[str, Any]], bool]],
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """区間1つ分を台帳判定・送信する。(エラー dict, _execute_prepared の結果) を返す。"""
+        failure, targets, stale_locks, prior = self._admit_window(job, prepared)
+        if failure is not None:
+            return failure, {}
+        context = dict(job["context"], prior_request_keys=sorted(prior), stale_locks=stale_locks)
+        shard_workers = int(self.config.get("send_shard_workers", 1))
+        if shard_workers > 1 and confirm_rerun_callback is None and len(targets) > 1:
+            # 再実行確認の対話が不要な場合のみ、複数プロセスへ分割して送信する。
+            from .send_sharding import execute_sharded
+
+            return None, execute_sharded(self, targets, context, shard_workers)
+        # 確定位置の記録は行順に処理する単一プロセス実行でのみ行う。
+        context["checkpoint_run_id"] = job["run_id"]
+        context["checkpoint_every"] = int(self.config.get("run_checkpoint_every", 50))
+        return None, self._execute_prepared(targets, context, confirm_rerun_callback)
+
+    def _bulk_summary(
+        self,
+        job: Dict[str, Any],
+        counts: Dict[str, int],
+        warnings: List[str],
+        results: List[Dict[str, Any]],
+        *,
+        audit_log_path: str,
+        sent_list_path: str,
+        unsent_list_path: str,
+        screen_output: str,
+    ) -> Dict[str, Any]:
+        confirmation_required_count = counts["confirmation_required_count"]
+        exit_code = EXIT_CODE_OK
+        if confirmation_required_count > 0 and job["non_interactive"]:
+            exit_code = EXIT_CODE_CONFIRM_REQUIRED
+        manifest = job["manifest"]
+        return {
+            "success": counts["failure_count"] == 0 and confirmation_required_count == 0,
+            "total": counts["total"],
+            "attempted_count": counts["attempted_count"],
+            "success_count": counts["success_count"],
+            "failure_count": counts["failure_count"],
+            "skipped_duplicate_count": counts["skipped_duplicate_count"],
+            "skipped_rerun_count": counts["skipped_rerun_count"],
+            "confirmation_required_count": confirmation_required_count,
+            "audit_log_path": audit_log_path,
+            "sent_list_path": sent_list_path,
+            "unsent_list_path": unsent_list_path,
+            "screen_output": screen_output,
+            "warning": "; ".join(warnings),
+            "warnings": warnings,
+            "warning_count": counts["warning_count"],
+            "results": results,
+            "dedupe_key_version": job["prepare"]["dedupe_key_version"],
+            "run_id": job["run_id"],
+            "resumed_from": 0 if manifest is None else int(manifest["high_water"]) + 1,
+            "exit_code": exit_code,
+        }
+
+    def _prepare_bulk_items(
+        self,
+        *,
+        records: List[ContactRecord],
+        subject: str,
+        template_content: str,
+        product_name: str,
+        product_features: str,
+        product_url: str,
+        maker_name: str,
+        maker_code: str,
+        quantity: str,
+        maker_code_norm: str,
+        canonical_input_url: str,
+        quantity_norm: str,
+        subject_norm: str,
+        dedupe_key_version: str,
+        idempotency_secret_version: str,
+        start_index: int = 0,
+        compiled_template: Optional[CompiledTemplate] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        本文生成（render_emails で共通変数は1度だけ差し込む）と各種キー・トークン・
+        宛先ハッシュの算出をまとめて行う。
+        send_prepare_workers > 1 ならスレッドプールで並行に算出する（結果は records の順）。
+        index は実行全体での位置（records[0] が start_index）。
+        """
+        workers = max(1, int(self.config.get("send_prepare_workers", 1)))
+        rendered = self.render_emails(
+            compiled_template if compiled_template is not None else template_content,
+            records,
+            product_name=product_name,
+            product_features=product_features,
+            product_url=product_url,
+            maker_name=maker_name,
+            maker_code=maker_code,
+            quantity=quantity,
+            workers=workers,
+        )
+
+        def prepare(index: int, record: ContactRecord, body: RenderedBody) -> Dict[str, Any]:
+            recipient_email_norm = self._normalize_email(record.email)
+            request_key = self._build_request_key(
+                recipient_email_norm,
+                maker_code_norm,
+                canonical_input_url,
+                quantity_norm,
+                dedupe_key_version,
+            )
+            mail_key = self._build_mail_key(
+                recipient_email_norm,
+                subject_norm,
+                body.fingerprint,
+            )
+            idempotency_token = self.send_ledger.build_idempotency_token(
+                request_key,
+                idempotency_secret_version,
+            )
+            return {
+                "index": index,
+                "record": record,
+                "body": body.body,
+                "request_key": request_key,
+                "mail_key": mail_key,
+                "v1_key": self._build_legacy_v1_key(record.email, subject, template_content),
+                "recipient_hash": self.send_ledger.hash_recipient(recipient_email_norm),
+                "idempotency_token": idempotency_token,
+            }
+
+        if workers == 1 or len(records) < 2:
+            return [
+                prepare(index, record, body)
+                for index, (record, body) in enumerate(zip(records, rendered), start_index)
+            ]
+        # 1件目で秘密鍵の取得（keyring）を済ませてから並行に回す。
+        prepared = [prepare(start_index, records[0], rendered[0])]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prepare") as pool:
+            prepared.extend(
+                pool.map(prepare, range(start_index + 1, start_index + len(records)), records[1:], rendered[1:])
+            )
+        return prepared
+
+    def _execute_prepared(
+        self,
+        prepared: List[Dict[str, Any]],
+        context: Dict[str, Any],
+        confirm_rerun_callback: Optional[Callable[[ContactRecord, Dict[str, Any]], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        準備済みの送信対象について、台帳判定・ロック確保・送信・記録を順に行う。
+        結果は prepared と同じ順序で返し、警告には元の行番号を添える。
+        送信中の IN_PROGRESS ロックは LeaseManager が dedupe_heartbeat_sec ごとに延長する。
+        send_concurrency > 1 の場合、判定・ロック確保は本スレッドで順に行い、
+        送信だけを送信ワーカーへ渡す（台帳への確定は投入順に本スレッドで行う）。
+        """
+        lease = self.send_ledger.open_lease_manager(
+            interval_sec=context["dedupe_heartbeat_sec"],
+            ttl_sec=context["in_progress_ttl_sec"],
+        )
+        workers = max(1, int(context.get("send_concurrency", 1)))
+        send_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="send") if workers > 1 else None
+        try:
+            return self._execute_prepared_with_lease(prepared, context, confirm_rerun_callback, lease, send_pool)
+        finally:
+            if send_pool is not None:
+                send_pool.shutdown(wait=True)
+            lease.stop()
+
+    def _execute_prepared_with_lease(
+        self,
+        prepared: List[Dict[str, Any]],
+        context: Dict[str, Any],
+        confirm_rerun_callback: Optional[Callable[[ContactRecord, Dict[str, Any]], bool]],
+        lease: LeaseManager,
+        send_pool: Optional[ThreadPoolExecutor] = None,
+    ) -> Dict[str, Any]:
+        run_id = context["run_id"]
+        run_scope = context["run_scope"]
+        subject = context["subject"]
+        subject_norm = context["subject_norm"]
+        dedupe_key_version = context["dedupe_key_version"]
+        rerun_policy_default = context["rerun_policy_default"]
+        rerun_window_hours = context["rerun_window_hours"]
+        in_progress_ttl_sec = context["in_progress_ttl_sec"]
+        unknown_sent_hold_sec = context["unknown_sent_hold_sec"]
+        idempotency_secret_version = context["idempotency_secret_version"]
+        item_index = -1
 
         results: List[Dict[str, Any]] = []
-        warnings: List[str] = []
+        warnings: List[Tuple[int, str]] = []
         seen_request_keys = set()
         skipped_duplicate_count = 0
         skipped_rerun_count = 0
         confirmation_required_count = 0
+        # 非同期で Message-ID を取得中の (結果dict, ticket)
+        resolving: List[Tuple[Dict[str, Any], ResolveTicket]] = []
+        # 送信ワーカーへ投入済みで未確定の (future, job)。投入順に確定する。
+        inflight: Deque[Tuple[Future, Dict[str, Any]]] = deque()
+        inflight_keys = set()
+        max_inflight = 2 * max(1, int(context.get("send_concurrency", 1)))
+        # results[:durable] は台帳へ確定済み。checkpoint_every 件進むごとに run_manifest へ記録する。
+        checkpoint_run_id = context.get("checkpoint_run_id")
+        checkpoint_every = max(1, int(context.get("checkpoint_every", 50)))
+        durable = 0
+        checkpointed = 0
 
         def add_skip(
             *,
@@ -516,7 +1225,7 @@ class QuoteRequestSkill:
                 skipped_rerun_count += 1
             if confirmation_required:
                 confirmation_required_count += 1
-            warnings.append(message)
+            warnings.append((item_index, message))
             self.send_ledger.mark_skipped(
                 request_key=request_key,
                 v1_key=v1_key,
@@ -551,79 +1260,258 @@ class QuoteRequestSkill:
                 "confirmation_required": confirmation_required,
             })
 
-        for record in records:
-            body = self.render_email(
-                template_content=template_content,
-                record=record,
-                product_name=product_name,
-                product_features=product_features,
-                product_url=product_url,
-                maker_name=maker_name,
-                maker_code=maker_code,
-                quantity=quantity,
-            )
-            recipient_email_norm = self._normalize_email(record.email)
-            request_key = self._build_request_key(
-                recipient_email_norm,
-                maker_code_norm,
-                canonical_input_url,
-                quantity_norm,
-                dedupe_key_version,
-            )
-            mail_key = self._build_mail_key(
-                recipient_email_norm,
-                subject_norm,
-                self._build_body_fingerprint(body),
-            )
-            v1_key = self._build_legacy_v1_key(record.email, subject, template_content)
-            recipient_hash = self.send_ledger.hash_recipient(recipient_email_norm)
-            idempotency_token = self.send_ledger.build_idempotency_token(
-                request_key,
-                idempotency_secret_version,
+        def hold_unknown(
+            job: Dict[str, Any],
+            send_error: str,
+            trace: str,
+            message_id: str = "",
+            message_id_source: str = "",
+        ) -> None:
+            """送信されたか分からない行を UNKNOWN_SENT として台帳へ記録する。"""
+            nonlocal confirmation_required_count
+            confirmation_required_count += 1
+            warnings.append((job["item_index"], send_error))
+            self.send_ledger.mark_unknown_sent(
+                request_key=job["request_key"],
+                v1_key=job["v1_key"],
+                key_version=dedupe_key_version,
+                run_id=run_id,
+                mail_key=job["mail_key"],
+                recipient_hash=job["recipient_hash"],
+                idempotency_token=job["idempotency_token"],
+                idempotency_secret_version=idempotency_secret_version,
+                subject_norm=subject_norm,
+                decision_trace=job["decision_trace"] + [trace],
+                error=send_error,
+                hold_sec=unknown_sent_hold_sec,
+                message_id=message_id,
+                message_id_source=message_id_source,
             )
-            body_marker = f"[IDEMP:{idempotency_token[:24]}]"
-            decision_trace = [f"request_key={request_key}", f"mail_key={mail_key}"]
 
-            if request_key in seen_request_keys:
-                skipped_duplicate_count += 1
-                add_skip(
-                    record=record,
-                    request_key=request_key,
-                    mail_key=mail_key,
-                    v1_key=v1_key,
-                    recipient_hash=recipient_hash,
-                    idempotency_token=idempotency_token,
-                    decision_trace=decision_trace + ["duplicate_in_run=true"],
-                    message=f"同一実行内の重複送信をスキップしました: {record.email}",
-                    action="skip_duplicate_in_run",
-                    status=STATUS_SKIPPED_DUPLICATE_IN_RUN,
-                    confirmation_required=False,
-                    count_as_rerun=False,
-                )
-                continue
-            seen_request_keys.add(request_key)
-
-            override_decision = self.send_ledger.evaluate_override(request_key, recipient_hash)
-            decision_trace.extend(override_decision.trace)
+        def finish_unknown(job: Dict[str, Any], error: BaseException) -> None:
+            """送信スレッドが例外で終わった行を確定する（受け渡し済みの可能性があるため要確認）。"""
+            record = job["record"]
+            send_error = f"送信処理が例外で終了したため送信結果が不明です（UNKNOWN_SENTとして保留）: {error}"
+            hold_unknown(job, send_error, "send_outcome=unknown")
+            lease.release(job["request_key"])
+            job["entry"].update({
+                "email": record.email,
+                "company_name": record.company_name,
+                "success": False,
+                "message_id": "",
+                "error": send_error,
+                "sent_at": "",
+                "is_fallback_id": False,
+                "message_id_source": "",
+                "dedupe_key": job["request_key"],
+                "request_key": job["request_key"],
+                "mail_key": job["mail_key"],
+                "dedupe_key_version": dedupe_key_version,
+                "decision_trace": job["decision_trace"],
+                "skipped": False,
+                "action": "unknown_sent_pending",
+                "skip_duplicate_in_run": False,
+                "confirmation_required": True,
+            })
 
-            unknown_lock = self.send_ledger.get_unknown_lock(request_key)
-            if unknown_lock:
-                matched = False
-                method = ""
-                message_id = ""
+        def finish_send(job: Dict[str, Any], send_result: Any) -> None:
+            """送信結果を台帳へ確定し、確保済みの結果枠を埋める（呼び出しは常に本スレッド）。"""
+            record = job["record"]
+            request_key = job["request_key"]
+            mail_key = job["mail_key"]
+            v1_key = job["v1_key"]
+            recipient_hash = job["recipient_hash"]
+            idempotency_token = job["idempotency_token"]
+            decision_trace = job["decision_trace"]
+            entry = job["entry"]
+            if send_result.success:
                 try:
-                    reconcile = self.mail_sender.reconcile_unknown_send(
-                        token=idempotency_token,
-                        body_marker=body_marker,
-                        message_id=str(unknown_lock.get("last_message_id", "")),
-                        subject=subject_norm,
-                        recipient=record.email,
+                    self.send_ledger.mark_sent(
+                        request_key=request_key,
+                        v1_key=v1_key,
+                        key_version=dedupe_key_version,
+                        run_id=run_id,
+                        mail_key=mail_key,
+                        recipient_hash=recipient_hash,
+                        message_id=send_result.message_id,
+                        message_id_source=send_result.message_id_source,
+                        idempotency_token=idempotency_token,
+                        idempotency_secret_version=idempotency_secret_version,
+                        subject_norm=subject_norm,
+                        decision_trace=decision_trace,
+                        sent_at=send_result.sent_at,
                     )
-                    matched = bool(reconcile.get("matched"))
-                    method = str(reconcile.get("method", ""))
-                    message_id = str(reconcile.get("message_id", ""))
-                except Exception:
-                    matched = False
+                    sent_keys_in_run.update((request_key, v1_key))
+                    send_success = True
+                    send_error = ""
+                    action = "sent"
+                    confirmation_required = False
+                except Exception as ledger_error:
+                    send_success = False
+                    send_error = f"送信後のSENT確定に失敗したためUNKNOWN_SENTとして保留: {ledger_error}"
+                    action = "unknown_sent_pending"
+                    confirmation_required = True
+                    hold_unknown(job, send_error, "sent_commit=unknown", send_result.message_id,
+                                 send_result.message_id_source)
+                lease.release(request_key)
+                entry.update({
+                    "email": record.email,
+                    "company_name": record.company_name,
+                    "success": send_success,
+                    "message_id": send_result.message_id,
+                    "error": send_error,
+                    "sent_at": send_result.sent_at.isoformat() if send_result.sent_at else "",
+                    "is_fallback_id": send_result.is_fallback_id,
+                    "message_id_source": send_result.message_id_source,
+                    "dedupe_key": request_key,
+                    "request_key": request_key,
+                    "mail_key": mail_key,
+                    "dedupe_key_version": dedupe_key_version,
+                    "decision_trace": decision_trace,
+                    "skipped": False,
+                    "action": action,
+                    "skip_duplicate_in_run": False,
+                    "confirmation_required": confirmation_required,
+                })
+                if getattr(send_result, "pending_lookup", None) is not None:
+                    resolving.append((entry, self._submit_message_id_lookup(send_result, request_key, run_id)))
+                return
+
+            self.send_ledger.mark_failed_pre_send(
+                request_key=request_key,
+                v1_key=v1_key,
+                key_version=dedupe_key_version,
+                run_id=run_id,
+                mail_key=mail_key,
+                recipient_hash=recipient_hash,
+                idempotency_token=idempotency_token,
+                idempotency_secret_version=idempotency_secret_version,
+                subject_norm=subject_norm,
+                decision_trace=decision_trace,
+                error=send_result.error,
+            )
+            lease.release(request_key)
+            entry.update({
+                "email": record.email,
+                "company_name": record.company_name,
+                "success": False,
+                "message_id": send_result.message_id,
+                "error": send_result.error,
+                "sent_at": send_result.sent_at.isoformat() if send_result.sent_at else "",
+                "is_fallback_id": send_result.is_fallback_id,
+                "message_id_source": send_result.message_id_source,
+                "dedupe_key": request_key,
+                "request_key": request_key,
+                "mail_key": mail_key,
+                "dedupe_key_version": dedupe_key_version,
+                "decision_trace": decision_trace,
+                "skipped": False,
+                "action": "failed_pre_send",
+                "skip_duplicate_in_run": False,
+                "confirmation_required": False,
+            })
+
+        def checkpoint(force: bool = False) -> None:
+            nonlocal durable, checkpointed
+            if not checkpoint_run_id:
+                return
+            while durable < len(results) and results[durable]:
+                durable += 1
+            if durable == checkpointed or (not force and durable - checkpointed < checkpoint_every):
+                return
+            # グループコミット待ちの SKIPPED / FAILED_PRE_SEND を先に確定させる。
+            self.send_ledger.flush_pending_events()
+            self.send_ledger.checkpoint_run(checkpoint_run_id, prepared[durable - 1]["index"])
+            checkpointed = durable
+
+        def drain_inflight(limit: int) -> None:
+            """送信中が limit 件以下になるまで、先頭（投入順）から完了を待って確定する。"""
+            while inflight and (len(inflight) > limit or inflight[0][0].done()):
+                future, job = inflight.popleft()
+                try:
+                    send_result = future.result()
+                except Exception as error:
+                    # 1件の例外で他の送信中の行を未確定のまま残さない。
+                    finish_unknown(job, error)
+                else:
+                    finish_send(job, send_result)
+                inflight_keys.discard(job["request_key"])
+                inflight_keys.discard(job["v1_key"])
+
+        # override / UNKNOWN_SENT / 直近SENT の判定は台帳へ一括照会する。
+        prechecks = self.send_ledger.precheck_batch(
+            request_keys=[p["request_key"] for p in prepared],
+            v1_keys=[p["v1_key"] for p in prepared],
+            recipient_hashes=[p["recipient_hash"] for p in prepared],
+            window_hours=rerun_window_hours,
+            run_id=run_scope,
+        )
+        # 本実行で SENT 化したキー（一括照会後の台帳変化を拾うため）
+        sent_keys_in_run = set()
+        # 再開時は、確定済み位置より前の行も同一実行内の重複判定に含める。
+        seen_request_keys.update(context.get("prior_request_keys") or ())
+        reconciled_locks = self._reconcile_unknown_locks(prepared, subject_norm, context.get("stale_locks"))
+
+        for item in prepared:
+            checkpoint()
+            item_index = item["index"]
+            record = item["record"]
+            body = item["body"]
+            request_key = item["request_key"]
+            mail_key = item["mail_key"]
+            v1_key = item["v1_key"]
+            recipient_hash = item["recipient_hash"]
+            idempotency_token = item["idempotency_token"]
+            body_marker = f"[IDEMP:{idempotency_token[:24]}]"
+            decision_trace = [f"request_key={request_key}", f"mail_key={mail_key}"]
+            if v1_key in inflight_keys:
+                # 同じ旧キーの送信結果を見てから直近SENT判定を行う。
+                drain_inflight(0)
+
+            if request_key in seen_request_keys:
+                skipped_duplicate_count += 1
+                add_skip(
+                    record=record,
+                    request_key=request_key,
+                    mail_key=mail_key,
+                    v1_key=v1_key,
+                    recipient_hash=recipient_hash,
+                    idempotency_token=idempotency_token,
+                    decision_trace=decision_trace + ["duplicate_in_run=true"],
+                    message=f"同一実行内の重複送信をスキップしました: {record.email}",
+                    action="skip_duplicate_in_run",
+                    status=STATUS_SKIPPED_DUPLICATE_IN_RUN,
+                    confirmation_required=False,
+                    count_as_rerun=False,
+                )
+                continue
+            seen_request_keys.add(request_key)
+
+            precheck = prechecks[request_key]
+            override_decision = precheck.override
+            decision_trace.extend(override_decision.trace)
+
+            unknown_lock = precheck.unknown_lock
+            if unknown_lock:
+                reconcile = reconciled_locks.get(request_key)
+                if reconcile is None:
+                    # 一括照合の後に UNKNOWN_SENT になったキーは個別に照合する。
+                    try:
+                        reconcile = self.mail_sender.reconcile_unknown_send(
+                            token=idempotency_token,
+                            body_marker=body_marker,
+                            message_id=str(unknown_lock.get("last_message_id", "")),
+                            subject=subject_norm,
+                            recipient=record.email,
+                            **self._lock_send_window(
+                                unknown_lock, self.send_ledger.reserved_at([request_key]).get(request_key)
+                            ),
+                        )
+                    except Exception:
+                        reconcile = {}
+                matched = bool(reconcile.get("matched"))
+                method = str(reconcile.get("method", ""))
+                message_id = str(reconcile.get("message_id", ""))
                 if matched:
                     self.send_ledger.mark_reconciled_sent(
                         request_key=request_key,
@@ -670,12 +1558,16 @@ class QuoteRequestSkill:
                     continue
                 self.send_ledger.clear_unknown_lock_for_manual_override(request_key)
 
-            recent_entry = self.send_ledger.find_recent_sent(
-                request_key=request_key,
-                v1_key=v1_key,
-                window_hours=rerun_window_hours,
-                run_id=run_scope,
-            )
+            recent_entry = precheck.recent_sent
+            if recent_entry is None and (
+                request_key in sent_keys_in_run or v1_key in sent_keys_in_run
+            ):
+                recent_entry = self.send_ledger.find_recent_sent(
+                    request_key=request_key,
+                    v1_key=v1_key,
+                    window_hours=rerun_window_hours,
+                    run_id=run_scope,
+                )
             if recent_entry and not override_decision.allowed:
                 should_send = False
                 if rerun_policy_default == "confirm" and confirm_rerun_callback is not None:
@@ -699,7 +1591,7 @@ class QuoteRequestSkill:
                     )
                     continue
 
-            reservation = self.send_ledger.reserve_send(
+            reserve_kwargs = dict(
                 request_key=request_key,
                 v1_key=v1_key,
                 key_version=dedupe_key_version,
@@ -711,60 +1603,69 @@ class QuoteRequestSkill:
                 subject_norm=subject_norm,
                 ttl_sec=in_progress_ttl_sec,
                 decision_trace=decision_trace,
+                # 一括照会後に別プロセスが送信済みにした場合もロック確保時に検知する。
+                recent_sent_window_hours=(
+                    None if recent_entry or override_decision.allowed else rerun_window_hours
+                ),
+                recent_sent_run_id=run_scope,
             )
-            if not reservation.acquired:
-                add_skip(
-                    record=record,
-                    request_key=request_key,
-                    mail_key=mail_key,
-                    v1_key=v1_key,
-                    recipient_hash=recipient_hash,
-                    idempotency_token=idempotency_token,
-                    decision_trace=decision_trace + [f"reservation={reservation.reason}"],
-                    message=f"送信ロックを確保できなかったため送信をスキップしました: {record.email}",
-                    action="skip_lock_conflict",
-                    status=STATUS_SKIPPED_CONFIRM_REQUIRED,
-                    confirmation_required=True,
-                )
-                continue
-
-            self.send_ledger.heartbeat(request_key, dedupe_heartbeat_sec)
-            send_result = self.mail_sender.send_mail(
-                to=record.email,
-                subject=subject,
-                body=body,
-                company_name=record.company_name,
-                idempotency_token=idempotency_token,
-                body_reconcile_marker=body_marker,
-            )
-            if send_result.success:
+            reservation = self.send_ledger.reserve_send(**reserve_kwargs)
+            if not reservation.acquired and reservation.reason == "in_progress_expired":
+                # lease が更新されず失効したロック（保持プロセスの異常終了）。
+                # 送信済みかを照合し、未送信と確認できた場合だけ引き継いで送信する。
+                expired_lock = reservation.lock_row or {}
+                expired_token = str(expired_lock.get("idempotency_token", "") or idempotency_token)
+                matched = False
+                checked = False
+                method = ""
+                message_id = ""
                 try:
-                    self.send_ledger.mark_sent(
+                    reconcile = reconciled_locks.get(request_key)
+                    if reconcile is None:
+                        reconcile = self.mail_sender.reconcile_unknown_send(
+                            token=expired_token,
+                            body_marker=f"[IDEMP:{expired_token[:24]}]",
+                            message_id=str(expired_lock.get("last_message_id", "") or ""),
+                            subject=subject_norm,
+                            recipient=record.email,
+                            **self._lock_send_window(
+                                expired_lock, self.send_ledger.reserved_at([request_key]).get(request_key)
+                            ),
+                        )
+                    matched = bool(reconcile.get("matched"))
+                    checked = bool(reconcile.get("checked"))
+                    method = str(reconcile.get("method", ""))
+                    message_id = str(reconcile.get("message_id", ""))
+                except Exception:
+                    matched = False
+                    checked = False
+                if matched:
+                    self.send_ledger.mark_reconciled_sent(
                         request_key=request_key,
-                        v1_key=v1_key,
-                        key_version=dedupe_key_version,
                         run_id=run_id,
+                        decision_trace=decision_trace + [f"expired_lock_reconciled={method}"],
+                        reconciled_message_id=message_id,
+                        reconciled_source=method or "reconcile",
+                        from_status=STATUS_IN_PROGRESS,
+                    )
+                    add_skip(
+                        record=record,
+                        request_key=request_key,
                         mail_key=mail_key,
+                        v1_key=v1_key,
                         recipient_hash=recipient_hash,
-                        message_id=send_result.message_id,
-                        message_id_source=send_result.message_id_source,
                         idempotency_token=idempotency_token,
-                        idempotency_secret_version=idempotency_secret_version,
-                        subject_norm=subject_norm,
-                        decision_trace=decision_trace,
-                        sent_at=send_result.sent_at,
+                        decision_trace=decision_trace + [f"expired_lock_reconciled={method}"],
+                        message="失効した送信ロックを照合し送信済みと判定したため送信をスキップしました。",
+                        action="skip_reconciled_sent",
+                        status=STATUS_SKIPPED_AUTO,
+                        confirmation_required=False,
                     )
-                    send_success = True
-                    send_error = ""
-                    action = "sent"
-                    confirmation_required = False
-                except Exception as ledger_error:
-                    send_success = False
-                    send_error = f"送信後のSENT確定に失敗したためUNKNOWN_SENTとして保留: {ledger_error}"
-                    action = "unknown_sent_pending"
-                    confirmation_required = True
-                    confirmation_required_count += 1
-                    warnings.append(send_error)
+                    continue
+                if not checked:
+                    # 送信済みを検索できない経路や検索の失敗では、SMTP 受理後・送信トレイ滞留中に
+                    # 落ちた可能性を否定できない。UNKNOWN_SENT として保留・確認の経路へ回す。
+                    unknown_error = "失効した送信ロックの送信有無を照合できないためUNKNOWN_SENTとして保留"
                     self.send_ledger.mark_unknown_sent(
                         request_key=request_key,
                         v1_key=v1_key,
@@ -772,125 +1673,204 @@ class QuoteRequestSkill:
                         run_id=run_id,
                         mail_key=mail_key,
                         recipient_hash=recipient_hash,
-                        idempotency_token=idempotency_token,
+                        idempotency_token=expired_token,
                         idempotency_secret_version=idempotency_secret_version,
                         subject_norm=subject_norm,
-                        decision_trace=decision_trace + ["sent_commit=unknown"],
-                        error=send_error,
+                        decision_trace=decision_trace + ["expired_lock_unverified=true"],
+                        error=unknown_error,
                         hold_sec=unknown_sent_hold_sec,
-                        message_id=send_result.message_id,
-                        message_id_source=send_result.message_id_source,
+                        message_id=str(expired_lock.get("last_message_id", "") or ""),
+                        message_id_source=str(expired_lock.get("last_message_id_source", "") or ""),
                     )
-                results.append({
-                    "email": record.email,
-                    "company_name": record.company_name,
-                    "success": send_success,
-                    "message_id": send_result.message_id,
-                    "error": send_error,
-                    "sent_at": send_result.sent_at.isoformat() if send_result.sent_at else "",
-                    "is_fallback_id": send_result.is_fallback_id,
-                    "message_id_source": send_result.message_id_source,
-                    "dedupe_key": request_key,
-                    "request_key": request_key,
-                    "mail_key": mail_key,
-                    "dedupe_key_version": dedupe_key_version,
-                    "decision_trace": decision_trace,
-                    "skipped": False,
-                    "action": action,
-                    "skip_duplicate_in_run": False,
-                    "confirmation_required": confirmation_required,
-                })
+                    add_skip(
+                        record=record,
+                        request_key=request_key,
+                        mail_key=mail_key,
+                        v1_key=v1_key,
+                        recipient_hash=recipient_hash,
+                        idempotency_token=idempotency_token,
+                        decision_trace=decision_trace + ["expired_lock_unverified=true"],
+                        message=f"{unknown_error}し、送信をスキップしました: {record.email}",
+                        action="skip_unknown_sent_confirm_required",
+                        status=STATUS_SKIPPED_CONFIRM_REQUIRED,
+                        confirmation_required=True,
+                    )
+                    continue
+                decision_trace.append("lease_takeover=true")
+                reservation = self.send_ledger.reserve_send(**reserve_kwargs, takeover_expired=True)
+            if not reservation.acquired and reservation.reason == "recent_sent":
+                add_skip(
+                    record=record,
+                    request_key=request_key,
+                    mail_key=mail_key,
+                    v1_key=v1_key,
+                    recipient_hash=recipient_hash,
+                    idempotency_token=idempotency_token,
+                    decision_trace=decision_trace + ["recent_sent_detected=true", "reservation=recent_sent"],
+                    message=f"24時間以内の再実行を検知したため送信をスキップしました: {record.email}",
+                    action="skip_rerun_auto_skip" if rerun_policy_default == "auto_skip" else "skip_rerun_confirmation_required",
+                    status=STATUS_SKIPPED_AUTO if rerun_policy_default == "auto_skip" else STATUS_SKIPPED_CONFIRM_REQUIRED,
+                    confirmation_required=rerun_policy_default != "auto_skip",
+                )
+                continue
+            if not reservation.acquired:
+                add_skip(
+                    record=record,
+                    request_key=request_key,
+                    mail_key=mail_key,
+                    v1_key=v1_key,
+                    recipient_hash=recipient_hash,
+                    idempotency_token=idempotency_token,
+                    decision_trace=decision_trace + [f"reservation={reservation.reason}"],
+                    message=f"送信ロックを確保できなかったため送信をスキップしました: {record.email}",
+                    action="skip_lock_conflict",
+                    status=STATUS_SKIPPED_CONFIRM_REQUIRED,
+                    confirmation_required=True,
+                )
                 continue
 
-            self.send_ledger.mark_failed_pre_send(
-                request_key=request_key,
-                v1_key=v1_key,
-                key_version=dedupe_key_version,
-                run_id=run_id,
-                mail_key=mail_key,
-                recipient_hash=recipient_hash,
-                idempotency_token=idempotency_token,
-                idempotency_secret_version=idempotency_secret_version,
-                subject_norm=subject_norm,
-                decision_trace=decision_trace,
-                error=send_result.error,
-            )
-            results.append({
-                "email": record.email,
-                "company_name": record.company_name,
-                "success": False,
-                "message_id": send_result.message_id,
-                "error": send_result.error,
-                "sent_at": send_result.sent_at.isoformat() if send_result.sent_at else "",
-                "is_fallback_id": send_result.is_fallback_id,
-                "message_id_source": send_result.message_id_source,
-                "dedupe_key": request_key,
+            lease.hold(request_key, run_id)
+            # 結果の並びを保つため、送信完了前に枠だけ確保しておく。
+            entry: Dict[str, Any] = {}
+            results.append(entry)
+            job = {
+                "item_index": item_index,
+                "record": record,
                 "request_key": request_key,
                 "mail_key": mail_key,
-                "dedupe_key_version": dedupe_key_version,
+                "v1_key": v1_key,
+                "recipient_hash": recipient_hash,
+                "idempotency_token": idempotency_token,
                 "decision_trace": decision_trace,
-                "skipped": False,
-                "action": "failed_pre_send",
-                "skip_duplicate_in_run": False,
-                "confirmation_required": False,
-            })
-
-        product_info = None
-        if product_name or maker_name or maker_code or quantity or product_url:
-            product_info = {
-                "product_name": product_name,
-                "maker_name": maker_name,
-                "maker_code": maker_code,
-                "quantity": quantity,
-                "product_url": product_url,
+                "entry": entry,
             }
-        if workflow_context is None:
-            audit_log_path = self.audit_logger.write_audit_log(
-                input_file,
-                results,
-                product_info=product_info,
-            )
-        else:
-            audit_log_path = self.audit_logger.write_audit_log(
-                input_file,
-                results,
-                product_info=product_info,
-                workflow_context=workflow_context,
+            send_kwargs = dict(
+                to=record.email,
+                subject=subject,
+                body=body,
+                company_name=record.company_name,
+                idempotency_token=idempotency_token,
+                body_reconcile_marker=body_marker,
+                message_id_scope=run_id,
             )
-        sent_list_path = self.audit_logger.write_sent_list(results)
-        unsent_list_path = ""
-        if any(not r["success"] for r in results):
-            unsent_list_path = self.audit_logger.write_unsent_list(results)
-
-        screen_output = self.audit_logger.format_screen_output(results)
-        attempted_results = [r for r in results if not r.get("skipped")]
-        success_count = sum(1 for r in attempted_results if r["success"])
-        failure_count = sum(1 for r in attempted_results if not r["success"])
-        warning_text = "; ".join(warnings)
-
-        exit_code = EXIT_CODE_OK
-        if confirmation_required_count > 0 and non_interactive:
-            exit_code = EXIT_CODE_CONFIRM_REQUIRED
+            if send_pool is None:
+                finish_send(job, self.mail_sender.send_mail(**send_kwargs))
+                continue
+            inflight.append((send_pool.submit(self.mail_sender.send_mail, **send_kwargs), job))
+            inflight_keys.update((request_key, v1_key))
+            drain_inflight(max_inflight)
+
+        drain_inflight(0)
+        checkpoint(force=True)
+        self._settle_message_ids(resolving)
+        # 送信完了の確定が後になった警告も行順に並べる（同一行内の順序は保つ）。
+        warnings.sort(key=lambda pair: pair[0])
         return {
-            "success": failure_count == 0 and confirmation_required_count == 0,
-            "total": len(results),
-            "attempted_count": len(attempted_results),
-            "success_count": success_count,
-            "failure_count": failure_count,
+            "results": results,
+            "indices": [item["index"] for item in prepared],
+            "warnings": warnings,
             "skipped_duplicate_count": skipped_duplicate_count,
             "skipped_rerun_count": skipped_rerun_count,
             "confirmation_required_count": confirmation_required_count,
-            "audit_log_path": audit_log_path,
-            "sent_list_path": sent_list_path,
-            "unsent_list_path": unsent_list_path,
-            "screen_output": screen_output,
-            "warning": warning_text,
-            "warnings": warnings,
-            "results": results,
-            "dedupe_key_version": dedupe_key_version,
-            "exit_code": exit_code,
         }
 
+    def _reconcile_unknown_locks(
+        self,
+        prepared: List[Dict[str, Any]],
+        subject_norm: str,
+        extra_locks: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        対象キーに残る UNKNOWN_SENT（と extra_locks で渡された再開時の失効ロック）を
+        まとめて照合する（送信済みフォルダの走査は1回）。
+        照合できなかった場合も結果を返し、照合自体が失敗したキーは含めない。
+        """
+        items: Dict[str, Dict[str, Any]] = {}
+        for item in prepared:
+            items.setdefault(item["request_key"], item)
+        # 失効ロックは実際に送った可能性のあるメールのトークン（ロック側）で照合する。
+        tokens = [
+            (lock, items[lock["request_key"]]["idempotency_token"])
+            for lock in self.send_ledger.list_unknown_locks(request_keys=list(items))
+        ]
+        tokens.extend(
+            (lock, str(lock.get("idempotency_token", "") or items[lock["request_key"]]["idempotency_token"]))
+            for lock in extra_locks or ()
+            if lock["request_key"] in items
+        )
+        if not tokens:
+            return {}
+        reserved = self.send_ledger.reserved_at([lock["request_key"] for lock, _ in tokens])
+        batch = []
+        for lock, token in tokens:
+            batch.append({
+                "request_key": lock["request_key"],
+                "token": token,
+                "body_marker": f"[IDEMP:{token[:24]}]",
+                "message_id": str(lock.get("last_message_id", "") or ""),
+                "subject": subject_norm,
+                "recipient": items[lock["request_key"]]["record"].email,
+                **self._lock_send_window(lock, reserved.get(lock["request_key"])),
+            })
+        reconcile_batch = getattr(self.mail_sender, "reconcile_unknown_batch", None)
+        try:
+            if reconcile_batch is not None:
+                return reconcile_batch(batch)
+        except Exception:
+            pass
+        return {}
+
+    def _lock_send_window(
+        self,
+        lock: Dict[str, Any],
+        reserved_at: Optional[dt.datetime],
+    ) -> Dict[str, Optional[dt.datetime]]:
+        """
+        ロックのメールを送りえた時刻の範囲（照合の sent_after / sent_before）。
+        下限はロック確保時刻、上限はロックの最終更新にロック期限を足した時刻。
+        確保時刻が分からなければ下限なし（件名+宛先では照合しない）。
+        """
+        try:
+            updated = dt.datetime.fromisoformat(str(lock.get("updated_at_utc", "") or ""))
+        except ValueError:
+            updated = None
+        sent_before = None
+        if updated is not None:
+            if updated.tzinfo is None:
+                updated = updated.replace(tzinfo=dt.timezone.utc)
+            sent_before = updated + dt.timedelta(seconds=int(self.config.get("dedupe_in_progress_ttl_sec", 180)))
+        return {"sent_after": reserved_at, "sent_before": sent_before}
+
+    def _submit_message_id_lookup(self, send_result: Any, request_key: str, run_id: str) -> ResolveTicket:
+        """送信後の Message-ID 取得を MessageIdResolver へ渡す。取得できたら台帳の仮 ID を差し替える。"""
+        provisional = send_result.message_id
+
+        def on_resolved(ticket: ResolveTicket) -> None:
+            self.send_ledger.update_sent_message_id(
+                request_key=request_key,
+                run_id=run_id,
+                provisional_message_id=provisional,
+                message_id=ticket.message_id,
+                message_id_source=ticket.message_id_source,
+            )
+
+        return self.message_id_resolver.submit(send_result.pending_lookup, on_resolved)
+
+    def _settle_message_ids(self, resolving: List[Tuple[Dict[str, Any], ResolveTicket]]) -> None:
+        """
+        監査ログ出力前に非同期取得の完了を待ち、結果 dict へ反映する。
+        期限内に終わらなかった行は仮 ID のまま（message_id_source=pending）残す。
+        """
+        if not resolving:
+            return
+        self.message_id_resolver.drain(float(self.config.get("message_id_drain_timeout_sec", 30)))
+        for entry, ticket in resolving:
+            if not ticket.done:
+                continue
+            entry["message_id"] = ticket.message_id
+            entry["message_id_source"] = ticket.message_id_source
+            entry["is_fallback_id"] = ticket.is_fallback_id
+
     def run_aimitsu_workflow(self, **kwargs) -> Dict[str, Any]:
         """
         相見積改良ワークフローを実行する。
@@ -931,13 +1911,13 @@ def main():
         print("エラー: 暗号化鍵の準備に失敗しました。")
         sys.exit(1)
 
-    # Outlook接続確認
+    # 送信経路の接続確認
     outlook_check = skill.check_outlook_connection()
     if not outlook_check["connected"]:
         print(f"エラー: {outlook_check['message']}")
         sys.exit(1)
 
-    print("Outlook接続: OK")
+    print(f"送信経路: {outlook_check['message']}")
     print()
     print("このスキルはAIチャット経由で実行してください。")
     print("詳細は SKILL.md を参照してください。")
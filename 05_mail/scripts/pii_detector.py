@@ -8,9 +8,17 @@ pii_detector.py - PII混入検出モジュール
 """
 
 import re
-from typing import List, Set, Tuple
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from dataclasses import dataclass
 
+# pyahocorasick は会社名照合の高速化にのみ使う（オプショナル依存）
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 
 @dataclass
 class PIIDetectionResult:
@@ -31,6 +39,98 @@ class PIIDetectionResult:
             self.companies_found = []
 
 
+class CompanyNameMatcher:
+    """
+    会社名照合用の Aho-Corasick オートマトン。
+
+    構築は1度だけ行い、照合はテキストの1回の走査で済ませる（会社名数に依存しない）。
+    重なり・包含する会社名もすべて返し、結果は `name in text` を会社名ごとに
+    調べた場合と同じ集合になる。順序は構築時に渡した会社名の反復順。
+    pyahocorasick があればそれを使い、無ければ純 Python の実装で照合する。
+    """
+
+    def __init__(self, company_names: Iterable[str], accelerated: bool = True):
+        # 空文字は照合しない（従来の `if company and company in text` と同じ）
+        self.names: List[str] = [name for name in dict.fromkeys(company_names) if name]
+        self._automaton = None
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._dict_link: List[int] = [-1]
+        if accelerated and AHOCORASICK_AVAILABLE and self.names:
+            automaton = ahocorasick.Automaton()
+            for index, name in enumerate(self.names):
+                automaton.add_word(name, index)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            self._build()
+
+    @property
+    def accelerated(self) -> bool:
+        return self._automaton is not None
+
+    def _build(self) -> None:
+        goto = self._goto
+        output = self._output
+        for index, name in enumerate(self.names):
+            state = 0
+            for ch in name:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append(-1)
+                state = nxt
+            output[state] = index
+
+        # 失敗遷移と、出力を持つ最長の真の接尾辞状態（dict_link）を幅優先で求める。
+        fail = [0] * len(goto)
+        dict_link = [-1] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                link = goto[link].get(ch, 0)
+                fail[nxt] = link
+                dict_link[nxt] = link if output[link] >= 0 else dict_link[link]
+                queue.append(nxt)
+        self._fail = fail
+        self._dict_link = dict_link
+
+    def find(self, text: str) -> List[str]:
+        """text に含まれる会社名を返す。"""
+        if not self.names or not text:
+            return []
+        if self._automaton is not None:
+            hits = {index for _, index in self._automaton.iter(text)}
+        else:
+            hits = self._find_indexes(text)
+        return [self.names[index] for index in sorted(hits)]
+
+    def _find_indexes(self, text: str) -> Set[int]:
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+        hits: Set[int] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = state if output[state] >= 0 else dict_link[state]
+            # 既に見つけた会社名の接尾辞側は、その時点で辿り終えている。
+            while match >= 0 and output[match] not in hits:
+                hits.add(output[match])
+                match = dict_link[match]
+        return hits
+
+
 class PIIDetector:
     """PII混入検出クラス"""
 
@@ -45,12 +145,43 @@ class PIIDetector:
         r'(?:\d[\d\-\s\(\)]{8,}\d)',  # 数字で始まり終わる、間に記号を含む
     )
 
+    # メールアドレスと電話番号候補を1回で走査する結合パターン（大文字小文字無視はメール側のみ）
+    # 先頭の先読みでどちらも始まりえない位置を1回の文字クラス判定で読み飛ばす。
+    # \u0130 \u0131 \u017f \u212a は re.IGNORECASE で a-z と同一視される文字。
+    SCAN_PATTERN = re.compile(
+        r'(?=[a-zA-Z0-9._%+\-\u0130\u0131\u017f\u212a]|\d)'
+        rf'(?:(?P<email>(?i:{EMAIL_PATTERN.pattern}))|(?P<phone>{PHONE_PATTERN.pattern}))'
+    )
+    # '@' を含まないテキストではメールアドレス側の試行を省く（1文字ごとの分岐が無くなる）
+    _PHONE_SCAN_PATTERN = re.compile(rf'(?P<phone>{PHONE_PATTERN.pattern})')
+
+    # 電話番号候補の直後に続くとメールアドレスの一部になりうる文字
+    _EMAIL_CONTINUATION = re.compile(r'[a-zA-Z0-9._%+@-]', re.IGNORECASE)
+    _DIGIT = re.compile(r'\d')
+
+    # detect_many で複数テキストをつなぐ区切り（どのパターンにも一致しない）
+    _TEXT_SEPARATOR = "\x00"
+
     def __init__(self, company_names: Set[str] = None):
         """
         Args:
             company_names: 連絡先CSVに含まれる会社名のセット
         """
         self.company_names = company_names or set()
+        self._company_matcher: Optional[CompanyNameMatcher] = None
+        # 照合器を構築した時点の会社名（company_names の差し替え・その場での変更を検知する）
+        self._matcher_names: FrozenSet[str] = frozenset()
+        self._rebuild_matcher()
+
+    def _rebuild_matcher(self) -> None:
+        self._company_matcher = CompanyNameMatcher(self.company_names)
+        self._matcher_names = frozenset(self.company_names)
+
+    def _current_matcher(self) -> CompanyNameMatcher:
+        """company_names が構築時から変わっていれば照合器を作り直して返す。"""
+        if self._matcher_names != self.company_names:
+            self._rebuild_matcher()
+        return self._company_matcher
 
     def detect(self, text: str) -> PIIDetectionResult:
         """
@@ -62,22 +193,106 @@ class PIIDetector:
         Returns:
             PIIDetectionResult
         """
+        emails: List[str] = []
+        phones: List[str] = []
+        pattern = self._scan_pattern(text)
+        for match in pattern.finditer(text) if pattern is not None else ():
+            if not self._collect(match, text, emails, phones):
+                emails = self.EMAIL_PATTERN.findall(text)
+                phones = self._detect_phones(text)
+                break
+        return self._build_result(emails, phones, self._current_matcher().find(text))
+
+    def detect_many(self, texts: Iterable[str]) -> List[PIIDetectionResult]:
+        """
+        複数テキストのPIIをまとめて検出する。
+
+        メールアドレスと電話番号はすべてのテキストを1回の正規表現走査で拾い、
+        会社名は構築済みの照合器で各テキストを1回ずつ走査する。
+        各結果は EMAIL_PATTERN / PHONE_PATTERN をそれぞれ独立に適用した場合と同一で、
+        メールアドレスと電話番号候補が重なりうるテキストだけ個別の走査に切り替える。
+
+        Args:
+            texts: 検査対象のテキスト（製品検索クエリ、テンプレート本文、生成済みメール等）
+
+        Returns:
+            texts と同じ順の PIIDetectionResult のリスト
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        emails: List[List[str]] = [[] for _ in texts]
+        phones: List[List[str]] = [[] for _ in texts]
+        exact = [True] * len(texts)
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(self._TEXT_SEPARATOR)
+        joined = texts[0] if len(texts) == 1 else self._TEXT_SEPARATOR.join(texts)
+
+        pattern = self._scan_pattern(joined)
+
+        index = 0
+        for match in pattern.finditer(joined) if pattern is not None else ():
+            while index + 1 < len(starts) and starts[index + 1] <= match.start():
+                index += 1
+            if exact[index] and not self._collect(match, joined, emails[index], phones[index]):
+                exact[index] = False
+
+        # 会社名の変更確認は1回だけ行い、全テキストを同じ照合器で走査する。
+        matcher = self._current_matcher()
+        results = []
+        for i, text in enumerate(texts):
+            if exact[i]:
+                found_emails, found_phones = emails[i], phones[i]
+            else:
+                found_emails = self.EMAIL_PATTERN.findall(text)
+                found_phones = self._detect_phones(text)
+            results.append(self._build_result(found_emails, found_phones, matcher.find(text)))
+        return results
+
+    def _scan_pattern(self, text: str) -> Optional["re.Pattern[str]"]:
+        """text に必要な結合パターン（メールアドレスも電話番号もありえなければ None）。"""
+        if "@" in text:
+            return self.SCAN_PATTERN
+        if self._DIGIT.search(text):
+            return self._PHONE_SCAN_PATTERN
+        return None
+
+    def _collect(self, match: "re.Match[str]", text: str, emails: List[str], phones: List[str]) -> bool:
+        """
+        結合パターンの一致を emails / phones に振り分ける。
+        独立走査と結果が変わりうる重なりを見つけたら False を返す。
+        """
+        value = match.group()
+        if match.lastgroup == "email":
+            # 数字を含むメールアドレスの中からは、電話番号の独立走査が候補を拾いうる。
+            if self._DIGIT.search(value):
+                return False
+            emails.append(value)
+            return True
+        # 電話番号候補の途中から始まるメールアドレスは、直後が続く文字の場合だけありうる。
+        if self._EMAIL_CONTINUATION.match(text, match.end()):
+            return False
+        if self._is_phone(value):
+            phones.append(value)
+        return True
+
+    def _build_result(self, emails: List[str], phones: List[str], companies: List[str]) -> PIIDetectionResult:
         result = PIIDetectionResult()
 
         # メールアドレス検出
-        emails = self.EMAIL_PATTERN.findall(text)
         if emails:
             result.has_blocking_pii = True
             result.emails_found = emails
 
         # 電話番号検出
-        phones = self._detect_phones(text)
         if phones:
             result.has_blocking_pii = True
             result.phones_found = phones
 
         # 会社名検出
-        companies = self._detect_companies(text)
         if companies:
             result.has_warning_pii = True
             result.companies_found = companies
@@ -87,6 +302,10 @@ class PIIDetector:
 
         return result
 
+    def _is_phone(self, candidate: str) -> bool:
+        """数字が10桁以上なら電話番号とみなす。"""
+        return len(self._DIGIT.findall(candidate)) >= 10
+
     def _detect_phones(self, text: str) -> List[str]:
         """
         電話番号を検出する。
@@ -97,23 +316,17 @@ class PIIDetector:
         candidates = self.PHONE_PATTERN.findall(text)
 
         for candidate in candidates:
-            # 数字以外を除去
-            digits_only = re.sub(r'\D', '', candidate)
-            # 10桁以上なら電話番号として検出
-            if len(digits_only) >= 10:
+            # 数字以外を除いて10桁以上なら電話番号として検出
+            if self._is_phone(candidate):
                 phones.append(candidate)
 
         return phones
 
     def _detect_companies(self, text: str) -> List[str]:
         """
-        会社名との完全一致を検出する。
+        会社名との完全一致を検出する（set_company_names で構築した照合器で1回走査）。
         """
-        found = []
-        for company in self.company_names:
-            if company and company in text:
-                found.append(company)
-        return found
+        return self._current_matcher().find(text)
 
     def _generate_message(self, result: PIIDetectionResult) -> str:
         """検出結果のメッセージを生成する"""
@@ -143,5 +356,9 @@ class PIIDetector:
         return "\n\n".join(messages)
 
     def set_company_names(self, company_names: Set[str]) -> None:
-        """会社名セットを設定する"""
+        """会社名セットを設定し、照合器を構築する（同じ内容なら作り直さない）。"""
+        if company_names == self._matcher_names:
+            self.company_names = company_names
+            return
         self.company_names = company_names
+        self._rebuild_matcher()
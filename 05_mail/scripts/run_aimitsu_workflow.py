@@ -47,6 +47,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--request-id", default="", help="Reuse request_id for rerun")
     parser.add_argument("--rerun-of-run-id", default="", help="Optional rerun_of_run_id")
     parser.add_argument("--user-approved", action="store_true", help="Set user_approved=true")
+    parser.add_argument(
+        "--resume",
+        default="",
+        metavar="RUN_ID",
+        help=(
+            "Resume an interrupted send run from its last checkpoint (same contacts/template required). "
+            "List resumable run IDs with ledger_maintenance.py --list-runs"
+        ),
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Send lists larger than max_recipients in max_recipients-sized chunks under one run",
+    )
     return parser.parse_args()
 
 
@@ -100,6 +114,8 @@ def main() -> int:
         request_id=args.request_id,
         rerun_of_run_id=args.rerun_of_run_id,
         user_approved=bool(args.user_approved),
+        resume_run_id=args.resume,
+        chunked=True if args.chunked else None,
     )
     print(json.dumps(result, ensure_ascii=False, indent=2))
     state = str(result.get("state", "failed"))
@@ -12,13 +12,16 @@ import random
 import re
 import secrets
 import sqlite3
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
 import keyring
 
+from .ledger_archive import LedgerArchive
+
 UTC = dt.timezone.utc
 
 STATUS_IN_PROGRESS = "IN_PROGRESS"
@@ -32,11 +35,32 @@ STATUS_SKIPPED_DUPLICATE_IN_RUN = "SKIPPED_DUPLICATE_IN_RUN"
 OVERRIDE_KIND_REQUEST_KEY = "request_key"
 OVERRIDE_KIND_RECIPIENT = "recipient"
 
+LAST_SENT_KIND_REQUEST_KEY = "request_key"
+LAST_SENT_KIND_V1_KEY = "v1_key"
+
 DEFAULT_CREDENTIAL_SERVICE = "見積依頼スキル"
 IDEMPOTENCY_SECRET_PREFIX = "idempotency_secret_"
 RECIPIENT_SALT_PREFIX = "recipient_hash_salt_"
 RECIPIENT_SALT_VERSION = "v1"
 
+# PRAGMA user_version で管理する台帳スキーマのバージョン
+SCHEMA_VERSION = 7
+SWEEP_CURSOR_KEY = "sweep_send_events_id"
+
+# run_manifest.status
+RUN_STATUS_RUNNING = "RUNNING"
+RUN_STATUS_COMPLETED = "COMPLETED"
+
+# decision_trace_codes の予約コード。行ごとに値が変わる要素は行の列から復元する。
+TRACE_CODE_REQUEST_KEY = -1
+TRACE_CODE_MAIL_KEY = -2
+
+# 公開 dict API には載せない内部列
+_INTERNAL_EVENT_COLUMNS = ("created_at_ms", "decision_trace_codes")
+_INTERNAL_LOCK_COLUMNS = ("expires_at_ms",)
+# ISO 文字列列を epoch ミリ秒へ変換する SQL 式（v4 移行時の埋め戻し用）
+_ISO_TO_MS_SQL = "CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
 
 @dataclass
 class ReservationResult:
@@ -52,6 +76,181 @@ class OverrideDecision:
     trace: List[str]
 
 
+@dataclass
+class PrecheckDecision:
+    request_key: str
+    override: OverrideDecision
+    unknown_lock: Optional[Dict[str, Any]] = None
+    recent_sent: Optional[Dict[str, Any]] = None
+
+
+class _GroupCommitWriter:
+    """
+    SKIPPED_* / FAILED_PRE_SEND イベントを N件 または M ミリ秒ごとに
+    1トランザクションへまとめて書き込む。SENT / IN_PROGRESS は対象外。
+    """
+
+    def __init__(self, ledger: "SendLedger", max_events: int, max_delay_ms: int):
+        self._ledger = ledger
+        self._conn = ledger._create_conn(full_sync=False)
+        self._max_events = max(0, int(max_events))
+        self._max_delay_sec = max(0, int(max_delay_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def has_pending_lock_release(self, request_key: str) -> bool:
+        with self._lock:
+            return any(release == request_key for _, release in self._pending)
+
+    def submit(self, event: Dict[str, Any], release_lock_for: Optional[str] = None) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("group commit writer is closed")
+            self._pending.append((event, release_lock_for))
+            reached = self._max_events and len(self._pending) >= self._max_events
+            if not reached and self._timer is None and self._max_delay_sec > 0:
+                self._timer = threading.Timer(self._max_delay_sec, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if reached:
+            self.flush()
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            # 失敗分は pending に戻っているため、次回の flush で再試行する。
+            pass
+
+    def flush(self) -> int:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            def op(conn: sqlite3.Connection) -> None:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for event, release_lock_for in batch:
+                        if release_lock_for:
+                            conn.execute(
+                                "DELETE FROM send_locks WHERE request_key = ? AND status = ? AND run_id IS ?;",
+                                (release_lock_for, STATUS_IN_PROGRESS, event.get("run_id")),
+                            )
+                        self._ledger._insert_event(conn=conn, **event)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            try:
+                self._ledger._with_retry(op, self._conn)
+            except Exception:
+                self._pending = batch + self._pending
+                raise
+            return len(batch)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._closed = True
+                self._conn.close()
+
+
+class LeaseManager:
+    """
+    保持中の IN_PROGRESS ロックを専用接続のバックグラウンドスレッドで延長する。
+    送信処理がリトライや Message-ID 取得で長く止まっても期限切れにならないため、
+    dedupe_in_progress_ttl_sec を短くでき、異常終了したプロセスのロックは早く失効する。
+    """
+
+    def __init__(self, ledger: "SendLedger", interval_sec: float, ttl_sec: int):
+        self._ledger = ledger
+        self._conn = ledger._create_conn(full_sync=False)
+        self.interval_sec = max(0.01, float(interval_sec))
+        # 延長が1〜2回遅れても失効しない長さを確保する。
+        self.ttl_sec = max(int(ttl_sec), int(self.interval_sec * 3) + 1)
+        self._held: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "LeaseManager":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="send-lease", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.renew_all()
+            except Exception:
+                # 次の周期で再試行する。失効すれば他プロセスが照合後に引き継ぐ。
+                pass
+
+    def hold(self, request_key: str, run_id: Optional[str]) -> None:
+        with self._lock:
+            self._held[request_key] = run_id
+        self.renew_all()
+
+    def release(self, request_key: str) -> None:
+        with self._lock:
+            self._held.pop(request_key, None)
+
+    def held_keys(self) -> List[str]:
+        with self._lock:
+            return list(self._held)
+
+    def renew_all(self, now: Optional[dt.datetime] = None) -> int:
+        with self._lock:
+            held = list(self._held.items())
+            if not held:
+                return 0
+            current = self._ledger._to_utc(now or self._ledger._utcnow())
+            expires = current + dt.timedelta(seconds=self.ttl_sec)
+            expires_iso = self._ledger._to_iso(expires)
+            expires_ms = self._ledger._to_ms(expires)
+            current_iso = self._ledger._to_iso(current)
+
+            def op(conn: sqlite3.Connection) -> int:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    renewed = 0
+                    for request_key, run_id in held:
+                        renewed += conn.execute(
+                            """
+                            UPDATE send_locks
+                               SET expires_at_utc = ?, expires_at_ms = ?, updated_at_utc = ?
+                             WHERE request_key = ? AND status = ? AND run_id IS ?;
+                            """,
+                            (expires_iso, expires_ms, current_iso, request_key, STATUS_IN_PROGRESS, run_id),
+                        ).rowcount
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                return renewed
+
+            return self._ledger._with_retry(op, self._conn)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(1.0, self.interval_sec * 2))
+            self._thread = None
+        with self._lock:
+            self._held.clear()
+            self._conn.close()
+
+
 class SendLedger:
     def __init__(
         self,
@@ -60,6 +259,13 @@ class SendLedger:
         busy_timeout_ms: int = 15000,
         backoff_attempts: int = 5,
         credential_target_name: Optional[str] = None,
+        group_commit_max_events: int = 0,
+        group_commit_max_delay_ms: int = 0,
+        sweep_chunk_size: int = 5000,
+        sweep_max_chunks: int = 20,
+        archive_dir: Optional[str] = None,
+        archive_hot_days: int = 7,
+        archive_compress: bool = False,
     ):
         self.input_path = Path(ledger_path)
         self.sqlite_path = (
@@ -72,10 +278,39 @@ class SendLedger:
         self.busy_timeout_ms = max(1000, int(busy_timeout_ms))
         self.backoff_attempts = max(1, int(backoff_attempts))
         self.credential_service = credential_target_name or DEFAULT_CREDENTIAL_SERVICE
+        self.sweep_chunk_size = max(1, int(sweep_chunk_size))
+        self.sweep_max_chunks = max(1, int(sweep_max_chunks))
+        # keyring 参照はバックエンドによって数ms掛かるため、プロセス内で保持する。
+        self._secret_cache: Dict[str, str] = {}
+        self._hmac_cache: Dict[str, Any] = {}
+        self._recipient_hasher: Optional[Any] = None
+        # decision_trace の文字列 <-> コード対応。確定済みのものだけを保持する。
+        self._trace_codes: Dict[str, int] = {}
+        self._trace_texts: Dict[int, str] = {}
+        self._trace_pending: Dict[int, Dict[str, int]] = {}
+        self._trace_lock = threading.Lock()
 
         self.conn_main = self._create_conn(full_sync=False)
         self.conn_sent = self._create_conn(full_sync=True)
+        # MessageIdResolver のスレッドから使う更新専用接続（初回利用時に開く）
+        self._message_id_conn: Optional[sqlite3.Connection] = None
+        self._message_id_lock = threading.Lock()
         self._init_schema()
+        self._group_writer: Optional[_GroupCommitWriter] = None
+        if int(group_commit_max_events) > 0 or int(group_commit_max_delay_ms) > 0:
+            self._group_writer = _GroupCommitWriter(
+                self,
+                max_events=group_commit_max_events,
+                max_delay_ms=group_commit_max_delay_ms,
+            )
+        self.archive_hot_days = max(1, int(archive_hot_days))
+        self.archive: Optional[LedgerArchive] = None
+        if archive_dir:
+            self.archive = LedgerArchive(
+                Path(archive_dir),
+                open_conn=lambda: self._create_conn(full_sync=True),
+                compress=archive_compress,
+            )
 
     def _create_conn(self, full_sync: bool) -> sqlite3.Connection:
         conn = sqlite3.connect(
@@ -83,8 +318,11 @@ class SendLedger:
             timeout=max(1, self.busy_timeout_ms // 1000),
             isolation_level=None,
             check_same_thread=False,
+            cached_statements=256,
         )
         conn.row_factory = sqlite3.Row
+        # 新規作成時のみ有効。既存台帳は従来どおり（incremental_vacuum は無害な no-op）。
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute(f"PRAGMA synchronous={'FULL' if full_sync else 'NORMAL'};")
         conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms};")
@@ -156,14 +394,130 @@ class SendLedger:
                 command_summary_redacted TEXT
             );
             """,
-            "CREATE INDEX IF NOT EXISTS idx_send_events_rt ON send_events(request_key, status, created_at_utc);",
-            "CREATE INDEX IF NOT EXISTS idx_send_events_v1 ON send_events(v1_key);",
             "CREATE INDEX IF NOT EXISTS idx_send_locks_exp ON send_locks(status, expires_at_utc);",
             "CREATE INDEX IF NOT EXISTS idx_overrides ON rerun_overrides(kind, target_hash, expires_at_utc);",
         ]
         for conn in (self.conn_main, self.conn_sent):
             for sql in schema:
                 conn.execute(sql)
+        self._with_retry(self._migrate_schema, self.conn_main)
+
+    def _migrate_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = int(conn.execute("PRAGMA user_version;").fetchone()[0])
+            if version < 1:
+                # 直近SENT検索用のカバリングインデックス（status を先頭にして
+                # request_key / v1_key を個別に索引引きできるようにする）。
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_send_events_sent_rk "
+                    "ON send_events(status, request_key, created_at_utc);"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_send_events_sent_v1 "
+                    "ON send_events(status, v1_key, created_at_utc);"
+                )
+                conn.execute("DROP INDEX IF EXISTS idx_send_events_rt;")
+                conn.execute("DROP INDEX IF EXISTS idx_send_events_v1;")
+            if version < 2:
+                # request_key / v1_key ごとの最新SENTだけを保持する圧縮表。
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS last_sent (
+                        key_kind TEXT NOT NULL,
+                        lookup_key TEXT NOT NULL,
+                        event_id INTEGER NOT NULL,
+                        created_at_utc TEXT NOT NULL,
+                        run_id TEXT,
+                        PRIMARY KEY (key_kind, lookup_key)
+                    ) WITHOUT ROWID;
+                    """
+                )
+                self._rebuild_last_sent(conn)
+            if version < 3:
+                # 保持期間スイーパーの進捗などを保持するメタデータ表。
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS ledger_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    ) WITHOUT ROWID;
+                    """
+                )
+            if version < 4:
+                # 比較用の epoch ミリ秒列と、decision_trace の文字列辞書。
+                self._add_column(conn, "send_events", "created_at_ms", "INTEGER")
+                self._add_column(conn, "send_events", "decision_trace_codes", "TEXT")
+                self._add_column(conn, "send_locks", "expires_at_ms", "INTEGER")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS trace_codes (
+                        code INTEGER PRIMARY KEY,
+                        text TEXT NOT NULL UNIQUE
+                    );
+                    """
+                )
+                conn.execute(
+                    f"UPDATE send_events SET created_at_ms = {_ISO_TO_MS_SQL.format(column='created_at_utc')} "
+                    "WHERE created_at_ms IS NULL;"
+                )
+                conn.execute(
+                    f"UPDATE send_locks SET expires_at_ms = {_ISO_TO_MS_SQL.format(column='expires_at_utc')} "
+                    "WHERE expires_at_ms IS NULL;"
+                )
+            if version < 5:
+                # send_bulk の実行ごとの宛先順（request_key 列）と、確定済み位置（high_water）。
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS run_manifest (
+                        run_id TEXT PRIMARY KEY,
+                        created_at_utc TEXT NOT NULL,
+                        updated_at_utc TEXT NOT NULL,
+                        key_version TEXT NOT NULL,
+                        subject_norm TEXT,
+                        total INTEGER NOT NULL,
+                        high_water INTEGER NOT NULL DEFAULT -1,
+                        status TEXT NOT NULL
+                    ) WITHOUT ROWID;
+                    """
+                )
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS run_manifest_items (
+                        run_id TEXT NOT NULL,
+                        position INTEGER NOT NULL,
+                        request_key TEXT NOT NULL,
+                        mail_key TEXT NOT NULL,
+                        PRIMARY KEY (run_id, position)
+                    );
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_run_manifest_status ON run_manifest(status, updated_at_utc);"
+                )
+            if version < 6:
+                # 分割処理時に、前の区間に同じ request_key があったかを引く。
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_run_manifest_items_key "
+                    "ON run_manifest_items(run_id, request_key, position);"
+                )
+            if version < 7:
+                # 期間検索・保持期間削除は created_at_ms で比較する（ISO 文字列比較を避ける）。
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_send_events_created_ms ON send_events(created_at_ms);"
+                )
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _add_column(conn: sqlite3.Connection, table: str, column: str, ctype: str) -> None:
+        existing = {str(r[1]) for r in conn.execute(f"PRAGMA table_info({table});").fetchall()}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ctype};")
 
     @staticmethod
     def _utcnow() -> dt.datetime:
@@ -179,6 +533,10 @@ class SendLedger:
     def _to_iso(ts: dt.datetime) -> str:
         return SendLedger._to_utc(ts).isoformat()
 
+    @staticmethod
+    def _to_ms(ts: dt.datetime) -> int:
+        return int(round(SendLedger._to_utc(ts).timestamp() * 1000))
+
     @staticmethod
     def _parse_iso(value: str) -> Optional[dt.datetime]:
         if not value:
@@ -191,14 +549,129 @@ class SendLedger:
     def _with_retry(self, op, conn: sqlite3.Connection):
         for i in range(self.backoff_attempts):
             try:
-                return op(conn)
+                result = op(conn)
             except sqlite3.OperationalError as exc:
+                self._settle_trace_codes(conn, committed=False)
                 msg = str(exc).lower()
                 if "locked" not in msg and "busy" not in msg:
                     raise
                 if i >= self.backoff_attempts - 1:
                     raise
                 time.sleep((0.05 * (2**i)) + random.uniform(0.0, 0.05))
+            except BaseException:
+                self._settle_trace_codes(conn, committed=False)
+                raise
+            else:
+                self._settle_trace_codes(conn, committed=True)
+                return result
+
+    @staticmethod
+    def _fetch_tuples(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        """sqlite3.Row / dict を作らずにタプルで返す内部用クエリ。"""
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(sql, tuple(params)).fetchall()
+
+    @staticmethod
+    def _fetch_tuple(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> Optional[Tuple[Any, ...]]:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(sql, tuple(params)).fetchone()
+
+    def _trace_code(self, conn: sqlite3.Connection, text: str) -> int:
+        code = self._trace_codes.get(text)
+        if code is not None:
+            return code
+        conn.execute("INSERT OR IGNORE INTO trace_codes (text) VALUES (?);", (text,))
+        code = int(self._fetch_tuple(conn, "SELECT code FROM trace_codes WHERE text = ?;", (text,))[0])
+        with self._trace_lock:
+            if conn.in_transaction:
+                # ロールバックされ得るため、コミットを見届けるまでキャッシュしない。
+                self._trace_pending.setdefault(id(conn), {})[text] = code
+            else:
+                self._trace_codes[text] = code
+                self._trace_texts[code] = text
+        return code
+
+    def _settle_trace_codes(self, conn: sqlite3.Connection, committed: bool) -> None:
+        with self._trace_lock:
+            pending = self._trace_pending.pop(id(conn), None)
+            if committed and pending:
+                self._trace_codes.update(pending)
+                self._trace_texts.update((code, text) for text, code in pending.items())
+
+    def _encode_trace(
+        self,
+        conn: sqlite3.Connection,
+        decision_trace: Sequence[str],
+        request_key: str,
+        mail_key: str,
+    ) -> str:
+        request_text = f"request_key={request_key}"
+        mail_text = f"mail_key={mail_key}"
+        codes: List[str] = []
+        for text in decision_trace:
+            text = str(text)
+            if text == request_text:
+                codes.append(str(TRACE_CODE_REQUEST_KEY))
+            elif text == mail_text:
+                codes.append(str(TRACE_CODE_MAIL_KEY))
+            else:
+                codes.append(str(self._trace_code(conn, text)))
+        return ",".join(codes)
+
+    def _decode_trace(
+        self,
+        conn: sqlite3.Connection,
+        encoded: str,
+        request_key: str,
+        mail_key: str,
+    ) -> List[str]:
+        codes = [int(c) for c in str(encoded).split(",") if c]
+        missing = [c for c in codes if c > 0 and c not in self._trace_texts]
+        if missing:
+            placeholders = ", ".join("?" for _ in missing)
+            rows = self._fetch_tuples(
+                conn,
+                f"SELECT code, text FROM trace_codes WHERE code IN ({placeholders});",
+                missing,
+            )
+            with self._trace_lock:
+                for code, text in rows:
+                    self._trace_texts[int(code)] = str(text)
+                    self._trace_codes[str(text)] = int(code)
+        decoded: List[str] = []
+        for code in codes:
+            if code == TRACE_CODE_REQUEST_KEY:
+                decoded.append(f"request_key={request_key}")
+            elif code == TRACE_CODE_MAIL_KEY:
+                decoded.append(f"mail_key={mail_key}")
+            else:
+                decoded.append(self._trace_texts.get(code, f"trace_code={code}"))
+        return decoded
+
+    def _event_dict(self, conn: sqlite3.Connection, row: Any) -> Dict[str, Any]:
+        """send_events 行を従来形式の dict にする（decision_trace は JSON 文字列）。"""
+        entry = dict(row)
+        encoded = entry.pop("decision_trace_codes", None)
+        for column in _INTERNAL_EVENT_COLUMNS:
+            entry.pop(column, None)
+        if entry.get("decision_trace") is None and encoded is not None:
+            trace = self._decode_trace(
+                conn,
+                encoded,
+                str(entry.get("request_key") or ""),
+                str(entry.get("mail_key") or ""),
+            )
+            entry["decision_trace"] = json.dumps(trace, ensure_ascii=False)
+        return entry
+
+    @staticmethod
+    def _lock_dict(row: Any) -> Dict[str, Any]:
+        entry = dict(row)
+        for column in _INTERNAL_LOCK_COLUMNS:
+            entry.pop(column, None)
+        return entry
 
     def _insert_event(
         self,
@@ -219,18 +692,22 @@ class SendLedger:
         subject_norm: str,
         decision_trace: Sequence[str],
         error: str,
-        created_at_utc: Optional[str] = None,
-    ) -> None:
-        conn.execute(
+        created_at: Optional[dt.datetime] = None,
+    ) -> int:
+        created = self._to_utc(created_at or self._utcnow())
+        # decision_trace は JSON にせずコード列で持つ（読み出し時に _event_dict で復元）。
+        cursor = conn.execute(
             """
             INSERT INTO send_events (
-                created_at_utc, request_key, v1_key, key_version, mail_key, run_id, status,
-                recipient_hash, message_id, message_id_source, idempotency_token,
-                idempotency_secret_version, sent_at_utc, subject_norm, decision_trace, error
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                created_at_utc, created_at_ms, request_key, v1_key, key_version, mail_key, run_id,
+                status, recipient_hash, message_id, message_id_source, idempotency_token,
+                idempotency_secret_version, sent_at_utc, subject_norm, decision_trace,
+                decision_trace_codes, error
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?);
             """,
             (
-                created_at_utc or self._to_iso(self._utcnow()),
+                created.isoformat(),
+                self._to_ms(created),
                 request_key,
                 v1_key,
                 key_version,
@@ -244,37 +721,334 @@ class SendLedger:
                 idempotency_secret_version,
                 sent_at_utc,
                 subject_norm,
-                json.dumps(list(decision_trace), ensure_ascii=False),
+                self._encode_trace(conn, decision_trace, request_key, mail_key),
                 error or "",
             ),
         )
+        return int(cursor.lastrowid)
+
+    def _upsert_last_sent(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        event_id: int,
+        request_key: str,
+        v1_key: Optional[str],
+        created_at_utc: str,
+        run_id: str,
+    ) -> None:
+        rows = [(LAST_SENT_KIND_REQUEST_KEY, request_key, event_id, created_at_utc, run_id)]
+        if v1_key is not None:
+            rows.append((LAST_SENT_KIND_V1_KEY, v1_key, event_id, created_at_utc, run_id))
+        conn.executemany(
+            """
+            INSERT INTO last_sent (key_kind, lookup_key, event_id, created_at_utc, run_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key_kind, lookup_key) DO UPDATE SET
+                event_id = excluded.event_id,
+                created_at_utc = excluded.created_at_utc,
+                run_id = excluded.run_id
+            WHERE excluded.created_at_utc >= last_sent.created_at_utc;
+            """,
+            rows,
+        )
+
+    @staticmethod
+    def _rebuild_last_sent(conn: sqlite3.Connection) -> int:
+        conn.execute("DELETE FROM last_sent;")
+        # SQLite の MAX() 集約では、素の列は最大値を持つ行の値になる。
+        for kind, column in (
+            (LAST_SENT_KIND_REQUEST_KEY, "request_key"),
+            (LAST_SENT_KIND_V1_KEY, "v1_key"),
+        ):
+            conn.execute(
+                f"""
+                INSERT INTO last_sent (key_kind, lookup_key, event_id, created_at_utc, run_id)
+                SELECT ?, {column}, id, MAX(created_at_utc), run_id
+                  FROM send_events
+                 WHERE status = ?
+                   AND {column} IS NOT NULL
+                 GROUP BY {column};
+                """,
+                (kind, STATUS_SENT),
+            )
+        return int(conn.execute("SELECT COUNT(*) FROM last_sent;").fetchone()[0])
+
+    def rebuild_last_sent(self) -> int:
+        """send_events から last_sent を再構築し、登録件数を返す。"""
+
+        def op(conn: sqlite3.Connection) -> int:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._rebuild_last_sent(conn)
+                conn.execute("COMMIT")
+                return count
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return self._with_retry(op, self.conn_sent)
+
+    def flush_pending_events(self) -> int:
+        """グループコミット待ちのイベントを即時に書き込み、件数を返す。"""
+        if self._group_writer is None:
+            return 0
+        return self._group_writer.flush()
+
+    def _flush_pending_lock_release(self, request_key: str) -> None:
+        if self._group_writer is not None and self._group_writer.has_pending_lock_release(request_key):
+            self._group_writer.flush()
 
     def cleanup_on_batch_start(
         self,
         rerun_window_hours: int,
         unknown_sent_hold_sec: int,
         now: Optional[dt.datetime] = None,
-    ) -> None:
+    ) -> Dict[str, int]:
+        self.flush_pending_events()
+        stats = self.sweep_retention(
+            rerun_window_hours=rerun_window_hours,
+            unknown_sent_hold_sec=unknown_sent_hold_sec,
+            chunk_size=self.sweep_chunk_size,
+            max_chunks=self.sweep_max_chunks,
+            now=now,
+        )
+        if self.archive is not None:
+            archived = self.archive_events(rerun_window_hours=rerun_window_hours, now=now)
+            stats["archived"] = sum(archived["moved"].values())
+        return stats
+
+    def archive_events(
+        self,
+        rerun_window_hours: int = 24,
+        now: Optional[dt.datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        ホット保持期間（再実行判定窓より短くはしない）を過ぎた send_events を
+        月次アーカイブへ移し、保持期間を過ぎたアーカイブファイルを削除する。
+        """
+        if self.archive is None:
+            return {"moved": {}, "expired": []}
+        self.flush_pending_events()
         current = self._to_utc(now or self._utcnow())
-        retention = current - dt.timedelta(days=self.retention_days)
-        in_progress_cutoff = current - dt.timedelta(hours=max(24, int(rerun_window_hours)))
-        unknown_cutoff = current - dt.timedelta(seconds=max(unknown_sent_hold_sec, 1800))
+        hot = max(
+            dt.timedelta(days=self.archive_hot_days),
+            dt.timedelta(hours=max(1, int(rerun_window_hours))),
+        )
+        moved = self.archive.archive_before(current - hot, chunk_size=self.sweep_chunk_size)
+        expired = self.archive.expire_before(current - dt.timedelta(days=self.retention_days))
+        return {"moved": moved, "expired": expired}
 
-        def op(conn: sqlite3.Connection):
-            conn.execute("BEGIN IMMEDIATE")
-            conn.execute("DELETE FROM send_events WHERE created_at_utc < ?;", (self._to_iso(retention),))
-            conn.execute(
-                "DELETE FROM send_locks WHERE status=? AND expires_at_utc < ?;",
-                (STATUS_IN_PROGRESS, self._to_iso(in_progress_cutoff)),
+    def query_events(
+        self,
+        start: Optional[dt.datetime] = None,
+        end: Optional[dt.datetime] = None,
+        request_key: Optional[str] = None,
+        run_id: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archives: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """監査用の send_events 検索。アーカイブ有効時は該当月のファイルも合わせて返す。"""
+        self.flush_pending_events()
+        # ホット台帳は created_at_ms の索引で引く。アーカイブは created_at_ms を
+        # 持たない古いファイルがあるため created_at_utc で比較する。
+        ms_clauses: List[str] = []
+        ms_params: List[Any] = []
+        iso_clauses: List[str] = []
+        iso_params: List[Any] = []
+        if start is not None:
+            ms_clauses.append("created_at_ms >= ?")
+            ms_params.append(self._to_ms(start))
+            iso_clauses.append("created_at_utc >= ?")
+            iso_params.append(self._to_iso(start))
+        if end is not None:
+            ms_clauses.append("created_at_ms < ?")
+            ms_params.append(self._to_ms(end))
+            iso_clauses.append("created_at_utc < ?")
+            iso_params.append(self._to_iso(end))
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (("request_key", request_key), ("run_id", run_id), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where_sql = " AND ".join(ms_clauses + clauses) or "1"
+        rows = [
+            self._event_dict(self.conn_main, row)
+            for row in self.conn_main.execute(
+                f"SELECT * FROM send_events WHERE {where_sql};", ms_params + params
             )
-            conn.execute(
-                "DELETE FROM send_locks WHERE status=? AND expires_at_utc < ?;",
-                (STATUS_UNKNOWN_SENT, self._to_iso(unknown_cutoff)),
+        ]
+        if include_archives and self.archive is not None:
+            seen = {row["id"] for row in rows}
+            archive_where = " AND ".join(iso_clauses + clauses) or "1"
+            for row in self.archive.query(archive_where, iso_params + params, start=start, end=end):
+                if row["id"] not in seen:
+                    rows.append(self._event_dict(self.conn_main, row))
+        rows.sort(key=lambda r: (str(r.get("created_at_utc", "")), int(r.get("id") or 0)))
+        return rows
+
+    def _get_meta(self, conn: sqlite3.Connection, key: str, default: str = "") -> str:
+        row = conn.execute("SELECT value FROM ledger_meta WHERE key = ?;", (key,)).fetchone()
+        return str(row[0]) if row else default
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute(
+            """
+            INSERT INTO ledger_meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value;
+            """,
+            (key, value),
+        )
+
+    def _delete_chunk(self, sql: str, params: Tuple[Any, ...]) -> int:
+        def op(conn: sqlite3.Connection) -> int:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = conn.execute(sql, params).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return max(0, int(deleted))
+
+        return self._with_retry(op, self.conn_main)
+
+    def sweep_retention(
+        self,
+        rerun_window_hours: int = 24,
+        unknown_sent_hold_sec: int = 1800,
+        chunk_size: int = 5000,
+        max_chunks: Optional[int] = None,
+        now: Optional[dt.datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        保持期間切れの行を chunk_size 件ずつ個別トランザクションで削除する。
+        max_chunks 到達で打ち切り、send_events の走査位置は ledger_meta に残して
+        次回その位置から再開する（None は打ち切りなし）。
+        """
+        current = self._to_utc(now or self._utcnow())
+        retention_iso = self._to_iso(current - dt.timedelta(days=self.retention_days))
+        retention_ms = self._to_ms(current - dt.timedelta(days=self.retention_days))
+        in_progress_iso = self._to_iso(current - dt.timedelta(hours=max(24, int(rerun_window_hours))))
+        unknown_iso = self._to_iso(current - dt.timedelta(seconds=max(unknown_sent_hold_sec, 1800)))
+        chunk = max(1, int(chunk_size))
+        budget = None if max_chunks is None else max(1, int(max_chunks))
+        stats = {
+            "send_events": 0,
+            "last_sent": 0,
+            "send_locks": 0,
+            "rerun_overrides": 0,
+            "run_manifest_items": 0,
+            "run_manifest": 0,
+            "chunks": 0,
+            "complete": 1,
+        }
+
+        def take_chunk() -> bool:
+            nonlocal budget
+            if budget is not None:
+                if budget <= 0:
+                    stats["complete"] = 0
+                    return False
+                budget -= 1
+            stats["chunks"] += 1
+            return True
+
+        def drain(table: str, sql: str, params: Tuple[Any, ...]) -> bool:
+            while take_chunk():
+                deleted = self._delete_chunk(sql, params + (chunk,))
+                stats[table] += deleted
+                if deleted < chunk:
+                    return True
+            return False
+
+        # ロック・override は件数が少なく判定に直結するため先に処理する。
+        lock_sql = (
+            "DELETE FROM send_locks WHERE rowid IN ("
+            "SELECT rowid FROM send_locks WHERE status = ? AND expires_at_utc < ? LIMIT ?);"
+        )
+        if not drain("send_locks", lock_sql, (STATUS_IN_PROGRESS, in_progress_iso)):
+            return stats
+        if not drain("send_locks", lock_sql, (STATUS_UNKNOWN_SENT, unknown_iso)):
+            return stats
+        if not drain(
+            "rerun_overrides",
+            "DELETE FROM rerun_overrides WHERE id IN ("
+            "SELECT id FROM rerun_overrides WHERE expires_at_utc < ? LIMIT ?);",
+            (self._to_iso(current),),
+        ):
+            return stats
+        if not drain(
+            "last_sent",
+            "DELETE FROM last_sent WHERE (key_kind, lookup_key) IN ("
+            "SELECT key_kind, lookup_key FROM last_sent WHERE created_at_utc < ? LIMIT ?);",
+            (retention_iso,),
+        ):
+            return stats
+
+        # send_events は id 範囲で走査する。範囲内の全行が期限切れなら
+        # 保存済み位置を進め、期限内の行が残る範囲に達したら終了する。
+        conn = self.conn_main
+        cursor_id = int(self._get_meta(conn, SWEEP_CURSOR_KEY, "0") or 0)
+        max_id = int(conn.execute("SELECT COALESCE(MAX(id), 0) FROM send_events;").fetchone()[0])
+        while cursor_id < max_id:
+            if not take_chunk():
+                break
+            upper = cursor_id + chunk
+
+            def op(c: sqlite3.Connection, lower: int = cursor_id, upper: int = upper) -> Tuple[int, bool]:
+                c.execute("BEGIN IMMEDIATE")
+                try:
+                    deleted = c.execute(
+                        "DELETE FROM send_events WHERE id > ? AND id <= ? AND created_at_ms < ?;",
+                        (lower, upper, retention_ms),
+                    ).rowcount
+                    remaining = c.execute(
+                        "SELECT 1 FROM send_events WHERE id > ? AND id <= ? LIMIT 1;",
+                        (lower, upper),
+                    ).fetchone()
+                    if remaining is None:
+                        self._set_meta(c, SWEEP_CURSOR_KEY, str(upper))
+                    c.execute("COMMIT")
+                except Exception:
+                    c.execute("ROLLBACK")
+                    raise
+                return max(0, int(deleted)), remaining is None
+
+            deleted, cleared = self._with_retry(op, conn)
+            stats["send_events"] += deleted
+            if not cleared:
+                break
+            cursor_id = upper
+
+        # 保持期間を過ぎた実行マニフェストは明細から先に消す。
+        if drain(
+            "run_manifest_items",
+            "DELETE FROM run_manifest_items WHERE rowid IN ("
+            "SELECT i.rowid FROM run_manifest_items AS i JOIN run_manifest AS m ON m.run_id = i.run_id "
+            "WHERE m.updated_at_utc < ? LIMIT ?);",
+            (retention_iso,),
+        ):
+            drain(
+                "run_manifest",
+                "DELETE FROM run_manifest WHERE run_id IN ("
+                "SELECT run_id FROM run_manifest WHERE updated_at_utc < ? LIMIT ?);",
+                (retention_iso,),
             )
-            conn.execute("DELETE FROM rerun_overrides WHERE expires_at_utc < ?;", (self._to_iso(current),))
-            conn.execute("COMMIT")
 
-        self._with_retry(op, self.conn_main)
+        if stats["send_events"] or stats["last_sent"]:
+            self._reclaim_space()
+        return stats
+
+    def _reclaim_space(self, pages: int = 2000) -> None:
+        # いずれも他接続を待たない。失敗しても次回の掃除で再試行されるため握りつぶす。
+        try:
+            self.conn_main.execute(f"PRAGMA incremental_vacuum({max(1, int(pages))});").fetchall()
+            self.conn_main.execute("PRAGMA wal_checkpoint(PASSIVE);").fetchall()
+        except sqlite3.OperationalError:
+            pass
 
     def reserve_send(
         self,
@@ -290,38 +1064,76 @@ class SendLedger:
         ttl_sec: int,
         decision_trace: Sequence[str],
         now: Optional[dt.datetime] = None,
+        recent_sent_window_hours: Optional[int] = None,
+        recent_sent_run_id: Optional[str] = None,
+        takeover_expired: bool = False,
     ) -> ReservationResult:
+        """
+        IN_PROGRESS ロックを確保する。recent_sent_window_hours 指定時は同じ
+        トランザクション内で直近SENTも再確認し、事前照会後に他プロセスが
+        送信済みにしたキーを reason="recent_sent" で弾く。
+        takeover_expired=True なら期限切れ IN_PROGRESS ロックを引き継ぐ
+        （呼び出し側で送信済みでないことを照合してから指定する）。
+        """
+        self._flush_pending_lock_release(request_key)
         current = self._to_utc(now or self._utcnow())
+        current_ms = self._to_ms(current)
         expires = current + dt.timedelta(seconds=max(60, int(ttl_sec)))
 
         def op(conn: sqlite3.Connection) -> ReservationResult:
             conn.execute("BEGIN IMMEDIATE")
-            row = conn.execute(
-                "SELECT * FROM send_locks WHERE request_key = ?;",
+            head = self._fetch_tuple(
+                conn,
+                "SELECT status, expires_at_ms, expires_at_utc FROM send_locks WHERE request_key = ?;",
                 (request_key,),
-            ).fetchone()
-            if row is not None:
-                lock = dict(row)
-                lock_status = str(lock.get("status", ""))
-                lock_expire = self._parse_iso(str(lock.get("expires_at_utc", "")))
-                conn.execute("ROLLBACK")
-                if lock_status == STATUS_IN_PROGRESS:
-                    if lock_expire and lock_expire > current:
-                        return ReservationResult(False, "in_progress_active", lock)
-                    return ReservationResult(False, "in_progress_expired", lock)
-                if lock_status == STATUS_UNKNOWN_SENT:
-                    if lock_expire and lock_expire > current:
-                        return ReservationResult(False, "unknown_sent_hold_active", lock)
-                    return ReservationResult(False, "unknown_sent_hold_expired", lock)
-                return ReservationResult(False, "lock_conflict", lock)
+            )
+            taken_over: Optional[Dict[str, Any]] = None
+            if head is not None:
+                lock_status = str(head[0] or "")
+                if head[1] is not None:
+                    active = int(head[1]) > current_ms
+                else:
+                    # v4 より前のプロセスが書いたロックは ISO 文字列で判定する。
+                    lock_expire = self._parse_iso(str(head[2] or ""))
+                    active = lock_expire is not None and lock_expire > current
+                lock = self._lock_dict(
+                    conn.execute("SELECT * FROM send_locks WHERE request_key = ?;", (request_key,)).fetchone()
+                )
+                if takeover_expired and lock_status == STATUS_IN_PROGRESS and not active:
+                    conn.execute("DELETE FROM send_locks WHERE request_key = ?;", (request_key,))
+                    taken_over = lock
+                else:
+                    conn.execute("ROLLBACK")
+                    if lock_status == STATUS_IN_PROGRESS:
+                        if active:
+                            return ReservationResult(False, "in_progress_active", lock)
+                        return ReservationResult(False, "in_progress_expired", lock)
+                    if lock_status == STATUS_UNKNOWN_SENT:
+                        if active:
+                            return ReservationResult(False, "unknown_sent_hold_active", lock)
+                        return ReservationResult(False, "unknown_sent_hold_expired", lock)
+                    return ReservationResult(False, "lock_conflict", lock)
+
+            if recent_sent_window_hours is not None:
+                recent = self._find_recent_sent_on(
+                    conn,
+                    request_key,
+                    v1_key,
+                    recent_sent_window_hours,
+                    recent_sent_run_id,
+                    current,
+                )
+                if recent is not None:
+                    conn.execute("ROLLBACK")
+                    return ReservationResult(False, "recent_sent", recent)
 
             conn.execute(
                 """
                 INSERT INTO send_locks (
-                    request_key, key_version, run_id, status, expires_at_utc, updated_at_utc,
-                    recipient_hash, mail_key, v1_key, idempotency_token,
+                    request_key, key_version, run_id, status, expires_at_utc, expires_at_ms,
+                    updated_at_utc, recipient_hash, mail_key, v1_key, idempotency_token,
                     idempotency_secret_version, subject_norm
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
                 """,
                 (
                     request_key,
@@ -329,6 +1141,7 @@ class SendLedger:
                     run_id,
                     STATUS_IN_PROGRESS,
                     self._to_iso(expires),
+                    self._to_ms(expires),
                     self._to_iso(current),
                     recipient_hash,
                     mail_key,
@@ -355,9 +1168,11 @@ class SendLedger:
                 subject_norm=subject_norm,
                 decision_trace=decision_trace,
                 error="",
-                created_at_utc=self._to_iso(current),
+                created_at=current,
             )
             conn.execute("COMMIT")
+            if taken_over is not None:
+                return ReservationResult(True, "acquired_expired_takeover", taken_over)
             return ReservationResult(True, "acquired", None)
 
         return self._with_retry(op, self.conn_main)
@@ -368,31 +1183,264 @@ class SendLedger:
         self.conn_main.execute(
             """
             UPDATE send_locks
-               SET expires_at_utc = ?, updated_at_utc = ?
+               SET expires_at_utc = ?, expires_at_ms = ?, updated_at_utc = ?
              WHERE request_key = ?
                AND status = ?;
             """,
             (
                 self._to_iso(expires),
+                self._to_ms(expires),
                 self._to_iso(current),
                 request_key,
                 STATUS_IN_PROGRESS,
             ),
         )
 
+    def open_lease_manager(self, interval_sec: float, ttl_sec: int) -> LeaseManager:
+        """バックグラウンド延長を開始した LeaseManager を返す。呼び出し側で stop() すること。"""
+        return LeaseManager(self, interval_sec=interval_sec, ttl_sec=ttl_sec).start()
+
     def clear_unknown_lock_for_manual_override(self, request_key: str) -> None:
         self.conn_main.execute(
             "DELETE FROM send_locks WHERE request_key = ? AND status = ?;",
             (request_key, STATUS_UNKNOWN_SENT),
         )
 
+    def list_unknown_locks(
+        self,
+        request_keys: Optional[Sequence[str]] = None,
+        run_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        UNKNOWN_SENT のロックを一覧する。request_keys / run_id を指定すればその範囲に絞る。
+        一括照合（reconcile_unknown_batch）の入力に使う。
+        """
+        sql = "SELECT * FROM send_locks WHERE status = ?"
+        params: List[Any] = [STATUS_UNKNOWN_SENT]
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        if request_keys is None:
+            rows = self.conn_main.execute(sql + " ORDER BY request_key;", params).fetchall()
+            return [self._lock_dict(row) for row in rows]
+        locks: List[Dict[str, Any]] = []
+        keys = list(dict.fromkeys(request_keys))
+        # SQLite の変数上限を超えないよう分割して照会する。
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self.conn_main.execute(
+                sql + f" AND request_key IN ({placeholders}) ORDER BY request_key;",
+                params + chunk,
+            ).fetchall()
+            locks.extend(self._lock_dict(row) for row in rows)
+        return locks
+
+    def reserved_at(self, request_keys: Sequence[str]) -> Dict[str, dt.datetime]:
+        """
+        キーごとに最後に送信ロックを確保した時刻（IN_PROGRESS イベントの記録時刻）。
+        送信結果が不明なメールの照合で、送信時刻の下限に使う。記録が無いキーは含めない。
+        """
+        found: Dict[str, dt.datetime] = {}
+        keys = list(dict.fromkeys(request_keys))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self.conn_main.execute(
+                "SELECT request_key, MAX(created_at_utc) FROM send_events "
+                f"WHERE status = ? AND request_key IN ({placeholders}) GROUP BY request_key;",
+                [STATUS_IN_PROGRESS] + chunk,
+            ).fetchall()
+            for request_key, created_at in rows:
+                parsed = self._parse_iso(str(created_at or ""))
+                if parsed is not None:
+                    found[str(request_key)] = parsed
+        return found
+
     def get_unknown_lock(self, request_key: str) -> Optional[Dict[str, Any]]:
         row = self.conn_main.execute(
             "SELECT * FROM send_locks WHERE request_key = ? AND status = ?;",
             (request_key, STATUS_UNKNOWN_SENT),
         ).fetchone()
+        return self._lock_dict(row) if row is not None else None
+
+    def begin_run(
+        self,
+        run_id: str,
+        key_version: str,
+        subject_norm: str,
+        items: Sequence[Tuple[str, str]] = (),
+        now: Optional[dt.datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        実行マニフェスト（宛先順の (request_key, mail_key) と確定位置）を作成する。
+        既に同じ run_id のマニフェストがあれば何もせず、既存のものを返す。
+        items は後から append_run_items で区間ごとに追加してもよい。
+        """
+        current_iso = self._to_iso(now or self._utcnow())
+
+        def op(conn: sqlite3.Connection) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                created = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO run_manifest (
+                        run_id, created_at_utc, updated_at_utc, key_version, subject_norm,
+                        total, high_water, status
+                    ) VALUES (?, ?, ?, ?, ?, 0, -1, ?);
+                    """,
+                    (run_id, current_iso, current_iso, key_version, subject_norm, RUN_STATUS_RUNNING),
+                ).rowcount
+                if created and items:
+                    self._insert_run_items(conn, run_id, 0, items)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        self._with_retry(op, self.conn_main)
+        return self.get_run_manifest(run_id) or {}
+
+    @staticmethod
+    def _insert_run_items(
+        conn: sqlite3.Connection,
+        run_id: str,
+        start: int,
+        items: Sequence[Tuple[str, str]],
+    ) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO run_manifest_items (run_id, position, request_key, mail_key) VALUES (?, ?, ?, ?);",
+            [(run_id, start + offset, rk, mk) for offset, (rk, mk) in enumerate(items)],
+        )
+        conn.execute(
+            "UPDATE run_manifest SET total = MAX(total, ?) WHERE run_id = ?;",
+            (start + len(items), run_id),
+        )
+
+    def append_run_items(self, run_id: str, start: int, items: Sequence[Tuple[str, str]]) -> None:
+        """position=start から items をマニフェストへ追加する（登録済みの位置はそのまま）。"""
+        if not items:
+            return
+
+        def op(conn: sqlite3.Connection) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_run_items(conn, run_id, int(start), items)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        self._with_retry(op, self.conn_main)
+
+    def get_run_manifest(self, run_id: str) -> Optional[Dict[str, Any]]:
+        row = self.conn_main.execute("SELECT * FROM run_manifest WHERE run_id = ?;", (run_id,)).fetchone()
         return dict(row) if row is not None else None
 
+    def load_run_items(self, run_id: str, start: int = 0, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """マニフェストの (request_key, mail_key) を送信順に返す（start 位置から最大 limit 件）。"""
+        rows = self._fetch_tuples(
+            self.conn_main,
+            "SELECT request_key, mail_key FROM run_manifest_items "
+            "WHERE run_id = ? AND position >= ? ORDER BY position LIMIT ?;",
+            (run_id, int(start), -1 if limit is None else int(limit)),
+        )
+        return [(str(rk), str(mk)) for rk, mk in rows]
+
+    def find_run_request_keys(self, run_id: str, request_keys: Sequence[str], before: int) -> Set[str]:
+        """request_keys のうち、同じ実行のマニフェストで position < before に現れるものを返す。"""
+        found: Set[str] = set()
+        keys = list(dict.fromkeys(request_keys))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._fetch_tuples(
+                self.conn_main,
+                f"SELECT DISTINCT request_key FROM run_manifest_items "
+                f"WHERE run_id = ? AND request_key IN ({placeholders}) AND position < ?;",
+                [run_id, *chunk, int(before)],
+            )
+            found.update(str(row[0]) for row in rows)
+        return found
+
+    def list_runs(self, status: Optional[str] = RUN_STATUS_RUNNING) -> List[Dict[str, Any]]:
+        """マニフェストを新しい順に返す（既定は未完了の実行のみ）。"""
+        if status is None:
+            rows = self.conn_main.execute("SELECT * FROM run_manifest ORDER BY updated_at_utc DESC;").fetchall()
+        else:
+            rows = self.conn_main.execute(
+                "SELECT * FROM run_manifest WHERE status = ? ORDER BY updated_at_utc DESC;",
+                (status,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def checkpoint_run(self, run_id: str, high_water: int, now: Optional[dt.datetime] = None) -> None:
+        """high_water（ここまでの位置は台帳へ確定済み）を進める。後退はさせない。"""
+        self.conn_main.execute(
+            """
+            UPDATE run_manifest
+               SET high_water = MAX(high_water, ?), updated_at_utc = ?
+             WHERE run_id = ?;
+            """,
+            (int(high_water), self._to_iso(now or self._utcnow()), run_id),
+        )
+
+    def finish_run(self, run_id: str, now: Optional[dt.datetime] = None) -> None:
+        self.conn_main.execute(
+            """
+            UPDATE run_manifest
+               SET high_water = total - 1, status = ?, updated_at_utc = ?
+             WHERE run_id = ?;
+            """,
+            (RUN_STATUS_COMPLETED, self._to_iso(now or self._utcnow()), run_id),
+        )
+
+    def expire_stale_run_locks(
+        self,
+        run_id: str,
+        request_keys: Sequence[str],
+        idle_sec: float,
+        now: Optional[dt.datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        再開対象の実行が残した IN_PROGRESS ロックのうち、idle_sec 以上延長されていないものを
+        その場で期限切れにする（reserve_send で照合・引き継ぎの対象になる）。
+        戻り値は (期限切れにしたロック, まだ延長が続いているロックの件数)。
+        """
+        current = self._to_utc(now or self._utcnow())
+        stale_before = current - dt.timedelta(seconds=max(0.0, float(idle_sec)))
+        wanted = set(request_keys)
+
+        def op(conn: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], int]:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired: List[Dict[str, Any]] = []
+                active = 0
+                rows = conn.execute(
+                    "SELECT * FROM send_locks WHERE status = ? AND run_id = ?;",
+                    (STATUS_IN_PROGRESS, run_id),
+                ).fetchall()
+                for row in rows:
+                    lock = self._lock_dict(row)
+                    if lock["request_key"] not in wanted:
+                        continue
+                    renewed = self._parse_iso(str(lock.get("updated_at_utc", "") or ""))
+                    if renewed is not None and renewed > stale_before:
+                        active += 1
+                        continue
+                    conn.execute(
+                        "UPDATE send_locks SET expires_at_utc = ?, expires_at_ms = ? WHERE request_key = ?;",
+                        (self._to_iso(current), self._to_ms(current), lock["request_key"]),
+                    )
+                    expired.append(lock)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return expired, active
+
+        return self._with_retry(op, self.conn_main)
+
     def mark_sent(
         self,
         request_key: str,
@@ -409,12 +1457,13 @@ class SendLedger:
         decision_trace: Sequence[str],
         sent_at: Optional[dt.datetime] = None,
     ) -> None:
+        self._flush_pending_lock_release(request_key)
         sent_ts = self._to_utc(sent_at or self._utcnow())
 
         def op(conn: sqlite3.Connection) -> None:
             conn.execute("BEGIN IMMEDIATE")
             conn.execute("DELETE FROM send_locks WHERE request_key = ?;", (request_key,))
-            self._insert_event(
+            event_id = self._insert_event(
                 conn=conn,
                 request_key=request_key,
                 v1_key=v1_key,
@@ -431,12 +1480,68 @@ class SendLedger:
                 subject_norm=subject_norm,
                 decision_trace=decision_trace,
                 error="",
+                created_at=sent_ts,
+            )
+            self._upsert_last_sent(
+                conn,
+                event_id=event_id,
+                request_key=request_key,
+                v1_key=v1_key,
                 created_at_utc=self._to_iso(sent_ts),
+                run_id=run_id,
             )
             conn.execute("COMMIT")
 
         self._with_retry(op, self.conn_sent)
 
+    def update_sent_message_id(
+        self,
+        request_key: str,
+        run_id: Optional[str],
+        provisional_message_id: str,
+        message_id: str,
+        message_id_source: str,
+    ) -> int:
+        """
+        仮 ID で記録した SENT / UNKNOWN_SENT の Message-ID を、後から取得できた値へ差し替える。
+        送信スレッドとは別スレッドから呼ばれるため、専用接続で更新する。更新した行数を返す。
+        """
+
+        def op(conn: sqlite3.Connection) -> int:
+            conn.execute("BEGIN IMMEDIATE")
+            events = conn.execute(
+                """
+                UPDATE send_events
+                SET message_id = ?, message_id_source = ?
+                WHERE request_key = ? AND run_id IS ? AND message_id = ?
+                  AND status IN (?, ?);
+                """,
+                (
+                    message_id,
+                    message_id_source,
+                    request_key,
+                    run_id,
+                    provisional_message_id,
+                    STATUS_SENT,
+                    STATUS_UNKNOWN_SENT,
+                ),
+            ).rowcount
+            locks = conn.execute(
+                """
+                UPDATE send_locks
+                SET last_message_id = ?, last_message_id_source = ?
+                WHERE request_key = ? AND last_message_id = ?;
+                """,
+                (message_id, message_id_source, request_key, provisional_message_id),
+            ).rowcount
+            conn.execute("COMMIT")
+            return int(events) + int(locks)
+
+        with self._message_id_lock:
+            if self._message_id_conn is None:
+                self._message_id_conn = self._create_conn(full_sync=True)
+            return self._with_retry(op, self._message_id_conn)
+
     def mark_failed_pre_send(
         self,
         request_key: str,
@@ -452,29 +1557,32 @@ class SendLedger:
         error: str,
     ) -> None:
         current = self._utcnow()
+        event = dict(
+            request_key=request_key,
+            v1_key=v1_key,
+            key_version=key_version,
+            mail_key=mail_key,
+            run_id=run_id,
+            status=STATUS_FAILED_PRE_SEND,
+            recipient_hash=recipient_hash,
+            message_id="",
+            message_id_source="",
+            idempotency_token=idempotency_token,
+            idempotency_secret_version=idempotency_secret_version,
+            sent_at_utc="",
+            subject_norm=subject_norm,
+            decision_trace=list(decision_trace),
+            error=error or "",
+            created_at=current,
+        )
+        if self._group_writer is not None:
+            self._group_writer.submit(event, release_lock_for=request_key)
+            return
 
         def op(conn: sqlite3.Connection) -> None:
             conn.execute("BEGIN IMMEDIATE")
             conn.execute("DELETE FROM send_locks WHERE request_key = ?;", (request_key,))
-            self._insert_event(
-                conn=conn,
-                request_key=request_key,
-                v1_key=v1_key,
-                key_version=key_version,
-                mail_key=mail_key,
-                run_id=run_id,
-                status=STATUS_FAILED_PRE_SEND,
-                recipient_hash=recipient_hash,
-                message_id="",
-                message_id_source="",
-                idempotency_token=idempotency_token,
-                idempotency_secret_version=idempotency_secret_version,
-                sent_at_utc="",
-                subject_norm=subject_norm,
-                decision_trace=decision_trace,
-                error=error or "",
-                created_at_utc=self._to_iso(current),
-            )
+            self._insert_event(conn=conn, **event)
             conn.execute("COMMIT")
 
         self._with_retry(op, self.conn_main)
@@ -496,6 +1604,7 @@ class SendLedger:
         message_id: str = "",
         message_id_source: str = "",
     ) -> None:
+        self._flush_pending_lock_release(request_key)
         current = self._utcnow()
         expires = current + dt.timedelta(seconds=max(300, int(hold_sec)))
 
@@ -504,16 +1613,17 @@ class SendLedger:
             conn.execute(
                 """
                 INSERT INTO send_locks (
-                    request_key, key_version, run_id, status, expires_at_utc, updated_at_utc,
-                    recipient_hash, mail_key, v1_key, idempotency_token,
+                    request_key, key_version, run_id, status, expires_at_utc, expires_at_ms,
+                    updated_at_utc, recipient_hash, mail_key, v1_key, idempotency_token,
                     idempotency_secret_version, subject_norm,
                     last_message_id, last_message_id_source, last_error
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(request_key) DO UPDATE SET
                     key_version = excluded.key_version,
                     run_id = excluded.run_id,
                     status = excluded.status,
                     expires_at_utc = excluded.expires_at_utc,
+                    expires_at_ms = excluded.expires_at_ms,
                     updated_at_utc = excluded.updated_at_utc,
                     recipient_hash = excluded.recipient_hash,
                     mail_key = excluded.mail_key,
@@ -531,6 +1641,7 @@ class SendLedger:
                     run_id,
                     STATUS_UNKNOWN_SENT,
                     self._to_iso(expires),
+                    self._to_ms(expires),
                     self._to_iso(current),
                     recipient_hash,
                     mail_key,
@@ -560,7 +1671,7 @@ class SendLedger:
                 subject_norm=subject_norm,
                 decision_trace=decision_trace,
                 error=error or "",
-                created_at_utc=self._to_iso(current),
+                created_at=current,
             )
             conn.execute("COMMIT")
 
@@ -573,10 +1684,11 @@ class SendLedger:
         decision_trace: Sequence[str],
         reconciled_message_id: str,
         reconciled_source: str,
+        from_status: str = STATUS_UNKNOWN_SENT,
     ) -> None:
         row = self.conn_main.execute(
             "SELECT * FROM send_locks WHERE request_key = ? AND status = ?;",
-            (request_key, STATUS_UNKNOWN_SENT),
+            (request_key, from_status),
         ).fetchone()
         if row is None:
             return
@@ -612,8 +1724,7 @@ class SendLedger:
         decision_trace: Sequence[str],
         error: str = "",
     ) -> None:
-        self._insert_event(
-            conn=self.conn_main,
+        event = dict(
             request_key=request_key,
             v1_key=v1_key,
             key_version=key_version,
@@ -627,10 +1738,39 @@ class SendLedger:
             idempotency_secret_version=idempotency_secret_version,
             sent_at_utc="",
             subject_norm=subject_norm,
-            decision_trace=decision_trace,
+            decision_trace=list(decision_trace),
             error=error or "",
-            created_at_utc=self._to_iso(self._utcnow()),
+            created_at=self._utcnow(),
         )
+        if self._group_writer is not None:
+            self._group_writer.submit(event)
+            return
+        self._insert_event(conn=self.conn_main, **event)
+
+    def _latest_sent_ref(
+        self,
+        conn: sqlite3.Connection,
+        column: str,
+        key: str,
+        window_start_iso: str,
+        run_id: Optional[str],
+    ) -> Optional[Tuple[str, int]]:
+        if column not in {"request_key", "v1_key"}:
+            raise ValueError(f"Unsupported lookup column: {column}")
+        sql = f"""
+            SELECT created_at_utc, id
+              FROM send_events
+             WHERE status = ?
+               AND {column} = ?
+               AND created_at_utc >= ?
+        """
+        params: List[Any] = [STATUS_SENT, key, window_start_iso]
+        if run_id:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        sql += " ORDER BY created_at_utc DESC LIMIT 1;"
+        row = self._fetch_tuple(conn, sql, params)
+        return (str(row[0]), int(row[1])) if row is not None else None
 
     def find_recent_sent(
         self,
@@ -641,31 +1781,52 @@ class SendLedger:
         now: Optional[dt.datetime] = None,
     ) -> Optional[Dict[str, Any]]:
         current = self._to_utc(now or self._utcnow())
-        window_start = current - dt.timedelta(hours=max(1, int(window_hours)))
-        sql = """
-            SELECT *
-              FROM send_events
-             WHERE created_at_utc >= ?
-               AND status = ?
-               AND (
-                    request_key = ?
-                 OR request_key = ?
-                 OR v1_key = ?
-               )
-        """
-        params: List[Any] = [
-            self._to_iso(window_start),
-            STATUS_SENT,
-            request_key,
-            request_key,
-            v1_key,
-        ]
-        if run_id:
-            sql += " AND run_id = ?"
-            params.append(run_id)
-        sql += " ORDER BY created_at_utc DESC LIMIT 1;"
-        row = self.conn_main.execute(sql, tuple(params)).fetchone()
-        return dict(row) if row is not None else None
+        return self._find_recent_sent_on(self.conn_main, request_key, v1_key, window_hours, run_id, current)
+
+    def _find_recent_sent_on(
+        self,
+        conn: sqlite3.Connection,
+        request_key: str,
+        v1_key: str,
+        window_hours: int,
+        run_id: Optional[str],
+        current: dt.datetime,
+    ) -> Optional[Dict[str, Any]]:
+        window_start = self._to_iso(current - dt.timedelta(hours=max(1, int(window_hours))))
+        latest = {
+            str(kind): (str(created_at), int(event_id), str(row_run_id or ""))
+            for kind, event_id, created_at, row_run_id in self._fetch_tuples(
+                conn,
+                """
+                SELECT key_kind, event_id, created_at_utc, run_id
+                  FROM last_sent
+                 WHERE (key_kind = ? AND lookup_key = ?)
+                    OR (key_kind = ? AND lookup_key = ?);
+                """,
+                (LAST_SENT_KIND_REQUEST_KEY, request_key, LAST_SENT_KIND_V1_KEY, v1_key),
+            )
+        }
+
+        candidates: List[Tuple[str, int]] = []
+        for kind, key in ((LAST_SENT_KIND_REQUEST_KEY, request_key), (LAST_SENT_KIND_V1_KEY, v1_key)):
+            entry = latest.get(kind)
+            if entry is None or entry[0] < window_start:
+                continue
+            if not run_id or entry[2] == run_id:
+                candidates.append((entry[0], entry[1]))
+                continue
+            # 最新SENTが別 run のものなら、同一 run のSENTを索引で探し直す。
+            ref = self._latest_sent_ref(conn, kind, key, window_start, run_id)
+            if ref is not None:
+                candidates.append(ref)
+        if not candidates:
+            return None
+        _, event_id = max(candidates, key=lambda ref: ref[0])
+        row = conn.execute(
+            "SELECT * FROM send_events WHERE id = ?;",
+            (event_id,),
+        ).fetchone()
+        return self._event_dict(conn, row) if row is not None else None
 
     def is_send_blocked_precheck(
         self,
@@ -745,16 +1906,7 @@ class SendLedger:
     def load_recent_entries(self, now: Optional[dt.datetime] = None) -> List[Dict[str, Any]]:
         current = self._to_utc(now or self._utcnow())
         cutoff = current - dt.timedelta(days=self.retention_days)
-        rows = self.conn_main.execute(
-            """
-            SELECT *
-              FROM send_events
-             WHERE created_at_utc >= ?
-             ORDER BY created_at_utc ASC;
-            """,
-            (self._to_iso(cutoff),),
-        ).fetchall()
-        return [dict(row) for row in rows]
+        return self.query_events(start=cutoff)
 
     def record_url_alias(
         self,
@@ -792,12 +1944,30 @@ class SendLedger:
         )
 
     def _get_or_create_secret(self, key_name: str, byte_length: int = 32) -> str:
+        cached = self._secret_cache.get(key_name)
+        if cached:
+            return cached
         value = keyring.get_password(self.credential_service, key_name)
-        if value:
-            return value
-        generated = secrets.token_hex(byte_length)
-        keyring.set_password(self.credential_service, key_name, generated)
-        return generated
+        if not value:
+            value = secrets.token_hex(byte_length)
+            keyring.set_password(self.credential_service, key_name, value)
+        self._secret_cache[key_name] = value
+        return value
+
+    def invalidate_secret_cache(self, key_name: Optional[str] = None) -> None:
+        """
+        秘密値キャッシュを破棄する。key_name 省略時は全件。
+        keyring 側で秘密値を差し替えた（ローテーションした）場合に呼び出す。
+        """
+        if key_name is None:
+            self._secret_cache.clear()
+            self._hmac_cache.clear()
+            self._recipient_hasher = None
+            return
+        self._secret_cache.pop(key_name, None)
+        self._hmac_cache.pop(key_name, None)
+        if key_name == f"{RECIPIENT_SALT_PREFIX}{RECIPIENT_SALT_VERSION}":
+            self._recipient_hasher = None
 
     @staticmethod
     def _previous_version(version: str) -> Optional[str]:
@@ -817,15 +1987,15 @@ class SendLedger:
         return versions
 
     def build_idempotency_token(self, request_key: str, secret_version: str) -> str:
-        secret = self._get_or_create_secret(
-            f"{IDEMPOTENCY_SECRET_PREFIX}{secret_version}",
-            byte_length=32,
-        )
-        return hmac.new(
-            secret.encode("utf-8"),
-            request_key.encode("utf-8"),
-            hashlib.sha256,
-        ).hexdigest()
+        key_name = f"{IDEMPOTENCY_SECRET_PREFIX}{secret_version}"
+        base = self._hmac_cache.get(key_name)
+        if base is None:
+            secret = self._get_or_create_secret(key_name, byte_length=32)
+            base = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+            self._hmac_cache[key_name] = base
+        mac = base.copy()
+        mac.update(request_key.encode("utf-8"))
+        return mac.hexdigest()
 
     def verify_idempotency_token(
         self,
@@ -840,12 +2010,17 @@ class SendLedger:
         return False
 
     def hash_recipient(self, recipient_email_norm: str) -> str:
-        salt = self._get_or_create_secret(
-            f"{RECIPIENT_SALT_PREFIX}{RECIPIENT_SALT_VERSION}",
-            byte_length=32,
-        )
-        payload = f"{salt}:{recipient_email_norm}".encode("utf-8")
-        return hashlib.sha256(payload).hexdigest()
+        hasher = self._recipient_hasher
+        if hasher is None:
+            salt = self._get_or_create_secret(
+                f"{RECIPIENT_SALT_PREFIX}{RECIPIENT_SALT_VERSION}",
+                byte_length=32,
+            )
+            hasher = hashlib.sha256(f"{salt}:".encode("utf-8"))
+            self._recipient_hasher = hasher
+        digest = hasher.copy()
+        digest.update(recipient_email_norm.encode("utf-8"))
+        return digest.hexdigest()
 
     def add_override(
         self,
@@ -934,6 +2109,35 @@ class SendLedger:
             dict(latest) if latest is not None else None,
         )
 
+    @staticmethod
+    def _build_override_decision(
+        key_active: bool,
+        key_seen: bool,
+        rec_active: bool,
+        rec_seen: bool,
+    ) -> OverrideDecision:
+        trace: List[str] = []
+        if key_active:
+            trace.append("override_check:request_key=matched_active")
+            trace.append("override_applied:request_key")
+            return OverrideDecision(True, OVERRIDE_KIND_REQUEST_KEY, trace)
+        trace.append(
+            "override_check:request_key=expired_or_inactive" if key_seen
+            else "override_check:request_key=not_found"
+        )
+
+        if rec_active:
+            trace.append("override_check:recipient=matched_active")
+            trace.append("override_applied:recipient")
+            return OverrideDecision(True, OVERRIDE_KIND_RECIPIENT, trace)
+        trace.append(
+            "override_check:recipient=expired_or_inactive" if rec_seen
+            else "override_check:recipient=not_found"
+        )
+
+        trace.append("override_applied:none")
+        return OverrideDecision(False, "default", trace)
+
     def evaluate_override(
         self,
         request_key: str,
@@ -941,7 +2145,6 @@ class SendLedger:
         now: Optional[dt.datetime] = None,
     ) -> OverrideDecision:
         current = self._to_utc(now or self._utcnow())
-        trace: List[str] = []
 
         key_active, key_latest = self._lookup_override(
             OVERRIDE_KIND_REQUEST_KEY,
@@ -949,36 +2152,181 @@ class SendLedger:
             current,
         )
         if key_active:
-            trace.append("override_check:request_key=matched_active")
-            trace.append("override_applied:request_key")
-            return OverrideDecision(True, OVERRIDE_KIND_REQUEST_KEY, trace)
-        trace.append(
-            "override_check:request_key=expired_or_inactive" if key_latest
-            else "override_check:request_key=not_found"
-        )
+            return self._build_override_decision(True, True, False, False)
 
         rec_active, rec_latest = self._lookup_override(
             OVERRIDE_KIND_RECIPIENT,
             recipient_hash,
             current,
         )
-        if rec_active:
-            trace.append("override_check:recipient=matched_active")
-            trace.append("override_applied:recipient")
-            return OverrideDecision(True, OVERRIDE_KIND_RECIPIENT, trace)
-        trace.append(
-            "override_check:recipient=expired_or_inactive" if rec_latest
-            else "override_check:recipient=not_found"
+        return self._build_override_decision(
+            False,
+            key_latest is not None,
+            rec_active is not None,
+            rec_latest is not None,
         )
 
-        trace.append("override_applied:none")
-        return OverrideDecision(False, "default", trace)
+    def precheck_batch(
+        self,
+        request_keys: Sequence[str],
+        v1_keys: Sequence[str],
+        recipient_hashes: Sequence[str],
+        window_hours: int,
+        run_id: Optional[str] = None,
+        now: Optional[dt.datetime] = None,
+    ) -> Dict[str, PrecheckDecision]:
+        """
+        送信前の override / UNKNOWN_SENT / 直近SENT 判定を一括で解決する。
+
+        evaluate_override + get_unknown_lock + find_recent_sent をキーごとに
+        呼ぶのと同じ判定・decision_trace を、一時テーブル上の集合クエリで返す。
+        """
+        if not (len(request_keys) == len(v1_keys) == len(recipient_hashes)):
+            raise ValueError("request_keys / v1_keys / recipient_hashes の件数が一致しません。")
+
+        current = self._to_utc(now or self._utcnow())
+        window_start = current - dt.timedelta(hours=max(1, int(window_hours)))
+        probes: List[Tuple[int, str, str, str]] = []
+        seen_keys = set()
+        for request_key, v1_key, recipient_hash in zip(request_keys, v1_keys, recipient_hashes):
+            if request_key in seen_keys:
+                continue
+            seen_keys.add(request_key)
+            probes.append((len(probes), request_key, v1_key, recipient_hash))
+        if not probes:
+            return {}
+
+        def op(conn: sqlite3.Connection):
+            conn.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS precheck_keys (
+                    seq INTEGER PRIMARY KEY,
+                    request_key TEXT NOT NULL,
+                    v1_key TEXT,
+                    recipient_hash TEXT
+                );
+                """
+            )
+            conn.execute("BEGIN")
+            try:
+                conn.execute("DELETE FROM temp.precheck_keys;")
+                conn.executemany(
+                    "INSERT INTO temp.precheck_keys (seq, request_key, v1_key, recipient_hash) VALUES (?, ?, ?, ?);",
+                    probes,
+                )
+                override_rows = self._fetch_tuples(
+                    conn,
+                    """
+                    SELECT kind, target_hash, MAX(expires_at_utc >= ?) AS has_active
+                      FROM rerun_overrides
+                     WHERE (kind = ? AND target_hash IN (SELECT request_key FROM temp.precheck_keys))
+                        OR (kind = ? AND target_hash IN (SELECT recipient_hash FROM temp.precheck_keys))
+                     GROUP BY kind, target_hash;
+                    """,
+                    (self._to_iso(current), OVERRIDE_KIND_REQUEST_KEY, OVERRIDE_KIND_RECIPIENT),
+                )
+                lock_rows = conn.execute(
+                    """
+                    SELECT *
+                      FROM send_locks
+                     WHERE status = ?
+                       AND request_key IN (SELECT request_key FROM temp.precheck_keys);
+                    """,
+                    (STATUS_UNKNOWN_SENT,),
+                ).fetchall()
+                if run_id:
+                    sent_filter = "e.status = ? AND e.created_at_utc >= ? AND e.run_id = ?"
+                    sent_params: List[Any] = [STATUS_SENT, self._to_iso(window_start), run_id]
+                    sent_rows = conn.execute(
+                        f"""
+                        SELECT k.seq AS probe_seq, e.*
+                          FROM temp.precheck_keys k
+                          JOIN send_events e ON e.request_key = k.request_key
+                         WHERE {sent_filter}
+                        UNION ALL
+                        SELECT k.seq AS probe_seq, e.*
+                          FROM temp.precheck_keys k
+                          JOIN send_events e ON e.v1_key = k.v1_key
+                         WHERE {sent_filter};
+                        """,
+                        tuple(sent_params + sent_params),
+                    ).fetchall()
+                else:
+                    sent_rows = conn.execute(
+                        """
+                        SELECT k.seq AS probe_seq, e.*
+                          FROM temp.precheck_keys k
+                          JOIN last_sent ls ON ls.key_kind = ? AND ls.lookup_key = k.request_key
+                          JOIN send_events e ON e.id = ls.event_id
+                         WHERE ls.created_at_utc >= ?
+                        UNION ALL
+                        SELECT k.seq AS probe_seq, e.*
+                          FROM temp.precheck_keys k
+                          JOIN last_sent ls ON ls.key_kind = ? AND ls.lookup_key = k.v1_key
+                          JOIN send_events e ON e.id = ls.event_id
+                         WHERE ls.created_at_utc >= ?;
+                        """,
+                        (
+                            LAST_SENT_KIND_REQUEST_KEY,
+                            self._to_iso(window_start),
+                            LAST_SENT_KIND_V1_KEY,
+                            self._to_iso(window_start),
+                        ),
+                    ).fetchall()
+                conn.execute("DELETE FROM temp.precheck_keys;")
+            finally:
+                conn.execute("COMMIT")
+            return override_rows, lock_rows, sent_rows
+
+        override_rows, lock_rows, sent_rows = self._with_retry(op, self.conn_main)
+
+        overrides: Dict[Tuple[str, str], bool] = {
+            (str(kind), str(target_hash)): bool(has_active)
+            for kind, target_hash, has_active in override_rows
+        }
+        locks = {str(row["request_key"]): self._lock_dict(row) for row in lock_rows}
+        best_rows: Dict[int, Any] = {}
+        for row in sent_rows:
+            seq = int(row["probe_seq"])
+            best = best_rows.get(seq)
+            if best is None or str(row["created_at_utc"] or "") > str(best["created_at_utc"] or ""):
+                best_rows[seq] = row
+        recent: Dict[int, Dict[str, Any]] = {}
+        for seq, row in best_rows.items():
+            entry = self._event_dict(self.conn_main, row)
+            entry.pop("probe_seq", None)
+            recent[seq] = entry
+
+        decisions: Dict[str, PrecheckDecision] = {}
+        for seq, request_key, _v1_key, recipient_hash in probes:
+            key_state = overrides.get((OVERRIDE_KIND_REQUEST_KEY, request_key))
+            rec_state = overrides.get((OVERRIDE_KIND_RECIPIENT, recipient_hash))
+            decisions[request_key] = PrecheckDecision(
+                request_key=request_key,
+                override=self._build_override_decision(
+                    bool(key_state),
+                    key_state is not None,
+                    bool(rec_state),
+                    rec_state is not None,
+                ),
+                unknown_lock=locks.get(request_key),
+                recent_sent=recent.get(seq),
+            )
+        return decisions
 
     def close(self) -> None:
         try:
-            self.conn_main.close()
+            if self._group_writer is not None:
+                self._group_writer.close()
         finally:
-            self.conn_sent.close()
+            try:
+                self.conn_main.close()
+            finally:
+                self.conn_sent.close()
+                with self._message_id_lock:
+                    if self._message_id_conn is not None:
+                        self._message_id_conn.close()
+                        self._message_id_conn = None
 
     def __del__(self) -> None:
         try:
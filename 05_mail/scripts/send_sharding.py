@@ -0,0 +1,208 @@
+"""
+send_sharding.py - send_bulk の複数プロセス分割実行
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+from .mail_sender import OutlookMailSender, SendRateLimiter
+
+
+def shard_of(request_key: str, workers: int) -> int:
+    """
+    request_key（または宛先ドメイン）からシャード番号を決める。
+    同一キーは必ず同じワーカーへ入るため、実行内重複の判定はワーカー内で完結する。
+    """
+    digest = hashlib.sha256(request_key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % max(1, int(workers))
+
+
+def partition(
+    prepared: List[Dict[str, Any]],
+    workers: int,
+    by_domain: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """
+    prepared をシャードに分ける。by_domain=True なら宛先ドメインで分け、
+    同じドメイン宛てを1つのワーカーにまとめる（同一 request_key は同一宛先なので同じシャードに入る）。
+    """
+    shards: List[List[Dict[str, Any]]] = [[] for _ in range(max(1, int(workers)))]
+    for item in prepared:
+        key = SendRateLimiter.domain_of(item["record"].email) if by_domain else item["request_key"]
+        shards[shard_of(key, len(shards))].append(item)
+    return [shard for shard in shards if shard]
+
+
+def effective_config(skill: Any) -> Dict[str, Any]:
+    """
+    ワーカーへ渡す親の実効設定。実行時に書き換えた config と、
+    送信器へ直接設定したドライランの状態を含める。
+    """
+    config = dict(skill.config)
+    dry_run = getattr(skill.mail_sender, "dry_run", None)
+    if dry_run is not None:
+        config["dry_run"] = bool(dry_run)
+    return config
+
+
+def default_skill_factory(config_path: str, config: Optional[Dict[str, Any]] = None) -> Any:
+    from .main import QuoteRequestSkill
+
+    return QuoteRequestSkill(config_path=config_path, config=config)
+
+
+def _shard_rate_limits(limiter: Optional[SendRateLimiter], shards: int) -> Optional[Dict[str, Any]]:
+    """
+    ワーカー1つ分の送信ペース。送信ペース制御はプロセス内でしか効かないため、
+    全体の上限はワーカー数で割る（ドメインごとの上限はドメイン単位の分割でそのまま守られる）。
+    """
+    if limiter is None or not limiter.enabled:
+        return None
+    return {
+        "global_per_min": limiter.global_per_min / max(1, shards),
+        "per_domain_per_min": limiter.per_domain_per_min,
+        "burst": limiter.burst,
+    }
+
+
+def _run_shard(
+    skill_factory: Callable[[], Any],
+    context: Dict[str, Any],
+    items: List[Dict[str, Any]],
+    dry_run: bool = False,
+    rate_limits: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    # ワーカープロセス側: 台帳接続と送信器は各プロセスで個別に生成する。
+    skill = skill_factory()
+    if dry_run and hasattr(skill.mail_sender, "dry_run"):
+        # 親がドライランなら、どのファクトリで組み立てた送信器でも実送信しない。
+        skill.mail_sender.dry_run = True
+    if rate_limits is not None and hasattr(skill.mail_sender, "rate_limiter"):
+        skill.mail_sender.rate_limiter = SendRateLimiter(**rate_limits)
+    try:
+        return skill._execute_prepared(items, context, None)
+    finally:
+        try:
+            # SMTP など接続を持つ送信経路はワーカー終了時に閉じる。
+            close_sender = getattr(skill.mail_sender, "close", None)
+            if close_sender is not None:
+                close_sender()
+        finally:
+            skill.send_ledger.close()
+
+
+def merge_outcomes(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """ワーカーごとの結果を元の行順に並べ直して1つにまとめる。"""
+    indexed = []
+    warnings = []
+    for outcome in outcomes:
+        indexed.extend(zip(outcome["indices"], outcome["results"]))
+        warnings.extend(outcome["warnings"])
+    indexed.sort(key=lambda pair: pair[0])
+    warnings.sort(key=lambda pair: pair[0])
+    return {
+        "results": [result for _, result in indexed],
+        "indices": [index for index, _ in indexed],
+        "warnings": warnings,
+        "skipped_duplicate_count": sum(o["skipped_duplicate_count"] for o in outcomes),
+        "skipped_rerun_count": sum(o["skipped_rerun_count"] for o in outcomes),
+        "confirmation_required_count": sum(o["confirmation_required_count"] for o in outcomes),
+    }
+
+
+def execute_sharded(
+    skill: Any,
+    prepared: List[Dict[str, Any]],
+    context: Dict[str, Any],
+    workers: int,
+    skill_factory: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    prepared を request_key でシャードに分け、spawn したワーカープロセスで並行送信する。
+    送信ペース制御（rate_limits）が有効なら宛先ドメインで分け、全体の上限をワーカー数で割る。
+    排他は台帳の send_locks（reserve_send / heartbeat）に任せ、run_id は親と共有する。
+    ワーカーは設定ファイルではなく親の実効設定（effective_config）で組み立てる。
+    """
+    limiter = getattr(skill.mail_sender, "rate_limiter", None)
+    rate_limited = limiter is not None and limiter.enabled
+    shards = partition(prepared, workers, by_domain=rate_limited)
+    if len(shards) <= 1:
+        return skill._execute_prepared(prepared, context, None)
+
+    config = effective_config(skill)
+    rate_limits = _shard_rate_limits(limiter, len(shards))
+    factory = skill_factory or getattr(skill, "shard_skill_factory", None)
+    if factory is None:
+        if not isinstance(skill.mail_sender, OutlookMailSender):
+            # 差し替えた送信器はワーカー側で再現できないため、分割せずに送る。
+            return skill._execute_prepared(prepared, context, None)
+        factory = functools.partial(default_skill_factory, skill.config_path, config)
+
+    # 親側で保留中の台帳書き込みを確定させてからワーカーへ渡す。
+    skill.send_ledger.flush_pending_events()
+    ctx = multiprocessing.get_context("spawn")
+    outcomes: List[Dict[str, Any]] = []
+    with ctx.Pool(processes=len(shards)) as pool:
+        pending = [
+            pool.apply_async(_run_shard, (factory, context, shard, bool(config.get("dry_run")), rate_limits))
+            for shard in shards
+        ]
+        # 1つが失敗しても他のワーカーは送信途中で止めず、全件の完了を待つ。
+        for shard, job in zip(shards, pending):
+            try:
+                outcomes.append(job.get())
+            except Exception as exc:
+                outcomes.append(_failed_shard_outcome(shard, context, exc))
+    return merge_outcomes(outcomes)
+
+
+def _failed_shard_outcome(
+    items: List[Dict[str, Any]],
+    context: Dict[str, Any],
+    error: BaseException,
+) -> Dict[str, Any]:
+    """
+    ワーカー異常終了時の結果。送信済みかどうかは台帳が正となるため、
+    該当行はすべて要確認として返す。
+    """
+    message = f"送信ワーカーが異常終了したため結果を確認できません: {error}"
+    results = []
+    warnings = []
+    for item in items:
+        record = item["record"]
+        warnings.append((item["index"], f"{message} ({record.email})"))
+        results.append({
+            "email": record.email,
+            "company_name": record.company_name,
+            "success": False,
+            "message_id": "",
+            "error": message,
+            "sent_at": "",
+            "is_fallback_id": False,
+            "message_id_source": "",
+            "dedupe_key": item["request_key"],
+            "request_key": item["request_key"],
+            "mail_key": item["mail_key"],
+            "dedupe_key_version": context["dedupe_key_version"],
+            "decision_trace": [
+                f"request_key={item['request_key']}",
+                f"mail_key={item['mail_key']}",
+                "shard_worker_failed=true",
+            ],
+            "skipped": False,
+            "action": "shard_worker_failed",
+            "skip_duplicate_in_run": False,
+            "confirmation_required": True,
+        })
+    return {
+        "results": results,
+        "indices": [item["index"] for item in items],
+        "warnings": warnings,
+        "skipped_duplicate_count": 0,
+        "skipped_rerun_count": 0,
+        "confirmation_required_count": len(items),
+    }
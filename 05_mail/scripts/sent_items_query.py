@@ -0,0 +1,151 @@
+"""
+sent_items_query.py - Outlook 送信済みフォルダの絞り込み検索
+
+条件は DASL（@SQL=）でストア側に渡し、Folder.GetTable で必要な列だけを
+1回の GetArray でまとめて取得する。アイテムを1件ずつ開いてプロパティを
+読む従来の走査に比べ、COM 呼び出しは件数に依存しない。
+"""
+
+from __future__ import annotations
+
+import datetime
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+# DASL プロパティ名
+PROP_SUBJECT = "urn:schemas:httpmail:subject"
+PROP_SENT_ON = "http://schemas.microsoft.com/mapi/proptag/0x00390040"  # PR_CLIENT_SUBMIT_TIME
+PROP_MESSAGE_ID = "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
+PROP_TRANSPORT_HEADERS = "http://schemas.microsoft.com/mapi/proptag/0x007D001F"
+PROP_TEXT_BODY = "urn:schemas:httpmail:textdescription"
+PROP_HTML_BODY = "urn:schemas:httpmail:htmldescription"
+PROP_IDEMPOTENCY_KEY = "urn:schemas:mailheader:x-idempotency-key"
+
+# GetTable の取得列。Table の文字列列は 255 文字で切り詰められるため、
+# 短い値（Message-ID / idempotency トークン）だけを列で取得する。
+TABLE_COLUMNS = ("EntryID", "Subject", "SentOn", "To", PROP_MESSAGE_ID, PROP_IDEMPOTENCY_KEY)
+
+OL_USER_ITEMS = 0  # olUserItems
+
+
+@dataclass
+class SentItemRow:
+    entry_id: str
+    subject: str
+    sent_on: Optional[datetime.datetime]
+    to: str
+    message_id: str
+    idempotency_key: str = ""
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _dasl_time(value: datetime.datetime) -> str:
+    # @SQL=（DASL）の日時は UTC の文字列で比較される（分単位）。tz なしはローカル時刻とみなす。
+    value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y/%m/%d %H:%M")
+
+
+def build_filter(
+    subject: Optional[str] = None,
+    sent_from: Optional[datetime.datetime] = None,
+    sent_to: Optional[datetime.datetime] = None,
+    message_id: Optional[str] = None,
+    header_contains: Optional[str] = None,
+    body_contains: Optional[str] = None,
+    body_contains_any: Sequence[str] = (),
+) -> str:
+    """
+    検索条件を DASL フィルタ文字列にする（条件はすべて AND、body_contains_any の中は OR）。
+    日時は分単位に丸めて範囲を広げるため、厳密な判定は呼び出し側で行う。
+    """
+    clauses: List[str] = []
+    if subject is not None:
+        clauses.append(f'"{PROP_SUBJECT}" = {_quote(subject)}')
+    if sent_from is not None:
+        floor = sent_from.replace(second=0, microsecond=0)
+        clauses.append(f'"{PROP_SENT_ON}" >= {_quote(_dasl_time(floor))}')
+    if sent_to is not None:
+        ceil = sent_to.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        clauses.append(f'"{PROP_SENT_ON}" <= {_quote(_dasl_time(ceil))}')
+    if message_id is not None:
+        clauses.append(f'"{PROP_MESSAGE_ID}" = {_quote(message_id)}')
+    if header_contains is not None:
+        clauses.append(f'"{PROP_TRANSPORT_HEADERS}" LIKE {_quote("%" + header_contains + "%")}')
+    if body_contains is not None:
+        pattern = _quote("%" + body_contains + "%")
+        clauses.append(f'("{PROP_TEXT_BODY}" LIKE {pattern} OR "{PROP_HTML_BODY}" LIKE {pattern})')
+    if body_contains_any:
+        terms = []
+        for needle in body_contains_any:
+            pattern = _quote("%" + needle + "%")
+            terms.append(f'"{PROP_TEXT_BODY}" LIKE {pattern} OR "{PROP_HTML_BODY}" LIKE {pattern}')
+        clauses.append("(" + " OR ".join(terms) + ")")
+    return "@SQL=" + " AND ".join(clauses) if clauses else ""
+
+
+class SentItemsQuery:
+    """送信済みフォルダに対する絞り込み検索（新しい順、最大 max_rows 件）"""
+
+    def __init__(self, folder: Any, max_rows: int = 200):
+        self.folder = folder
+        self.max_rows = max(1, int(max_rows))
+
+    def find(self, dasl_filter: str, max_rows: Optional[int] = None) -> List[SentItemRow]:
+        limit = self.max_rows if max_rows is None else max(1, int(max_rows))
+        try:
+            table = self.folder.GetTable(dasl_filter, OL_USER_ITEMS)
+        except AttributeError:
+            # Table を持たない古い環境では Items.Restrict で絞ってから読む。
+            return self._find_with_restrict(dasl_filter, limit)
+        columns = table.Columns
+        columns.RemoveAll()
+        for name in TABLE_COLUMNS:
+            columns.Add(name)
+        table.Sort("SentOn", True)
+        return [self._row(values) for values in (table.GetArray(limit) or ())]
+
+    def _find_with_restrict(self, dasl_filter: str, limit: int) -> List[SentItemRow]:
+        items = self.folder.Items
+        if dasl_filter:
+            items = items.Restrict(dasl_filter)
+        items.Sort("[SentOn]", True)
+        rows: List[SentItemRow] = []
+        for item in items:
+            if len(rows) >= limit:
+                break
+            values = [getattr(item, "EntryID", ""), getattr(item, "Subject", ""),
+                      getattr(item, "SentOn", None), getattr(item, "To", "")]
+            for prop in (PROP_MESSAGE_ID, PROP_IDEMPOTENCY_KEY):
+                try:
+                    values.append(item.PropertyAccessor.GetProperty(prop))
+                except Exception:
+                    values.append("")
+            rows.append(self._row(values))
+        return rows
+
+    @staticmethod
+    def _row(values: Sequence[Any]) -> SentItemRow:
+        entry_id, subject, sent_on, to, message_id, idempotency_key = (tuple(values) + (None,) * 6)[:6]
+        if not isinstance(sent_on, datetime.datetime):
+            sent_on = None
+        elif sent_on.tzinfo is not None:
+            sent_on = sent_on.replace(tzinfo=None)
+        return SentItemRow(
+            entry_id=str(entry_id or "").strip(),
+            subject=str(subject or "").strip(),
+            sent_on=sent_on,
+            to=str(to or ""),
+            message_id=str(message_id or "").strip(),
+            idempotency_key=str(idempotency_key or "").strip(),
+        )
+
+
+def window(center: datetime.datetime, seconds: int) -> Tuple[datetime.datetime, datetime.datetime]:
+    """center の前後 seconds 秒の範囲（tz は外す）。"""
+    if center.tzinfo is not None:
+        center = center.replace(tzinfo=None)
+    delta = datetime.timedelta(seconds=seconds)
+    return center - delta, center + delta
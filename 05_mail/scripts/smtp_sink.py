@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+smtp_sink.py - テスト・計測用のローカル SMTP 受信サーバ
+
+受け取ったメールは配送せずメモリに保持するだけ。PIPELINING を広告するため、
+SmtpTransport の1往復送信をそのまま試せる。
+
+  python 05_mail/scripts/smtp_sink.py --port 2525
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+_ADDRESS = re.compile(r"<([^>]*)>")
+
+
+@dataclass
+class SinkMessage:
+    mail_from: str
+    recipients: List[str]
+    data: bytes
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    # パイプライン応答を1行ずつ書くため、Nagle で遅延 ACK 待ちにならないようにする
+    disable_nagle_algorithm = True
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def _read_data(self) -> Optional[bytes]:
+        lines: List[bytes] = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+
+    def handle(self) -> None:
+        sink: SmtpSink = self.server.sink  # type: ignore[attr-defined]
+        sink._register(self.connection)
+        mail_from: Optional[str] = None
+        recipients: List[str] = []
+        self._reply("220 smtp-sink ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                extensions = ["8BITMIME", "SIZE 52428800"]
+                if sink.pipelining:
+                    extensions.insert(0, "PIPELINING")
+                self._reply("250-smtp-sink")
+                for ext in extensions[:-1]:
+                    self._reply(f"250-{ext}")
+                self._reply(f"250 {extensions[-1]}")
+            elif verb == "HELO":
+                self._reply("250 smtp-sink")
+            elif verb == "MAIL":
+                match = _ADDRESS.search(command)
+                mail_from = match.group(1) if match else ""
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                match = _ADDRESS.search(command)
+                address = match.group(1) if match else ""
+                if mail_from is None:
+                    self._reply("503 need MAIL first")
+                elif address.lower() in sink.reject_recipients:
+                    self._reply("550 mailbox unavailable")
+                else:
+                    recipients.append(address)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                if mail_from is None or not recipients:
+                    self._reply("554 no valid recipients")
+                    continue
+                self._reply("354 end data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if data is None:
+                    return
+                if sink.accept_delay_sec > 0:
+                    time.sleep(sink.accept_delay_sec)
+                queued = sink._store(SinkMessage(mail_from, recipients, data))
+                mail_from, recipients = None, []
+                self._reply(f"250 OK queued as {queued}")
+            elif verb == "RSET":
+                mail_from, recipients = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 command not implemented")
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpSink:
+    """
+    バックグラウンドスレッドで動くローカル SMTP サーバ。
+    port=0 なら空きポートを使う（実際のポートは address で取得）。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        keep_messages: bool = True,
+        pipelining: bool = True,
+        reject_recipients: Iterable[str] = (),
+        accept_delay_sec: float = 0.0,
+    ):
+        self.keep_messages = keep_messages
+        # 本文受信後、250 を返すまでの待ち（実サーバの受理処理・往復遅延の再現用）
+        self.accept_delay_sec = max(0.0, float(accept_delay_sec))
+        self.pipelining = pipelining
+        self.reject_recipients = {r.lower() for r in reject_recipients}
+        self.messages: List[SinkMessage] = []
+        self.received = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._sockets: List = []
+        self._server = _SinkServer((host, port), _SinkHandler)
+        self._server.sink = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def _register(self, sock) -> None:
+        with self._lock:
+            self.connections += 1
+            self._sockets.append(sock)
+
+    def _store(self, message: SinkMessage) -> int:
+        with self._lock:
+            self.received += 1
+            if self.keep_messages:
+                self.messages.append(message)
+            return self.received
+
+    def drop_connections(self) -> None:
+        """接続中のクライアントを切断する（アイドル切断の再現用）。"""
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+    def start(self) -> "SmtpSink":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self) -> "SmtpSink":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local SMTP sink for tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--no-pipelining", action="store_true", help="do not advertise PIPELINING")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sink = SmtpSink(args.host, args.port, keep_messages=False, pipelining=not args.no_pipelining)
+    host, port = sink.address
+    print(f"smtp sink listening on {host}:{port} (Ctrl+C で終了)")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink._server.server_close()
+        print(f"received={sink.received} connections={sink.connections}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,17 +6,22 @@ template_processor.py - テンプレート処理モジュール
 - テキスト(.txt)形式: {{変数名}} 形式の差し込み
 """
 
+import hashlib
+import importlib.util
+import io
+import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
 
-# python-docxは実行時にインポート（オプショナル依存）
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+# python-docxはキャッシュに無い.docxを読むときだけインポートする（オプショナル依存）
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
+
+# .docx から抽出した本文（プロセス内で共有）。{解決済みパス: (mtime_ns, size, sha256, 本文)}
+_DOCX_TEXT_CACHE: Dict[str, Tuple[int, int, str, str]] = {}
 
 
 @dataclass
@@ -32,6 +37,123 @@ class TemplateResult:
             self.missing_variables = []
 
 
+@dataclass
+class RenderedBody:
+    """render_batch の1宛先分の結果"""
+    body: str
+    fingerprint: str = ""
+    missing_variables: List[str] = None
+
+    def __post_init__(self):
+        if self.missing_variables is None:
+            self.missing_variables = []
+
+
+# 宛先ごとに変わる create_email_body の変数
+_PER_RECIPIENT_VARIABLES = ("会社名", "担当者名", "姓")
+
+# compile() で差し込み位置として切り出す変数（区切り文字を含まない最内の ≪≫ / «» / {{}}）
+_SLOT_PATTERN = re.compile(r'≪([^≪≫«»{}]*)≫|«([^≪≫«»{}]*)»|\{\{([^≪≫«»{}]*)\}\}')
+
+# 置換結果が別の変数に見えうる文字。リテラル部・変数名・値に含まれる場合は逐次置換に委ねる。
+_DELIMITER_CHARS = re.compile(r'[≪≫«»{}]')
+
+
+class CompiledTemplate:
+    """
+    TemplateProcessor.compile() が返す再利用可能なレンダラ。
+
+    テンプレートをリテラル部と差し込み位置に分割しておき、1回の ''.join で本文を組み立てる。
+    区切り文字がリテラル部・変数名・値に現れる場合は、置換の連鎖まで一致させるため
+    TemplateProcessor.render に委ねる（出力は常に render と同一）。
+    """
+
+    def __init__(self, processor: "TemplateProcessor", template_content: str):
+        self.template_content = template_content
+        self.variables = processor.extract_variables(template_content)
+        self._processor = processor
+        literals: List[str] = []
+        slots: List[Tuple[str, str]] = []
+        pos = 0
+        for match in _SLOT_PATTERN.finditer(template_content):
+            literals.append(template_content[pos:match.start()])
+            slots.append((match.group(match.lastindex), match.group(0)))
+            pos = match.end()
+        literals.append(template_content[pos:])
+        self._literals = literals
+        self._slots = slots
+        self._simple = not any(_DELIMITER_CHARS.search(literal) for literal in literals)
+        self._bound: Dict[str, str] = {}
+
+    def bind(self, constants: Dict[str, str]) -> "CompiledTemplate":
+        """
+        実行中に変わらない変数を先に差し込んだレンダラを返す。
+        束縛した変数は render に渡した同名の値より優先される。
+        """
+        bound = CompiledTemplate.__new__(CompiledTemplate)
+        bound.template_content = self.template_content
+        bound.variables = self.variables
+        bound._processor = self._processor
+        bound._bound = {**self._bound, **constants}
+        bound._literals = self._literals
+        bound._slots = self._slots
+        bound._simple = self._simple and not any(
+            _DELIMITER_CHARS.search(name) or _DELIMITER_CHARS.search(value)
+            for name, value in constants.items()
+        )
+        if bound._simple:
+            literals = [self._literals[0]]
+            slots: List[Tuple[str, str]] = []
+            for (name, raw), literal in zip(self._slots, self._literals[1:]):
+                if name in constants:
+                    literals[-1] += constants[name] + literal
+                else:
+                    slots.append((name, raw))
+                    literals.append(literal)
+            bound._literals = literals
+            bound._slots = slots
+        return bound
+
+    @property
+    def simple(self) -> bool:
+        """区切り文字を含まず、分割済みの差し込み位置だけで描画できるか"""
+        return self._simple
+
+    def render(self, variables: Dict[str, str], strict: bool = False) -> TemplateResult:
+        """TemplateProcessor.render(template_content, variables, strict) と同じ結果を返す。"""
+        if self._bound:
+            missing = [var for var in self.variables if var not in variables and var not in self._bound]
+        else:
+            missing = [var for var in self.variables if var not in variables]
+        if strict and missing:
+            return TemplateResult(
+                success=False,
+                error=f"未定義の変数があります: {', '.join(missing)}",
+                missing_variables=missing
+            )
+        if not self._simple or any(
+            _DELIMITER_CHARS.search(name) or _DELIMITER_CHARS.search(value)
+            for name, value in variables.items()
+        ):
+            return self._processor.render(self.template_content, {**variables, **self._bound}, strict=strict)
+
+        return TemplateResult(
+            success=True,
+            content=self._fill(variables),
+            missing_variables=missing
+        )
+
+    def _fill(self, variables: Dict[str, str]) -> str:
+        """区切り文字を含まない値で差し込み位置を埋める（simple なテンプレート専用）。"""
+        literals = self._literals
+        parts = [literals[0]]
+        for (name, raw), literal in zip(self._slots, literals[1:]):
+            value = variables.get(name)
+            parts.append(raw if value is None else value)
+            parts.append(literal)
+        return "".join(parts)
+
+
 class TemplateProcessor:
     """テンプレート処理クラス"""
 
@@ -41,8 +163,12 @@ class TemplateProcessor:
     # 汎用形式の差し込み変数パターン（{{変数名}}）
     GENERIC_VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
 
-    def __init__(self):
-        pass
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: .docx から抽出した本文を保存するディレクトリ（None なら保存しない）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
 
     def load_template(self, filepath: str) -> TemplateResult:
         """
@@ -75,23 +201,93 @@ class TemplateProcessor:
             )
 
     def _load_docx(self, path: Path) -> TemplateResult:
-        """Wordファイルを読み込む"""
-        if not DOCX_AVAILABLE:
-            return TemplateResult(
-                success=False,
-                error="python-docxがインストールされていません。"
-            )
+        """
+        Wordファイルを読み込む。
 
+        抽出した本文はパス・更新時刻・サイズ・内容ハッシュが一致する間、メモリ
+        （と cache_dir）から返し、python-docx での解析（とインポート）を省く。
+        """
         try:
-            doc = Document(str(path))
-            paragraphs = [p.text for p in doc.paragraphs]
-            content = "\n".join(paragraphs)
-            return TemplateResult(success=True, content=content)
-        except Exception as e:
+            stat = path.stat()
+            data = path.read_bytes()
+        except OSError as e:
             return TemplateResult(
                 success=False,
                 error=f"Wordファイル読み込みエラー: {e}"
             )
+        cache_key = str(path.resolve())
+        signature = (stat.st_mtime_ns, stat.st_size, hashlib.sha256(data).hexdigest())
+
+        cached = _DOCX_TEXT_CACHE.get(cache_key)
+        if cached is not None and cached[:3] == signature:
+            return TemplateResult(success=True, content=cached[3])
+
+        content = self._read_docx_cache(cache_key, signature)
+        if content is None:
+            if not DOCX_AVAILABLE:
+                return TemplateResult(
+                    success=False,
+                    error="python-docxがインストールされていません。"
+                )
+            try:
+                from docx import Document
+
+                doc = Document(io.BytesIO(data))
+                paragraphs = [p.text for p in doc.paragraphs]
+                content = "\n".join(paragraphs)
+            except Exception as e:
+                return TemplateResult(
+                    success=False,
+                    error=f"Wordファイル読み込みエラー: {e}"
+                )
+            self._write_docx_cache(cache_key, signature, content)
+        _DOCX_TEXT_CACHE[cache_key] = signature + (content,)
+        return TemplateResult(success=True, content=content)
+
+    def _docx_cache_path(self, cache_key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        name = hashlib.sha256(cache_key.encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / f"docx_{name}.json"
+
+    def _read_docx_cache(self, cache_key: str, signature: Tuple[int, int, str]) -> Optional[str]:
+        """保存済みの抽出本文を返す（無い・壊れている・元ファイルと不一致なら None）。"""
+        cache_path = self._docx_cache_path(cache_key)
+        if cache_path is None:
+            return None
+        try:
+            entry = json.loads(cache_path.read_text(encoding="utf-8"))
+            if (
+                entry.get("path") == cache_key
+                and (entry.get("mtime_ns"), entry.get("size"), entry.get("sha256")) == signature
+            ):
+                return str(entry["content"])
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return None
+
+    def _write_docx_cache(self, cache_key: str, signature: Tuple[int, int, str], content: str) -> None:
+        """抽出本文を保存する。保存できなくても読み込みは失敗させない。"""
+        cache_path = self._docx_cache_path(cache_key)
+        if cache_path is None:
+            return
+        entry = {
+            "path": cache_key,
+            "mtime_ns": signature[0],
+            "size": signature[1],
+            "sha256": signature[2],
+            "content": content,
+        }
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
 
     def _load_text(self, path: Path) -> TemplateResult:
         """テキストファイルを読み込む"""
@@ -130,6 +326,18 @@ class TemplateProcessor:
 
         return list(variables)
 
+    def compile(self, template_content: str) -> CompiledTemplate:
+        """
+        同じテンプレートで繰り返し描画するためのレンダラを作る。
+
+        Args:
+            template_content: テンプレート内容
+
+        Returns:
+            CompiledTemplate（render の結果は TemplateProcessor.render と同一）
+        """
+        return CompiledTemplate(self, template_content)
+
     def render(self, template_content: str, variables: Dict[str, str],
                strict: bool = False) -> TemplateResult:
         """
@@ -178,7 +386,7 @@ class TemplateProcessor:
 
     def create_email_body(
         self,
-        template_content: str,
+        template_content: Union[str, CompiledTemplate],
         company_name: str,
         contact_name: str,
         product_name: str,
@@ -193,7 +401,7 @@ class TemplateProcessor:
         メール本文を生成する（ヘルパーメソッド）。
 
         Args:
-            template_content: テンプレート内容
+            template_content: テンプレート内容（compile() 済みのものも可）
             company_name: 会社名
             contact_name: 担当者名
             product_name: 製品名
@@ -207,6 +415,36 @@ class TemplateProcessor:
         Returns:
             TemplateResult
         """
+        variables = self.email_variables(
+            company_name,
+            contact_name,
+            product_name,
+            product_features,
+            product_url,
+            maker_name=maker_name,
+            maker_code=maker_code,
+            quantity=quantity,
+            **extra_variables
+        )
+
+        if isinstance(template_content, CompiledTemplate):
+            return template_content.render(variables, strict=False)
+        return self.render(template_content, variables, strict=False)
+
+
+    @staticmethod
+    def email_variables(
+        company_name: str,
+        contact_name: str,
+        product_name: str,
+        product_features: str,
+        product_url: str,
+        maker_name: str = "",
+        maker_code: str = "",
+        quantity: str = "",
+        **extra_variables
+    ) -> Dict[str, str]:
+        """create_email_body が差し込む変数辞書を作る。"""
         variables = {
             "会社名": company_name,
             "担当者名": contact_name,
@@ -220,8 +458,73 @@ class TemplateProcessor:
             "姓": contact_name.split()[0] if " " in contact_name else contact_name,
         }
         variables.update(extra_variables)
+        return variables
 
-        return self.render(template_content, variables, strict=False)
+    def render_batch(
+        self,
+        compiled_template: CompiledTemplate,
+        constant_vars: Dict[str, str],
+        records: Iterable[Any],
+        fingerprint: Optional[Callable[[str], str]] = None,
+        workers: int = 1,
+    ) -> List[RenderedBody]:
+        """
+        複数宛先の本文をまとめて生成する。
+
+        製品情報などの共通変数は1度だけ差し込み、宛先ごとには会社名・担当者名・姓だけを埋める。
+        各本文は create_email_body(compiled_template, company_name, contact_name, **constant_vars)
+        と同一。
+
+        Args:
+            compiled_template: compile() 済みのテンプレート
+            constant_vars: create_email_body の宛先以外の引数
+                （product_name, product_features, product_url, maker_name, maker_code, quantity, 追加変数）
+            records: company_name / contact_name を持つ宛先（ContactRecord など）
+            fingerprint: 本文から照合用ハッシュを作る関数（指定時は RenderedBody.fingerprint に格納）
+            workers: 2以上ならスレッドプールで並行に生成する（結果は records の順）
+
+        Returns:
+            RenderedBody のリスト
+        """
+        records = list(records)
+        shared = self.email_variables("", "", **constant_vars)
+        per_recipient = [name for name in _PER_RECIPIENT_VARIABLES if name not in constant_vars]
+        bound = compiled_template.bind({k: v for k, v in shared.items() if k not in per_recipient})
+        # 変数はすべて揃っているので、未定義変数は宛先によらず同じ。
+        missing = [var for var in compiled_template.variables if var not in shared]
+
+        def render_one(record: Any) -> RenderedBody:
+            company_name = record.company_name
+            contact_name = record.contact_name
+            if bound.simple and not _DELIMITER_CHARS.search(company_name) and not _DELIMITER_CHARS.search(contact_name):
+                own = {
+                    "会社名": company_name,
+                    "担当者名": contact_name,
+                    "姓": contact_name.split()[0] if " " in contact_name else contact_name,
+                }
+                body = bound._fill(own)
+                return RenderedBody(
+                    body=body,
+                    fingerprint=fingerprint(body) if fingerprint is not None else "",
+                    missing_variables=list(missing),
+                )
+            # 置換の連鎖が起こりうる値は create_email_body と同じ順序の逐次置換で描画する。
+            result = self.create_email_body(
+                compiled_template,
+                company_name,
+                contact_name,
+                **constant_vars
+            )
+            return RenderedBody(
+                body=result.content,
+                fingerprint=fingerprint(result.content) if fingerprint is not None else "",
+                missing_variables=result.missing_variables,
+            )
+
+        if workers <= 1 or len(records) < 2:
+            return [render_one(record) for record in records]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render") as pool:
+            return list(pool.map(render_one, records))
 
 
 def get_default_template() -> str:
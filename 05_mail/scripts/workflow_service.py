@@ -232,6 +232,8 @@ class WorkflowService:
         request_id: str = "",
         rerun_of_run_id: str = "",
         user_approved: Optional[bool] = None,
+        resume_run_id: str = "",
+        chunked: Optional[bool] = None,
     ) -> Dict[str, Any]:
         run_started_at = dt.datetime.now(dt.timezone.utc)
         resolved_workflow_mode = self.resolve_workflow_mode(workflow_mode)
@@ -284,16 +286,16 @@ class WorkflowService:
 
         preview_body = ""
         if final_records:
-            preview_body = self.skill.render_email(
+            preview_body = self.skill.render_emails(
                 template_content=template_content,
-                record=final_records[0],
+                records=final_records[:1],
                 product_name=product_name,
                 product_features=product_features,
                 product_url=product_url,
                 maker_name=maker_name,
                 maker_code=maker_code,
                 quantity=quantity,
-            )
+            )[0].body
 
         draft_content = self._build_markdown_content(
             request_id=resolved_request_id,
@@ -321,6 +323,7 @@ class WorkflowService:
         completed_path = ""
         error_path = ""
         audit_log_path = ""
+        send_run_id = ""
 
         workflow_context = {
             "request_id": resolved_request_id,
@@ -369,8 +372,11 @@ class WorkflowService:
                         quantity=quantity,
                         input_file=input_file,
                         workflow_context=workflow_context,
+                        resume_run_id=resume_run_id or None,
+                        chunked=chunked,
                     )
                     audit_log_path = str(send_result.get("audit_log_path", ""))
+                    send_run_id = str(send_result.get("run_id", ""))
                     if bool(send_result.get("success")) and audit_log_path:
                         state = "completed"
                     else:
@@ -435,6 +441,9 @@ class WorkflowService:
                 "completed_path": completed_path,
                 "error_path": error_path,
                 "audit_log_path": audit_log_path,
+                # 送信まで進んだ実行の送信実行 ID（send_bulk が戻った場合のみ記録される）。
+                # 異常終了で履歴が残らなかった実行の ID は ledger_maintenance.py --list-runs で確認する。
+                "send_run_id": send_run_id,
             },
             now=run_started_at,
         )
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+PIIDetector の会社名照合計測。
+
+指定件数の会社名で照合器を構築し、製品検索クエリ程度の文とメール本文程度の文を
+繰り返し照合する。--legacy を付けると会社名ごとの `name in text` を再現する。
+--pure を付けると pyahocorasick があっても純 Python 実装を使う。
+結果が `name in text` の集合と一致することも確認する。
+
+  python 05_mail/tests/bench_pii_companies.py --names 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.pii_detector import CompanyNameMatcher
+
+
+def _company_names(count: int) -> list:
+    rng = random.Random(50000)
+    suffixes = ["株式会社", "有限会社", "商事", "工業", "製作所", "バイオ"]
+    return [f"{rng.choice(['', '株式会社'])}サンプル{i:05d}{rng.choice(suffixes)}" for i in range(count)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark PIIDetector company-name matching.")
+    parser.add_argument("--names", type=int, default=50000)
+    parser.add_argument("--texts", type=int, default=200, help="texts matched per kind")
+    parser.add_argument("--legacy", action="store_true", help="check every name with `in`")
+    parser.add_argument("--pure", action="store_true", help="force the pure-Python automaton")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    names = _company_names(args.names)
+    query = f"細胞培養用96ウェルプレート {names[len(names) // 2]} 向け 見積"
+    body = ("下記製品のお見積りをお願いしたく、ご連絡いたしました。" * 20) + names[-1]
+    texts = [query, body]
+
+    t0 = time.perf_counter()
+    matcher = CompanyNameMatcher(names, accelerated=not args.pure)
+    build_sec = time.perf_counter() - t0
+    for text in texts:
+        if set(matcher.find(text)) != {n for n in names if n in text}:
+            print("matcher result differs from `name in text`")
+            return 1
+
+    if args.legacy:
+        find = lambda text: [n for n in names if n in text]  # noqa: E731
+        mode = "legacy"
+    else:
+        find = matcher.find
+        mode = "accelerated" if matcher.accelerated else "pure-python"
+    for label, text in (("query", query), ("body", body)):
+        t0 = time.perf_counter()
+        for _ in range(args.texts):
+            find(text)
+        per_call_ms = (time.perf_counter() - t0) / args.texts * 1000
+        print(f"{mode} {label} ({len(text)} chars): {per_call_ms:.3f} ms/call")
+    if not args.legacy:
+        print(f"{mode} build ({args.names} names): {build_sec:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+SendLedger.find_recent_sent のレイテンシ計測。
+
+send_events を指定件数まで合成投入し、ヒット/ミス混在の直近SENT検索を
+繰り返して中央値と p95 を表示する。--compare-legacy を付けると旧来の
+OR 結合クエリも同条件で計測する。
+
+  python 05_mail/tests/bench_recent_sent_lookup.py --sizes 10000,100000,1000000,5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import STATUS_SENT, STATUS_SKIPPED_AUTO, SendLedger
+
+LEGACY_SQL = """
+    SELECT *
+      FROM send_events
+     WHERE created_at_utc >= ?
+       AND status = ?
+       AND (request_key = ? OR request_key = ? OR v1_key = ?)
+     ORDER BY created_at_utc DESC LIMIT 1;
+"""
+
+
+def _populate(ledger: SendLedger, size: int, span_days: int, seed: int) -> None:
+    rng = random.Random(seed)
+    start = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=span_days)
+    step = dt.timedelta(days=span_days) / max(1, size)
+
+    def rows():
+        for i in range(size):
+            created = (start + step * i).isoformat()
+            status = STATUS_SENT if rng.random() < 0.7 else STATUS_SKIPPED_AUTO
+            yield (
+                created, f"rq:v2:{i:012d}", f"v1-{i:012d}", "v2", f"mk:v2:{i}",
+                f"run-{i // 50}", status, "", f"MID-{i}", "direct", "", "", created, "", "[]", "",
+            )
+
+    conn = ledger.conn_main
+    conn.execute("BEGIN")
+    conn.executemany(
+        """
+        INSERT INTO send_events (
+            created_at_utc, request_key, v1_key, key_version, mail_key, run_id, status,
+            recipient_hash, message_id, message_id_source, idempotency_token,
+            idempotency_secret_version, sent_at_utc, subject_norm, decision_trace, error
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+        rows(),
+    )
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE;")
+
+
+def _measure(fn: Callable[[int], object], size: int, lookups: int, seed: int) -> List[float]:
+    rng = random.Random(seed)
+    samples: List[float] = []
+    for _ in range(lookups):
+        # 半分は既存キー（直近側に寄せる）、半分は未登録キー。
+        if rng.random() < 0.5:
+            idx = size - 1 - int(rng.random() * min(size, 5000))
+        else:
+            idx = size + rng.randrange(1_000_000)
+        t0 = time.perf_counter()
+        fn(idx)
+        samples.append((time.perf_counter() - t0) * 1_000_000)
+    return samples
+
+
+def _fmt(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"median={statistics.median(ordered):8.1f}us p95={p95:8.1f}us"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SendLedger recent-sent lookups.")
+    parser.add_argument("--sizes", default="10000,100000,1000000,5000000", help="comma separated event counts")
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups per size")
+    parser.add_argument("--span-days", type=int, default=90, help="days covered by synthetic events")
+    parser.add_argument("--window-hours", type=int, default=24, help="rerun window")
+    parser.add_argument("--compare-legacy", action="store_true", help="also time the OR query")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sizes = [int(s) for s in str(args.sizes).split(",") if s.strip()]
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "bench.sqlite3"))
+            t0 = time.perf_counter()
+            _populate(ledger, size, args.span_days, args.seed)
+            load_sec = time.perf_counter() - t0
+
+            samples = _measure(
+                lambda i: ledger.find_recent_sent(f"rq:v2:{i:012d}", f"v1-{i:012d}", args.window_hours),
+                size,
+                args.lookups,
+                args.seed,
+            )
+            print(f"events={size:>9,d} load={load_sec:7.1f}s indexed {_fmt(samples)}")
+
+            if args.compare_legacy:
+                window_start = (
+                    dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=args.window_hours)
+                ).isoformat()
+                legacy = _measure(
+                    lambda i: ledger.conn_main.execute(
+                        LEGACY_SQL,
+                        (window_start, STATUS_SENT, f"rq:v2:{i:012d}", f"rq:v2:{i:012d}", f"v1-{i:012d}"),
+                    ).fetchone(),
+                    size,
+                    args.lookups,
+                    args.seed,
+                )
+                print(f"{'':>16}{'':>14} legacy  {_fmt(legacy)}")
+            ledger.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+SendLedger の秘密値キャッシュ計測。
+
+keyring を遅延付きのインメモリ辞書に差し替え、指定人数分の
+hash_recipient / build_idempotency_token / verify_idempotency_token を実行する。
+--no-cache を付けると毎回キャッシュを破棄し、従来の keyring 往復を再現する。
+
+  python 05_mail/tests/bench_secret_cache.py --recipients 10000 --keyring-latency-ms 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SendLedger
+
+
+class _InMemoryKeyring:
+    def __init__(self, latency_sec: float):
+        self.latency_sec = latency_sec
+        self.store = {}
+        self.calls = 0
+
+    def get_password(self, service, key):
+        self.calls += 1
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        return self.store.get((service, key))
+
+    def set_password(self, service, key, value):
+        self.store[(service, key)] = value
+
+
+def _run(ledger: SendLedger, recipients: int, invalidate: bool) -> float:
+    t0 = time.perf_counter()
+    for i in range(recipients):
+        if invalidate:
+            ledger.invalidate_secret_cache()
+        ledger.hash_recipient(f"user{i}@example.com")
+        request_key = f"rq:v2:{i:012d}"
+        token = ledger.build_idempotency_token(request_key, "v2")
+        ledger.verify_idempotency_token(request_key, token, "v2")
+    return time.perf_counter() - t0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SendLedger secret caching.")
+    parser.add_argument("--recipients", type=int, default=10000)
+    parser.add_argument("--keyring-latency-ms", type=float, default=0.0, help="simulated backend latency per get")
+    parser.add_argument("--no-cache", action="store_true", help="invalidate before every recipient")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    fake = _InMemoryKeyring(args.keyring_latency_ms / 1000.0)
+    with mock.patch("scripts.send_ledger.keyring", fake):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "bench.sqlite3"))
+            modes = [("cached", False)]
+            if args.no_cache:
+                modes.append(("uncached", True))
+            for label, invalidate in modes:
+                fake.calls = 0
+                elapsed = _run(ledger, args.recipients, invalidate)
+                per = elapsed / max(1, args.recipients) * 1_000_000
+                print(
+                    f"{label:>8} recipients={args.recipients:,d} total={elapsed:7.3f}s "
+                    f"per_recipient={per:8.1f}us keyring_gets={fake.calls:,d}"
+                )
+            ledger.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+send_bulk の送信スループット計測（ローカル SMTP シンク宛て）。
+
+宛先数ごとに send_concurrency を変えて send_bulk を実行し、1 秒あたりの
+送信通数を表示する。台帳は計測ごとに一時ディレクトリへ作り直す。
+keyring は計測用にメモリ上の辞書へ差し替える。--accept-delay-ms でシンクの
+受理応答を遅らせると、遠隔サーバ相手の待ち時間を再現できる。
+
+  python 05_mail/tests/bench_send_pipeline.py --sizes 100,1000,10000 --concurrency 1,4,8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.main import QuoteRequestSkill
+from scripts.smtp_sink import SmtpSink
+
+
+class _NullAudit:
+    execution_id = "bench"
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        return ""
+
+    def write_sent_list(self, results):
+        return ""
+
+    def write_unsent_list(self, results):
+        return ""
+
+    def format_screen_output(self, results):
+        return ""
+
+
+def _records(size: int) -> List[ContactRecord]:
+    return [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@supplier{i % 50}.example", contact_name=f"担当{i}")
+        for i in range(size)
+    ]
+
+
+def _config(tmp: Path, sink: SmtpSink, size: int, concurrency: int, prepare_workers: int) -> str:
+    host, port = sink.address
+    config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+    config.update({
+        "ledger_sqlite_path": str(tmp / "bench.sqlite3"),
+        "max_recipients": size,
+        "send_interval_sec": 0,
+        "mail_transport": "smtp",
+        "send_concurrency": concurrency,
+        "send_prepare_workers": prepare_workers,
+    })
+    config["smtp"] = dict(config["smtp"], host=host, port=port, from_address="bench@example.jp")
+    path = tmp / "config.json"
+    path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def _run(size: int, concurrency: int, prepare_workers: int, accept_delay_sec: float) -> float:
+    store = {}
+    with tempfile.TemporaryDirectory() as tmp, SmtpSink(
+        keep_messages=False, accept_delay_sec=accept_delay_sec
+    ) as sink, mock.patch(
+        "scripts.send_ledger.keyring.get_password",
+        side_effect=lambda service, key: store.get((service, key)),
+    ), mock.patch(
+        "scripts.send_ledger.keyring.set_password",
+        side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+    ):
+        skill = QuoteRequestSkill(config_path=_config(Path(tmp), sink, size, concurrency, prepare_workers))
+        skill.audit_logger = _NullAudit()
+        t0 = time.perf_counter()
+        result = skill.send_bulk(
+            records=_records(size),
+            subject="スループット計測",
+            template_content="{{会社名}} 御中\n{{担当者名}} 様\n\n{{製品名}} の見積をお願いします。",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code=f"BENCH-{size}-{concurrency}",
+            input_file="bench.csv",
+        )
+        elapsed = time.perf_counter() - t0
+        skill.mail_sender.close()
+        skill.send_ledger.close()
+        if result["success_count"] != size or sink.received != size:
+            raise RuntimeError(f"sent {result['success_count']}/{size}, sink received {sink.received}")
+    return elapsed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark send_bulk throughput against a local SMTP sink.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma separated recipient counts")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma separated send_concurrency values")
+    parser.add_argument("--accept-delay-ms", type=float, default=0.0, help="sink delay before accepting each mail")
+    parser.add_argument("--prepare-workers", type=int, default=0, help="send_prepare_workers (0 = same as concurrency)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sizes = [int(s) for s in str(args.sizes).split(",") if s.strip()]
+    levels = [int(s) for s in str(args.concurrency).split(",") if s.strip()]
+    for size in sizes:
+        for concurrency in levels:
+            elapsed = _run(size, concurrency, args.prepare_workers or concurrency, args.accept_delay_ms / 1000.0)
+            print(
+                f"recipients={size:>6,d} concurrency={concurrency:>2d} "
+                f"elapsed={elapsed:8.2f}s throughput={size / elapsed:8.1f} mails/s"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
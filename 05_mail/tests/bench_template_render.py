@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+TemplateProcessor の本文描画計測。
+
+既定テンプレートで指定件数分の本文を create_email_body により生成する。
+--legacy を付けると毎回テンプレート文字列を渡し、従来の逐次置換を再現する。
+--batch を付けると render_batch で共通変数を1度だけ差し込み、本文ハッシュまで算出する。
+出力が一致することも確認する。
+
+  python 05_mail/tests/bench_template_render.py --bodies 100000
+  python 05_mail/tests/bench_template_render.py --bodies 100000 --batch
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.main import QuoteRequestSkill
+from scripts.template_processor import TemplateProcessor, get_default_template
+
+_PRODUCT = dict(
+    product_name="細胞培養用96ウェルプレート",
+    product_features="滅菌済み・TC処理",
+    product_url="https://example.com/products/96well",
+    maker_name="BIO-RAD",
+    maker_code="170-4156",
+    quantity="10箱",
+)
+
+
+def _run(processor: TemplateProcessor, template, bodies: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(bodies):
+        processor.create_email_body(
+            template_content=template,
+            company_name=f"株式会社サンプル{i}",
+            contact_name=f"担当 {i}",
+            **_PRODUCT,
+        )
+    return time.perf_counter() - t0
+
+
+def _run_batch(processor: TemplateProcessor, compiled, bodies: int, workers: int) -> float:
+    records = [
+        ContactRecord(company_name=f"株式会社サンプル{i}", email=f"user{i}@example.com", contact_name=f"担当 {i}")
+        for i in range(bodies)
+    ]
+    t0 = time.perf_counter()
+    processor.render_batch(
+        compiled,
+        _PRODUCT,
+        records,
+        fingerprint=QuoteRequestSkill._build_body_fingerprint,
+        workers=workers,
+    )
+    return time.perf_counter() - t0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark TemplateProcessor body rendering.")
+    parser.add_argument("--bodies", type=int, default=100000)
+    parser.add_argument("--legacy", action="store_true", help="render from the template string every time")
+    parser.add_argument("--batch", action="store_true", help="use render_batch (includes body fingerprints)")
+    parser.add_argument("--workers", type=int, default=1, help="render_batch thread pool size")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    processor = TemplateProcessor()
+    template = get_default_template()
+    compiled = processor.compile(template)
+    sample = dict(
+        company_name="A社",
+        contact_name="山田 太郎",
+        product_name="P",
+        product_features="F",
+        product_url="https://example.com",
+    )
+    if (
+        processor.create_email_body(template_content=compiled, **sample).content
+        != processor.create_email_body(template_content=template, **sample).content
+    ):
+        print("compiled output differs from render()")
+        return 1
+    if args.batch:
+        elapsed = _run_batch(processor, compiled, args.bodies, args.workers)
+        mode = f"batch(workers={args.workers})"
+    else:
+        elapsed = _run(processor, template if args.legacy else compiled, args.bodies)
+        mode = "legacy" if args.legacy else "compiled"
+    print(f"{mode}: {args.bodies} bodies in {elapsed:.3f}s ({args.bodies / elapsed:,.0f} bodies/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
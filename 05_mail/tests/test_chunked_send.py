@@ -0,0 +1,173 @@
+import datetime as dt
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.audit_logger import AuditLogger
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import SendResult
+from scripts.main import EXIT_CODE_INVALID_INPUT, QuoteRequestSkill
+from scripts.send_ledger import RUN_STATUS_COMPLETED
+
+
+class _AuditStub:
+    def __init__(self, execution_id: str) -> None:
+        self.execution_id = execution_id
+        self.audit_calls = []
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        self.audit_calls.append(list(results))
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+class _DummyEncryptionManager:
+    def encrypt(self, value: str) -> str:
+        return f"enc:v1:{value}"
+
+
+class _FakeSender:
+    def __init__(self):
+        self.sent = []
+
+    def send_mail(self, to, subject, body, company_name="", html_body=None,
+                  idempotency_token="", body_reconcile_marker="", message_id_scope=""):
+        self.sent.append(to)
+        return SendResult(
+            success=True,
+            email=to,
+            company_name=company_name,
+            message_id=f"<{len(self.sent)}@fake>",
+            message_id_source="direct",
+            sent_at=dt.datetime.now(dt.timezone.utc),
+        )
+
+    def close(self):
+        pass
+
+
+def _records(count: int):
+    return [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@example.com", contact_name=f"担当{i}")
+        for i in range(count)
+    ]
+
+
+class ChunkedSendTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        tmp = Path(self._tmp.name)
+        config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+        config.update({
+            "ledger_sqlite_path": str(tmp / "ledger.sqlite3"),
+            "max_recipients": 3,
+            "max_job_recipients": 20,
+            "chunk_pause_sec": 2,
+            "confirmation_threshold": 5,
+            "send_interval_sec": 0,
+            "rerun_policy_default": "auto_skip",
+        })
+        self.config_path = tmp / "config.json"
+        self.config_path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        store = {}
+        patches = [
+            mock.patch(
+                "scripts.send_ledger.keyring.get_password",
+                side_effect=lambda service, key: store.get((service, key)),
+            ),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+            ),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.sleep = mock.patch("scripts.main.time.sleep").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _skill(self):
+        skill = QuoteRequestSkill(config_path=str(self.config_path))
+        skill.audit_logger = _AuditStub("chunk-run")
+        skill.mail_sender = _FakeSender()
+        self.addCleanup(skill.send_ledger.close)
+        return skill
+
+    def _send(self, skill, records, **kwargs):
+        confirmations = []
+
+        def confirm(count):
+            confirmations.append(count)
+            return True
+
+        result = skill.send_bulk(
+            records=records,
+            subject="チャンク",
+            template_content="{{会社名}} 御中",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="CHUNK-1",
+            input_file="chunk.csv",
+            confirm_bulk_send_callback=confirm,
+            **kwargs,
+        )
+        return result, confirmations
+
+    def test_chunked_job_confirms_once_and_writes_one_audit_log(self):
+        records = _records(8)
+        skill = self._skill()
+        result, confirmations = self._send(skill, records, chunked=True)
+
+        self.assertTrue(result["success"])
+        self.assertEqual(confirmations, [8])
+        self.assertEqual(result["run_id"], "chunk-run")
+        self.assertEqual(result["success_count"], 8)
+        self.assertEqual(skill.mail_sender.sent, [r.email for r in records])
+        self.assertEqual([r["email"] for r in result["results"]], [r.email for r in records])
+        self.assertEqual(len(skill.audit_logger.audit_calls), 1)
+        self.assertEqual(len(skill.audit_logger.audit_calls[0]), 8)
+        self.assertEqual(self.sleep.call_args_list, [mock.call(2.0), mock.call(2.0)])
+        manifest = skill.send_ledger.get_run_manifest("chunk-run")
+        self.assertEqual((manifest["total"], manifest["status"]), (8, RUN_STATUS_COMPLETED))
+
+    def test_chunked_streaming_uses_chunk_windows(self):
+        skill = self._skill()
+        skill.audit_logger = AuditLogger(str(Path(self._tmp.name) / "logs"), _DummyEncryptionManager())
+        with mock.patch.object(skill, "_prepare_bulk_items", wraps=skill._prepare_bulk_items) as prepare:
+            result, confirmations = self._send(skill, _records(7), chunked=True, stream_results=True)
+        self.assertEqual(result["success_count"], 7)
+        self.assertEqual(confirmations, [7])
+        self.assertEqual([len(c.kwargs["records"]) for c in prepare.call_args_list], [3, 3, 1])
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_limits_without_and_with_chunking(self):
+        skill = self._skill()
+        plain, _ = self._send(skill, _records(4))
+        self.assertFalse(plain["success"])
+        self.assertEqual(plain["exit_code"], EXIT_CODE_INVALID_INPUT)
+        too_many, confirmations = self._send(skill, _records(21), chunked=True)
+        self.assertFalse(too_many["success"])
+        self.assertEqual(confirmations, [])
+        self.assertEqual(skill.mail_sender.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
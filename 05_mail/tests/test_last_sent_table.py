@@ -0,0 +1,124 @@
+import datetime as dt
+from pathlib import Path
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SendLedger
+
+
+def _mark_sent(ledger: SendLedger, request_key: str, v1_key: str, mid: str, run_id: str, sent_at: dt.datetime):
+    ledger.mark_sent(
+        request_key=request_key,
+        v1_key=v1_key,
+        key_version="v2",
+        run_id=run_id,
+        mail_key="mk",
+        recipient_hash="h",
+        message_id=mid,
+        message_id_source="direct",
+        idempotency_token="t",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        decision_trace=["seed"],
+        sent_at=sent_at,
+    )
+
+
+class LastSentTableTests(unittest.TestCase):
+    def test_mark_sent_keeps_only_latest_row_per_key(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            now = dt.datetime.now(dt.timezone.utc)
+            _mark_sent(ledger, "rq:v2:a", "v1-a", "MID-NEW", "run-2", now - dt.timedelta(hours=1))
+            # 遅れて記録された古いSENTで最新行が巻き戻らないこと
+            _mark_sent(ledger, "rq:v2:a", "v1-a", "MID-OLD", "run-1", now - dt.timedelta(hours=3))
+
+            rows = ledger.conn_main.execute(
+                "SELECT key_kind, lookup_key FROM last_sent ORDER BY key_kind;"
+            ).fetchall()
+            found = ledger.find_recent_sent("rq:v2:a", "v1-other", 24)
+            same_run = ledger.find_recent_sent("rq:v2:a", "v1-other", 24, run_id="run-1")
+            other_run = ledger.find_recent_sent("rq:v2:a", "v1-other", 24, run_id="run-3")
+            blocked, reason = ledger.is_send_blocked_precheck(
+                request_key="rq:v2:zzz",
+                v1_key="v1-a",
+                rerun_window_hours=24,
+            )
+            ledger.close()
+
+        self.assertEqual([tuple(r) for r in rows], [("request_key", "rq:v2:a"), ("v1_key", "v1-a")])
+        self.assertEqual(found["message_id"], "MID-NEW")
+        self.assertEqual(same_run["message_id"], "MID-OLD")
+        self.assertIsNone(other_run)
+        self.assertTrue(blocked)
+        self.assertEqual(reason, "recent_sent_detected")
+
+    def test_reconciled_sent_updates_last_sent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            ledger.mark_unknown_sent(
+                request_key="rq:v2:u",
+                v1_key="v1-u",
+                key_version="v2",
+                run_id="run-1",
+                mail_key="mk",
+                recipient_hash="h",
+                idempotency_token="t",
+                idempotency_secret_version="v1",
+                subject_norm="s",
+                decision_trace=["seed"],
+                error="commit failed",
+                hold_sec=1800,
+            )
+            self.assertIsNone(ledger.find_recent_sent("rq:v2:u", "v1-u", 24))
+            ledger.mark_reconciled_sent(
+                request_key="rq:v2:u",
+                run_id="run-2",
+                decision_trace=["unknown_reconciled=header"],
+                reconciled_message_id="MID-R",
+                reconciled_source="header",
+            )
+            found = ledger.find_recent_sent("rq:v2:u", "v1-u", 24)
+            ledger.close()
+
+        self.assertEqual(found["message_id"], "MID-R")
+
+    def test_rebuild_repopulates_from_send_events(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            ledger = SendLedger(str(path))
+            now = dt.datetime.now(dt.timezone.utc)
+            _mark_sent(ledger, "rq:v2:a", "v1-a", "MID-1", "run-1", now - dt.timedelta(hours=5))
+            _mark_sent(ledger, "rq:v2:a", "v1-a", "MID-2", "run-2", now - dt.timedelta(hours=2))
+            _mark_sent(ledger, "rq:v2:b", "v1-b", "MID-3", "run-2", now - dt.timedelta(hours=1))
+            ledger.close()
+
+            # 変更前の台帳を模して last_sent を空にし、スキーマ版を戻す
+            conn = sqlite3.connect(str(path))
+            conn.execute("DROP TABLE last_sent;")
+            conn.execute("PRAGMA user_version = 1;")
+            conn.commit()
+            conn.close()
+
+            ledger = SendLedger(str(path))
+            migrated = ledger.find_recent_sent("rq:v2:a", "", 24)
+            ledger.conn_main.execute("DELETE FROM last_sent;")
+            self.assertIsNone(ledger.find_recent_sent("rq:v2:a", "", 24))
+            rebuilt_rows = ledger.rebuild_last_sent()
+            rebuilt = ledger.find_recent_sent("rq:v2:zzz", "v1-a", 24)
+            ledger.close()
+
+        self.assertEqual(migrated["message_id"], "MID-2")
+        self.assertEqual(rebuilt_rows, 4)
+        self.assertEqual(rebuilt["message_id"], "MID-2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import datetime as dt
+from pathlib import Path
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import SendResult
+from scripts.main import QuoteRequestSkill
+from scripts.send_ledger import STATUS_UNKNOWN_SENT, SendLedger
+
+
+class _AuditStub:
+    def __init__(self) -> None:
+        self.execution_id = "run-new"
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+def _reserve(ledger: SendLedger, request_key: str, run_id: str, now=None, **kwargs):
+    return ledger.reserve_send(
+        request_key=request_key,
+        v1_key=f"v1-{request_key}",
+        key_version="v2",
+        run_id=run_id,
+        mail_key="mk",
+        recipient_hash="h",
+        idempotency_token="tok-" + request_key,
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        ttl_sec=60,
+        decision_trace=["reserve"],
+        now=now,
+        **kwargs,
+    )
+
+
+def _expires(ledger: SendLedger, request_key: str) -> str:
+    row = ledger.conn_main.execute(
+        "SELECT expires_at_utc FROM send_locks WHERE request_key = ?;", (request_key,)
+    ).fetchone()
+    return row[0] if row else ""
+
+
+class LeaseManagerTests(unittest.TestCase):
+    def test_background_thread_renews_held_locks_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=10)
+            _reserve(ledger, "rq:v2:held", "run-1", now=past)
+            _reserve(ledger, "rq:v2:other", "run-1", now=past)
+            held_before = _expires(ledger, "rq:v2:held")
+            other_before = _expires(ledger, "rq:v2:other")
+
+            lease = ledger.open_lease_manager(interval_sec=0.02, ttl_sec=120)
+            lease.hold("rq:v2:held", "run-1")
+            first = _expires(ledger, "rq:v2:held")
+            time.sleep(0.15)
+            second = _expires(ledger, "rq:v2:held")
+            other_after = _expires(ledger, "rq:v2:other")
+            lease.release("rq:v2:held")
+            lease.stop()
+            ledger.close()
+
+        self.assertGreater(first, held_before)
+        self.assertGreater(second, first)
+        self.assertEqual(other_after, other_before)
+
+    def test_lease_does_not_renew_lock_owned_by_another_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            _reserve(ledger, "rq:v2:a", "run-other")
+            before = _expires(ledger, "rq:v2:a")
+            lease = ledger.open_lease_manager(interval_sec=60, ttl_sec=600)
+            lease.hold("rq:v2:a", "run-mine")
+            after = _expires(ledger, "rq:v2:a")
+            lease.stop()
+            ledger.close()
+
+        self.assertEqual(before, after)
+
+    def test_expired_lock_is_taken_over_only_with_flag(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=10)
+            _reserve(ledger, "rq:v2:a", "run-crashed", now=past)
+            plain = _reserve(ledger, "rq:v2:a", "run-new")
+            taken = _reserve(ledger, "rq:v2:a", "run-new", takeover_expired=True)
+            owner = ledger.conn_main.execute(
+                "SELECT run_id FROM send_locks WHERE request_key = 'rq:v2:a';"
+            ).fetchone()[0]
+            ledger.close()
+
+        self.assertFalse(plain.acquired)
+        self.assertEqual(plain.reason, "in_progress_expired")
+        self.assertTrue(taken.acquired)
+        self.assertEqual(taken.reason, "acquired_expired_takeover")
+        self.assertEqual(taken.lock_row["run_id"], "run-crashed")
+        self.assertEqual(owner, "run-new")
+
+
+class SendBulkExpiredLockTests(unittest.TestCase):
+    def _run(self, reconcile_result):
+        store = {}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            "scripts.send_ledger.keyring.get_password",
+            side_effect=lambda service, key: store.get((service, key)),
+        ), mock.patch(
+            "scripts.send_ledger.keyring.set_password",
+            side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+        ):
+            skill = QuoteRequestSkill(config_path=str(SKILL_DIR / "config.json"))
+            skill.audit_logger = _AuditStub()
+            original_ledger = skill.send_ledger
+            skill.send_ledger = SendLedger(str(Path(tmp) / "send_ledger.sqlite3"))
+            original_ledger.close()
+            record = ContactRecord(company_name="A社", email="a@example.com", contact_name="A")
+            kwargs = dict(
+                records=[record],
+                subject="lease",
+                template_content="body",
+                product_name="P",
+                product_features="F",
+                product_url="https://example.com",
+                maker_code="LEASE-1",
+                input_file="lease.csv",
+            )
+
+            # 異常終了したプロセスが残した失効済みロックを再現する
+            prepared = skill._prepare_bulk_items(
+                records=[record],
+                subject="lease",
+                template_content="body",
+                product_name="P",
+                product_features="F",
+                product_url="https://example.com",
+                maker_name="",
+                maker_code="LEASE-1",
+                quantity="",
+                maker_code_norm=skill._normalize_maker_code("LEASE-1"),
+                canonical_input_url=skill._normalize_input_url("https://example.com"),
+                quantity_norm=skill._normalize_quantity(""),
+                subject_norm=skill._normalize_subject("lease"),
+                dedupe_key_version="v2",
+                idempotency_secret_version="v1",
+            )
+            past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=10)
+            _reserve(skill.send_ledger, prepared[0]["request_key"], "run-crashed", now=past)
+
+            reconcile_kwargs = (
+                {"side_effect": reconcile_result}
+                if isinstance(reconcile_result, Exception)
+                else {"return_value": reconcile_result}
+            )
+            with mock.patch.object(
+                skill.mail_sender, "reconcile_unknown_send", **reconcile_kwargs
+            ) as reconcile_mock, mock.patch.object(
+                skill.mail_sender,
+                "send_mail",
+                return_value=SendResult(
+                    success=True,
+                    email="a@example.com",
+                    company_name="A社",
+                    message_id="MID-NEW",
+                    sent_at=dt.datetime.now(),
+                ),
+            ) as send_mock:
+                result = skill.send_bulk(**kwargs)
+            self.reconcile_kwargs = reconcile_mock.call_args.kwargs
+            self.reserved_at = past
+            lock = dict(skill.send_ledger.conn_main.execute(
+                "SELECT * FROM send_locks WHERE request_key = ?;", (prepared[0]["request_key"],)
+            ).fetchone() or {})
+            skill.send_ledger.close()
+        return result, send_mock.call_count, lock
+
+    def test_expired_lock_checked_unsent_is_taken_over_and_sent(self):
+        result, sends, _ = self._run({"matched": False, "checked": True})
+        self.assertEqual(sends, 1)
+        self.assertEqual(result["results"][0]["action"], "sent")
+        self.assertIn("lease_takeover=true", result["results"][0]["decision_trace"])
+        # 件名+宛先の照合はロック確保時刻以降の送信に限る
+        self.assertEqual(self.reconcile_kwargs["sent_after"], self.reserved_at)
+        self.assertGreater(self.reconcile_kwargs["sent_before"], self.reserved_at)
+
+    def test_expired_lock_that_cannot_be_checked_becomes_unknown_sent(self):
+        # SMTP 経路・検索失敗・送信トレイ滞留はいずれも checked=False（照合例外も同じ扱い）
+        for reconcile in ({"matched": False}, {"matched": False, "checked": False}, RuntimeError("COM")):
+            with self.subTest(reconcile=reconcile):
+                result, sends, lock = self._run(reconcile)
+                self.assertEqual(sends, 0)
+                self.assertEqual(result["results"][0]["action"], "skip_unknown_sent_confirm_required")
+                self.assertNotIn("lease_takeover=true", result["results"][0]["decision_trace"])
+                self.assertEqual(lock["status"], STATUS_UNKNOWN_SENT)
+                self.assertEqual(lock["idempotency_token"], "tok-" + lock["request_key"])
+
+    def test_reconciled_expired_lock_is_not_sent_again(self):
+        result, sends, _ = self._run({"matched": True, "method": "sent_items", "message_id": "MID-OLD", "checked": True})
+        self.assertEqual(sends, 0)
+        self.assertEqual(result["results"][0]["action"], "skip_reconciled_sent")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import datetime as dt
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.ledger_archive import ZSTD_AVAILABLE
+from scripts.send_ledger import STATUS_SENT, SendLedger
+
+NOW = dt.datetime(2026, 5, 20, 12, 0, tzinfo=dt.timezone.utc)
+
+
+def _insert(ledger: SendLedger, request_key: str, created: dt.datetime) -> None:
+    ledger.conn_main.execute(
+        """
+        INSERT INTO send_events (created_at_utc, created_at_ms, request_key, v1_key, key_version, run_id, status, message_id)
+        VALUES (?, ?, ?, '', 'v2', 'r', ?, ?);
+        """,
+        (created.isoformat(), SendLedger._to_ms(created), request_key, STATUS_SENT, f"MID-{request_key}"),
+    )
+
+
+def _seed(ledger: SendLedger) -> None:
+    _insert(ledger, "rq:v2:mar", dt.datetime(2026, 3, 10, tzinfo=dt.timezone.utc))
+    _insert(ledger, "rq:v2:apr1", dt.datetime(2026, 4, 2, tzinfo=dt.timezone.utc))
+    _insert(ledger, "rq:v2:apr2", dt.datetime(2026, 4, 28, tzinfo=dt.timezone.utc))
+    _insert(ledger, "rq:v2:may", dt.datetime(2026, 5, 5, tzinfo=dt.timezone.utc))
+    _insert(ledger, "rq:v2:hot", NOW - dt.timedelta(hours=2))
+
+
+class LedgerArchiveTests(unittest.TestCase):
+    def _run(self, compress: bool):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive_dir = Path(tmp) / "archive"
+            ledger = SendLedger(
+                str(Path(tmp) / "ledger.sqlite3"),
+                retention_days=90,
+                sweep_chunk_size=1,
+                archive_dir=str(archive_dir),
+                archive_hot_days=7,
+                archive_compress=compress,
+            )
+            _seed(ledger)
+            before = [row["request_key"] for row in ledger.query_events()]
+            result = ledger.archive_events(rerun_window_hours=24, now=NOW)
+            hot = [
+                row[0]
+                for row in ledger.conn_main.execute("SELECT request_key FROM send_events ORDER BY id;")
+            ]
+            after = [row["request_key"] for row in ledger.query_events()]
+            april = [row["request_key"] for row in ledger.query_events(
+                start=dt.datetime(2026, 4, 1, tzinfo=dt.timezone.utc),
+                end=dt.datetime(2026, 5, 1, tzinfo=dt.timezone.utc),
+            )]
+            files = sorted(p.name for p in archive_dir.iterdir())
+
+            expired = ledger.archive_events(rerun_window_hours=24, now=NOW + dt.timedelta(days=62))
+            remaining = sorted(p.name for p in archive_dir.iterdir())
+            ledger.close()
+
+        self.assertEqual(result["moved"], {"202603": 1, "202604": 2, "202605": 1})
+        self.assertEqual(hot, ["rq:v2:hot"])
+        self.assertEqual(after, before)
+        self.assertEqual(april, ["rq:v2:apr1", "rq:v2:apr2"])
+        self.assertEqual(expired["expired"], ["202603"])
+        return files, remaining
+
+    def test_archive_moves_old_rows_and_expires_by_file(self):
+        files, remaining = self._run(compress=False)
+        self.assertEqual(
+            files,
+            ["send_events_202603.sqlite3", "send_events_202604.sqlite3", "send_events_202605.sqlite3"],
+        )
+        self.assertNotIn("send_events_202603.sqlite3", remaining)
+
+    @unittest.skipUnless(ZSTD_AVAILABLE, "zstandard not installed")
+    def test_sealed_months_are_compressed(self):
+        files, _ = self._run(compress=True)
+        self.assertEqual(
+            files,
+            [
+                "send_events_202603.sqlite3.zst",
+                "send_events_202604.sqlite3.zst",
+                "send_events_202605.sqlite3",
+            ],
+        )
+
+    def test_hot_window_never_shorter_than_rerun_window(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(
+                str(Path(tmp) / "ledger.sqlite3"),
+                archive_dir=str(Path(tmp) / "archive"),
+                archive_hot_days=1,
+            )
+            ledger.mark_sent(
+                request_key="rq:v2:recent",
+                v1_key="v1-recent",
+                key_version="v2",
+                run_id="r",
+                mail_key="mk",
+                recipient_hash="h",
+                message_id="MID-RECENT",
+                message_id_source="direct",
+                idempotency_token="t",
+                idempotency_secret_version="v1",
+                subject_norm="s",
+                decision_trace=["seed"],
+                sent_at=NOW - dt.timedelta(days=2),
+            )
+            ledger.archive_events(rerun_window_hours=72, now=NOW)
+            found = ledger.find_recent_sent("rq:v2:recent", "", 72, now=NOW)
+            ledger.close()
+
+        self.assertIsNotNone(found)
+
+
+if __name__ == "__main__":
+    unittest.main()
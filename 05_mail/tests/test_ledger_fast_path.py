@@ -0,0 +1,161 @@
+import datetime as dt
+import json
+from pathlib import Path
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import STATUS_SKIPPED_AUTO, SendLedger
+
+
+def _reserve(ledger: SendLedger, request_key: str, trace, now=None, ttl_sec: int = 300):
+    return ledger.reserve_send(
+        request_key=request_key,
+        v1_key=f"v1-{request_key}",
+        key_version="v2",
+        run_id="run-1",
+        mail_key="mk-1",
+        recipient_hash="h",
+        idempotency_token="t",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        ttl_sec=ttl_sec,
+        decision_trace=trace,
+        now=now,
+    )
+
+
+def _skip(ledger: SendLedger, request_key: str, trace) -> None:
+    ledger.mark_skipped(
+        request_key=request_key,
+        v1_key="",
+        key_version="v2",
+        run_id="run-1",
+        mail_key="mk-1",
+        recipient_hash="h",
+        idempotency_token="",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        status=STATUS_SKIPPED_AUTO,
+        decision_trace=trace,
+    )
+
+
+class LedgerFastPathTests(unittest.TestCase):
+    def test_trace_is_stored_as_codes_and_returned_as_json(self):
+        trace = ["request_key=rq:v2:a", "mail_key=mk-1", "reservation=acquired", "見積依頼"]
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            now = dt.datetime(2026, 5, 1, 12, 0, 0, 250000, tzinfo=dt.timezone.utc)
+            _reserve(ledger, "rq:v2:a", trace, now=now)
+            raw = ledger.conn_main.execute(
+                "SELECT decision_trace, decision_trace_codes, created_at_ms FROM send_events;"
+            ).fetchone()
+            events = ledger.query_events()
+            ledger.close()
+
+        self.assertIsNone(raw["decision_trace"])
+        self.assertTrue(raw["decision_trace_codes"].startswith("-1,-2,"))
+        self.assertEqual(raw["created_at_ms"], int(now.timestamp() * 1000))
+        self.assertEqual(events[0]["decision_trace"], json.dumps(trace, ensure_ascii=False))
+        self.assertNotIn("decision_trace_codes", events[0])
+        self.assertNotIn("created_at_ms", events[0])
+
+    def test_other_ledger_instance_decodes_codes_from_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "ledger.sqlite3")
+            writer = SendLedger(path)
+            reader = SendLedger(path)
+            _skip(writer, "rq:v2:a", ["rerun_detected", "override_applied:none"])
+            events = reader.query_events()
+            writer.close()
+            reader.close()
+
+        self.assertEqual(json.loads(events[0]["decision_trace"]), ["rerun_detected", "override_applied:none"])
+
+    def test_rolled_back_codes_are_not_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+
+            def op(conn: sqlite3.Connection) -> None:
+                conn.execute("BEGIN IMMEDIATE")
+                ledger._encode_trace(conn, ["only_in_rolled_back_txn"], "rq", "mk")
+                conn.execute("ROLLBACK")
+                raise ValueError("abort")
+
+            with self.assertRaises(ValueError):
+                ledger._with_retry(op, ledger.conn_main)
+            cached = "only_in_rolled_back_txn" in ledger._trace_codes
+            _skip(ledger, "rq:v2:a", ["only_in_rolled_back_txn"])
+            events = ledger.query_events()
+            ledger.close()
+
+        self.assertFalse(cached)
+        self.assertEqual(json.loads(events[0]["decision_trace"]), ["only_in_rolled_back_txn"])
+
+    def test_lock_expiry_uses_epoch_ms_and_is_hidden_from_lock_dict(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            start = dt.datetime(2026, 5, 1, 12, 0, tzinfo=dt.timezone.utc)
+            _reserve(ledger, "rq:v2:a", ["reserve"], now=start, ttl_sec=60)
+            active = _reserve(ledger, "rq:v2:a", ["reserve"], now=start + dt.timedelta(seconds=59))
+            expired = _reserve(ledger, "rq:v2:a", ["reserve"], now=start + dt.timedelta(seconds=60))
+            ledger.close()
+
+        self.assertEqual(active.reason, "in_progress_active")
+        self.assertEqual(expired.reason, "in_progress_expired")
+        self.assertNotIn("expires_at_ms", expired.lock_row)
+
+    def test_v3_ledger_is_backfilled_on_open(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            SendLedger(str(path)).close()
+            created = dt.datetime(2026, 4, 1, 9, 30, tzinfo=dt.timezone.utc)
+            expires = dt.datetime(2099, 1, 1, tzinfo=dt.timezone.utc)
+
+            # v4 列が無い旧台帳を模す
+            conn = sqlite3.connect(str(path))
+            conn.execute("DROP INDEX idx_send_events_created_ms;")
+            conn.execute("ALTER TABLE send_events DROP COLUMN created_at_ms;")
+            conn.execute("ALTER TABLE send_events DROP COLUMN decision_trace_codes;")
+            conn.execute("ALTER TABLE send_locks DROP COLUMN expires_at_ms;")
+            conn.execute("DROP TABLE trace_codes;")
+            conn.execute(
+                """
+                INSERT INTO send_events (created_at_utc, request_key, key_version, status, decision_trace)
+                VALUES (?, 'rq:v2:old', 'v2', 'SENT', ?);
+                """,
+                (created.isoformat(), json.dumps(["legacy"])),
+            )
+            conn.execute(
+                """
+                INSERT INTO send_locks (request_key, key_version, run_id, status, expires_at_utc, updated_at_utc)
+                VALUES ('rq:v2:lock', 'v2', 'run-0', 'IN_PROGRESS', ?, ?);
+                """,
+                (expires.isoformat(), created.isoformat()),
+            )
+            conn.execute("PRAGMA user_version = 3;")
+            conn.commit()
+            conn.close()
+
+            ledger = SendLedger(str(path))
+            event_ms = ledger.conn_main.execute("SELECT created_at_ms FROM send_events;").fetchone()[0]
+            lock_ms = ledger.conn_main.execute("SELECT expires_at_ms FROM send_locks;").fetchone()[0]
+            events = ledger.query_events()
+            conflict = _reserve(ledger, "rq:v2:lock", ["reserve"])
+            ledger.close()
+
+        self.assertEqual(event_ms, int(created.timestamp() * 1000))
+        self.assertEqual(lock_ms, int(expires.timestamp() * 1000))
+        self.assertEqual(events[0]["decision_trace"], json.dumps(["legacy"]))
+        self.assertEqual(conflict.reason, "in_progress_active")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+from pathlib import Path
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import STATUS_SKIPPED_AUTO, SendLedger
+
+
+def _skip(ledger: SendLedger, request_key: str) -> None:
+    ledger.mark_skipped(
+        request_key=request_key,
+        v1_key=f"v1-{request_key}",
+        key_version="v2",
+        run_id="run-1",
+        mail_key="mk",
+        recipient_hash="h",
+        idempotency_token="",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        status=STATUS_SKIPPED_AUTO,
+        decision_trace=["rerun_detected"],
+    )
+
+
+def _reserve(ledger: SendLedger, request_key: str, run_id: str):
+    return ledger.reserve_send(
+        request_key=request_key,
+        v1_key=f"v1-{request_key}",
+        key_version="v2",
+        run_id=run_id,
+        mail_key="mk",
+        recipient_hash="h",
+        idempotency_token="t",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        ttl_sec=300,
+        decision_trace=["reserve"],
+    )
+
+
+def _count(path: Path, status: str) -> int:
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM send_events WHERE status = ?;", (status,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+CRASH_SCRIPT = textwrap.dedent(
+    """
+    import os, sys
+    sys.path.insert(0, sys.argv[1])
+    from scripts.send_ledger import STATUS_SKIPPED_AUTO, SendLedger
+
+    ledger = SendLedger(sys.argv[2], group_commit_max_events=1000, group_commit_max_delay_ms=60000)
+    for i in range(5):
+        ledger.mark_skipped(
+            request_key=f"rq:v2:skip{i}", v1_key="", key_version="v2", run_id="run-1",
+            mail_key="mk", recipient_hash="h", idempotency_token="",
+            idempotency_secret_version="v1", subject_norm="s",
+            status=STATUS_SKIPPED_AUTO, decision_trace=["rerun_detected"],
+        )
+    ledger.reserve_send(
+        request_key="rq:v2:sent", v1_key="v1-sent", key_version="v2", run_id="run-1",
+        mail_key="mk", recipient_hash="h", idempotency_token="t",
+        idempotency_secret_version="v1", subject_norm="s", ttl_sec=300,
+        decision_trace=["reserve"],
+    )
+    ledger.mark_sent(
+        request_key="rq:v2:sent", v1_key="v1-sent", key_version="v2", run_id="run-1",
+        mail_key="mk", recipient_hash="h", message_id="MID-CRASH",
+        message_id_source="direct", idempotency_token="t",
+        idempotency_secret_version="v1", subject_norm="s", decision_trace=["sent"],
+    )
+    os._exit(1)
+    """
+)
+
+
+class LedgerGroupCommitTests(unittest.TestCase):
+    def test_skipped_events_are_coalesced_until_threshold(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            ledger = SendLedger(str(path), group_commit_max_events=3, group_commit_max_delay_ms=60000)
+            _skip(ledger, "rq:v2:a")
+            _skip(ledger, "rq:v2:b")
+            self.assertEqual(_count(path, STATUS_SKIPPED_AUTO), 0)
+            _skip(ledger, "rq:v2:c")
+            self.assertEqual(_count(path, STATUS_SKIPPED_AUTO), 3)
+            _skip(ledger, "rq:v2:d")
+            self.assertEqual(ledger.flush_pending_events(), 1)
+            self.assertEqual(_count(path, STATUS_SKIPPED_AUTO), 4)
+            ledger.close()
+
+    def test_max_delay_flushes_in_background(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            ledger = SendLedger(str(path), group_commit_max_events=1000, group_commit_max_delay_ms=50)
+            _skip(ledger, "rq:v2:a")
+            deadline = time.monotonic() + 5
+            while _count(path, STATUS_SKIPPED_AUTO) == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(_count(path, STATUS_SKIPPED_AUTO), 1)
+            ledger.close()
+
+    def test_failed_pre_send_releases_lock_before_next_reservation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(
+                str(Path(tmp) / "ledger.sqlite3"),
+                group_commit_max_events=1000,
+                group_commit_max_delay_ms=60000,
+            )
+            first = _reserve(ledger, "rq:v2:a", "run-1")
+            ledger.mark_failed_pre_send(
+                request_key="rq:v2:a",
+                v1_key="v1-a",
+                key_version="v2",
+                run_id="run-1",
+                mail_key="mk",
+                recipient_hash="h",
+                idempotency_token="t",
+                idempotency_secret_version="v1",
+                subject_norm="s",
+                decision_trace=["send_failed"],
+                error="boom",
+            )
+            second = _reserve(ledger, "rq:v2:a", "run-2")
+            ledger.close()
+
+        self.assertTrue(first.acquired)
+        self.assertTrue(second.acquired)
+
+    def test_sent_row_survives_crash_with_pending_skips(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            proc = subprocess.run(
+                [sys.executable, "-c", CRASH_SCRIPT, str(SKILL_DIR), str(path)],
+                capture_output=True,
+                text=True,
+                timeout=60,
+            )
+            self.assertEqual(proc.returncode, 1, proc.stderr)
+
+            ledger = SendLedger(str(path))
+            found = ledger.find_recent_sent("rq:v2:sent", "v1-sent", 24)
+            last_sent = ledger.conn_main.execute("SELECT COUNT(*) FROM last_sent;").fetchone()[0]
+            ledger.close()
+
+            self.assertEqual(found["message_id"], "MID-CRASH")
+            self.assertEqual(last_sent, 2)
+            # コミット前に落ちたスキップ行は失われてよい（再実行で再判定される）。
+            self.assertEqual(_count(path, STATUS_SKIPPED_AUTO), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import datetime as dt
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import STATUS_SENT, SWEEP_CURSOR_KEY, SendLedger
+
+
+def _insert_events(ledger: SendLedger, count: int, created: dt.datetime, prefix: str) -> None:
+    ledger.conn_main.executemany(
+        """
+        INSERT INTO send_events (created_at_utc, created_at_ms, request_key, v1_key, key_version, run_id, status)
+        VALUES (?, ?, ?, ?, 'v2', 'r', ?);
+        """,
+        [
+            (created.isoformat(), SendLedger._to_ms(created), f"{prefix}{i}", f"v1-{prefix}{i}", STATUS_SENT)
+            for i in range(count)
+        ],
+    )
+
+
+def _count(ledger: SendLedger) -> int:
+    return ledger.conn_main.execute("SELECT COUNT(*) FROM send_events;").fetchone()[0]
+
+
+class LedgerSweepTests(unittest.TestCase):
+    def test_sweep_is_bounded_and_resumes_from_saved_cursor(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"), retention_days=30)
+            now = dt.datetime.now(dt.timezone.utc)
+            _insert_events(ledger, 25, now - dt.timedelta(days=60), "old")
+            _insert_events(ledger, 5, now - dt.timedelta(days=1), "new")
+
+            first = ledger.sweep_retention(chunk_size=10, max_chunks=6, now=now)
+            cursor = ledger.conn_main.execute(
+                "SELECT value FROM ledger_meta WHERE key = ?;", (SWEEP_CURSOR_KEY,)
+            ).fetchone()[0]
+            self.assertEqual(first["complete"], 0)
+            self.assertEqual(first["send_events"], 20)
+            self.assertEqual(cursor, "20")
+            self.assertEqual(_count(ledger), 10)
+
+            second = ledger.sweep_retention(chunk_size=10, now=now)
+            self.assertEqual(second["complete"], 1)
+            self.assertEqual(second["send_events"], 5)
+            self.assertEqual(_count(ledger), 5)
+
+            # 期限内の行が残る範囲では位置を進めない
+            third = ledger.sweep_retention(chunk_size=10, now=now)
+            self.assertEqual(third["send_events"], 0)
+            ledger.close()
+
+    def test_batch_start_cleanup_removes_expired_locks_and_last_sent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"), retention_days=30)
+            now = dt.datetime.now(dt.timezone.utc)
+            ledger.mark_sent(
+                request_key="rq:v2:old",
+                v1_key="v1-old",
+                key_version="v2",
+                run_id="r",
+                mail_key="mk",
+                recipient_hash="h",
+                message_id="MID",
+                message_id_source="direct",
+                idempotency_token="t",
+                idempotency_secret_version="v1",
+                subject_norm="s",
+                decision_trace=["seed"],
+                sent_at=now - dt.timedelta(days=45),
+            )
+            ledger.conn_main.execute(
+                """
+                INSERT INTO send_locks (request_key, key_version, run_id, status, expires_at_utc, updated_at_utc)
+                VALUES ('rq:v2:stale', 'v2', 'r', 'IN_PROGRESS', ?, ?);
+                """,
+                ((now - dt.timedelta(days=3)).isoformat(), (now - dt.timedelta(days=3)).isoformat()),
+            )
+
+            stats = ledger.cleanup_on_batch_start(24, 1800, now=now)
+            remaining = {
+                table: ledger.conn_main.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+                for table in ("send_events", "last_sent", "send_locks")
+            }
+            ledger.close()
+
+        self.assertEqual(stats["complete"], 1)
+        self.assertEqual(remaining, {"send_events": 0, "last_sent": 0, "send_locks": 0})
+
+    def test_new_ledger_uses_incremental_auto_vacuum(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            mode = ledger.conn_main.execute("PRAGMA auto_vacuum;").fetchone()[0]
+            ledger.close()
+
+        self.assertEqual(mode, 2)
+
+    def test_query_events_window_uses_created_at_ms_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            now = dt.datetime.now(dt.timezone.utc)
+            _insert_events(ledger, 3, now - dt.timedelta(days=3), "old")
+            _insert_events(ledger, 2, now - dt.timedelta(hours=1), "new")
+            rows = ledger.query_events(start=now - dt.timedelta(days=1), end=now)
+            plan = ledger.conn_main.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM send_events WHERE created_at_ms >= ? AND created_at_ms < ?;",
+                (0, 1),
+            ).fetchall()
+            ledger.close()
+
+        self.assertEqual(sorted(r["request_key"] for r in rows), ["new0", "new1"])
+        self.assertIn("idx_send_events_created_ms", " ".join(str(row[3]) for row in plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,54 @@ SKILL_DIR = Path(__file__).resolve().parents[1]
 if str(SKILL_DIR) not in sys.path:
     sys.path.insert(0, str(SKILL_DIR))
 
-from scripts.mail_sender import OutlookMailSender
+from scripts.mail_sender import (
+    MESSAGE_ID_MODE_LOOKUP,
+    MESSAGE_ID_MODE_STAMPED,
+    OutlookMailSender,
+    build_stamped_message_id,
+)
+
+
+class _FakePropertyAccessor:
+    def __init__(self, fail_on_set: bool = False):
+        self.fail_on_set = fail_on_set
+        self.props = {}
+        self.after_send = {}
+
+    def SetProperty(self, name, value):
+        if self.fail_on_set:
+            raise Exception("property is read-only")
+        self.props[name] = value
+
+    def GetProperty(self, name):
+        return self.props.get(name, "")
+
+
+class _FakeMailItem:
+    def __init__(self, fail_on_set: bool = False):
+        self.PropertyAccessor = _FakePropertyAccessor(fail_on_set)
+        self.To = ""
+        self.Subject = ""
+        self.Body = ""
+        self.sent = False
+
+    def Send(self):
+        self.sent = True
+        # トランスポートが送信時に付与値を書き換える環境を模す
+        self.PropertyAccessor.props.update(self.PropertyAccessor.after_send)
+
+
+class _FakeOutlook:
+    def __init__(self, fail_on_set: bool = False, after_send=None):
+        self.fail_on_set = fail_on_set
+        self.after_send = dict(after_send or {})
+        self.items = []
+
+    def CreateItem(self, _kind):
+        item = _FakeMailItem(self.fail_on_set)
+        item.PropertyAccessor.after_send = self.after_send
+        self.items.append(item)
+        return item
 
 
 class MailSenderMessageIdTests(unittest.TestCase):
@@ -90,5 +137,67 @@ class MailSenderMessageIdTests(unittest.TestCase):
         self.assertEqual(source, "fallback")
 
 
+class StampedMessageIdTests(unittest.TestCase):
+    def _send(self, mode: str, outlook: _FakeOutlook, lookup_result=("<looked-up@example.com>", False, "direct")):
+        sender = OutlookMailSender(send_interval_sec=0, dry_run=False, message_id_mode=mode, message_id_domain="example.jp")
+        with mock.patch.object(sender, "_get_outlook", return_value=outlook), mock.patch.object(
+            sender,
+            "_get_message_id_with_source",
+            return_value=lookup_result,
+        ) as lookup:
+            result = sender.send_mail(
+                to="buyer@supplier.example",
+                subject="見積依頼",
+                body="本文",
+                idempotency_token="tok-1",
+                message_id_scope="run-1",
+            )
+        return result, lookup
+
+    def test_stamped_id_is_set_before_send_and_skips_lookup(self):
+        outlook = _FakeOutlook()
+        result, lookup = self._send(MESSAGE_ID_MODE_STAMPED, outlook)
+
+        expected = build_stamped_message_id("tok-1", scope="run-1", domain="example.jp")
+        self.assertTrue(result.success)
+        self.assertEqual(result.message_id, expected)
+        self.assertEqual(result.message_id_source, "stamped")
+        self.assertFalse(result.is_fallback_id)
+        self.assertEqual(outlook.items[0].PropertyAccessor.props[OutlookMailSender.MESSAGE_ID_PROPERTY], expected)
+        lookup.assert_not_called()
+
+    def test_stamp_failure_falls_back_to_lookup_chain(self):
+        result, lookup = self._send(MESSAGE_ID_MODE_STAMPED, _FakeOutlook(fail_on_set=True))
+
+        self.assertEqual(result.message_id, "<looked-up@example.com>")
+        self.assertEqual(result.message_id_source, "direct")
+        lookup.assert_called_once()
+
+    def test_stamped_id_rewritten_on_send_falls_back_to_lookup_chain(self):
+        outlook = _FakeOutlook(after_send={OutlookMailSender.MESSAGE_ID_PROPERTY: "<server@example.com>"})
+        result, lookup = self._send(MESSAGE_ID_MODE_STAMPED, outlook)
+
+        self.assertEqual(result.message_id, "<looked-up@example.com>")
+        self.assertEqual(result.message_id_source, "direct")
+        lookup.assert_called_once()
+
+    def test_lookup_mode_keeps_original_chain(self):
+        outlook = _FakeOutlook()
+        result, lookup = self._send(MESSAGE_ID_MODE_LOOKUP, outlook)
+
+        self.assertEqual(result.message_id_source, "direct")
+        self.assertNotIn(OutlookMailSender.MESSAGE_ID_PROPERTY, outlook.items[0].PropertyAccessor.props)
+        lookup.assert_called_once()
+
+    def test_stamped_id_is_deterministic_per_token_and_scope(self):
+        first = build_stamped_message_id("tok-1", scope="run-1", domain="example.jp")
+        again = build_stamped_message_id("tok-1", scope="run-1", domain="example.jp")
+        other_run = build_stamped_message_id("tok-1", scope="run-2", domain="example.jp")
+
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other_run)
+        self.assertRegex(first, r"^<[0-9a-f]{40}@example\.jp>$")
+
+
 if __name__ == "__main__":
     unittest.main()
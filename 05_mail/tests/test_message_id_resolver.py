@@ -0,0 +1,245 @@
+import datetime as dt
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import (
+    MESSAGE_ID_MODE_LOOKUP,
+    MESSAGE_ID_MODE_STAMPED,
+    MessageIdResolver,
+    OutlookMailSender,
+    PendingMessageIdLookup,
+    SendResult,
+)
+from scripts.main import QuoteRequestSkill
+from scripts.send_ledger import SendLedger
+
+
+class _AuditStub:
+    def __init__(self) -> None:
+        self.execution_id = "run-async"
+        self.audited = []
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        self.audited = [(r["message_id"], r["message_id_source"]) for r in results]
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+class _FakePropertyAccessor:
+    def __init__(self):
+        self.props = {}
+
+    def SetProperty(self, name, value):
+        self.props[name] = value
+
+    def GetProperty(self, name):
+        return self.props.get(name, "")
+
+
+class _FakeMailItem:
+    def __init__(self):
+        self.PropertyAccessor = _FakePropertyAccessor()
+        self.To = ""
+        self.Subject = ""
+        self.Body = ""
+
+    def Send(self):
+        pass
+
+
+class _FakeOutlook:
+    def CreateItem(self, _kind):
+        return _FakeMailItem()
+
+
+def _async_sender(mode: str = MESSAGE_ID_MODE_LOOKUP) -> OutlookMailSender:
+    return OutlookMailSender(send_interval_sec=0, message_id_mode=mode, async_message_id=True)
+
+
+class MessageIdResolverTests(unittest.TestCase):
+    def test_send_returns_provisional_id_and_resolver_fills_it_in(self):
+        sender = _async_sender()
+        release = threading.Event()
+        resolved = []
+
+        def slow_poll(**_kwargs):
+            release.wait(5)
+            return "<direct@example.com>"
+
+        with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook()), mock.patch.object(
+            sender, "_poll_message_id_from_mail_item", side_effect=slow_poll
+        ), mock.patch.object(sender, "_get_message_id_from_sent_items", return_value=""):
+            result = sender.send_mail(to="a@example.com", subject="s", body="b", idempotency_token="tok")
+            resolver = MessageIdResolver(sender)
+            ticket = resolver.submit(result.pending_lookup, resolved.append)
+            # 取得待ちの間も送信側はブロックされない
+            self.assertFalse(resolver.drain(0.05))
+            release.set()
+            self.assertTrue(resolver.drain(5))
+            resolver.close()
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.message_id_source, "pending")
+        self.assertTrue(result.is_fallback_id)
+        self.assertTrue(ticket.done)
+        self.assertEqual(ticket.message_id, "<direct@example.com>")
+        self.assertEqual(ticket.message_id_source, "direct")
+        self.assertFalse(ticket.is_fallback_id)
+        self.assertEqual(resolved, [ticket])
+
+    def test_unresolved_lookup_keeps_provisional_id_as_fallback(self):
+        sender = _async_sender()
+        with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook()), mock.patch.object(
+            sender, "_poll_message_id_from_mail_item", return_value=""
+        ), mock.patch.object(sender, "_get_message_id_from_sent_items", return_value=""):
+            result = sender.send_mail(to="a@example.com", subject="s", body="b")
+            resolver = MessageIdResolver(sender)
+            ticket = resolver.submit(result.pending_lookup)
+            self.assertTrue(resolver.drain(5))
+            resolver.close()
+
+        self.assertEqual(ticket.message_id, result.message_id)
+        self.assertEqual(ticket.message_id_source, "fallback")
+        self.assertTrue(ticket.is_fallback_id)
+
+    def test_stamped_id_is_only_replaced_when_sent_items_disagree(self):
+        sender = _async_sender(MESSAGE_ID_MODE_STAMPED)
+        with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook()), mock.patch.object(
+            sender, "_poll_message_id_from_mail_item"
+        ) as poll, mock.patch.object(sender, "_get_message_id_from_sent_items", return_value="<rewritten@example.com>"):
+            result = sender.send_mail(to="a@example.com", subject="s", body="b", idempotency_token="tok")
+            resolver = MessageIdResolver(sender)
+            ticket = resolver.submit(result.pending_lookup)
+            self.assertTrue(resolver.drain(5))
+            resolver.close()
+
+        poll.assert_not_called()
+        self.assertEqual(result.message_id_source, "stamped")
+        self.assertEqual(ticket.message_id, "<rewritten@example.com>")
+        self.assertEqual(ticket.message_id_source, "sent_items")
+
+    def test_sync_mode_has_no_pending_lookup(self):
+        sender = OutlookMailSender(send_interval_sec=0, message_id_mode=MESSAGE_ID_MODE_LOOKUP)
+        with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook()), mock.patch.object(
+            sender, "_get_message_id_with_source", return_value=("<direct@example.com>", False, "direct")
+        ):
+            result = sender.send_mail(to="a@example.com", subject="s", body="b")
+
+        self.assertIsNone(result.pending_lookup)
+        self.assertEqual(result.message_id_source, "direct")
+
+
+class LedgerMessageIdUpdateTests(unittest.TestCase):
+    def test_update_replaces_provisional_id_in_events_and_unknown_lock(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            common = dict(
+                v1_key="",
+                key_version="v2",
+                run_id="run-1",
+                mail_key="mk",
+                recipient_hash="h",
+                idempotency_token="t",
+                idempotency_secret_version="v1",
+                subject_norm="s",
+                decision_trace=["x"],
+            )
+            ledger.mark_sent(request_key="rq:a", message_id="<fallback-a>", message_id_source="pending", **common)
+            ledger.mark_unknown_sent(
+                request_key="rq:b",
+                error="commit failed",
+                hold_sec=600,
+                message_id="<fallback-b>",
+                message_id_source="pending",
+                **common,
+            )
+            updated_a = ledger.update_sent_message_id("rq:a", "run-1", "<fallback-a>", "<real-a>", "direct")
+            updated_b = ledger.update_sent_message_id("rq:b", "run-1", "<fallback-b>", "<real-b>", "sent_items")
+            other_run = ledger.update_sent_message_id("rq:a", "run-2", "<real-a>", "<x>", "direct")
+            events = {e["request_key"]: e for e in ledger.query_events()}
+            lock = ledger.get_unknown_lock("rq:b")
+            ledger.close()
+
+        self.assertEqual(updated_a, 1)
+        self.assertEqual(updated_b, 2)
+        self.assertEqual(other_run, 0)
+        self.assertEqual((events["rq:a"]["message_id"], events["rq:a"]["message_id_source"]), ("<real-a>", "direct"))
+        self.assertEqual(events["rq:b"]["message_id"], "<real-b>")
+        self.assertEqual((lock["last_message_id"], lock["last_message_id_source"]), ("<real-b>", "sent_items"))
+
+
+class SendBulkAsyncMessageIdTests(unittest.TestCase):
+    def test_resolved_id_reaches_ledger_and_audit_log(self):
+        store = {}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            "scripts.send_ledger.keyring.get_password",
+            side_effect=lambda service, key: store.get((service, key)),
+        ), mock.patch(
+            "scripts.send_ledger.keyring.set_password",
+            side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+        ):
+            skill = QuoteRequestSkill(config_path=str(SKILL_DIR / "config.json"))
+            audit = _AuditStub()
+            skill.audit_logger = audit
+            original_ledger = skill.send_ledger
+            skill.send_ledger = SendLedger(str(Path(tmp) / "send_ledger.sqlite3"))
+            original_ledger.close()
+            now = dt.datetime.now()
+            pending = PendingMessageIdLookup(_FakeMailItem(), "async", "a@example.com", now, "<fallback>")
+
+            with mock.patch.object(
+                skill.mail_sender,
+                "send_mail",
+                return_value=SendResult(
+                    success=True,
+                    email="a@example.com",
+                    company_name="A社",
+                    message_id="<fallback>",
+                    is_fallback_id=True,
+                    message_id_source="pending",
+                    sent_at=now,
+                    pending_lookup=pending,
+                ),
+            ), mock.patch.object(
+                skill.mail_sender, "_poll_message_id_from_mail_item", return_value="<real@example.com>"
+            ):
+                result = skill.send_bulk(
+                    records=[ContactRecord(company_name="A社", email="a@example.com", contact_name="A")],
+                    subject="async",
+                    template_content="body",
+                    product_name="P",
+                    product_features="F",
+                    product_url="https://example.com",
+                    maker_code="ASYNC-1",
+                    input_file="async.csv",
+                )
+            events = skill.send_ledger.query_events(status="SENT")
+            skill.send_ledger.close()
+
+        row = result["results"][0]
+        self.assertEqual((row["message_id"], row["message_id_source"]), ("<real@example.com>", "direct"))
+        self.assertFalse(row["is_fallback_id"])
+        self.assertEqual(audit.audited, [("<real@example.com>", "direct")])
+        self.assertEqual(events[0]["message_id"], "<real@example.com>")
+
+
+if __name__ == "__main__":
+    unittest.main()
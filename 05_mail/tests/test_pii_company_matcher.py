@@ -0,0 +1,71 @@
+from pathlib import Path
+import random
+import sys
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.pii_detector import AHOCORASICK_AVAILABLE, CompanyNameMatcher, PIIDetector
+
+
+def _naive(names, text):
+    return [name for name in names if name and name in text]
+
+
+class CompanyNameMatcherTests(unittest.TestCase):
+    def _backends(self):
+        backends = [False]
+        if AHOCORASICK_AVAILABLE:
+            backends.append(True)
+        return backends
+
+    def test_overlapping_and_nested_names_match_naive_scan(self):
+        names = {"ABC", "BC", "ABCD", "C", "株式会社A", "A", "", "セルジェンテック株式会社", "テック"}
+        texts = ["xxABCDyy", "BCBC", "御社 株式会社A 様", "セルジェンテック株式会社の見積", "", "none"]
+        for accelerated in self._backends():
+            matcher = CompanyNameMatcher(names, accelerated=accelerated)
+            self.assertEqual(matcher.accelerated, accelerated)
+            for text in texts:
+                self.assertEqual(matcher.find(text), _naive(names, text), (accelerated, text))
+
+    def test_random_names_match_naive_scan(self):
+        rng = random.Random(24)
+        alphabet = "abc株社"
+        for _ in range(200):
+            names = {"".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4))) for _ in range(rng.randint(0, 15))}
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            for accelerated in self._backends():
+                matcher = CompanyNameMatcher(names, accelerated=accelerated)
+                self.assertEqual(matcher.find(text), _naive(names, text), (names, text))
+
+    def test_detector_rebuilds_only_when_names_change(self):
+        detector = PIIDetector({"A社"})
+        self.assertEqual(detector.detect("A社とB社").companies_found, ["A社"])
+        matcher = detector._company_matcher
+        detector.set_company_names({"A社"})
+        self.assertIs(detector._company_matcher, matcher)
+        detector.set_company_names({"A社", "B社"})
+        self.assertEqual(sorted(detector.detect("A社とB社").companies_found), ["A社", "B社"])
+        detector.company_names = {"C社"}
+        result = detector.detect("C社")
+        self.assertTrue(result.has_warning_pii)
+        self.assertEqual(result.companies_found, ["C社"])
+
+    def test_detector_notices_in_place_changes_of_the_same_size(self):
+        names = {"foo", "bar"}
+        detector = PIIDetector(names)
+        self.assertEqual(detector.detect("foo here").companies_found, ["foo"])
+        detector.company_names.discard("foo")
+        detector.company_names.add("baz")
+        self.assertEqual(detector.detect("baz here").companies_found, ["baz"])
+        self.assertEqual(detector.detect("foo here").companies_found, [])
+        names.discard("baz")
+        names.add("qux")
+        self.assertEqual([r.companies_found for r in detector.detect_many(["qux", "baz"])], [["qux"], []])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from pathlib import Path
+import random
+import re
+import sys
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.pii_detector import PIIDetector
+
+
+def _legacy_parts(text):
+    """従来の3回走査（メール findall、電話 findall + re.sub、会社名は別途）"""
+    emails = PIIDetector.EMAIL_PATTERN.findall(text)
+    phones = [
+        candidate
+        for candidate in PIIDetector.PHONE_PATTERN.findall(text)
+        if len(re.sub(r"\D", "", candidate)) >= 10
+    ]
+    return emails, phones
+
+
+class CombinedScannerTests(unittest.TestCase):
+    def setUp(self):
+        self.detector = PIIDetector({"A社", "セルジェンテック株式会社"})
+
+    def assertMatchesLegacy(self, text, result):
+        emails, phones = _legacy_parts(text)
+        self.assertEqual(result.emails_found, emails, repr(text))
+        self.assertEqual(result.phones_found, phones, repr(text))
+        self.assertEqual(result.has_blocking_pii, bool(emails or phones), repr(text))
+
+    def test_overlapping_email_and_phone_candidates(self):
+        texts = [
+            "連絡先 test@example.com 03-1234-5678 で確認",
+            "03-1234-5678-abc@example.com",
+            "user0312345678@example.com",
+            "03 1234 5678abc@x.com",
+            "(03) 1234-5678 / 090 1234 5678",
+            "０３１２３４５６７８９",
+            "TEST@EXAMPLE.COM ſ@example.com",
+            "細胞培養用プレートの見積依頼",
+            "",
+        ]
+        for text in texts:
+            self.assertMatchesLegacy(text, self.detector.detect(text))
+
+    def test_scan_lookahead_covers_every_possible_match_start(self):
+        pattern = PIIDetector.SCAN_PATTERN.pattern
+        lookahead = re.compile(pattern[: pattern.index(")") + 1])
+        starts = re.compile(r"[a-zA-Z0-9._%+-]|\d", re.IGNORECASE)
+        missing = [hex(code) for code in range(0x110000) if starts.match(chr(code)) and not lookahead.match(chr(code))]
+        self.assertEqual(missing, [])
+
+    def test_detect_many_matches_per_text_legacy_scan(self):
+        rng = random.Random(25)
+        alphabet = ["0", "1", "5", "９", "-", " ", "(", ")", "@", ".", "a", "Z", "com", "jp", "A社", "\n", "\x00"]
+        texts = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(500)]
+        results = self.detector.detect_many(texts)
+        self.assertEqual(len(results), len(texts))
+        for text, result in zip(texts, results):
+            self.assertMatchesLegacy(text, result)
+            self.assertEqual(result.companies_found, ["A社"] if "A社" in text else [])
+            self.assertEqual(result.message, self.detector._generate_message(result))
+        self.assertEqual(self.detector.detect_many([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import datetime as dt
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SendLedger
+
+
+class _KeyringPatch:
+    def __init__(self):
+        self._store = {}
+        self._patchers = []
+
+    def __enter__(self):
+        self._patchers = [
+            mock.patch(
+                "scripts.send_ledger.keyring.get_password",
+                side_effect=lambda service, key: self._store.get((service, key)),
+            ),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, val: self._store.__setitem__((service, key), val),
+            ),
+        ]
+        for p in self._patchers:
+            p.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for p in reversed(self._patchers):
+            p.stop()
+
+
+def _seed(ledger: SendLedger) -> None:
+    now = dt.datetime.now(dt.timezone.utc)
+    ledger.add_override(
+        kind="request_key",
+        target_hash="rq:v2:override",
+        ttl_min=30,
+        reason="r",
+        operator="op",
+        host="h",
+        command_summary_redacted="c",
+    )
+    ledger.add_override(
+        kind="recipient",
+        target_hash="hash-expired",
+        ttl_min=1,
+        reason="r",
+        operator="op",
+        host="h",
+        command_summary_redacted="c",
+        now=now - dt.timedelta(hours=2),
+    )
+    ledger.mark_sent(
+        request_key="rq:v2:sent",
+        v1_key="v1-sent",
+        key_version="v2",
+        run_id="prev",
+        mail_key="mk",
+        recipient_hash="hash-sent",
+        message_id="MID-SENT",
+        message_id_source="direct",
+        idempotency_token="t",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        decision_trace=["seed"],
+        sent_at=now - dt.timedelta(hours=1),
+    )
+    ledger.append_entry(
+        dedupe_key="v1-legacy",
+        recipient="x@example.com",
+        message_id="MID-LEGACY",
+        run_id="legacy",
+        sent_at=now - dt.timedelta(hours=2),
+    )
+    ledger.mark_unknown_sent(
+        request_key="rq:v2:unknown",
+        v1_key="v1-unknown",
+        key_version="v2",
+        run_id="prev",
+        mail_key="mk",
+        recipient_hash="hash-unknown",
+        idempotency_token="t",
+        idempotency_secret_version="v1",
+        subject_norm="s",
+        decision_trace=["seed"],
+        error="commit failed",
+        hold_sec=1800,
+    )
+
+
+class PrecheckBatchTests(unittest.TestCase):
+    KEYS = [
+        ("rq:v2:override", "v1-a", "hash-a"),
+        ("rq:v2:other", "v1-b", "hash-expired"),
+        ("rq:v2:sent", "v1-c", "hash-c"),
+        ("rq:v2:legacy", "v1-legacy", "hash-d"),
+        ("rq:v2:unknown", "v1-unknown", "hash-unknown"),
+        ("rq:v2:fresh", "v1-fresh", "hash-fresh"),
+    ]
+
+    def test_batch_matches_per_key_evaluation(self):
+        with _KeyringPatch():
+            with tempfile.TemporaryDirectory() as tmp:
+                ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+                _seed(ledger)
+
+                decisions = ledger.precheck_batch(
+                    request_keys=[k[0] for k in self.KEYS],
+                    v1_keys=[k[1] for k in self.KEYS],
+                    recipient_hashes=[k[2] for k in self.KEYS],
+                    window_hours=24,
+                )
+                for request_key, v1_key, recipient_hash in self.KEYS:
+                    decision = decisions[request_key]
+                    expected = ledger.evaluate_override(request_key, recipient_hash)
+                    self.assertEqual(decision.override.trace, expected.trace)
+                    self.assertEqual(decision.override.allowed, expected.allowed)
+                    self.assertEqual(decision.unknown_lock, ledger.get_unknown_lock(request_key))
+                    self.assertEqual(
+                        decision.recent_sent,
+                        ledger.find_recent_sent(request_key, v1_key, 24),
+                    )
+
+                self.assertIn("override_applied:request_key", decisions["rq:v2:override"].override.trace)
+                self.assertIn(
+                    "override_check:recipient=expired_or_inactive",
+                    decisions["rq:v2:other"].override.trace,
+                )
+                self.assertEqual(decisions["rq:v2:sent"].recent_sent["message_id"], "MID-SENT")
+                self.assertEqual(decisions["rq:v2:legacy"].recent_sent["message_id"], "MID-LEGACY")
+                self.assertIsNotNone(decisions["rq:v2:unknown"].unknown_lock)
+                self.assertIsNone(decisions["rq:v2:fresh"].recent_sent)
+                ledger.close()
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with _KeyringPatch():
+            with tempfile.TemporaryDirectory() as tmp:
+                ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+                _seed(ledger)
+
+                def count_selects(size: int) -> int:
+                    statements = []
+                    ledger.conn_main.set_trace_callback(statements.append)
+                    try:
+                        ledger.precheck_batch(
+                            request_keys=[f"rq:v2:{i}" for i in range(size)],
+                            v1_keys=[f"v1-{i}" for i in range(size)],
+                            recipient_hashes=[f"hash-{i}" for i in range(size)],
+                            window_hours=24,
+                            run_id="run-1",
+                        )
+                    finally:
+                        ledger.conn_main.set_trace_callback(None)
+                    return sum(1 for sql in statements if sql.lstrip().upper().startswith("SELECT"))
+
+                small = count_selects(3)
+                self.assertGreater(small, 0)
+                self.assertEqual(small, count_selects(300))
+                ledger.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
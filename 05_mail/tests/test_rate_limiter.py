@@ -0,0 +1,119 @@
+from pathlib import Path
+import sys
+import threading
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.mail_sender import OutlookMailSender, SendRateLimiter, TokenBucket
+
+
+class _SimClock:
+    """sleep で時刻だけを進める模擬時計。"""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def __call__(self) -> float:
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+def _limiter(clock: _SimClock, **kwargs) -> SendRateLimiter:
+    return SendRateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def _send_times(limiter: SendRateLimiter, clock: _SimClock, recipients):
+    times = []
+    for recipient in recipients:
+        limiter.acquire(recipient)
+        times.append(round(clock() - 1000.0, 6))
+    return times
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_steady_rate(self):
+        bucket = TokenBucket(rate_per_min=60, burst=3, now=0.0)
+        starts = []
+        for _ in range(5):
+            at = bucket.ready_at(0.0)
+            bucket.take(at)
+            starts.append(at)
+        self.assertEqual(starts, [0.0, 0.0, 0.0, 1.0, 2.0])
+
+    def test_idle_time_refills_up_to_capacity_only(self):
+        bucket = TokenBucket(rate_per_min=60, burst=2, now=0.0)
+        bucket.take(0.0)
+        bucket.take(0.0)
+        self.assertEqual(bucket.ready_at(100.0), 100.0)
+        self.assertEqual(bucket.tokens, 2.0)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate_per_min=0)
+
+
+class SendRateLimiterTests(unittest.TestCase):
+    def test_global_rate_paces_every_mail(self):
+        clock = _SimClock()
+        limiter = _limiter(clock, global_per_min=20)
+        times = _send_times(limiter, clock, ["a@x.example", "b@y.example", "c@z.example"])
+        self.assertEqual(times, [0.0, 3.0, 6.0])
+
+    def test_per_domain_rate_lets_other_domains_go_first(self):
+        clock = _SimClock()
+        limiter = _limiter(clock, global_per_min=60, per_domain_per_min=20)
+        times = _send_times(
+            limiter,
+            clock,
+            ["a@x.example", "b@y.example", "c@X.example", "d@z.example"],
+        )
+        # x 宛ての2通目は 3 秒後まで待つ。別ドメインは全体の 1 通/秒だけで進む。
+        self.assertEqual(times, [0.0, 1.0, 3.0, 4.0])
+
+    def test_reservations_from_threads_do_not_block_other_domains(self):
+        clock = _SimClock()
+        limiter = _limiter(clock, per_domain_per_min=6)
+        starts = {}
+
+        def reserve(recipient):
+            starts.setdefault(recipient.split("@")[1], []).append(limiter.reserve(recipient) - 1000.0)
+
+        threads = [
+            threading.Thread(target=reserve, args=(f"u{i}@{domain}",))
+            for i in range(3)
+            for domain in ("x.example", "y.example")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(starts["x.example"]), [0.0, 10.0, 20.0])
+        self.assertEqual(sorted(starts["y.example"]), [0.0, 10.0, 20.0])
+
+    def test_disabled_limiter_is_ignored_by_sender(self):
+        sender = OutlookMailSender(send_interval_sec=0, rate_limiter=SendRateLimiter())
+        self.assertIsNone(sender.rate_limiter)
+
+    def test_sender_uses_limiter_instead_of_fixed_interval(self):
+        clock = _SimClock()
+        limiter = _limiter(clock, per_domain_per_min=30)
+        sender = OutlookMailSender(send_interval_sec=60, dry_run=True, rate_limiter=limiter)
+        for recipient in ("a@x.example", "b@y.example", "c@x.example"):
+            self.assertTrue(sender.send_mail(to=recipient, subject="s", body="b").success)
+        self.assertEqual(clock.sleeps, [2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
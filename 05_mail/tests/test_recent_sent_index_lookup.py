@@ -0,0 +1,138 @@
+import datetime as dt
+from pathlib import Path
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SCHEMA_VERSION, SendLedger
+
+
+LEGACY_SCHEMA = [
+    """
+    CREATE TABLE send_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at_utc TEXT NOT NULL,
+        request_key TEXT NOT NULL,
+        v1_key TEXT,
+        key_version TEXT NOT NULL,
+        mail_key TEXT,
+        run_id TEXT,
+        status TEXT NOT NULL,
+        recipient_hash TEXT,
+        message_id TEXT,
+        message_id_source TEXT,
+        idempotency_token TEXT,
+        idempotency_secret_version TEXT,
+        sent_at_utc TEXT,
+        subject_norm TEXT,
+        decision_trace TEXT,
+        error TEXT
+    );
+    """,
+    "CREATE INDEX idx_send_events_rt ON send_events(request_key, status, created_at_utc);",
+    "CREATE INDEX idx_send_events_v1 ON send_events(v1_key);",
+]
+
+
+def _index_names(path: Path):
+    conn = sqlite3.connect(str(path))
+    try:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='send_events';"
+        ).fetchall()
+        return {row[0] for row in rows}
+    finally:
+        conn.close()
+
+
+class RecentSentIndexLookupTests(unittest.TestCase):
+    def test_existing_ledger_is_migrated_and_keeps_history(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ledger.sqlite3"
+            sent_at = dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=1)
+            conn = sqlite3.connect(str(path))
+            for sql in LEGACY_SCHEMA:
+                conn.execute(sql)
+            conn.execute(
+                """
+                INSERT INTO send_events (created_at_utc, request_key, v1_key, key_version, run_id, status, message_id)
+                VALUES (?, 'rq:v2:old', 'v1-old', 'v2', 'legacy', 'SENT', 'MID-OLD');
+                """,
+                (sent_at.isoformat(),),
+            )
+            conn.commit()
+            conn.close()
+
+            ledger = SendLedger(str(path))
+            version = ledger.conn_main.execute("PRAGMA user_version;").fetchone()[0]
+            self.assertEqual(version, SCHEMA_VERSION)
+            found = ledger.find_recent_sent("rq:v2:new", "v1-old", 24)
+            ledger.close()
+
+            self.assertIsNotNone(found)
+            self.assertEqual(found["message_id"], "MID-OLD")
+            indexes = _index_names(path)
+            self.assertIn("idx_send_events_sent_rk", indexes)
+            self.assertIn("idx_send_events_sent_v1", indexes)
+            self.assertNotIn("idx_send_events_rt", indexes)
+            self.assertIn("idx_send_events_created_ms", indexes)
+
+    def test_lookup_plans_use_covering_indexes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            for column in ("request_key", "v1_key"):
+                plan = ledger.conn_main.execute(
+                    f"""
+                    EXPLAIN QUERY PLAN
+                    SELECT created_at_utc, id
+                      FROM send_events
+                     WHERE status = ? AND {column} = ? AND created_at_utc >= ?
+                     ORDER BY created_at_utc DESC LIMIT 1;
+                    """,
+                    ("SENT", "k", "2000-01-01"),
+                ).fetchall()
+                detail = " ".join(str(row[3]) for row in plan)
+                self.assertIn("COVERING INDEX", detail)
+            ledger.close()
+
+    def test_newest_match_across_request_key_and_v1_key_wins(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            now = dt.datetime.now(dt.timezone.utc)
+            for key, v1, mid, age in (
+                ("rq:v2:a", "v1-x", "MID-RK", 3),
+                ("rq:v2:b", "v1-a", "MID-V1", 1),
+            ):
+                ledger.mark_sent(
+                    request_key=key,
+                    v1_key=v1,
+                    key_version="v2",
+                    run_id="r",
+                    mail_key="mk",
+                    recipient_hash="h",
+                    message_id=mid,
+                    message_id_source="direct",
+                    idempotency_token="t",
+                    idempotency_secret_version="v1",
+                    subject_norm="s",
+                    decision_trace=["seed"],
+                    sent_at=now - dt.timedelta(hours=age),
+                )
+            found = ledger.find_recent_sent("rq:v2:a", "v1-a", 24)
+            scoped = ledger.find_recent_sent("rq:v2:a", "v1-a", 24, run_id="other")
+            expired = ledger.find_recent_sent("rq:v2:a", "v1-a", 2, now=now + dt.timedelta(hours=2))
+            ledger.close()
+
+        self.assertEqual(found["message_id"], "MID-V1")
+        self.assertIsNone(scoped)
+        self.assertIsNone(expired)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import datetime as dt
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import SendResult
+from scripts.main import EXIT_CODE_INVALID_INPUT, QuoteRequestSkill
+from scripts.send_ledger import RUN_STATUS_COMPLETED, RUN_STATUS_RUNNING, STATUS_IN_PROGRESS
+
+
+class _AuditStub:
+    def __init__(self, execution_id: str) -> None:
+        self.execution_id = execution_id
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+class _Crash(Exception):
+    pass
+
+
+class _CrashingSender:
+    """crash_after 通目を送った直後に例外で止まる偽送信器（送信済みトークンを覚えておく）。"""
+
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.sent = []
+        self.tokens = set()
+        self.batch_calls = 0
+
+    def send_mail(self, to, subject, body, company_name="", html_body=None,
+                  idempotency_token="", body_reconcile_marker="", message_id_scope=""):
+        self.sent.append(to)
+        self.tokens.add(idempotency_token)
+        if self.crash_after is not None and len(self.sent) == self.crash_after:
+            raise _Crash(to)
+        return SendResult(
+            success=True,
+            email=to,
+            company_name=company_name,
+            message_id=f"<{idempotency_token[:16]}@fake>",
+            message_id_source="direct",
+            sent_at=dt.datetime.now(dt.timezone.utc),
+        )
+
+    def reconcile_unknown_send(self, token="", **kwargs):
+        raise AssertionError("resume must reconcile in-flight locks in one batch")
+
+    def reconcile_unknown_batch(self, locks):
+        self.batch_calls += 1
+        return {
+            lock["request_key"]: {
+                "matched": lock["token"] in self.tokens,
+                "method": "fake",
+                "message_id": "<m@fake>",
+                "checked": True,
+            }
+            for lock in locks
+        }
+
+    def close(self):
+        pass
+
+
+def _records(count: int):
+    return [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@example.com", contact_name=f"担当{i}")
+        for i in range(count)
+    ]
+
+
+class RunResumeTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+        config.update({
+            "ledger_sqlite_path": str(tmp / "ledger.sqlite3"),
+            "max_recipients": 100,
+            "send_interval_sec": 0,
+            "rerun_policy_default": "auto_skip",
+            "run_checkpoint_every": 2,
+        })
+        self.config_path = tmp / "config.json"
+        self.config_path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        store = {}
+        patches = [
+            mock.patch(
+                "scripts.send_ledger.keyring.get_password",
+                side_effect=lambda service, key: store.get((service, key)),
+            ),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+            ),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+    def _skill(self, sender, run_id="run-1"):
+        skill = QuoteRequestSkill(config_path=str(self.config_path))
+        skill.audit_logger = _AuditStub(run_id)
+        skill.mail_sender = sender
+        self.addCleanup(skill.send_ledger.close)
+        return skill
+
+    def _send(self, skill, records, resume_run_id=None, template="{{会社名}} 御中"):
+        return skill.send_bulk(
+            records=records,
+            subject="再開",
+            template_content=template,
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="RESUME-1",
+            input_file="resume.csv",
+            resume_run_id=resume_run_id,
+        )
+
+    def _backdate_locks(self, skill, seconds: int) -> None:
+        past = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=seconds)).isoformat()
+        skill.send_ledger.conn_main.execute("UPDATE send_locks SET updated_at_utc = ?;", (past,))
+
+    def test_resume_continues_after_checkpoint_and_batch_reconciles_in_flight(self):
+        records = _records(10)
+        crashed = _CrashingSender(crash_after=7)
+        first = self._skill(crashed)
+        with self.assertRaises(_Crash):
+            self._send(first, records)
+        manifest = first.send_ledger.get_run_manifest("run-1")
+        self.assertEqual(manifest["status"], RUN_STATUS_RUNNING)
+        self.assertEqual(manifest["high_water"], 5)
+        in_progress = first.send_ledger.conn_main.execute(
+            "SELECT COUNT(*) FROM send_locks WHERE status = ?;", (STATUS_IN_PROGRESS,)
+        ).fetchone()[0]
+        self.assertEqual(in_progress, 1)
+
+        resumed = _CrashingSender()
+        resumed.tokens = set(crashed.tokens)
+        second = self._skill(resumed, run_id="fresh-run")
+
+        # 元プロセスのロックがまだ延長されているうちは再開しない
+        refused = self._send(second, records, resume_run_id="run-1")
+        self.assertFalse(refused["success"])
+        self.assertEqual(refused["exit_code"], EXIT_CODE_INVALID_INPUT)
+        self.assertEqual(resumed.sent, [])
+
+        self._backdate_locks(second, 600)
+        result = self._send(second, records, resume_run_id="run-1")
+
+        self.assertEqual(result["run_id"], "run-1")
+        self.assertEqual(result["resumed_from"], 6)
+        self.assertEqual([r["email"] for r in result["results"]], [r.email for r in records[6:]])
+        self.assertEqual(result["results"][0]["action"], "skip_reconciled_sent")
+        self.assertEqual([r["action"] for r in result["results"][1:]], ["sent"] * 3)
+        self.assertEqual(resumed.sent, [r.email for r in records[7:]])
+        self.assertEqual(resumed.batch_calls, 1)
+        self.assertEqual(second.send_ledger.get_run_manifest("run-1")["status"], RUN_STATUS_COMPLETED)
+
+        again = self._send(second, records, resume_run_id="run-1")
+        self.assertFalse(again["success"])
+
+    def test_resume_holds_in_flight_lock_as_unknown_when_it_cannot_be_checked(self):
+        records = _records(4)
+        first = self._skill(_CrashingSender(crash_after=3))
+        with self.assertRaises(_Crash):
+            self._send(first, records)
+
+        resumed = _CrashingSender()
+        resumed.reconcile_unknown_batch = lambda locks: {
+            lock["request_key"]: {"matched": False, "method": "", "message_id": "", "checked": False}
+            for lock in locks
+        }
+        second = self._skill(resumed, run_id="fresh-run")
+        self._backdate_locks(second, 600)
+        result = self._send(second, records, resume_run_id="run-1")
+
+        self.assertEqual(result["results"][0]["email"], records[2].email)
+        self.assertEqual(result["results"][0]["action"], "skip_unknown_sent_confirm_required")
+        self.assertEqual(resumed.sent, [records[3].email])
+        unknown = [lock["request_key"] for lock in second.send_ledger.list_unknown_locks(run_id="run-1")]
+        self.assertEqual(unknown, [result["results"][0]["request_key"]])
+
+    def test_resume_rejects_changed_recipient_list(self):
+        records = _records(4)
+        first = self._skill(_CrashingSender(crash_after=3))
+        with self.assertRaises(_Crash):
+            self._send(first, records)
+
+        sender = _CrashingSender()
+        second = self._skill(sender)
+        self._backdate_locks(second, 600)
+        changed = self._send(second, list(reversed(records)), resume_run_id="run-1")
+        self.assertFalse(changed["success"])
+        self.assertEqual(changed["exit_code"], EXIT_CODE_INVALID_INPUT)
+        other_body = self._send(second, records, resume_run_id="run-1", template="{{会社名}} 様")
+        self.assertFalse(other_body["success"])
+        missing = self._send(second, records, resume_run_id="no-such-run")
+        self.assertFalse(missing["success"])
+        self.assertEqual(sender.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import hashlib
+import hmac
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.send_ledger import SendLedger
+
+
+class _KeyringPatch:
+    def __init__(self):
+        self._store = {}
+        self._patchers = []
+        self.get_calls = 0
+
+    def _get(self, service, key):
+        self.get_calls += 1
+        return self._store.get((service, key))
+
+    def __enter__(self):
+        self._patchers = [
+            mock.patch("scripts.send_ledger.keyring.get_password", side_effect=self._get),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, val: self._store.__setitem__((service, key), val),
+            ),
+        ]
+        for p in self._patchers:
+            p.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for p in reversed(self._patchers):
+            p.stop()
+
+
+class SecretCacheTests(unittest.TestCase):
+    def test_keyring_is_read_once_per_secret(self):
+        with _KeyringPatch() as kr:
+            with tempfile.TemporaryDirectory() as tmp:
+                ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+                for i in range(50):
+                    ledger.hash_recipient(f"user{i}@example.com")
+                    token = ledger.build_idempotency_token(f"rq:v2:{i}", "v2")
+                    self.assertTrue(ledger.verify_idempotency_token(f"rq:v2:{i}", token, "v2"))
+                    self.assertFalse(ledger.verify_idempotency_token(f"rq:v2:{i}", "deadbeef", "v2"))
+                ledger.close()
+
+        # recipient salt / v2 / v1 の3件のみ
+        self.assertEqual(kr.get_calls, 3)
+
+    def test_cached_digests_match_uncached_computation(self):
+        with _KeyringPatch() as kr:
+            with tempfile.TemporaryDirectory() as tmp:
+                ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+                first_hash = ledger.hash_recipient("a@example.com")
+                first_token = ledger.build_idempotency_token("rq:v2:a", "v1")
+                ledger.hash_recipient("b@example.com")
+                ledger.build_idempotency_token("rq:v2:b", "v1")
+                second_hash = ledger.hash_recipient("a@example.com")
+                second_token = ledger.build_idempotency_token("rq:v2:a", "v1")
+                ledger.close()
+
+            salt = kr._store[(ledger.credential_service, "recipient_hash_salt_v1")]
+            secret = kr._store[(ledger.credential_service, "idempotency_secret_v1")]
+
+        expected_hash = hashlib.sha256(f"{salt}:a@example.com".encode("utf-8")).hexdigest()
+        expected_token = hmac.new(secret.encode("utf-8"), b"rq:v2:a", hashlib.sha256).hexdigest()
+        self.assertEqual(first_hash, expected_hash)
+        self.assertEqual(second_hash, expected_hash)
+        self.assertEqual(first_token, expected_token)
+        self.assertEqual(second_token, expected_token)
+
+    def test_invalidate_picks_up_rotated_secret(self):
+        with _KeyringPatch() as kr:
+            with tempfile.TemporaryDirectory() as tmp:
+                ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+                before = ledger.build_idempotency_token("rq:v2:a", "v1")
+                kr._store[(ledger.credential_service, "idempotency_secret_v1")] = "rotated"
+                stale = ledger.build_idempotency_token("rq:v2:a", "v1")
+                ledger.invalidate_secret_cache("idempotency_secret_v1")
+                after = ledger.build_idempotency_token("rq:v2:a", "v1")
+                ledger.close()
+
+        self.assertEqual(before, stale)
+        self.assertNotEqual(before, after)
+        self.assertEqual(after, hmac.new(b"rotated", b"rq:v2:a", hashlib.sha256).hexdigest())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import csv
+import datetime as dt
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.audit_logger import AuditLogger
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import SendResult
+from scripts.main import QuoteRequestSkill
+from scripts.send_ledger import RUN_STATUS_COMPLETED
+
+
+class _DummyEncryptionManager:
+    def encrypt(self, value: str) -> str:
+        return f"enc:v1:{value}"
+
+
+class _FakeSender:
+    def __init__(self, fail_emails=()):
+        self.fail_emails = set(fail_emails)
+        self.sent = []
+
+    def send_mail(self, to, subject, body, company_name="", html_body=None,
+                  idempotency_token="", body_reconcile_marker="", message_id_scope=""):
+        self.sent.append(to)
+        if to in self.fail_emails:
+            return SendResult(success=False, email=to, company_name=company_name, error="rejected")
+        return SendResult(
+            success=True,
+            email=to,
+            company_name=company_name,
+            message_id=f"<{len(self.sent)}@fake>",
+            message_id_source="direct",
+            sent_at=dt.datetime.now(dt.timezone.utc),
+        )
+
+    def close(self):
+        pass
+
+
+def _records():
+    records = [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@example.com", contact_name=f"担当{i}")
+        for i in range(7)
+    ]
+    # 別区間に入る実行内重複
+    records.append(ContactRecord(company_name="会社1", email="user1@example.com", contact_name="担当1"))
+    return records
+
+
+class SendBulkStreamingTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        store = {}
+        patches = [
+            mock.patch(
+                "scripts.send_ledger.keyring.get_password",
+                side_effect=lambda service, key: store.get((service, key)),
+            ),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+            ),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _skill(self, name: str, sender):
+        tmp = Path(self._tmp.name) / name
+        tmp.mkdir()
+        config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+        config.update({
+            "ledger_sqlite_path": str(tmp / "ledger.sqlite3"),
+            "max_recipients": 100,
+            "send_interval_sec": 0,
+            "rerun_policy_default": "auto_skip",
+            "stream_window_size": 3,
+        })
+        config_path = tmp / "config.json"
+        config_path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+        skill = QuoteRequestSkill(config_path=str(config_path))
+        skill.audit_logger = AuditLogger(str(tmp / "logs"), _DummyEncryptionManager())
+        skill.mail_sender = sender
+        self.addCleanup(skill.send_ledger.close)
+        return skill
+
+    def _send(self, skill, stream_results):
+        return skill.send_bulk(
+            records=_records(),
+            subject="逐次",
+            template_content="{{会社名}} 御中",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="STREAM-1",
+            input_file="stream.csv",
+            stream_results=stream_results,
+        )
+
+    @staticmethod
+    def _csv_column(path: str, column: int):
+        with open(path, encoding="utf-8", newline="") as f:
+            return [row[column] for row in csv.reader(f)]
+
+    @staticmethod
+    def _audit(path: str):
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        details = [(d["company_name"], d["success"]) for d in data["details"]]
+        counts = (data["total_count"], data["success_count"], data["failure_count"])
+        return counts, details, data["errors"]
+
+    def test_streamed_artifacts_match_buffered_run(self):
+        buffered_sender = _FakeSender(fail_emails={"user4@example.com"})
+        streamed_sender = _FakeSender(fail_emails={"user4@example.com"})
+        buffered = self._send(self._skill("buffered", buffered_sender), stream_results=False)
+        streaming_skill = self._skill("streamed", streamed_sender)
+        streamed = self._send(streaming_skill, stream_results=True)
+
+        self.assertEqual(streamed["results"], [])
+        self.assertEqual(len(buffered["results"]), 8)
+        self.assertEqual(buffered["results"][-1]["action"], "skip_duplicate_in_run")
+        for key in (
+            "success",
+            "total",
+            "attempted_count",
+            "success_count",
+            "failure_count",
+            "skipped_duplicate_count",
+            "exit_code",
+        ):
+            self.assertEqual(streamed[key], buffered[key], key)
+        self.assertEqual(streamed["skipped_duplicate_count"], 1)
+        self.assertEqual(streamed_sender.sent, buffered_sender.sent)
+
+        self.assertEqual(self._audit(streamed["audit_log_path"]), self._audit(buffered["audit_log_path"]))
+        self.assertEqual(
+            self._csv_column(streamed["sent_list_path"], 0),
+            self._csv_column(buffered["sent_list_path"], 0),
+        )
+        self.assertTrue(streamed["unsent_list_path"])
+        self.assertEqual(
+            self._csv_column(streamed["unsent_list_path"], 0),
+            self._csv_column(buffered["unsent_list_path"], 0),
+        )
+        self.assertEqual(streamed["screen_output"].splitlines()[:3], buffered["screen_output"].splitlines()[:3])
+        manifest = streaming_skill.send_ledger.get_run_manifest(streamed["run_id"])
+        self.assertEqual(manifest["status"], RUN_STATUS_COMPLETED)
+        self.assertEqual(manifest["total"], 8)
+        self.assertEqual(list(Path(streamed["audit_log_path"]).parent.glob("*.part")), [])
+
+    def test_iter_send_bulk_yields_rows_in_order_from_unsized_source(self):
+        skill = self._skill("iter", _FakeSender())
+        stream = skill.iter_send_bulk(
+            iter(_records()),
+            subject="逐次",
+            template_content="{{会社名}} 御中",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="STREAM-1",
+            input_file="stream.csv",
+            total=8,
+        )
+        rows = []
+        while True:
+            try:
+                rows.append(next(stream))
+            except StopIteration as done:
+                summary = done.value
+                break
+        self.assertEqual([r["email"] for r in rows], [r.email for r in _records()])
+        self.assertEqual([r["action"] for r in rows][-1], "skip_duplicate_in_run")
+        self.assertEqual(summary["total"], 8)
+        self.assertEqual(summary["success_count"], 7)
+        self.assertEqual(summary["results"], [])
+
+        missing_total = skill.iter_send_bulk(
+            iter(_records()),
+            subject="逐次",
+            template_content="{{会社名}} 御中",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="STREAM-1",
+        )
+        with self.assertRaises(StopIteration) as stopped:
+            next(missing_total)
+        self.assertFalse(stopped.exception.value["success"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.main import QuoteRequestSkill
+from scripts.mail_sender import OutgoingMail, SmtpTransport
+from scripts.smtp_sink import SmtpSink
+
+
+class _AuditStub:
+    def __init__(self, run_id: str) -> None:
+        self.execution_id = run_id
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+def _write_config(tmp: Path, sink: SmtpSink, concurrency: int) -> str:
+    host, port = sink.address
+    config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+    config.update({
+        "ledger_sqlite_path": str(tmp / f"ledger-{concurrency}.sqlite3"),
+        "max_recipients": 500,
+        "send_interval_sec": 0,
+        "rerun_policy_default": "auto_skip",
+        "mail_transport": "smtp",
+        "send_concurrency": concurrency,
+        "send_prepare_workers": concurrency,
+    })
+    config["smtp"] = dict(config["smtp"], host=host, port=port, from_address="quote@example.jp")
+    path = tmp / f"config-{concurrency}.json"
+    path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def _records(count: int):
+    records = [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@supplier{i % 3}.example", contact_name=f"担当{i}")
+        for i in range(count)
+    ]
+    records.append(ContactRecord(company_name="重複", email="user2@supplier2.example", contact_name="重複"))
+    records.append(ContactRecord(company_name="拒否", email="bad@supplier0.example", contact_name="拒否"))
+    return records
+
+
+def _run(tmp: Path, sink: SmtpSink, concurrency: int, records, prepare=None, inspect=None):
+    store = {}
+    with mock.patch(
+        "scripts.send_ledger.keyring.get_password",
+        side_effect=lambda service, key: store.get((service, key)),
+    ), mock.patch(
+        "scripts.send_ledger.keyring.set_password",
+        side_effect=lambda service, key, value: store.__setitem__((service, key), value),
+    ):
+        skill = QuoteRequestSkill(config_path=_write_config(tmp, sink, concurrency))
+        skill.audit_logger = _AuditStub(f"run-{concurrency}")
+        if prepare is not None:
+            prepare(skill)
+        try:
+            result = skill.send_bulk(
+                records=records,
+                subject="並行送信",
+                template_content="{{会社名}} 御中",
+                product_name="P",
+                product_features="F",
+                product_url="https://example.com/p",
+                maker_code="PIPE-1",
+                input_file="pipe.csv",
+            )
+            if inspect is not None:
+                inspect(skill)
+            return result
+        finally:
+            skill.mail_sender.close()
+            skill.send_ledger.close()
+
+
+class SendPipelineTests(unittest.TestCase):
+    def test_concurrent_send_keeps_result_order_and_schema(self):
+        records = _records(24)
+        with tempfile.TemporaryDirectory() as tmp, SmtpSink(reject_recipients=["bad@supplier0.example"]) as sink:
+            sequential = _run(Path(tmp), sink, 1, records)
+            sequential_received = sink.received
+            concurrent = _run(Path(tmp), sink, 4, records)
+
+        def shape(result):
+            return [(r["email"], r["action"], r["success"], sorted(r)) for r in result["results"]]
+
+        self.assertEqual(shape(concurrent), shape(sequential))
+        self.assertEqual(concurrent["warnings"], sequential["warnings"])
+        self.assertEqual(concurrent["success_count"], 24)
+        self.assertEqual(concurrent["skipped_duplicate_count"], 1)
+        self.assertEqual(sink.received, sequential_received * 2)
+
+    def test_exception_in_one_send_worker_finalizes_every_inflight_row(self):
+        records = _records(24)
+        failing = "user5@supplier2.example"
+        lock_rows = []
+
+        def prepare(skill):
+            original = skill.mail_sender.send_mail
+
+            def send_mail(**kwargs):
+                if kwargs["to"] == failing:
+                    raise RuntimeError("COM error after Send()")
+                return original(**kwargs)
+
+            skill.mail_sender.send_mail = send_mail
+
+        def inspect(skill):
+            lock_rows.extend(
+                tuple(row) for row in skill.send_ledger.conn_main.execute("SELECT request_key, status FROM send_locks;")
+            )
+
+        with tempfile.TemporaryDirectory() as tmp, SmtpSink(reject_recipients=["bad@supplier0.example"]) as sink:
+            result = _run(Path(tmp), sink, 4, records, prepare=prepare, inspect=inspect)
+            received = sink.received
+
+        self.assertEqual([r["email"] for r in result["results"]], [r.email for r in records])
+        self.assertTrue(all(result["results"]))
+        failed = next(r for r in result["results"] if r["email"] == failing)
+        self.assertEqual(failed["action"], "unknown_sent_pending")
+        self.assertTrue(failed["confirmation_required"])
+        self.assertEqual(result["success_count"], 23)
+        self.assertEqual(received, 23)
+        self.assertEqual([status for _, status in lock_rows], ["UNKNOWN_SENT"])
+        self.assertEqual(lock_rows[0][0], failed["request_key"])
+
+    def test_smtp_transport_lends_at_most_max_connections(self):
+        with SmtpSink() as sink:
+            host, port = sink.address
+            transport = SmtpTransport(host=host, port=port, from_address="q@example.jp", max_connections=2)
+            active = []
+            peak = []
+            lock = threading.Lock()
+            original = transport._transaction
+
+            def slow_transaction(smtp, to, payload):
+                with lock:
+                    active.append(to)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                try:
+                    original(smtp, to, payload)
+                finally:
+                    with lock:
+                        active.remove(to)
+
+            transport._transaction = slow_transaction
+            threads = [
+                threading.Thread(
+                    target=transport.deliver,
+                    args=(OutgoingMail(f"u{i}@x.example", "s", "b", None, ""),),
+                )
+                for i in range(6)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            transport.close()
+
+        self.assertEqual(sink.received, 6)
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(sink.connections, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
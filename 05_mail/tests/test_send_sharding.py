@@ -0,0 +1,256 @@
+import datetime as dt
+import functools
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.mail_sender import SendRateLimiter, SendResult
+from scripts.main import QuoteRequestSkill
+from scripts.send_sharding import _run_shard, _shard_rate_limits, partition
+
+
+class _AuditStub:
+    def __init__(self, execution_id: str) -> None:
+        self.execution_id = execution_id
+        self.audit_calls = 0
+
+    def write_audit_log(self, input_file, results, product_info=None):
+        self.audit_calls += 1
+        return "audit.json"
+
+    def write_sent_list(self, results):
+        return "sent.csv"
+
+    def write_unsent_list(self, results):
+        return "unsent.csv"
+
+    def format_screen_output(self, results):
+        return "screen"
+
+
+class _FileLogSender:
+    """送信内容をプロセス共有のファイルへ追記する偽送信器。"""
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+
+    def send_mail(self, to, subject, body, company_name="", html_body=None,
+                  idempotency_token="", body_reconcile_marker="", message_id_scope=""):
+        time.sleep(0.005)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(f"{to}\t{os.getpid()}\n")
+        return SendResult(
+            success=True,
+            email=to,
+            company_name=company_name,
+            message_id=f"<{idempotency_token[:16]}.{os.getpid()}@fake>",
+            message_id_source="direct",
+            sent_at=dt.datetime.now(dt.timezone.utc),
+        )
+
+    def reconcile_unknown_send(self, **kwargs):
+        return {"matched": False, "checked": True}
+
+
+def _build_worker_skill(config_path: str, log_path: str) -> QuoteRequestSkill:
+    skill = QuoteRequestSkill(config_path=config_path)
+    skill.mail_sender = _FileLogSender(log_path)
+    return skill
+
+
+def _write_config(tmp: Path, workers: int) -> str:
+    config = json.loads((SKILL_DIR / "config.json").read_text(encoding="utf-8"))
+    config.update({
+        "ledger_sqlite_path": str(tmp / "send_ledger.sqlite3"),
+        "send_shard_workers": workers,
+        "max_recipients": 500,
+        "send_interval_sec": 0,
+        "rerun_policy_default": "auto_skip",
+    })
+    path = tmp / "config.json"
+    path.write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def _records(count: int):
+    records = [
+        ContactRecord(company_name=f"会社{i}", email=f"user{i}@example.com", contact_name=f"担当{i}")
+        for i in range(count)
+    ]
+    # 実行内重複（同一キーは同じワーカーに入る）
+    records.append(ContactRecord(company_name="重複", email="user3@example.com", contact_name="重複"))
+    return records
+
+
+class _KeyringPatch:
+    def __init__(self):
+        self._store = {}
+        self._patchers = []
+
+    def __enter__(self):
+        self._patchers = [
+            mock.patch(
+                "scripts.send_ledger.keyring.get_password",
+                side_effect=lambda service, key: self._store.get((service, key)),
+            ),
+            mock.patch(
+                "scripts.send_ledger.keyring.set_password",
+                side_effect=lambda service, key, val: self._store.__setitem__((service, key), val),
+            ),
+        ]
+        for p in self._patchers:
+            p.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for p in reversed(self._patchers):
+            p.stop()
+
+
+class SendShardingTests(unittest.TestCase):
+    def _skill(self, config_path: str, log_path: str, run_id: str) -> QuoteRequestSkill:
+        skill = QuoteRequestSkill(config_path=config_path)
+        skill.audit_logger = _AuditStub(run_id)
+        skill.shard_skill_factory = functools.partial(_build_worker_skill, config_path, log_path)
+        return skill
+
+    @staticmethod
+    def _send(skill: QuoteRequestSkill, records):
+        return skill.send_bulk(
+            records=records,
+            subject="分割送信",
+            template_content="{{会社名}} 御中",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com/p",
+            maker_code="SHARD-1",
+            input_file="shard.csv",
+        )
+
+    def test_partition_keeps_same_key_on_one_shard(self):
+        items = [{"request_key": f"rq:v2:{i % 7}", "index": i} for i in range(50)]
+        shards = partition(items, 3)
+        owner = {}
+        for n, shard in enumerate(shards):
+            for item in shard:
+                owner.setdefault(item["request_key"], n)
+                self.assertEqual(owner[item["request_key"]], n)
+        self.assertEqual(sum(len(s) for s in shards), 50)
+
+    def test_rate_limited_partition_keeps_each_domain_on_one_shard(self):
+        items = [
+            {"request_key": f"rq:v2:{i}", "index": i,
+             "record": ContactRecord(company_name=f"会社{i}", email=f"u{i}@Supplier{i % 4}.example")}
+            for i in range(40)
+        ]
+        owner = {}
+        shards = partition(items, 3, by_domain=True)
+        for n, shard in enumerate(shards):
+            for item in shard:
+                domain = item["record"].email.rsplit("@", 1)[-1].lower()
+                self.assertEqual(owner.setdefault(domain, n), n)
+        self.assertEqual(sum(len(s) for s in shards), 40)
+
+    def test_workers_split_the_global_rate_budget(self):
+        limiter = SendRateLimiter(global_per_min=60, per_domain_per_min=6, burst=2)
+        self.assertIsNone(_shard_rate_limits(None, 3))
+        self.assertIsNone(_shard_rate_limits(SendRateLimiter(), 3))
+        limits = _shard_rate_limits(limiter, 3)
+        self.assertEqual(limits, {"global_per_min": 20.0, "per_domain_per_min": 6.0, "burst": 2})
+
+        worker = mock.Mock()
+        worker.mail_sender = mock.Mock(rate_limiter=limiter, dry_run=False)
+        worker._execute_prepared.return_value = {"results": []}
+        _run_shard(lambda: worker, {}, [], False, limits)
+        applied = worker.mail_sender.rate_limiter
+        self.assertEqual((applied.global_per_min, applied.per_domain_per_min, applied.burst), (20.0, 6.0, 2))
+
+    def test_sharded_run_merges_results_in_record_order(self):
+        with _KeyringPatch(), tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            log_path = str(tmp_path / "sent.log")
+            skill = self._skill(_write_config(tmp_path, 3), log_path, "run-merge")
+            records = _records(12)
+            result = self._send(skill, records)
+            skill.send_ledger.close()
+            sent_lines = Path(log_path).read_text(encoding="utf-8").splitlines()
+
+        self.assertEqual([r["email"] for r in result["results"]], [r.email for r in records])
+        self.assertEqual(result["success_count"], 12)
+        self.assertEqual(result["skipped_duplicate_count"], 1)
+        self.assertEqual(result["results"][-1]["action"], "skip_duplicate_in_run")
+        self.assertEqual(skill.audit_logger.audit_calls, 1)
+        self.assertEqual(len(sent_lines), 12)
+        self.assertGreater(len({line.split("\t")[1] for line in sent_lines}), 1)
+
+    def test_concurrent_sharded_runs_never_double_send(self):
+        with _KeyringPatch(), tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            log_path = str(tmp_path / "sent.log")
+            config_path = _write_config(tmp_path, 3)
+            records = _records(30)
+            skills = [self._skill(config_path, log_path, f"run-{n}") for n in range(3)]
+            outputs = [None] * len(skills)
+
+            def run(n: int) -> None:
+                outputs[n] = self._send(skills[n], records)
+
+            threads = [threading.Thread(target=run, args=(n,)) for n in range(len(skills))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=300)
+            for skill in skills:
+                skill.send_ledger.close()
+            sent = [line.split("\t")[0] for line in Path(log_path).read_text(encoding="utf-8").splitlines()]
+
+        self.assertTrue(all(out is not None for out in outputs))
+        self.assertEqual(len(sent), 30)
+        self.assertEqual(len(set(sent)), 30)
+        self.assertEqual(sum(out["success_count"] for out in outputs), 30)
+        for out in outputs:
+            self.assertEqual([r["email"] for r in out["results"]], [r.email for r in records])
+
+    def test_default_workers_inherit_parent_runtime_settings(self):
+        with _KeyringPatch(), tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            skill = QuoteRequestSkill(config_path=_write_config(tmp_path, 3))
+            skill.audit_logger = _AuditStub("run-dry")
+            # 設定ファイルは実送信のまま、親だけ実行時にドライランへ切り替える
+            skill.mail_sender.dry_run = True
+            records = _records(6)[:-1]
+            result = self._send(skill, records)
+            skill.send_ledger.close()
+
+        self.assertEqual(result["success_count"], 6)
+        self.assertEqual({r["message_id_source"] for r in result["results"]}, {"dry_run"})
+
+    def test_replaced_sender_without_factory_is_not_sharded(self):
+        with _KeyringPatch(), tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            log_path = str(tmp_path / "sent.log")
+            skill = QuoteRequestSkill(config_path=_write_config(tmp_path, 3))
+            skill.audit_logger = _AuditStub("run-inline")
+            skill.mail_sender = _FileLogSender(log_path)
+            result = self._send(skill, _records(6)[:-1])
+            skill.send_ledger.close()
+            pids = {line.split("\t")[1] for line in Path(log_path).read_text(encoding="utf-8").splitlines()}
+
+        self.assertEqual(result["success_count"], 6)
+        self.assertEqual(pids, {str(os.getpid())})
+
+
+if __name__ == "__main__":
+    unittest.main()
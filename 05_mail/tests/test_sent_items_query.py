@@ -0,0 +1,383 @@
+import contextlib
+import datetime as dt
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+import types
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts import mail_sender as mail_sender_module
+from scripts.mail_sender import OutlookMailSender
+from scripts.send_ledger import SendLedger
+from scripts.sent_items_query import (
+    PROP_HTML_BODY,
+    PROP_IDEMPOTENCY_KEY,
+    PROP_MESSAGE_ID,
+    PROP_SENT_ON,
+    PROP_SUBJECT,
+    PROP_TEXT_BODY,
+    PROP_TRANSPORT_HEADERS,
+    SentItemsQuery,
+    build_filter,
+)
+
+
+class _FakeSentItem:
+    """送信済みアイテム。テーブル経由の検索ではプロパティを直接読まれないことを確認する。"""
+
+    def __init__(self, entry_id, subject, sent_on, to, message_id="", headers="", body="", token=""):
+        self.values = {
+            "EntryID": entry_id,
+            "Subject": subject,
+            "SentOn": sent_on,
+            "To": to,
+            PROP_MESSAGE_ID: message_id,
+            PROP_IDEMPOTENCY_KEY: token,
+            PROP_SUBJECT: subject,
+            PROP_SENT_ON: sent_on,
+            PROP_TRANSPORT_HEADERS: headers,
+            PROP_TEXT_BODY: body,
+            PROP_HTML_BODY: "",
+        }
+
+    def __getattr__(self, name):
+        raise AssertionError(f"item property read: {name}")
+
+
+def _like(value, pattern):
+    needle = pattern.strip("%").lower()
+    return needle in str(value or "").lower()
+
+
+def _compare(value, op, literal):
+    if isinstance(value, dt.datetime):
+        # アイテムの SentOn はローカル時刻、DASL のリテラルは UTC として比較する（Outlook と同じ）。
+        literal_ts = dt.datetime.strptime(literal, "%Y/%m/%d %H:%M").replace(tzinfo=dt.timezone.utc)
+        value = value.astimezone(dt.timezone.utc)
+        return value >= literal_ts if op == ">=" else value <= literal_ts
+    if op == "LIKE":
+        return _like(value, literal)
+    return str(value or "").strip() == literal
+
+
+def _matches(item, dasl):
+    # build_filter が出力する形式だけを解釈する簡易 DASL 評価器
+    if not dasl:
+        return True
+    for clause in dasl[len("@SQL="):].split(" AND "):
+        terms = clause.strip("()").split(" OR ")
+        ok = False
+        for term in terms:
+            prop, rest = term[1:].split('" ', 1)
+            op, literal = rest.split(" ", 1)
+            literal = literal[1:-1].replace("''", "'")
+            ok = ok or _compare(item.values[prop], op, literal)
+        if not ok:
+            return False
+    return True
+
+
+class _FakeColumns:
+    def __init__(self):
+        self.names = []
+
+    def RemoveAll(self):
+        self.names = []
+
+    def Add(self, name):
+        self.names.append(name)
+
+
+class _FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.Columns = _FakeColumns()
+
+    def Sort(self, column, descending):
+        self.rows.sort(key=lambda item: item.values[column], reverse=descending)
+
+    def GetArray(self, max_rows):
+        return tuple(
+            tuple(item.values[name] for name in self.Columns.names)
+            for item in self.rows[:max_rows]
+        )
+
+
+class _FakeFolder:
+    def __init__(self, items):
+        self.items = items
+        self.filters = []
+
+    def GetTable(self, dasl, _kind):
+        self.filters.append(dasl)
+        return _FakeTable([item for item in self.items if _matches(item, dasl)])
+
+
+class _FakeNamespace:
+    def __init__(self, folder, outbox=None):
+        self.folder = folder
+        self.outbox = outbox if outbox is not None else _FakeFolder([])
+        self.opened = []
+
+    def GetDefaultFolder(self, folder_id):
+        return self.outbox if folder_id == OutlookMailSender.OUTBOX_FOLDER_ID else self.folder
+
+    def GetItemFromID(self, entry_id):
+        self.opened.append(entry_id)
+        item = next(i for i in self.folder.items if i.values["EntryID"] == entry_id)
+        return types.SimpleNamespace(Body=item.values[PROP_TEXT_BODY], HTMLBody="")
+
+
+class _FakeOutlook:
+    def __init__(self, folder, outbox=None):
+        self.namespace = _FakeNamespace(folder, outbox)
+
+    def GetNamespace(self, _name):
+        return self.namespace
+
+
+def _sent_folder(count, now):
+    items = []
+    for i in range(count):
+        items.append(_FakeSentItem(
+            entry_id=f"E{i}",
+            subject=f"見積依頼 {i % 10}",
+            sent_on=now - dt.timedelta(minutes=i),
+            to=f"Buyer {i} <buyer{i}@supplier.example>",
+            message_id=f"<m{i}@example.com>",
+            headers=f"Message-ID: <m{i}@example.com>\r\nX-Idempotency-Key: tok{i}\r\n",
+            body=f"本文 [ref:{i}]",
+            token=f"tok{i}" if i % 2 == 0 else "",
+        ))
+    return _FakeFolder(items)
+
+
+@contextlib.contextmanager
+def _local_timezone(name):
+    """プロセスのローカル時刻を一時的に切り替える（time.tzset のある環境のみ）。"""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = name
+    time.tzset()
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = previous
+        time.tzset()
+
+
+class SentItemsQueryTests(unittest.TestCase):
+    def test_filter_quotes_values_and_widens_time_window_to_minutes(self):
+        jst = dt.timezone(dt.timedelta(hours=9))
+        start = dt.datetime(2026, 5, 1, 21, 0, 30, tzinfo=jst)
+        end = dt.datetime(2026, 5, 1, 21, 3, 10, tzinfo=jst)
+        dasl = build_filter(subject="O'Brien 見積", sent_from=start, sent_to=end)
+        self.assertEqual(
+            dasl,
+            f'@SQL="{PROP_SUBJECT}" = \'O\'\'Brien 見積\' AND '
+            f'"{PROP_SENT_ON}" >= \'2026/05/01 12:00\' AND '
+            f'"{PROP_SENT_ON}" <= \'2026/05/01 12:04\'',
+        )
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "time.tzset is not available")
+    def test_local_time_bounds_are_written_in_utc(self):
+        with _local_timezone("Asia/Tokyo"):
+            dasl = build_filter(sent_from=dt.datetime(2026, 5, 1, 9, 0, 30))
+        self.assertEqual(dasl, f'@SQL="{PROP_SENT_ON}" >= \'2026/05/01 00:00\'')
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "time.tzset is not available")
+    def test_message_id_lookup_window_matches_on_non_utc_host(self):
+        with _local_timezone("Asia/Tokyo"):
+            now = dt.datetime(2026, 5, 1, 12, 0)
+            folder = _sent_folder(100, now)
+            sender = OutlookMailSender(send_interval_sec=0, message_id_retry_count=1)
+            with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook(folder)):
+                found = sender._get_message_id_from_sent_items(
+                    "見積依頼 2", "buyer2@supplier.example", now - dt.timedelta(minutes=2), 60
+                )
+        self.assertEqual(found, "<m2@example.com>")
+
+    def test_find_fetches_only_needed_columns_newest_first(self):
+        now = dt.datetime(2026, 5, 1, 12, 0)
+        folder = _sent_folder(30, now)
+        rows = SentItemsQuery(folder, max_rows=3).find(build_filter(subject="見積依頼 1"))
+        self.assertEqual([r.entry_id for r in rows], ["E1", "E11", "E21"])
+        self.assertEqual(rows[0].message_id, "<m1@example.com>")
+
+    def test_message_id_lookup_uses_subject_and_window(self):
+        now = dt.datetime(2026, 5, 1, 12, 0)
+        folder = _sent_folder(1000, now)
+        sender = OutlookMailSender(send_interval_sec=0, message_id_retry_count=1)
+        with mock.patch.object(sender, "_get_outlook", return_value=_FakeOutlook(folder)):
+            found = sender._get_message_id_from_sent_items(
+                "見積依頼 2", "buyer2@supplier.example", now - dt.timedelta(minutes=2), 60
+            )
+            missing = sender._get_message_id_from_sent_items(
+                "見積依頼 2", "other@supplier.example", now - dt.timedelta(minutes=2), 60
+            )
+
+        self.assertEqual(found, "<m2@example.com>")
+        self.assertEqual(missing, "")
+        self.assertEqual(len(folder.filters), 2)
+
+    def test_reconcile_of_large_folder_is_one_table_fetch(self):
+        now = dt.datetime.now().replace(second=0, microsecond=0)
+        folder = _sent_folder(1000, now)
+        sender = OutlookMailSender(send_interval_sec=0)
+        with mock.patch.object(mail_sender_module, "WIN32COM_AVAILABLE", True), mock.patch.object(
+            sender, "_get_outlook", return_value=_FakeOutlook(folder)
+        ):
+            by_header = sender.reconcile_unknown_send("TOK42", "[ref:42]", "", "見積依頼 2", "buyer42@supplier.example")
+            header_fetches = len(folder.filters)
+            by_body = sender.reconcile_unknown_send("", "[ref:43]", "", "", "")
+            by_subject = sender.reconcile_unknown_send(
+                "nope", "", "", "見積依頼 4", "buyer14@supplier.example", sent_after=now - dt.timedelta(minutes=15)
+            )
+            # 同じ件名・宛先でもロック確保より前の送信や、確保時刻が不明な場合は一致としない
+            before_lock = sender.reconcile_unknown_send(
+                "nope", "", "", "見積依頼 4", "buyer14@supplier.example", sent_after=now - dt.timedelta(minutes=10)
+            )
+            no_window = sender.reconcile_unknown_send("nope", "", "", "見積依頼 4", "buyer14@supplier.example")
+            unmatched = sender.reconcile_unknown_send("nope", "", "<none@x>", "no such subject", "")
+
+        self.assertEqual(header_fetches, 1)
+        self.assertEqual(
+            by_header, {"matched": True, "method": "header", "message_id": "<m42@example.com>", "checked": True}
+        )
+        self.assertEqual((by_body["method"], by_body["message_id"]), ("body", "<m43@example.com>"))
+        self.assertEqual((by_subject["method"], by_subject["message_id"]), ("subject_to", "<m14@example.com>"))
+        self.assertFalse(before_lock["matched"])
+        self.assertFalse(no_window["matched"])
+        self.assertFalse(unmatched["matched"])
+        self.assertTrue(unmatched["checked"])
+
+    def test_reconcile_is_unchecked_while_outbox_holds_the_mail_or_search_fails(self):
+        now = dt.datetime.now().replace(second=0, microsecond=0)
+        outbox = _FakeFolder([_FakeSentItem("O1", "見積依頼 X", None, "buyer@supplier.example")])
+        sender = OutlookMailSender(send_interval_sec=0)
+        with mock.patch.object(mail_sender_module, "WIN32COM_AVAILABLE", True), mock.patch.object(
+            sender, "_get_outlook", return_value=_FakeOutlook(_sent_folder(10, now), outbox)
+        ):
+            waiting = sender.reconcile_unknown_send("nope", "[ref:x]", "", "見積依頼 X", "buyer@supplier.example")
+            other = sender.reconcile_unknown_send("nope", "[ref:x]", "", "見積依頼 X", "other@supplier.example")
+            batch = sender.reconcile_unknown_batch([
+                {"request_key": "rq:waiting", "token": "nope", "subject": "見積依頼 X", "recipient": "buyer@supplier.example"},
+                {"request_key": "rq:unsent", "token": "nope", "subject": "見積依頼 Y", "recipient": "buyer@supplier.example"},
+            ])
+        with mock.patch.object(mail_sender_module, "WIN32COM_AVAILABLE", True), mock.patch.object(
+            sender, "_get_outlook", side_effect=RuntimeError("COM")
+        ):
+            failed = sender.reconcile_unknown_send("nope", "", "", "見積依頼 X", "")
+            failed_batch = sender.reconcile_unknown_batch([{"request_key": "rq:a", "token": "nope"}])
+
+        self.assertEqual((waiting["matched"], waiting["checked"]), (False, False))
+        self.assertEqual((other["matched"], other["checked"]), (False, True))
+        self.assertFalse(batch["rq:waiting"]["checked"])
+        self.assertTrue(batch["rq:unsent"]["checked"])
+        self.assertEqual((failed["matched"], failed["checked"]), (False, False))
+        self.assertFalse(failed_batch["rq:a"]["checked"])
+
+
+class BatchReconcileTests(unittest.TestCase):
+    def test_batch_resolves_all_locks_from_one_folder_pass(self):
+        now = dt.datetime.now().replace(second=0, microsecond=0)
+        folder = _sent_folder(1000, now)
+        outlook = _FakeOutlook(folder)
+        sender = OutlookMailSender(send_interval_sec=0)
+        locks = [
+            {"request_key": "rq:header", "token": "TOK10", "body_marker": "[ref:10]"},
+            {"request_key": "rq:body", "token": "tok11", "body_marker": "[ref:11]"},
+            {"request_key": "rq:mid", "token": "", "message_id": "<m13@example.com>"},
+            {"request_key": "rq:subject", "subject": "見積依頼 5", "recipient": "buyer25@supplier.example",
+             "sent_after": now - dt.timedelta(minutes=30), "sent_before": now - dt.timedelta(minutes=20)},
+            {"request_key": "rq:earlier", "subject": "見積依頼 5", "recipient": "buyer25@supplier.example",
+             "sent_after": now - dt.timedelta(minutes=20)},
+            {"request_key": "rq:unbounded", "subject": "見積依頼 5", "recipient": "buyer25@supplier.example"},
+            {"request_key": "rq:none", "token": "tok-x", "body_marker": "[ref:x]", "subject": "no such"},
+        ]
+        with mock.patch.object(mail_sender_module, "WIN32COM_AVAILABLE", True), mock.patch.object(
+            sender, "_get_outlook", return_value=outlook
+        ):
+            results = sender.reconcile_unknown_batch(locks)
+
+        # 全件の索引用に1回 + 未解決の本文マーカー用に1回
+        self.assertEqual(len(folder.filters), 2)
+        self.assertEqual(outlook.namespace.opened, ["E11"])
+        self.assertEqual(
+            results["rq:header"], {"matched": True, "method": "header", "message_id": "<m10@example.com>", "checked": True}
+        )
+        self.assertEqual((results["rq:body"]["method"], results["rq:body"]["message_id"]), ("body", "<m11@example.com>"))
+        self.assertEqual(results["rq:mid"]["method"], "message_id")
+        self.assertEqual((results["rq:subject"]["method"], results["rq:subject"]["message_id"]), ("subject_to", "<m25@example.com>"))
+        self.assertFalse(results["rq:earlier"]["matched"])
+        self.assertFalse(results["rq:unbounded"]["matched"])
+        self.assertEqual((results["rq:none"]["matched"], results["rq:none"]["checked"]), (False, True))
+
+    def test_transport_without_sent_folder_reports_unmatched(self):
+        sender = OutlookMailSender(send_interval_sec=0)
+        with mock.patch.object(mail_sender_module, "WIN32COM_AVAILABLE", False):
+            results = sender.reconcile_unknown_batch([{"request_key": "rq:a", "token": "t"}])
+        self.assertEqual(results, {"rq:a": {"matched": False, "method": "", "message_id": "", "checked": False}})
+
+    def test_ledger_lists_unknown_locks_by_key_and_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            for key, run_id in (("rq:a", "run-1"), ("rq:b", "run-1"), ("rq:c", "run-2")):
+                ledger.mark_unknown_sent(
+                    request_key=key,
+                    v1_key="",
+                    key_version="v2",
+                    run_id=run_id,
+                    mail_key="mk",
+                    recipient_hash="h",
+                    idempotency_token="t",
+                    idempotency_secret_version="v1",
+                    subject_norm="s",
+                    decision_trace=["x"],
+                    error="e",
+                    hold_sec=600,
+                )
+            by_run = [lock["request_key"] for lock in ledger.list_unknown_locks(run_id="run-1")]
+            by_keys = [lock["request_key"] for lock in ledger.list_unknown_locks(request_keys=["rq:c", "rq:a", "rq:z"])]
+            ledger.close()
+
+        self.assertEqual(by_run, ["rq:a", "rq:b"])
+        self.assertEqual(by_keys, ["rq:a", "rq:c"])
+
+    def test_ledger_reports_when_each_lock_was_reserved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = SendLedger(str(Path(tmp) / "ledger.sqlite3"))
+            first = dt.datetime(2026, 5, 1, 3, 0, tzinfo=dt.timezone.utc)
+            for key, minutes in (("rq:a", 0), ("rq:b", 5)):
+                ledger.reserve_send(
+                    request_key=key,
+                    v1_key="",
+                    key_version="v2",
+                    run_id="run-1",
+                    mail_key="mk",
+                    recipient_hash="h",
+                    idempotency_token="t-" + key,
+                    idempotency_secret_version="v1",
+                    subject_norm="s",
+                    ttl_sec=60,
+                    decision_trace=["reserve"],
+                    now=first + dt.timedelta(minutes=minutes),
+                )
+            reserved = ledger.reserved_at(["rq:b", "rq:a", "rq:z"])
+            ledger.close()
+
+        self.assertEqual(reserved, {"rq:a": first, "rq:b": first + dt.timedelta(minutes=5)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+from email import message_from_bytes
+from email import policy
+from pathlib import Path
+import sys
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.mail_sender import OutlookMailSender, SmtpTransport
+from scripts.smtp_sink import SmtpSink
+
+
+def _sender(sink: SmtpSink, **kwargs) -> OutlookMailSender:
+    host, port = sink.address
+    transport = SmtpTransport(host=host, port=port, from_address="quote@example.jp", **kwargs)
+    return OutlookMailSender(send_interval_sec=0, retry_count=1, retry_interval_sec=0, transport=transport)
+
+
+class SmtpTransportTests(unittest.TestCase):
+    def test_messages_share_one_connection_and_carry_generated_message_id(self):
+        with SmtpSink() as sink:
+            sender = _sender(sink)
+            results = [
+                sender.send_mail(
+                    to=f"buyer{i}@supplier.example",
+                    subject="見積依頼",
+                    body="本文です。\n.先頭ドット",
+                    idempotency_token=f"tok{i}",
+                    body_reconcile_marker=f"[ref:{i}]",
+                )
+                for i in range(3)
+            ]
+            sender.close()
+
+        self.assertTrue(all(r.success for r in results), [r.error for r in results])
+        self.assertEqual(sink.connections, 1)
+        self.assertEqual(len(sink.messages), 3)
+        for i, (result, received) in enumerate(zip(results, sink.messages)):
+            parsed = message_from_bytes(received.data, policy=policy.default)
+            self.assertEqual(result.message_id_source, "generated")
+            self.assertFalse(result.is_fallback_id)
+            self.assertEqual(parsed["Message-ID"], result.message_id)
+            self.assertEqual(parsed["X-Idempotency-Key"], f"tok{i}")
+            self.assertEqual(received.recipients, [f"buyer{i}@supplier.example"])
+            content = parsed.get_content()
+            self.assertIn("\n.先頭ドット", content)
+            self.assertTrue(content.rstrip().endswith(f"[ref:{i}]"))
+
+    def test_stamped_message_id_is_used_as_header(self):
+        with SmtpSink() as sink:
+            host, port = sink.address
+            transport = SmtpTransport(host=host, port=port, from_address="quote@example.jp")
+            sender = OutlookMailSender(send_interval_sec=0, transport=transport, message_id_mode="stamped")
+            result = sender.send_mail(
+                to="a@supplier.example",
+                subject="s",
+                body="b",
+                idempotency_token="tok",
+                message_id_scope="run-1",
+            )
+            sender.close()
+
+        parsed = message_from_bytes(sink.messages[0].data, policy=policy.default)
+        self.assertEqual(result.message_id_source, "stamped")
+        self.assertEqual(parsed["Message-ID"], result.message_id)
+
+    def test_without_pipelining_falls_back_to_stepwise_commands(self):
+        with SmtpSink(pipelining=False) as sink:
+            sender = _sender(sink)
+            result = sender.send_mail(to="a@supplier.example", subject="s", body="b")
+            sender.close()
+
+        self.assertTrue(result.success, result.error)
+        self.assertEqual(sink.received, 1)
+
+    def test_rejected_recipient_fails_without_breaking_connection(self):
+        with SmtpSink(reject_recipients=["bad@supplier.example"]) as sink:
+            sender = _sender(sink)
+            rejected = sender.send_mail(to="bad@supplier.example", subject="s", body="b")
+            accepted = sender.send_mail(to="good@supplier.example", subject="s", body="b")
+            sender.close()
+
+        self.assertFalse(rejected.success)
+        self.assertIn("550", rejected.error)
+        self.assertTrue(accepted.success, accepted.error)
+        self.assertEqual(sink.received, 1)
+        self.assertEqual(sink.connections, 1)
+
+    def test_pipelined_envelope_uses_bare_address_and_rejects_line_breaks(self):
+        with SmtpSink() as sink:
+            sender = _sender(sink)
+            named = sender.send_mail(to="Buyer <buyer@supplier.example>", subject="s", body="b")
+            injected = sender.send_mail(
+                to="a@supplier.example>\r\nRCPT TO:<evil@attacker.example", subject="s", body="b"
+            )
+            transport = sender.transport
+            with self.assertRaises(ValueError):
+                transport._envelope_address("a@supplier.example\nRSET")
+            sender.close()
+
+        self.assertTrue(named.success, named.error)
+        self.assertFalse(injected.success)
+        self.assertEqual(sink.received, 1)
+        self.assertEqual(sink.messages[0].recipients, ["buyer@supplier.example"])
+
+    def test_reconnects_after_idle_disconnect_and_connection_limit(self):
+        with SmtpSink() as sink:
+            sender = _sender(sink, max_messages_per_connection=2)
+            first = sender.send_mail(to="a@supplier.example", subject="s", body="b")
+            sink.drop_connections()
+            second = sender.send_mail(to="b@supplier.example", subject="s", body="b")
+            third = sender.send_mail(to="c@supplier.example", subject="s", body="b")
+            fourth = sender.send_mail(to="d@supplier.example", subject="s", body="b")
+            sender.close()
+
+        self.assertTrue(all(r.success for r in (first, second, third, fourth)))
+        self.assertEqual(sink.received, 4)
+        # 切断後の再接続 + 2通ごとの張り直し
+        self.assertEqual(sink.connections, 3)
+
+    def test_check_connection_and_reconcile_are_transport_specific(self):
+        with SmtpSink() as sink:
+            sender = _sender(sink)
+            ok, message = sender.check_connection()
+            reconcile = sender.reconcile_unknown_send("tok", "marker", "", "s", "a@supplier.example")
+            sender.close()
+
+        self.assertTrue(ok, message)
+        self.assertFalse(reconcile["matched"])
+        self.assertFalse(reconcile["checked"])
+
+    def test_from_address_is_required(self):
+        with self.assertRaises(ValueError):
+            SmtpTransport(host="127.0.0.1", port=25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts import template_processor
+from scripts.template_processor import TemplateProcessor
+
+try:
+    import docx
+except ImportError:  # pragma: no cover - python-docx 未導入環境
+    docx = None
+
+
+def _write_docx(path: Path, *paragraphs: str) -> None:
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(str(path))
+
+
+@unittest.skipIf(docx is None, "python-docx is not installed")
+class DocxTemplateCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = Path(self._tmp.name)
+        self.cache_dir = self.tmp / "cache"
+        self.template = self.tmp / "template.docx"
+        _write_docx(self.template, "≪会社名≫ 御中", "本文")
+        template_processor._DOCX_TEXT_CACHE.clear()
+        self.addCleanup(template_processor._DOCX_TEXT_CACHE.clear)
+
+    def test_reuses_memory_then_persisted_text_until_file_changes(self):
+        processor = TemplateProcessor(cache_dir=str(self.cache_dir))
+        first = processor.load_template(str(self.template))
+        self.assertTrue(first.success)
+        self.assertEqual(first.content, "≪会社名≫ 御中\n本文")
+
+        with mock.patch("docx.Document", side_effect=AssertionError("parsed again")):
+            self.assertEqual(TemplateProcessor().load_template(str(self.template)).content, first.content)
+            template_processor._DOCX_TEXT_CACHE.clear()
+            cold = TemplateProcessor(cache_dir=str(self.cache_dir)).load_template(str(self.template))
+            self.assertEqual(cold.content, first.content)
+
+        _write_docx(self.template, "{{会社名}} 様")
+        stat = self.template.stat()
+        os.utime(self.template, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        changed = TemplateProcessor(cache_dir=str(self.cache_dir)).load_template(str(self.template))
+        self.assertEqual(changed.content, "{{会社名}} 様")
+
+    def test_corrupt_cache_entry_falls_back_to_parsing(self):
+        processor = TemplateProcessor(cache_dir=str(self.cache_dir))
+        processor.load_template(str(self.template))
+        for entry in self.cache_dir.glob("docx_*.json"):
+            entry.write_text("{broken", encoding="utf-8")
+        template_processor._DOCX_TEXT_CACHE.clear()
+        result = processor.load_template(str(self.template))
+        self.assertTrue(result.success)
+        self.assertEqual(result.content, "≪会社名≫ 御中\n本文")
+
+    def test_cold_start_with_valid_cache_does_not_import_python_docx(self):
+        TemplateProcessor(cache_dir=str(self.cache_dir)).load_template(str(self.template))
+        script = (
+            "import sys\n"
+            f"sys.path.insert(0, {str(SKILL_DIR)!r})\n"
+            "from scripts.template_processor import TemplateProcessor\n"
+            f"result = TemplateProcessor(cache_dir={str(self.cache_dir)!r}).load_template({str(self.template)!r})\n"
+            "assert result.success, result.error\n"
+            "print('docx' in sys.modules)\n"
+        )
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
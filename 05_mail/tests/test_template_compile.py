@@ -0,0 +1,125 @@
+from pathlib import Path
+import random
+import sys
+import unittest
+
+
+SKILL_DIR = Path(__file__).resolve().parents[1]
+if str(SKILL_DIR) not in sys.path:
+    sys.path.insert(0, str(SKILL_DIR))
+
+from scripts.csv_handler import ContactRecord
+from scripts.template_processor import TemplateProcessor, get_default_template
+
+
+_VARIABLES = {
+    "会社名": "A社",
+    "担当者名": "山田 太郎",
+    "製品名": "96ウェルプレート",
+    "製品URL": "https://example.com/p?a=1",
+    "数量": "",
+}
+
+
+class CompiledTemplateTests(unittest.TestCase):
+    def setUp(self):
+        self.processor = TemplateProcessor()
+
+    def assertSameAsRender(self, template, variables, strict=False):
+        expected = self.processor.render(template, variables, strict=strict)
+        actual = self.processor.compile(template).render(variables, strict=strict)
+        self.assertEqual(actual.success, expected.success, template)
+        self.assertEqual(actual.content, expected.content, template)
+        self.assertEqual(actual.error, expected.error, template)
+        self.assertEqual(sorted(actual.missing_variables), sorted(expected.missing_variables), template)
+
+    def test_matches_render_for_supported_and_edge_syntax(self):
+        templates = [
+            get_default_template(),
+            "{{会社名}} 御中\n{{担当者名}} 様\n{{製品名}}",
+            "«会社名» / ≪会社名≫ / {{会社名}} / ≪会社名» / {{ 会社名 }}",
+            "≪≪会社名≫≫ {{{会社名}}} {{{{製品名}}}} ≪≫ {{}}",
+            "≪未定義≫ {{未定義2}} 本文 { 単独 } 括弧",
+            "",
+            "変数なし",
+        ]
+        variable_sets = [
+            _VARIABLES,
+            {},
+            dict(_VARIABLES, 会社名="{{製品名}}"),
+            dict(_VARIABLES, 会社名="≪", 担当者名="会社名≫"),
+            dict(_VARIABLES, **{"": "空"}),
+        ]
+        for template in templates:
+            for variables in variable_sets:
+                self.assertSameAsRender(template, variables)
+                self.assertSameAsRender(template, variables, strict=True)
+
+    def test_matches_render_on_random_templates(self):
+        rng = random.Random(20261016)
+        pieces = ["≪", "≫", "«", "»", "{{", "}}", "{", "}", "会社名", "製品名", "x", " ", "\n"]
+        names = ["会社名", "製品名", "x", ""]
+        values = ["", "V", "{{x}}", "≫", "会社名", "{"]
+        for _ in range(2000):
+            template = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            variables = {name: rng.choice(values) for name in rng.sample(names, rng.randint(0, len(names)))}
+            self.assertSameAsRender(template, variables)
+
+    def test_create_email_body_accepts_compiled_template(self):
+        template = get_default_template()
+        compiled = self.processor.compile(template)
+        kwargs = dict(
+            company_name="A社",
+            contact_name="山田 太郎",
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com",
+            maker_name="M",
+            maker_code="C-1",
+            quantity="2",
+        )
+        self.assertEqual(
+            self.processor.create_email_body(template_content=compiled, **kwargs).content,
+            self.processor.create_email_body(template_content=template, **kwargs).content,
+        )
+
+    def test_render_batch_matches_create_email_body_per_recipient(self):
+        constant_vars = dict(
+            product_name="P",
+            product_features="F",
+            product_url="https://example.com",
+            maker_name="M",
+            maker_code="C-1",
+            quantity="2",
+        )
+        records = [
+            ContactRecord(company_name="A社", email="a@example.com", contact_name="山田 太郎"),
+            ContactRecord(company_name="B社", email="b@example.com", contact_name="鈴木"),
+            ContactRecord(company_name="{{製品名}}社", email="c@example.com", contact_name="≪会社名≫"),
+        ]
+        templates = [get_default_template(), "{{会社名}} {{姓}} 様 {{製品名}} ≪未定義≫", "{ ≪会社名≫ }"]
+        for template in templates:
+            for extra in ({}, {"製品名": "≪会社名≫"}, {"会社名": "固定"}):
+                compiled = self.processor.compile(template)
+                batch = self.processor.render_batch(
+                    compiled,
+                    dict(constant_vars, **extra),
+                    records,
+                    fingerprint=lambda body: f"#{len(body)}",
+                    workers=2,
+                )
+                for record, rendered in zip(records, batch):
+                    expected = self.processor.create_email_body(
+                        template,
+                        record.company_name,
+                        record.contact_name,
+                        **constant_vars,
+                        **extra,
+                    )
+                    self.assertEqual(rendered.body, expected.content, (template, extra))
+                    self.assertEqual(rendered.fingerprint, f"#{len(expected.content)}")
+                    self.assertEqual(sorted(rendered.missing_variables), sorted(expected.missing_variables))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -100,8 +100,11 @@ class UnknownSentReconcileTests(unittest.TestCase):
 
                 with mock.patch.object(
                     skill.mail_sender,
-                    "reconcile_unknown_send",
-                    return_value={"matched": True, "method": "header", "message_id": "MID-1"},
+                    "reconcile_unknown_batch",
+                    side_effect=lambda locks: {
+                        lock["request_key"]: {"matched": True, "method": "header", "message_id": "MID-1"}
+                        for lock in locks
+                    },
                 ), mock.patch.object(skill.mail_sender, "send_mail") as send_mock_2:
                     second = skill.send_bulk(
                         records=[record],